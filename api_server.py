@@ -0,0 +1,497 @@
+# api_server.py — API REST/JSON locale (ASGI) : réponses, normes, utilisateurs, métriques et risque
+# ============================================================
+# Lancement autonome :  python api_server.py [--host 127.0.0.1] [--port 8765]   (uvicorn requis)
+# Embarqué dans l'UI  :  CYBERPIVOT_API_PORT=8765 streamlit run app_cyberpivot.py
+#                        -> start_in_thread() : même processus, donc même backend (pool SQLAlchemy)
+#                           et même file d'écriture (write_queue) que l'interface
+#
+# - Authentification : POST /auth/token {email, password} -> jeton Bearer signé (HMAC, CYBERPIVOT_API_SECRET)
+# - Tenant : celui de l'utilisateur ; un admin peut cibler ?tenant=
+#   Isolation réelle seulement avec CYBERPIVOT_SHARDING=1 (une base par tenant). En base unique, les audits
+#   ne portent pas de tenant : les vues transverses (GET /audits, /changes, /metrics sans audits, /trends
+#   sans audits) sont réservées aux admins ; les routes /audits/{id}/… restent ouvertes à qui connaît l'id
+# - Lectures paginées par curseur opaque (clé domain, qid, item) : ?limit=&cursor=
+# - ETag / If-None-Match (304) sur normes et métriques ; gzip si Accept-Encoding le permet
+# - Écritures groupées : PUT /audits/{id}/responses [ {...}, ... ] (acquittées après commit)
+# - Appels bloquants (SQLite, pandas) exécutés dans un pool de threads borné
+# ============================================================
+#
+# GET    /health
+# POST   /auth/token                         GET /me
+# GET    /users            POST /users       (admin)
+# GET    /audits?limit=&offset=
+# GET    /audits/{id}/responses?limit=&cursor=&domain=&level=&columns=
+# PUT    /audits/{id}/responses              GET|DELETE /audits/{id}/responses/{qid}/{item}
+# DELETE /audits/{id}/responses  ({"keys": [[qid, item], ...]} ou {"all": true})
+# GET    /changes?since=&limit=&audits=      (journal response_changes, curseur = seq)
+# GET    /audits/{id}/metrics                GET|POST /metrics  (?audits=a,b | {"audit_ids": [...]})
+# GET    /audits/{id}/risk?limit=
+# GET    /audits/{id}/export?format=parquet|arrow|csv   (fichier colonnes, engine.columnar)
+# GET    /trends?grain=month|quarter|day&from=&to=&project=&standard=&audits=&domain=&by=project|standard|audit|domain
+# GET    /norms            GET /norms/{name}   PUT|DELETE /norms/{name} (admin)
+
+import os
+import re
+import hmac
+import gzip
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote
+
+import storage
+import storage_backend
+import tenancy
+import write_queue
+
+SECRET = (os.getenv("CYBERPIVOT_API_SECRET") or secrets.token_hex(32)).encode("utf-8")
+TOKEN_TTL_S = int(os.getenv("CYBERPIVOT_API_TOKEN_TTL", "3600"))
+MAX_BODY = int(os.getenv("CYBERPIVOT_API_MAX_BODY_MB", "50")) * 1024 * 1024
+GZIP_MIN = 1024
+PAGE_DEFAULT, PAGE_MAX = 500, 5000
+WORKERS = int(os.getenv("CYBERPIVOT_API_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+_POOL = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="cp-api")
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message); self.status = status; self.message = message
+
+# ============================================================
+# Requête / réponse
+# ============================================================
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body", "params", "user")
+    def __init__(self, scope: Dict[str, Any], body: bytes):
+        self.method = scope["method"]; self.path = scope["path"]; self.body = body
+        self.query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.params: Dict[str, str] = {}; self.user: Dict[str, Any] = {}
+
+    def arg(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        v = self.query.get(name); return v[0] if v else default
+
+    def int_arg(self, name: str, default: int, hi: Optional[int] = None) -> int:
+        try: n = int(self.arg(name, default))
+        except (TypeError, ValueError): raise ApiError(400, f"Paramètre entier attendu : {name}")
+        return max(0, min(n, hi) if hi else n)
+
+    def json(self) -> Any:
+        try: return json.loads(self.body or b"null")
+        except ValueError: raise ApiError(400, "JSON invalide")
+
+    @property
+    def tenant(self) -> str:
+        t = self.arg("tenant")
+        if t and self.user.get("role") == "admin": return t
+        return self.user.get("tenant_id") or "default"
+
+class Response:
+    __slots__ = ("status", "payload", "etag", "headers")
+    def __init__(self, payload: Any = None, status: int = 200, etag: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+        self.status = status; self.payload = payload; self.etag = etag; self.headers = headers or {}
+
+def _etag(*parts: Any) -> str:
+    return '"' + hashlib.sha1(json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest() + '"'
+
+def _not_modified(req: Request, etag: str) -> bool:
+    inm = req.headers.get("if-none-match", "")
+    return bool(inm) and (inm.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in inm.split(",")])
+
+async def _send(send, req: Optional[Request], resp: Response) -> None:
+    headers: List[Tuple[bytes, bytes]] = [(b"vary", b"Accept-Encoding")]
+    headers += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in resp.headers.items()]
+    if resp.etag:
+        headers.append((b"etag", resp.etag.encode("latin-1")))
+        if req is not None and resp.status == 200 and _not_modified(req, resp.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""}); return
+    raw = isinstance(resp.payload, (bytes, bytearray))  # fichier binaire : content-type fourni par la route
+    body = b"" if resp.payload is None else bytes(resp.payload) if raw else json.dumps(resp.payload, ensure_ascii=False, default=str).encode("utf-8")
+    if body and not raw:
+        headers.append((b"content-type", b"application/json; charset=utf-8"))
+        if len(body) >= GZIP_MIN and req is not None and "gzip" in req.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=5); headers.append((b"content-encoding", b"gzip"))
+    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+    await send({"type": "http.response.start", "status": resp.status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+def _run(fn: Callable, *a, **kw) -> Awaitable:
+    """Exécute un appel bloquant dans le pool de l'API."""
+    return asyncio.get_running_loop().run_in_executor(_POOL, lambda: fn(*a, **kw))
+
+def _db() -> storage_backend.StorageBackend:
+    return storage_backend.get_backend()
+
+# ============================================================
+# Jetons (HMAC) — payload base64url « email|tenant|role|exp »
+# ============================================================
+def _b64(b: bytes) -> str:
+    return base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
+
+def _unb64(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+def issue_token(user: Dict[str, Any], ttl: int = TOKEN_TTL_S) -> str:
+    raw = json.dumps([user["email"], user.get("tenant_id") or "default", user.get("role") or "user",
+                      int(time.time()) + ttl]).encode("utf-8")
+    return _b64(raw) + "." + _b64(hmac.new(SECRET, raw, hashlib.sha256).digest())
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        p, sig = token.split(".", 1); raw = _unb64(p)
+        if not hmac.compare_digest(_unb64(sig), hmac.new(SECRET, raw, hashlib.sha256).digest()): return None
+        email, tenant, role, exp = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return {"email": email, "tenant_id": tenant, "role": role} if exp > time.time() else None
+
+def _authenticate(req: Request) -> None:
+    h = req.headers.get("authorization", "")
+    user = verify_token(h[7:].strip()) if h[:7].lower() == "bearer " else None
+    if user is None: raise ApiError(401, "Jeton Bearer manquant, invalide ou expiré")
+    req.user = user
+
+def _require_admin(req: Request) -> None:
+    if req.user.get("role") != "admin": raise ApiError(403, "Réservé aux administrateurs")
+
+def _require_cross_audit(req: Request) -> None:
+    """Vue sur tous les audits : sans shards, tenant_id n'y filtre rien => admin seulement."""
+    if not tenancy.sharding_enabled() and req.user.get("role") != "admin":
+        raise ApiError(403, "Vue transverse réservée aux administrateurs (isolation par tenant : CYBERPIVOT_SHARDING=1)")
+
+# ============================================================
+# Curseurs de pagination (clé storage.PAGE_KEY)
+# ============================================================
+def _encode_cursor(key: Optional[tuple]) -> Optional[str]:
+    return None if key is None else _b64(json.dumps(list(key), ensure_ascii=False).encode("utf-8"))
+
+def _decode_cursor(c: Optional[str]) -> Optional[tuple]:
+    if not c: return None
+    try:
+        k = json.loads(_unb64(c))
+        if isinstance(k, list) and len(k) == len(storage.PAGE_KEY): return tuple(k)
+    except ValueError:
+        pass
+    raise ApiError(400, "Curseur invalide")
+
+def _csv_arg(req: Request, name: str) -> Optional[List[str]]:
+    vals = [x.strip() for v in req.query.get(name, []) for x in v.split(",") if x.strip()]
+    return vals or None
+
+# ============================================================
+# Routes
+# ============================================================
+_ROUTES: List[Tuple[str, "re.Pattern[str]", Callable, bool]] = []
+
+def route(method: str, pattern: str, auth: bool = True):
+    rx = re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", pattern) + "$")
+    def deco(fn):
+        _ROUTES.append((method, rx, fn, auth)); return fn
+    return deco
+
+@route("GET", "/health", auth=False)
+async def health(req: Request) -> Response:
+    return Response({"status": "ok", "backend": type(_db()).__name__})
+
+@route("POST", "/auth/token", auth=False)
+async def token(req: Request) -> Response:
+    b = req.json() or {}
+    email, pwd = str(b.get("email") or "").strip().lower(), str(b.get("password") or "")
+    if not email or not pwd: raise ApiError(400, "email et password requis")
+    user = await _run(_db().verify_password, email, pwd)
+    if not user: raise ApiError(401, "Identifiants invalides")
+    return Response({"access_token": issue_token(user), "token_type": "bearer", "expires_in": TOKEN_TTL_S})
+
+@route("GET", "/me")
+async def me(req: Request) -> Response:
+    return Response(req.user)
+
+def _public_user(u: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in u.items() if k != "pwd_hash"}
+
+@route("GET", "/users")
+async def users(req: Request) -> Response:
+    _require_admin(req)
+    return Response([_public_user(u) for u in await _run(_db().list_users)])
+
+@route("POST", "/users")
+async def create_user(req: Request) -> Response:
+    _require_admin(req); b = req.json() or {}
+    try:
+        u = await _run(_db().create_user, str(b.get("email") or ""), b.get("password"), b.get("full_name") or "",
+                       b.get("role") or "user", b.get("tenant_id") or "default")
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    return Response(_public_user(u), status=201)
+
+@route("GET", "/audits")
+async def audits(req: Request) -> Response:
+    _require_cross_audit(req)
+    limit = req.int_arg("limit", PAGE_DEFAULT, PAGE_MAX); offset = req.int_arg("offset", 0)
+    rows = await _run(_db().list_audits, req.tenant)
+    return Response({"items": rows[offset:offset + limit], "total": len(rows), "offset": offset, "limit": limit})
+
+@route("GET", "/audits/{audit_id}/responses")
+async def responses(req: Request) -> Response:
+    aid = req.params["audit_id"]; limit = req.int_arg("limit", PAGE_DEFAULT, PAGE_MAX) or PAGE_DEFAULT
+    want = _csv_arg(req, "columns") or list(storage.DEST_COLS)
+    cols = want + [k for k in storage.PAGE_KEY if k not in want]
+    try:
+        rows = await _run(_db().query_responses, aid, columns=cols, domains=_csv_arg(req, "domain"),
+                          levels=_csv_arg(req, "level"), after=_decode_cursor(req.arg("cursor")),
+                          limit=limit, tenant_id=req.tenant)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    nxt = tuple(rows[-1][k] for k in storage.PAGE_KEY) if len(rows) == limit else None
+    if cols != want: rows = [{k: r[k] for k in want} for r in rows]
+    return Response({"items": rows, "next_cursor": _encode_cursor(nxt), "limit": limit})
+
+@route("PUT", "/audits/{audit_id}/responses")
+async def put_responses(req: Request) -> Response:
+    b = req.json(); recs = b.get("responses") if isinstance(b, dict) else b
+    if not isinstance(recs, list) or not all(isinstance(r, dict) for r in recs):
+        raise ApiError(400, "Liste de réponses attendue")
+    try:
+        fut = write_queue.get_queue(req.tenant).submit(req.params["audit_id"], recs)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    n = await asyncio.wrap_future(fut)
+    return Response({"written": n})
+
+@route("GET", "/audits/{audit_id}/responses/{qid}/{item}")
+async def get_response(req: Request) -> Response:
+    r = await _run(_db().get_response, req.params["audit_id"], unquote(req.params["qid"]),
+                   unquote(req.params["item"]), tenant_id=req.tenant)
+    if r is None: raise ApiError(404, "Réponse introuvable")
+    return Response(r)
+
+@route("DELETE", "/audits/{audit_id}/responses/{qid}/{item}")
+async def delete_response(req: Request) -> Response:
+    ok = await _run(_db().delete_response, req.params["audit_id"], unquote(req.params["qid"]),
+                    unquote(req.params["item"]), tenant_id=req.tenant)
+    if not ok: raise ApiError(404, "Réponse introuvable")
+    _touch_trends(req.params["audit_id"], req.tenant)
+    return Response(None, status=204)
+
+@route("DELETE", "/audits/{audit_id}/responses")
+async def delete_responses(req: Request) -> Response:
+    b = req.json() or {}
+    if not isinstance(b, dict): raise ApiError(400, "Objet JSON attendu")
+    keys = b.get("keys")
+    if b.get("all") is True: keys = None
+    elif not isinstance(keys, list) or not all(isinstance(k, list) and len(k) == 2 for k in keys):
+        raise ApiError(400, 'keys : [[qid, item], ...] ou {"all": true}')
+    # la file d'écriture est vidée d'abord : une suppression ne doit pas précéder un upsert déjà acquitté
+    await _run(write_queue.get_queue(req.tenant).flush)
+    n = await _run(_db().delete_responses, req.params["audit_id"], [tuple(k) for k in keys] if keys is not None else None,
+                   tenant_id=req.tenant)
+    if n: _touch_trends(req.params["audit_id"], req.tenant)
+    return Response({"deleted": n})
+
+@route("GET", "/changes")
+async def changes(req: Request) -> Response:
+    _require_cross_audit(req)
+    page = await _run(_db().changes_since, req.int_arg("since", 0), req.int_arg("limit", PAGE_DEFAULT, PAGE_MAX) or PAGE_DEFAULT,
+                      _csv_arg(req, "audits"), tenant_id=req.tenant)
+    return Response(page)
+
+async def _metrics(req: Request, ids: Optional[List[str]]) -> Response:
+    if ids is None: _require_cross_audit(req)
+    db = _db()
+    am = await _run(db.audit_metrics, ids, tenant_id=req.tenant)
+    dm = await _run(db.domain_metrics, ids, tenant_id=req.tenant)
+    body = {a: {**m, "by_domain": dm.get(a, {})} for a, m in am.items()}
+    return Response(body, etag=_etag("metrics", req.tenant, body))
+
+@route("GET", "/audits/{audit_id}/metrics")
+async def audit_metrics(req: Request) -> Response:
+    r = await _metrics(req, [req.params["audit_id"]])
+    if not r.payload: raise ApiError(404, "Audit inconnu")
+    r.payload = r.payload[req.params["audit_id"]]; return r
+
+@route("GET", "/metrics")
+async def metrics(req: Request) -> Response:
+    return await _metrics(req, _csv_arg(req, "audits"))
+
+@route("POST", "/metrics")
+async def metrics_bulk(req: Request) -> Response:
+    b = req.json() or {}; ids = b.get("audit_ids") if isinstance(b, dict) else None
+    if ids is not None and not isinstance(ids, list): raise ApiError(400, "audit_ids : liste attendue")
+    return await _metrics(req, [str(x) for x in ids] if ids is not None else None)
+
+def _risk_rows(audit_id: str, tenant_id: str, limit: int) -> Dict[str, Any]:
+    from engine.risk import MODEL_VERSION, RISK_COLS, action_order, control_text, responses_risk
+    df = _db().query_responses(audit_id, columns=["domain", "qid", "item", "question", "level"], as_frame=True, tenant_id=tenant_id)
+    r = action_order(responses_risk(df.assign(question=control_text(df["item"], df["question"])))) if len(df) else df
+    cols = ["domain", "qid", "item", "answer"] + RISK_COLS
+    return {"model": MODEL_VERSION, "n": len(r), "exp_loss_total": float(r["exp_loss"].sum()) if len(r) else 0.0,
+            "items": r[cols].head(limit).to_dict(orient="records") if len(r) else []}
+
+@route("GET", "/audits/{audit_id}/risk")
+async def risk(req: Request) -> Response:
+    body = await _run(_risk_rows, req.params["audit_id"], req.tenant, req.int_arg("limit", PAGE_DEFAULT, PAGE_MAX))
+    return Response(body, etag=_etag("risk", req.tenant, body["model"], body["items"]))
+
+EXPORT_TYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.file",
+                "csv": "application/gzip"}
+
+def _export_bytes(audit_id: str, tenant_id: str, fmt: str) -> Optional[bytes]:
+    from engine import columnar
+    df = _db().query_responses(audit_id, columns=columnar.KINDS["responses"], as_frame=True, tenant_id=tenant_id)
+    return columnar.to_bytes(df, "responses", fmt) if len(df) else None
+
+@route("GET", "/audits/{audit_id}/export")
+async def export_audit(req: Request) -> Response:
+    from engine import columnar
+    aid = req.params["audit_id"]; fmt = req.arg("format") or columnar.default_format()
+    try:
+        data = await _run(_export_bytes, aid, req.tenant, columnar._check(fmt))
+    except (ValueError, RuntimeError) as e:
+        raise ApiError(400, str(e))
+    if data is None: raise ApiError(404, "Audit inconnu")
+    name = re.sub(r"[^\w.-]+", "_", aid) + columnar.EXT[fmt]
+    return Response(data, headers={"Content-Type": EXPORT_TYPES[fmt], "Content-Disposition": f'attachment; filename="{name}"'})
+
+@route("GET", "/trends")
+async def trends_series(req: Request) -> Response:
+    grain, by = req.arg("grain", "month"), req.arg("by")
+    if not _csv_arg(req, "audits"): _require_cross_audit(req)
+    try:
+        rows = await _run(_db().trend_series, grain, req.arg("from"), req.arg("to"), req.arg("project"), req.arg("standard"),
+                          _csv_arg(req, "audits"), req.arg("domain", ""), by, tenant_id=req.tenant)
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    body = {"grain": grain, "by": by, "items": rows}
+    return Response(body, etag=_etag("trends", req.tenant, body))
+
+def _touch_trends(audit_id: str, tenant_id: str) -> None:
+    from engine import trends
+    trends.touch([audit_id], tenant_id, _db())  # sans effet si l'alimentation n'est pas installée
+
+@route("GET", "/norms")
+async def norms_list(req: Request) -> Response:
+    rows = await _run(_db().list_norms, req.tenant)
+    return Response({"items": rows}, etag=_etag("norms", req.tenant, rows))
+
+async def _norm_meta(req: Request, name: str) -> Optional[Dict[str, Any]]:
+    return next((n for n in await _run(_db().list_norms, req.tenant) if n["name"] == name), None)
+
+@route("GET", "/norms/{name}")
+async def norm_get(req: Request) -> Response:
+    name = unquote(req.params["name"]); meta = await _norm_meta(req, name)
+    if meta is None: raise ApiError(404, "Norme introuvable")
+    # ETag tiré des métadonnées : un 304 ne lit ni ne sérialise le contenu de la norme
+    etag = _etag("norm", req.tenant, name, meta["updated_at"])
+    if _not_modified(req, etag): return Response(None, etag=etag)
+    df = await _run(_db().get_norm_df, req.tenant, name)
+    if df is None: raise ApiError(404, "Norme introuvable")
+    return Response({**meta, "rows": df.to_dict(orient="records")}, etag=etag)
+
+@route("PUT", "/norms/{name}")
+async def norm_put(req: Request) -> Response:
+    import pandas as pd
+    _require_admin(req)  # publication réservée aux admins, comme la page Administration
+    b = req.json(); rows = b.get("rows") if isinstance(b, dict) else b
+    if not isinstance(rows, list) or not rows: raise ApiError(400, "Lignes de norme attendues")
+    try:
+        meta = await _run(_db().save_norm, req.tenant, unquote(req.params["name"]), pd.DataFrame(rows))
+    except ValueError as e:
+        raise ApiError(400, str(e))
+    return Response(meta)
+
+@route("DELETE", "/norms/{name}")
+async def norm_delete(req: Request) -> Response:
+    _require_admin(req)
+    if not await _run(_db().delete_norm, req.tenant, unquote(req.params["name"])): raise ApiError(404, "Norme introuvable")
+    return Response(None, status=204)
+
+# ============================================================
+# Application ASGI
+# ============================================================
+def _match(method: str, path: str):
+    allowed = False
+    for m, rx, fn, auth in _ROUTES:
+        g = rx.match(path)
+        if g is None: continue
+        if m == method: return fn, auth, g.groupdict()
+        allowed = True
+    raise ApiError(405 if allowed else 404, "Méthode non autorisée" if allowed else "Ressource introuvable")
+
+async def _read_body(receive) -> bytes:
+    chunks: List[bytes] = []; n = 0
+    while True:
+        msg = await receive()
+        if msg["type"] == "http.disconnect": break
+        b = msg.get("body", b""); n += len(b)
+        if n > MAX_BODY: raise ApiError(413, "Corps de requête trop volumineux")
+        chunks.append(b)
+        if not msg.get("more_body"): break
+    return b"".join(chunks)
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup": await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"}); return
+    if scope["type"] != "http": return
+    req: Optional[Request] = None
+    try:
+        req = Request(scope, await _read_body(receive))
+        fn, auth, req.params = _match(req.method, req.path.rstrip("/") or "/")
+        if auth: _authenticate(req)
+        resp = await fn(req)
+    except ApiError as e:
+        resp = Response({"error": e.message}, status=e.status)
+    except Exception as e:
+        import traceback; traceback.print_exc()
+        resp = Response({"error": f"Erreur interne : {type(e).__name__}"}, status=500)
+    await _send(send, req, resp)
+
+# ============================================================
+# Serveur (uvicorn, optionnel)
+# ============================================================
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+def _server(host: str, port: int):
+    try:
+        import uvicorn
+    except ImportError:
+        raise RuntimeError("uvicorn requis pour servir l'API : pip install uvicorn")
+    return uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level=os.getenv("CYBERPIVOT_API_LOG", "warning"),
+                                         access_log=False, lifespan="on"))
+
+def start_in_thread(host: Optional[str] = None, port: Optional[int] = None):
+    """Démarre l'API une seule fois par processus (thread démon) ; renvoie le serveur uvicorn."""
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            srv = _server(host or os.getenv("CYBERPIVOT_API_HOST", "127.0.0.1"), int(port or os.getenv("CYBERPIVOT_API_PORT", "8765")))
+            threading.Thread(target=srv.run, name="cp-api-server", daemon=True).start()
+            _SERVER = srv
+    return _SERVER
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="API REST CyberPivot")
+    ap.add_argument("--host", default=os.getenv("CYBERPIVOT_API_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("CYBERPIVOT_API_PORT", "8765")))
+    a = ap.parse_args(argv)
+    _db().init()
+    import webhooks
+    from engine import trends
+    webhooks.start_in_thread()  # sans effet si aucun abonné configuré
+    trends.install()
+    _server(a.host, a.port).run()
+
+if __name__ == "__main__":
+    main()
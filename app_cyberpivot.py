@@ -4,12 +4,12 @@
 # - Édition des contrôles (niveaux FR), commentaires
 # - KPI dynamiques (global & vue) : taux pondéré, preuves, etc.
 # - UX: "—" si aucun contrôle applicable (évite 0% trompeur)
-# - Preuves : upload/list/download/delete + export ZIP (manifest)
+# - Preuves : upload/list/download/delete + export ZIP (manifest), vignettes (previews), téléchargement au clic
 # - Exports: DOCX (ISACA), Excel, PDF (si dispo)
 # - Thème sombre: valeur KPI visible (contraste corrigé)
 # ============================================================
 
-import os, io, json, shutil, hashlib, zipfile, pathlib
+import os, io, zipfile
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 
@@ -20,23 +20,24 @@ import pandas as pd
 import matplotlib
 matplotlib.use("agg")
 import matplotlib.pyplot as plt
-import numpy as np
 
 # --- Modules internes ---
-import auth
 import session_guard
 import storage
-import norms
+import tenancy
+import storage_backend
+import write_queue
+import previews
+import perf
+import api_server
+import webhooks
+import validators  # import_norm : validation ligne à ligne + publication
+# moteur d'audit (sans Streamlit) : niveaux, métriques, rapports, preuves
+from engine.levels import LEVELS_FR, to_fr_level as _to_fr_level
+from engine.metrics import compute_metrics as _compute_metrics, compute_scores as _compute_scores
+from engine import reports, evidence as ev_engine, snapshots, trends, columnar
 
 # ==== Fallback utilitaires (si absents) ====
-try:
-    import validators  # doit fournir load_norme_excel(file)->DataFrame
-except Exception:
-    class _V:
-        @staticmethod
-        def load_norme_excel(f): return pd.read_excel(f)
-    validators = _V()
-
 try:
     import errors  # doit fournir report_error(ctx, e)
 except Exception:
@@ -49,6 +50,11 @@ except Exception:
 # Config & Styles
 # ============================================================
 st.set_page_config(page_title="CyberPivot™ – Audit intelligent", page_icon="🛡️", layout="wide")
+# Chronos par étape (CYBERPIVOT_PERF=1) ; profil d'un seul rerun si demandé depuis l'administration
+# ("armed" au clic -> "next" -> profil du rerun suivant, p. ex. navigation vers la page Audit)
+_pf = st.session_state.get("perf_profile")
+st.session_state["perf_profile"] = {"armed": "next"}.get(_pf)
+perf.begin_rerun(profile=(_pf == "next"))
 st.markdown("""
 <style>
 :root { --brand:#0C2E6B; --brand-soft:#E8EEF9; --accent:#1E40AF; }
@@ -81,11 +87,20 @@ ensure_state()
 
 @st.cache_resource
 def _init_all():
-    auth.init_auth_db()
-    storage.init_db()
-    norms.init_norms_db()
+    storage_backend.get_backend().init()
     return True
 _init_all()
+DB = storage_backend.get_backend()
+
+# API REST embarquée : même processus => même backend (pool) et même file d'écriture que l'UI
+if os.getenv("CYBERPIVOT_API_PORT"):
+    try: api_server.start_in_thread()
+    except RuntimeError as e: st.sidebar.warning(str(e))
+# Diffusion du journal des changements vers les webhooks configurés (un seul thread par processus)
+if os.getenv("CYBERPIVOT_WEBHOOKS") or os.getenv("CYBERPIVOT_WEBHOOKS_FILE"):
+    webhooks.start_in_thread()
+# Séries de tendance recalculées en arrière-plan après chaque enregistrement (engine.trends)
+trends.install()
 
 # ============================================================
 # Auth
@@ -97,7 +112,7 @@ def _login_ui() -> Dict[str, Any]:
         email = st.text_input("Email", key="login_email")
         pwd = st.text_input("Mot de passe", type="password", key="login_pwd")
         if st.button("Connexion", type="primary"):
-            u = auth.verify_password(email, pwd)
+            u = DB.verify_password(email, pwd)
             if u and u["is_active"]:
                 st.session_state["_auth_name"] = u["full_name"]
                 st.session_state["_auth_username"] = u["email"]
@@ -114,9 +129,9 @@ def _login_ui() -> Dict[str, Any]:
             if not n_email or not n_pwd1: st.sidebar.warning("Email et mot de passe requis.")
             elif n_pwd1 != n_pwd2: st.sidebar.warning("Les mots de passe ne correspondent pas.")
             else:
-                if auth.user_exists(n_email): st.sidebar.info("Un compte existe déjà avec cet email.")
+                if DB.user_exists(n_email): st.sidebar.info("Un compte existe déjà avec cet email.")
                 else:
-                    auth.create_user(email=n_email, password=n_pwd1, full_name=n_name or n_email,
+                    DB.create_user(email=n_email, password=n_pwd1, full_name=n_name or n_email,
                                      role="user", tenant_id="default", is_active=True)
                     st.sidebar.success("Compte créé. Connectez-vous.")
                     st.rerun()
@@ -161,21 +176,6 @@ st.markdown(f"""
 # ============================================================
 # Helpers (levels, KPI, radar, docx…)
 # ============================================================
-LEVELS_FR = ["conforme", "partiellement conforme", "non conforme", "non applicable"]
-CANON_TO_FR = {
-    "yes":"conforme","conforme":"conforme",
-    "partial":"partiellement conforme","partially compliant":"partiellement conforme","partiellement conforme":"partiellement conforme",
-    "no":"non conforme","non conforme":"non conforme",
-    "n/a":"non applicable","na":"non applicable","non applicable":"non applicable","": "non applicable",
-}
-LEVEL_SCORE = {"conforme":1.0,"partiellement conforme":0.5,"non conforme":0.0,"non applicable":None}
-SEVERITY = {"non conforme":"Haut","partiellement conforme":"Moyen","conforme":"Faible","non applicable":"N/A"}
-
-def _to_fr_level(x) -> str:
-    if x is None: return "non applicable"
-    s = str(x).strip().lower()
-    return CANON_TO_FR.get(s, "non applicable")
-
 def _format_kpi(label: str, val: str):
     st.markdown(f"""
     <div class="kpi">
@@ -183,175 +183,68 @@ def _format_kpi(label: str, val: str):
       <div class="value">{val}</div>
     </div>""", unsafe_allow_html=True)
 
-def _compute_metrics(df: pd.DataFrame) -> dict:
-    if df is None or df.empty:
-        return {"n_total":0,"n_applicable":0,"n_c":0,"n_pc":0,"n_nc":0,"n_na":0,"rate":None}
-    d = df.copy()
-    d["Level"] = d["Level"].map(_to_fr_level)
-    vc = d["Level"].value_counts()
-    n_c  = int(vc.get("conforme",0))
-    n_pc = int(vc.get("partiellement conforme",0))
-    n_nc = int(vc.get("non conforme",0))
-    n_na = int(vc.get("non applicable",0))
-    n_app = n_c + n_pc + n_nc
-    rate = None if n_app==0 else round(((n_c + 0.5*n_pc)/n_app)*100)
-    return {"n_total":len(d),"n_applicable":n_app,"n_c":n_c,"n_pc":n_pc,"n_nc":n_nc,"n_na":n_na,"rate":rate}
-
-def _compute_scores(df: pd.DataFrame) -> dict:
-    d = df.copy()
-    d["Level"] = d["Level"].map(_to_fr_level)
-    d["__s"] = d["Level"].map(LEVEL_SCORE)
-    d = d[d["__s"].notna()]
-    return {
-        "global": float(d["__s"].mean()) if not d.empty else 0.0,
-        "by_domain": d.groupby("Domain")["__s"].mean().to_dict() if not d.empty else {}
-    }
-
-def _radar(scores_by_domain: Dict[str,float]) -> Optional[bytes]:
-    if not scores_by_domain: return None
-    labels = list(scores_by_domain.keys())
-    vals = [max(0.0, min(1.0, scores_by_domain[k])) for k in labels]
-    if len(labels) < 3:
-        while len(labels) < 3:
-            labels.append(labels[-1]+" "); vals.append(vals[-1])
-    ang = np.linspace(0, 2*np.pi, len(labels), endpoint=False).tolist()
-    vals += vals[:1]; ang += ang[:1]
-    fig = plt.figure(figsize=(5,5)); ax = plt.subplot(111, polar=True)
-    ax.set_theta_offset(np.pi/2); ax.set_theta_direction(-1)
-    ax.set_rlabel_position(0); ax.set_ylim(0,1)
-    ax.plot(ang, vals, linewidth=2); ax.fill(ang, vals, alpha=0.25)
-    ax.set_xticks(ang[:-1]); ax.set_xticklabels(labels, fontsize=9)
-    ax.set_yticks([.25,.5,.75,1]); ax.set_yticklabels(['25%','50%','75%','100%'], fontsize=8)
-    bio = io.BytesIO(); fig.tight_layout(); fig.savefig(bio, format="png", dpi=180, bbox_inches="tight"); plt.close(fig)
-    return bio.getvalue()
-
-# ---- DOCX minimal (ISACA) ----
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Pt, Inches, Cm
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-def _justify_document(doc):
-    for p in doc.paragraphs:
-        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        for r in p.runs: r.font.size = Pt(11)
-def _generate_docx(audit_id: str, df: pd.DataFrame) -> bytes:
-    from docx import Document
-    doc = Document()
-    for s in doc.sections:
-        s.top_margin = Cm(2); s.bottom_margin = Cm(2); s.left_margin = Cm(2); s.right_margin = Cm(2)
-
-    title = doc.add_paragraph()
-    r = title.add_run(f"Rapport d'audit (ISACA) — {audit_id}")
-    r.bold = True; r.font.size = Pt(22)
-
-    d = df.copy()
-    for c in ["Domain","ID","Item","Contrôle","Level","Comment"]:
-        if c not in d.columns: d[c] = ""
-        d[c] = d[c].astype(str)
-    d["Level"] = d["Level"].map(_to_fr_level)
-    d["_s"] = d["Level"].map(LEVEL_SCORE)
-    dscore = d[d["_s"].notna()]
-    score_global = round(dscore["_s"].mean()*100) if not dscore.empty else 0
-    counts = d["Level"].value_counts().reindex(LEVELS_FR).fillna(0).astype(int)
-
-    doc.add_paragraph(f"Taux de conformité (pondéré) : {score_global}%")
-    doc.add_paragraph(
-        f"Répartition : {counts.get('conforme',0)} conformes, "
-        f"{counts.get('partiellement conforme',0)} partiellement conformes, "
-        f"{counts.get('non conforme',0)} non conformes, "
-        f"{counts.get('non applicable',0)} non applicables."
-    )
-    _justify_document(doc)
-    bio = io.BytesIO(); doc.save(bio); return bio.getvalue()
-
-def _converter_available():
-    try:
-        import docx2pdf; return True
-    except Exception:
-        return shutil.which("soffice") is not None
-
+_radar = reports.radar_png
+_generate_docx = reports.generate_docx
+_converter_available = reports.converter_available
 def _docx_to_pdf_bytes(docx_bytes: bytes) -> Optional[bytes]:
-    import tempfile, subprocess
-    tmp = tempfile.mkdtemp(prefix="cp_")
-    src = os.path.join(tmp, "r.docx"); pdf = os.path.join(tmp, "r.pdf")
-    with open(src,"wb") as f: f.write(docx_bytes)
+    return reports.docx_to_pdf_bytes(docx_bytes, on_error=errors.report_error)
+
+def _snapshot_audit(audit:str, label:str)->Optional[Dict[str,Any]]:
+    """Instantané immuable de l'état enregistré (file d'écriture vidée d'abord) ; idempotent si rien n'a changé."""
     try:
-        import docx2pdf; docx2pdf.convert(src, pdf); 
-        with open(pdf,"rb") as r: return r.read()
-    except Exception: pass
-    soffice = shutil.which("soffice")
-    if soffice:
-        try:
-            subprocess.run([soffice,"--headless","--convert-to","pdf","--outdir",tmp,src], check=True,
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            with open(pdf,"rb") as r: return r.read()
-        except Exception as e: errors.report_error("LibreOffice PDF", e)
-    return None
+        write_queue.get_queue(TENANT_ID).flush()
+        snap = snapshots.take(audit, label=label, tenant_id=TENANT_ID, backend=DB)
+        st.session_state.pop("snap_old", None)  # la comparaison repart du dernier instantané
+        return snap
+    except ValueError as e:
+        st.warning(str(e)); return None
+    except Exception as e:
+        errors.report_error("Instantané d'audit", e); return None
 
 # ============================================================
-# Évidence (preuves)
+# Évidence (preuves) — engine.evidence ; vues et téléchargements ci-dessous
 # ============================================================
-def _slug(s:str)->str:
-    s = (s or "").strip().lower()
-    ok = "".join(ch if ch.isalnum() or ch in "-_." else "-" for ch in s)
-    while "--" in ok: ok = ok.replace("--","-")
-    return ok.strip("-_.")
-def _evidence_dir(audit:str, qid:str, item:str)->str:
-    p = os.path.join("evidence", audit, f"{qid}__{_slug(item)[:60]}")
-    pathlib.Path(p).mkdir(parents=True, exist_ok=True); return p
-def _has_evidence(audit:str)->bool:
-    root = os.path.join("evidence", audit)
-    if not os.path.isdir(root): return False
-    for _,_,files in os.walk(root):
-        if files: return True
-    return False
+_slug = ev_engine.slug
+_evidence_dir = ev_engine.evidence_dir
+_has_evidence = ev_engine.has_evidence
+_load_existing = ev_engine.load_existing
+_export_evidence_zip = ev_engine.export_zip
+_evidence_stats = ev_engine.evidence_stats
 def _persist_uploads(audit:str, qid:str, item:str, files)->List[Dict[str,str]]:
-    saved=[]; tgt=_evidence_dir(audit,qid,item)
-    for f in files or []:
-        ts = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
-        name=f"{ts}__{_slug(f.name)}"
-        with open(os.path.join(tgt,name),"wb") as w: w.write(f.read())
-        saved.append({"name":name,"path":os.path.join(tgt,name)})
+    saved = ev_engine.persist_uploads(audit, qid, item, files)
+    previews.schedule(e["path"] for e in saved)  # vignettes en arrière-plan
     return _load_existing(audit,qid,item)
-def _load_existing(audit:str, qid:str, item:str)->List[Dict[str,str]]:
-    p=_evidence_dir(audit,qid,item); out=[]
-    for n in sorted(os.listdir(p)):
-        fp=os.path.join(p,n)
-        if os.path.isfile(fp): out.append({"name":n,"path":fp})
-    return out
-def _delete_file(path:str)->bool:
-    try:
-        if os.path.isfile(path): os.remove(path); return True
-    except Exception as e: errors.report_error("Suppression preuve", e)
-    return False
-def _export_evidence_zip(audit_id:str)->Optional[bytes]:
-    root = os.path.join("evidence", audit_id)
-    if not os.path.isdir(root): return None
-    entries=[]; total=0; bio=io.BytesIO()
-    with zipfile.ZipFile(bio,"w",compression=zipfile.ZIP_DEFLATED) as z:
-        for d,_,fs in os.walk(root):
-            for fn in fs:
-                full=os.path.join(d,fn); rel=os.path.relpath(full,root)
-                try:
-                    size=os.path.getsize(full); total+=size
-                    entries.append({"path":os.path.join(audit_id,rel).replace("\\","/"),"bytes":int(size)})
-                    z.write(full, arcname=os.path.join(audit_id,rel))
-                except Exception: pass
-        if not entries: return None
-        import csv
-        buf=io.StringIO(); w=csv.writer(buf, lineterminator="\n")
-        w.writerow(["path","bytes"])
-        for e in entries: w.writerow([e["path"], e["bytes"]])
-        z.writestr("manifest.csv", buf.getvalue())
-        z.writestr("manifest.json", json.dumps({"audit_id":audit_id,"total_files":len(entries),"total_bytes":total,"entries":entries}, indent=2))
-    return bio.getvalue()
-def _evidence_stats(audit_id:str, df:pd.DataFrame)->dict:
-    tot=0; by={}
-    for r in df[["Domain","ID","Item"]].drop_duplicates().itertuples(index=False):
-        p=_evidence_dir(audit_id, str(r.ID), str(r.Item))
-        c= len([fn for fn in os.listdir(p) if os.path.isfile(os.path.join(p,fn))]) if os.path.isdir(p) else 0
-        tot+=c; by[str(r.Domain)]=by.get(str(r.Domain),0)+c
-    return {"total":tot,"by_domain":by}
+def _delete_file(audit:str, qid:str, item:str, path:str)->bool:
+    ok = ev_engine.delete_file(path, on_error=errors.report_error)
+    if ok: DB.delete_evidence(audit, qid, item, os.path.basename(path), tenant_id=TENANT_ID)  # sinon ré-import vu comme doublon
+    return ok
+
+# Téléchargement paresseux : octets produits au clic (data callable, documenté
+# depuis Streamlit 1.52), sinon bouton « Préparer » qui ne produit que la
+# ressource demandée.
+LAZY_DOWNLOAD_MIN = (1, 52)
+def _st_version()->tuple:
+    try: return tuple(int(x) for x in st.__version__.split(".")[:2])
+    except (AttributeError, ValueError): return (0, 0)
+_LAZY_DOWNLOAD = _st_version() >= LAZY_DOWNLOAD_MIN
+def _read_file(path:str):
+    def _read():
+        with open(path,"rb") as rb: return rb.read()
+    return _read
+def _lazy_download(label:str, make, file_name:str, key:str, prep:str="Préparer", **kw):
+    """Bouton de téléchargement dont les octets ne sont produits qu'à la demande."""
+    if _LAZY_DOWNLOAD:
+        st.download_button(label, data=make, file_name=file_name, key=f"dl_{key}", on_click="ignore", **kw); return
+    if st.session_state.get("dl_ready") == key:
+        st.download_button(label, data=make(), file_name=file_name, key=f"dl_{key}", **kw)
+    elif st.button(prep, key=f"prep_{key}"):
+        st.session_state["dl_ready"] = key; st.rerun()
+def _download_button(fpath:str, fname:str):
+    _lazy_download("Télécharger", _read_file(fpath), fname, key=fpath)
+def _columnar_bytes(audit:str, fmt:str)->bytes:
+    with perf.span("columnar"):
+        cdf = DB.query_responses(audit, columns=columnar.KINDS["responses"], as_frame=True, tenant_id=TENANT_ID)
+        return columnar.to_bytes(cdf, "responses", fmt)
 
 # ============================================================
 # Sidebar — params / normes
@@ -362,20 +255,42 @@ audit_id = st.sidebar.text_input("Identifiant de l’audit", value=default_audit
 st.session_state["audit_id"] = audit_id
 
 st.sidebar.subheader("📚 Norme")
-norms_av = norms.list_norms(TENANT_ID)
+norms_av = DB.list_norms(TENANT_ID)
 opt = ["(Choisir)"] + [n["name"] for n in norms_av]
 sel_norm = st.sidebar.selectbox("Sélectionner une norme publiée", opt, index=0)
+def _with_saved_answers(df_std: pd.DataFrame) -> pd.DataFrame:
+    """Reporte Level/Comment déjà enregistrés pour l'audit (projection : 4 colonnes seulement)."""
+    saved = DB.query_responses(audit_id, columns=["qid","item","level","comment"], as_frame=True, tenant_id=TENANT_ID)
+    if saved.empty: return df_std
+    saved = saved.rename(columns={"qid":"ID","item":"Item","level":"Level","comment":"Comment"}).set_index(["ID","Item"])
+    g = df_std.set_index(["ID","Item"])
+    g.update(saved)
+    return g.reset_index()[df_std.columns]
+
 if sel_norm != "(Choisir)":
-    df_std = norms.get_norm_df(TENANT_ID, sel_norm)
+    with perf.span("norms.load"): df_std = DB.get_norm_df(TENANT_ID, sel_norm)
     if df_std is not None:
         st.session_state["std_df"] = df_std
-        st.session_state["working_df"] = df_std.copy()
+        with perf.span("responses.load"): st.session_state["working_df"] = _with_saved_answers(df_std)
         st.sidebar.success(f"Norme « {sel_norm} » chargée ✅")
     else:
         st.sidebar.error("Impossible de charger la norme.")
 
 st.sidebar.subheader("📄 Rapport")
-st.session_state["client_name"]  = st.sidebar.text_input("Client / entité", value=st.session_state.get("client_name",""))
+# projet / norme de l'audit pour les tendances : rechargés à chaque changement d'audit,
+# projet écrit seulement quand l'utilisateur modifie le champ, norme quand la sélection diffère
+if st.session_state.get("_meta_audit") != audit_id:
+    _m = DB.get_audit_meta(audit_id, tenant_id=TENANT_ID)
+    st.session_state["client_name"] = _m.get("project") or ""
+    st.session_state["_meta_synced"] = _m.get("standard"); st.session_state["_meta_audit"] = audit_id
+
+def _save_client(aid: str):
+    DB.set_audit_meta(aid, project=st.session_state["client_name"].strip() or None, tenant_id=TENANT_ID)
+
+st.sidebar.text_input("Client / entité", key="client_name", on_change=_save_client, args=(audit_id,))
+if sel_norm != "(Choisir)" and st.session_state.get("_meta_synced") != sel_norm:
+    DB.set_audit_meta(audit_id, standard=sel_norm, tenant_id=TENANT_ID)
+    st.session_state["_meta_synced"] = sel_norm
 st.session_state["contact_name"] = st.sidebar.text_input("Contact (optionnel)", value=st.session_state.get("contact_name",""))
 logo_up = st.sidebar.file_uploader("Logo (PNG/JPG)", type=["png","jpg","jpeg"])
 if logo_up: st.session_state["logo_bytes"] = logo_up.read()
@@ -385,6 +300,7 @@ if logo_up: st.session_state["logo_bytes"] = logo_up.read()
 # ============================================================
 pages = ["Audit","Mon compte"] + (["Administration"] if IS_ADMIN else [])
 page = st.sidebar.radio("Navigation", options=pages, index=0)
+perf.set_page(page)
 
 # ============================================================
 # Page AUDIT
@@ -419,6 +335,7 @@ if page == "Audit":
     with f3:
         only_todo = st.toggle("🔎 À traiter (non / partiellement conformes)", value=False)
 
+    @perf.timed("filters")
     def _apply_filters(df: pd.DataFrame) -> pd.DataFrame:
         d = df.copy()
         d["Level"] = d["Level"].map(_to_fr_level)
@@ -530,18 +447,43 @@ if page == "Audit":
                 for f in cur:
                     fname, fpath = f["name"], f["path"]
                     cA,cB,cC = st.columns([3,1,1])
-                    with cA: st.markdown(f"<span class='evidence-chip'>📄 {fname}</span>", unsafe_allow_html=True)
+                    with cA:
+                        thumb = previews.thumbnail(fpath)
+                        if thumb: st.image(thumb, width=160)
+                        elif previews.supported(fpath): st.caption("⏳ aperçu en préparation…")
+                        st.markdown(f"<span class='evidence-chip'>📄 {fname}</span>", unsafe_allow_html=True)
                     with cB:
-                        try:
-                            with open(fpath,"rb") as rb:
-                                st.download_button("Télécharger", data=rb.read(), file_name=fname, key=f"dl_{fname}")
-                        except Exception: st.caption("(introuvable)")
+                        if os.path.isfile(fpath): _download_button(fpath, fname)
+                        else: st.caption("(introuvable)")
                     with cC:
                         if st.button("❌ Supprimer", key=f"rm_{fname}"):
-                            if _delete_file(fpath):
+                            if _delete_file(audit_id, qid, item, fpath):
                                 st.success("Supprimé."); st.session_state["evidence_map"][ek] = _load_existing(audit_id, qid, item); st.rerun()
             st.markdown("</div>", unsafe_allow_html=True)
 
+    # Import en masse : un ZIP (ou dossier) -> (ID, Item) par CSV de correspondance, dossier ou préfixe du nom
+    with st.expander("📦 Import en masse (ZIP / CSV de correspondance)"):
+        st.caption("Association : mapping.csv (fichier;ID;Item) — sinon dossier <ID>__<item>/ ou <ID>/ — sinon préfixe du nom (<ID>_capture.png).")
+        bz = st.file_uploader("Archive ZIP", type=["zip"], key="bulk_zip")
+        bm = st.file_uploader("CSV de correspondance (optionnel)", type=["csv"], key="bulk_map")
+        if st.button("📥 Importer l’archive", disabled=bz is None):
+            allc = st.session_state["working_df"][["ID","Item"]].astype(str).drop_duplicates()
+            bar = st.progress(0.0, text="Import des preuves…")
+            def _bprog(k, n, b): bar.progress(k / max(n, 1), text=f"{k}/{n} fichier(s) — {b/1e6:.1f} Mo")
+            try:
+                rep = ev_engine.ingest_for_audit(audit_id, bz, allc.itertuples(index=False, name=None),
+                                                 mapping=bm, tenant_id=TENANT_ID, backend=DB, progress=_bprog)
+            except Exception as e:
+                errors.report_error("Import en masse des preuves", e); rep = None
+            if rep:
+                for q, it in rep["touched"]: st.session_state["evidence_map"][(q, it)] = _load_existing(audit_id, q, it)
+                previews.schedule(r["path"] for r in rep["rows"])
+                st.success(f"{rep['attached']} fichier(s) joint(s) sur {rep['files']} — {rep['duplicates']} doublon(s) ignoré(s) — "
+                           f"{rep['files_per_s']} fichiers/s.")
+                if rep["unmatched"]:
+                    st.warning(f"{len(rep['unmatched'])} fichier(s) non associé(s).")
+                    st.dataframe(pd.DataFrame(rep["unmatched"]), use_container_width=True, hide_index=True)
+
     st.divider()
 
     # === Sauvegarde DB
@@ -556,16 +498,22 @@ if page == "Audit":
             "evidence": [{"name":e["name"],"path":e["path"]} for e in ev],
         }
 
+    # Écriture en arrière-plan (write_queue) : le rerun n'attend pas le commit SQLite,
+    # l'acquittement (Future) est affiché au rerun suivant.
     if st.button("💾 Sauvegarder toutes les réponses", type="primary"):
-        saved=0; failed=[]
-        for r in st.session_state["working_df"][REQUIRED].itertuples(index=False):
-            p=_payload(r)
-            if not p["domain"] or not p["qid"] or not p["item"]: continue
-            try:
-                storage.upsert_response(audit_id, p); saved+=1
-            except Exception as e: failed.append((p["qid"], p["item"], str(e)))
-        if saved: st.success(f"✅ {saved} réponse(s) sauvegardée(s).")
-        if failed: st.error(f"⚠️ {len(failed)} échec(s). Exemple: {failed[0]}")
+        batch=[p for p in map(_payload, st.session_state["working_df"][REQUIRED].itertuples(index=False))
+               if p["domain"] and p["qid"] and p["item"]]
+        try:
+            st.session_state["pending_save"] = write_queue.get_queue(TENANT_ID).submit(audit_id, batch)
+            st.info(f"📨 {len(batch)} réponse(s) en cours d’enregistrement…")
+        except Exception as e: st.error(f"⚠️ Échec de validation : {e}")
+    fut = st.session_state.get("pending_save")
+    if fut is not None and fut.done():
+        st.session_state.pop("pending_save", None)
+        if fut.exception(): st.error(f"⚠️ Échec de sauvegarde : {fut.exception()}")
+        else: st.success(f"✅ {fut.result()} réponse(s) sauvegardée(s).")
+    elif fut is not None:
+        st.caption("⏳ Sauvegarde en cours…")
 
     st.divider()
 
@@ -604,24 +552,79 @@ if page == "Audit":
 
     st.divider()
 
+    # === Comparaison de campagnes (instantanés figés à chaque téléchargement du rapport)
+    diff = None
+    with st.expander("🔁 Comparer des campagnes (instantanés)"):
+        snaps = DB.list_snapshots(tenant_id=TENANT_ID)
+        CUR = f"(état actuel — {audit_id})"
+        by_lbl = {f"{x['audit_id']} • {x['created_at'][:16].replace('T',' ')} • {x['label'] or '—'} • {x['n_controls']} ctrl • "
+                  f"{x['rate'] if x['rate'] is not None else '—'}% • {x['snapshot_id'][-6:]}": x for x in snaps}
+        opts = list(by_lbl) + [CUR]
+        mine = [k for k,x in by_lbl.items() if x["audit_id"] == audit_id]
+        s1,s2,s3 = st.columns([3,3,1])
+        with s1: old_k = st.selectbox("Référence", opts, index=opts.index(mine[0]) if mine else 0, key="snap_old")
+        with s2: new_k = st.selectbox("Comparée à", opts, index=len(opts)-1, key="snap_new")
+        with s3:
+            st.write("")
+            if st.button("📸 Figer", help="Prend un instantané de l'état enregistré de l'audit"):
+                _snapshot_audit(audit_id, "manuel"); st.rerun()
+        # Calcul à la demande seulement, mémoïsé en session par paire d'états
+        sid = lambda k: "current" if k == CUR else by_lbl[k]["snapshot_id"]
+        sel = (audit_id, sid(old_k), sid(new_k))
+        if old_k == new_k:
+            st.caption("Choisis deux états différents (au moins un instantané : télécharger le rapport en crée un).")
+        elif st.button("🔁 Comparer", key="snap_cmp"):
+            try:
+                with perf.span("snapshots.diff"):
+                    frames = [snapshots.current(audit_id, TENANT_ID, DB) if k == CUR else snapshots.load(by_lbl[k]) for k in (old_k, new_k)]
+                    short = lambda k: "actuel" if k == CUR else by_lbl[k]["created_at"][:10]
+                    st.session_state["snap_diff"] = {"key": sel, "diff": snapshots.diff(*frames), "labels": (short(old_k), short(new_k)),
+                                                     "at": datetime.now().strftime("%H:%M:%S")}
+            except Exception as e:
+                errors.report_error("Comparaison d'instantanés", e); st.session_state.pop("snap_diff", None)
+        cached = st.session_state.get("snap_diff")
+        if cached and cached["key"] == sel:
+            sm = cached["diff"]["summary"]
+            if "current" in sel[1:]: st.caption(f"État actuel lu à {cached['at']} — « Comparer » pour rafraîchir.")
+            m1,m2,m3,m4 = st.columns(4)
+            m1.metric("Conformité", "—" if sm["rate_new"] is None else f"{sm['rate_new']}%",
+                      None if sm["rate_delta"] is None else f"{sm['rate_delta']:+.1f} pts")
+            m2.metric("Améliorations", sm["improved"]); m3.metric("Dégradations", sm["regressed"])
+            m4.metric("Ajoutés / retirés", f"{sm['added']} / {sm['removed']}")
+            st.dataframe(cached["diff"]["domains"], use_container_width=True, hide_index=True)
+            st.dataframe(cached["diff"]["transitions"], use_container_width=True)
+            st.dataframe(cached["diff"]["level_changes"].head(500), use_container_width=True, hide_index=True)
+            _lazy_download("📥 Rapport de comparaison (DOCX)",
+                           lambda c=cached, a=audit_id: reports.diff_docx(c["diff"], *c["labels"], title=f"Comparaison d’audit — {a}"),
+                           f"comparaison_{audit_id}.docx", key=f"diff_{'_'.join(sel)}", prep="📥 Préparer le rapport de comparaison",
+                           mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+            if st.checkbox("Inclure l'évolution dans le rapport ISACA", value=False, key="snap_in_report"):
+                diff, diff_labels = cached["diff"], cached["labels"]
+        elif cached and old_k != new_k:
+            st.caption("Sélection modifiée : clique « Comparer » pour mettre à jour.")
+
     # === Exports & livrables (live)
     st.subheader("📦 Exports & livrables")
     export_df = st.session_state["working_df"][REQUIRED].copy().fillna("").astype(str)
     # DOCX
-    docx_bytes = _generate_docx(audit_id, export_df)
+    docx_bytes = _generate_docx(audit_id, export_df, diff, diff_labels) if diff is not None else _generate_docx(audit_id, export_df)
     c1,c2,c3,c4 = st.columns(4)
     with c1:
         st.download_button("📥 Rapport ISACA (DOCX)", data=docx_bytes,
                            file_name=f"rapport_ISACA_{audit_id}.docx",
-                           mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+                           mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                           on_click=_snapshot_audit, args=(audit_id, "rapport"))
     # Excel
     with c2:
-        bio = io.BytesIO()
-        with pd.ExcelWriter(bio, engine="openpyxl") as w:
-            export_df.to_excel(w, index=False, sheet_name="Audit")
-        st.download_button("📊 Export Excel", data=bio.getvalue(),
-                           file_name=f"audit_{audit_id}.xlsx",
-                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        # Généré au clic seulement, mémoïsé par empreinte du contenu
+        _lazy_download("📊 Export Excel", lambda d=export_df, a=audit_id: reports.xlsx_cached(a, d),
+                       f"audit_{audit_id}.xlsx", key=f"xlsx_{audit_id}", prep="📊 Préparer l'export Excel",
+                       mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        # Colonnes (analytique) : état enregistré en base, lu et encodé au clic seulement
+        cfmt = columnar.default_format()
+        _lazy_download(f"🧮 Export {cfmt.capitalize()}", lambda a=audit_id, f=cfmt: _columnar_bytes(a, f),
+                       f"audit_{audit_id}{columnar.EXT[cfmt]}", key=f"col_{audit_id}", prep=f"🧮 Préparer l'export {cfmt.capitalize()}",
+                       mime="application/octet-stream")
     # PDF
     with c3:
         conv = _converter_available()
@@ -647,7 +650,7 @@ if page == "Audit":
 # ============================================================
 if page == "Mon compte":
     st.title("👤 Mon compte")
-    u = auth.get_user(USER_EMAIL)
+    u = DB.get_user(USER_EMAIL)
     if not u: st.error("Utilisateur introuvable."); st.stop()
     c1,c2 = st.columns(2)
     with c1:
@@ -656,7 +659,7 @@ if page == "Mon compte":
         tenant = st.text_input("Tenant / Organisation", value=u.get("tenant_id") or "default")
         if st.button("💾 Mettre à jour le profil", type="primary"):
             try:
-                auth.update_user_profile(USER_EMAIL, full_name=full, tenant_id=tenant)
+                DB.update_user_profile(USER_EMAIL, full_name=full, tenant_id=tenant)
                 st.success("Profil mis à jour."); st.rerun()
             except Exception as e: st.error(e)
     with c2:
@@ -667,7 +670,7 @@ if page == "Mon compte":
             if not p1 or len(p1)<6: st.warning("Mot de passe trop court.")
             elif p1!=p2: st.warning("Les mots de passe ne correspondent pas.")
             else:
-                try: auth.set_password(USER_EMAIL, p1); st.success("Mot de passe mis à jour.")
+                try: DB.set_password(USER_EMAIL, p1); st.success("Mot de passe mis à jour.")
                 except Exception as e: st.error(e)
     st.divider()
     st.json({"email":u["email"],"role":u["role"],"tenant":u["tenant_id"],"actif":u["is_active"],"créé_le":u["created_at"]})
@@ -678,7 +681,7 @@ if page == "Mon compte":
 if page == "Administration" and IS_ADMIN:
     st.title("🛡️ Administration")
     st.subheader("Utilisateurs")
-    try: users = auth.list_users()
+    try: users = DB.list_users()
     except Exception as e: st.error(e); users=[]
     st.dataframe(pd.DataFrame(users), use_container_width=True) if users else st.caption("Aucun utilisateur.")
     st.subheader("Créer un utilisateur")
@@ -690,31 +693,119 @@ if page == "Administration" and IS_ADMIN:
         p = st.text_input("Mot de passe (optionnel)", type="password"); act = st.checkbox("Actif", value=True)
     if st.button("➕ Créer", type="primary"):
         try:
-            auth.create_user(email=e, password=p or None, full_name=n, role=r, tenant_id=t, is_active=act)
+            DB.create_user(email=e, password=p or None, full_name=n, role=r, tenant_id=t, is_active=act)
             st.success("Utilisateur créé."); st.rerun()
         except Exception as ex: st.error(ex)
     st.subheader("Bibliothèque de normes")
-    upl = st.file_uploader("Fichier Excel norme", type=["xlsx","xls"])
+    upl = st.file_uploader("Fichier Excel / CSV norme", type=["xlsx","xls","csv"])
     name = st.text_input("Nom public de la norme")
     if st.button("📤 Publier / Mettre à jour", type="primary"):
         if not upl or not name.strip(): st.warning("Fichier et nom requis.")
         else:
             try:
-                df_norm = validators.load_norme_excel(upl)
-                df_norm = df_norm.rename(columns={"QID":"ID","Question":"Contrôle"})
-                info = norms.save_norm(TENANT_ID, name.strip(), df_norm)
-                st.success(f"Norme publiée : {info['name']}"); st.rerun()
+                bar = st.progress(0.0, text="Lecture…")
+                def _prog(n, total):
+                    bar.progress(min(n / total, 1.0) if total else 0.0, text=f"{n:,} lignes lues".replace(",", " "))
+                res = validators.import_norm(upl, name.strip(), DB.save_norm, tenant_id=TENANT_ID, progress=_prog)
+                bar.empty()
+                if res["n_errors"]:
+                    st.warning(f"{res['n_errors']} ligne(s) écartée(s).")
+                    st.dataframe(pd.DataFrame(res["errors"]), use_container_width=True, hide_index=True)
+                if res["info"]: st.success(f"Norme publiée : {res['info']['name']} ({res['rows_imported']} lignes, {res['seconds']} s)")
+                else: st.error("Aucune ligne valide.")
             except Exception as e: st.error(e)
     st.write("### Normes disponibles")
-    lst = norms.list_norms(TENANT_ID)
+    lst = DB.list_norms(TENANT_ID)
     if lst:
         st.dataframe(pd.DataFrame(lst), use_container_width=True, hide_index=True)
         deln = st.selectbox("Supprimer une norme", ["(Aucune)"]+[n["name"] for n in lst])
         if st.button("🗑️ Supprimer la norme"):
             if deln and deln!="(Aucune)":
                 try:
-                    if norms.delete_norm(TENANT_ID, deln): st.success("Supprimée."); st.rerun()
+                    if DB.delete_norm(TENANT_ID, deln): st.success("Supprimée."); st.rerun()
                 except Exception as e: st.error(e)
     else:
         st.caption("Aucune norme publiée.")
+    st.subheader("Portefeuille d’audits")
+    pm = DB.audit_metrics(tenant_id=TENANT_ID)
+    if pm:
+        st.dataframe(pd.DataFrame([{"Audit": k, "Taux (%)": "—" if v["rate"] is None else v["rate"],
+                                    "Conformes": v["n_c"], "Partiels": v["n_pc"], "Non conformes": v["n_nc"], "N/A": v["n_na"],
+                                    "Couverture preuves (%)": "—" if v["evidence_coverage"] is None else round(v["evidence_coverage"]*100)}
+                                   for k, v in pm.items()]), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Aucun audit enregistré.")
+    with st.expander("🧮 Export / import en colonnes (Parquet, Arrow, CSV)"):
+        cx1, cx2 = st.columns(2)
+        with cx1:
+            xfmt = st.selectbox("Format", [f for f in columnar.FORMATS if f == "csv" or columnar.available()], key="col_fmt")
+            if st.button("Préparer l'export de tous les audits"):
+                import tempfile
+                with tempfile.TemporaryDirectory() as td, perf.span("columnar.export"):
+                    man = columnar.export_bundle(os.path.join(td, "export"), tenant_id=TENANT_ID, backend=DB, fmt=xfmt)
+                    bio = io.BytesIO()
+                    with zipfile.ZipFile(bio, "w", zipfile.ZIP_STORED) as z:  # fichiers déjà compressés
+                        for f in os.listdir(os.path.join(td, "export")): z.write(os.path.join(td, "export", f), f)
+                st.session_state["col_export"] = (bio.getvalue(), man)
+            if st.session_state.get("col_export"):
+                data, man = st.session_state["col_export"]
+                st.caption(" • ".join(f"{k} : {v['rows']} lignes" for k, v in man["files"].items()) + f" • {man['seconds']} s")
+                st.download_button("📥 Télécharger (ZIP)", data=data, file_name=f"cyberpivot_{man['format']}.zip", mime="application/zip")
+        with cx2:
+            cup = st.file_uploader("Fichier responses / evidence / norms", type=["parquet", "arrow", "gz", "csv"], key="col_import")
+            if cup is not None and st.button("Importer"):
+                import tempfile
+                try:
+                    with tempfile.TemporaryDirectory() as td:
+                        fp = os.path.join(td, os.path.basename(cup.name))
+                        with open(fp, "wb") as f: f.write(cup.getbuffer())
+                        r = columnar.import_file(fp, tenant_id=TENANT_ID, backend=DB)
+                    st.success(f"{r['rows']} ligne(s) {r['kind']} importée(s) en {r['seconds']} s.")
+                except (ValueError, RuntimeError) as e: st.error(e)
+                except Exception as e: errors.report_error("Import en colonnes", e)
+        st.caption("CLI : python -m engine.columnar export|import — un dossier par export (manifest + sha256).")
+    st.subheader("📈 Tendances de conformité")
+    tc1, tc2, tc3, tc4 = st.columns(4)
+    with tc1: t_grain = st.selectbox("Pas", ["month", "quarter", "day"], format_func={"month": "Mois", "quarter": "Trimestre", "day": "Jour"}.get)
+    with tc2: t_by = st.selectbox("Séries", [None, "project", "standard", "audit", "domain"],
+                                  format_func={None: "Global", "project": "Projet / client", "standard": "Norme", "audit": "Audit", "domain": "Domaine"}.get)
+    with tc3: t_val = st.selectbox("Indicateur", ["rate", "evidence_coverage", "expected_loss"],
+                                   format_func={"rate": "Taux de conformité (%)", "evidence_coverage": "Couverture de preuves", "expected_loss": "Perte espérée (€)"}.get)
+    with tc4: t_from = st.date_input("Depuis", value=datetime.now().date() - timedelta(days=3*365))
+    t_all = tenancy.sharding_enabled() and st.checkbox("Tous les clients (shards)")
+    with perf.span("trends.series"):
+        tdf = trends.series(t_grain, start=t_from.isoformat(), by=t_by, tenant_id=TENANT_ID, backend=DB, all_tenants=t_all)
+    if tdf.empty: st.caption("Pas encore de points : la série s'alimente à chaque enregistrement et à chaque instantané.")
+    else:
+        st.line_chart(trends.pivot(tdf, t_val))
+        st.caption(f"{tdf['period'].nunique()} période(s) • {len(tdf)} point(s) agrégé(s) • moyenne des audits par période "
+                   "(valeur de fin de période), perte espérée sommée.")
+    st.subheader("⏱️ Performance des reruns")
+    if not perf.ENABLED: st.caption("Chronos désactivés : lancer avec CYBERPIVOT_PERF=1 (puits : CYBERPIVOT_PERF_SINK).")
+    pc1, pc2 = st.columns([1,3])
+    with pc1:
+        perf_last = st.number_input("Derniers reruns", 10, 10000, 500, 50)
+        perf_page = st.selectbox("Page", ["(Toutes)"] + pages, key="perf_page")
+        st.button("🧪 Profiler le prochain rerun", on_click=lambda: st.session_state.update(perf_profile="armed"),
+                  help="cProfile (ou pyinstrument) sur un seul rerun : aller ensuite sur la page à mesurer.")
+        if st.session_state.get("perf_profile") == "next": st.caption("Profil armé : prochain rerun.")
+    with pc2:
+        ps = perf.summary(int(perf_last), page=None if perf_page == "(Toutes)" else perf_page)
+        st.dataframe(ps, use_container_width=True, hide_index=True) if len(ps) else st.caption("Aucune mesure enregistrée.")
+    lp = st.session_state.get("perf_last_profile")
+    if lp:
+        with st.expander(f"Dernier profil — {lp['path']}"):
+            st.code(lp["text"][:20000])
+            if os.path.isfile(lp["path"]): _download_button(lp["path"], os.path.basename(lp["path"]))
+    if tenancy.sharding_enabled():
+        st.subheader("Vue multi-tenant")
+        by_t = storage.list_audits_all_tenants()
+        rows_t = [{"tenant": t, "audits": len(a), "réponses": sum(x["n_responses"] for x in a),
+                   "maj": max((x["updated_at"] or "" for x in a), default="")} for t, a in by_t.items()]
+        st.dataframe(pd.DataFrame(rows_t), use_container_width=True, hide_index=True) if rows_t else st.caption("Aucun shard.")
 
+# ============================================================
+# Fin du rerun : chronos -> puits ; profil éventuel affiché au rerun suivant (admin)
+# ============================================================
+_perf_res = perf.end_rerun()
+if _perf_res and _perf_res.get("profile"): st.session_state["perf_last_profile"] = _perf_res["profile"]
@@ -1,25 +1,12 @@
 # app_cyberpivot_v13.py
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-import os, io, re, json, sqlite3
+import os, re, json, sqlite3
 from pathlib import Path
-from datetime import date, datetime
+from datetime import datetime
 
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-
-# Exports
-from docx import Document
-from docx.shared import Pt, RGBColor, Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 
 # Local imports
 import sys
@@ -83,238 +70,11 @@ def init_app_db():
 init_app_db()
 auth.init_auth_db()
 
-# ========= Risk model =========
-DOMAIN_TIERS = {
-    "sécurité": ("high", 1.00), "contrôle d’accès": ("high", 1.00),
-    "opérations": ("high", 0.90), "sécurité communications": ("high", 0.95),
-    "gouvernance ia": ("high", 0.95), "sécurité modèle/données": ("high", 1.00),
-    "organisation": ("mid", 0.70), "politiques de sécurité": ("mid", 0.70),
-    "gestion des risques ia": ("mid", 0.75), "conformité & éthique": ("mid", 0.75),
-    "ressources humaines": ("low", 0.50),
-}
-KEYWORD_WEIGHTS = [
-    (r"\b(mfa|2fa|multi\-?factor)\b",           1.30, 1.20),
-    (r"\b(chiffr|encrypt|crypto|tls|ssl)\b",    1.25, 1.20),
-    (r"\b(sauvegard|backup|restore)\b",         1.20, 1.15),
-    (r"\b(pare\-?feu|firewall|segment|ids|ips)\b", 1.20, 1.15),
-    (r"\b(vuln|patch|correctif|cve)\b",         1.20, 1.15),
-    (r"\b(journal|log|siem|détect|detect)\b",   1.15, 1.10),
-    (r"\b(acc[eè]s|access|privilege|iam)\b",    1.20, 1.15),
-    (r"\b(fournisseur|tiers|vendor|third)\b",   1.15, 1.10),
-]
-STATE = {
-    "non conforme":             {"prob": 0.40, "loss_mul": 1.00, "cost_mul": 1.00, "prio": "Haute"},
-    "partiellement conforme":   {"prob": 0.22, "loss_mul": 0.75, "cost_mul": 0.75, "prio": "Moyenne"},
-    "conforme":                 {"prob": 0.05, "loss_mul": 0.20, "cost_mul": 0.30, "prio": "Info"},
-}
-BASE_FINANCIALS = {"high": {"loss": 70000, "cost": 17000}, "mid": {"loss": 40000, "cost": 10000}, "low": {"loss": 22000, "cost": 6000}}
-
-def _norm(s: str)->str: return re.sub(r"\s+"," ", (s or "").strip().lower())
-
-def _domain_weight(domain: str)->tuple[str,float]:
-    d=_norm(domain)
-    for k,(tier,w) in DOMAIN_TIERS.items():
-        if k in d: return tier,w
-    return "mid",0.70
-
-def _kw_muls(q: str)->tuple[float,float]:
-    qn=_norm(q); lm=1.0; cm=1.0
-    for pat,l,c in KEYWORD_WEIGHTS:
-        if re.search(pat, qn): lm*=l; cm*=c
-    return lm,cm
-
-def infer_risk(domain: str, question: str, answer: str)->dict:
-    tier,w=_domain_weight(domain)
-    base=BASE_FINANCIALS.get(tier, BASE_FINANCIALS["mid"])
-    lm,cm=_kw_muls(question)
-    stt=STATE.get(_norm(answer), STATE["partiellement conforme"])
-    prob=stt["prob"]*w
-    loss=base["loss"]*lm*stt["loss_mul"]
-    cost=base["cost"]*cm*stt["cost_mul"]
-    exp=prob*loss
-    return {"probability":prob,"loss_estimate":loss,"remediation_cost":cost,"exp_loss":exp,"priority":stt["prio"]}
-
-def default_reco(answer: str)->str:
-    a=_norm(answer)
-    if a=="non conforme": return "Mettre en œuvre le contrôle requis et corriger la non-conformité."
-    if a=="partiellement conforme": return "Compléter la mise en œuvre jusqu’à conformité totale."
-    return "Maintenir, mesurer et documenter la conformité."
-
-def fmt_money(x)->str:
-    try: return f"{float(x):,.0f} €".replace(",", " ")
-    except: return "—"
-
-# ========= Radar =========
-def radar_figure(domain_scores: dict[str,float]) -> go.Figure:
-    cats=list(domain_scores.keys()); vals=list(domain_scores.values())
-    fig=go.Figure()
-    if len(cats)>=3:
-        fig.add_trace(go.Scatterpolar(r=vals+[vals[0]], theta=cats+[cats[0]], fill='toself', line_color="#2563EB"))
-        fig.update_layout(polar=dict(radialaxis=dict(visible=True,range=[0,100])),
-                          showlegend=False, margin=dict(l=40,r=40,t=20,b=20), paper_bgcolor="white")
-    return fig
-
-def fig_to_png_bytes(fig: go.Figure, width=900, height=650, scale=2):
-    try: return fig.to_image(format="png", width=width, height=height, scale=scale)  # kaleido
-    except Exception: return None
-
-# ========= Exports =========
-def _docx_header_table(doc, headers):
-    t=doc.add_table(rows=1, cols=len(headers)); t.style="Table Grid"
-    for i,h in enumerate(headers):
-        cell=t.rows[0].cells[i]; cell.text=h
-        for run in cell.paragraphs[0].runs:
-            run.font.bold=True; run.font.color.rgb=RGBColor(255,255,255)
-        tcPr=cell._tc.get_or_add_tcPr(); shd=OxmlElement('w:shd')
-        shd.set(qn('w:val'),'clear'); shd.set(qn('w:color'),'auto'); shd.set(qn('w:fill'),'0A1F44'); tcPr.append(shd)
-    return t
-
-def export_word(project, standard, audit_id, df, radar_png):
-    doc=Document()
-    styles=doc.styles
-    styles["Normal"].font.name="Segoe UI"; styles["Normal"].font.size=Pt(10)
-    for h,sz in [("Heading 1",16),("Heading 2",13),("Heading 3",11)]:
-        if h in styles:
-            styles[h].font.name="Segoe UI"; styles[h].font.size=Pt(sz); styles[h].font.bold=True; styles[h].font.color.rgb=RGBColor(0x0A,0x1F,0x44)
-
-    # Couverture
-    p=doc.add_paragraph(); p.alignment=WD_ALIGN_PARAGRAPH.CENTER
-    r=p.add_run(f"CyberPivot™\nRapport d’audit — {standard}"); r.bold=True; r.font.size=Pt(24)
-    doc.add_paragraph().add_run(f"Projet : {project} • Audit #{audit_id}")
-    doc.add_paragraph().add_run(f"Date : {date.today():%d/%m/%Y}")
-    doc.add_page_break()
-
-    # TOC
-    doc.add_heading("Sommaire", level=1)
-    p=doc.add_paragraph(); r=p.add_run()
-    fb=OxmlElement('w:fldChar'); fb.set(qn('w:fldCharType'),'begin'); r._r.append(fb)
-    it=OxmlElement('w:instrText'); it.set(qn('xml:space'),'preserve'); it.text=r'TOC \o "1-3" \h \z \u'; r._r.append(it)
-    fs=OxmlElement('w:fldChar'); fs.set(qn('w:fldCharType'),'separate'); r._r.append(fs)
-    p.add_run("Table des matières (mise à jour automatique)")
-    fe=OxmlElement('w:fldChar'); fe.set(qn('w:fldCharType'),'end'); r._r.append(fe)
-    doc.add_page_break()
-
-    # KPI
-    mapping={"conforme":100,"partiellement conforme":50,"non conforme":0}
-    k_total=len(df)
-    k_avg=round(df["answer"].str.lower().map(mapping).fillna(0).mean(),1) if k_total else 0.0
-    k_conf=(df["answer"].str.lower()=="conforme").sum()
-    k_part=(df["answer"].str.lower()=="partiellement conforme").sum()
-    k_non =(df["answer"].str.lower()=="non conforme").sum()
-    doc.add_heading("1. Résumé exécutif", level=1)
-    doc.add_paragraph(f"• Norme : {standard}")
-    doc.add_paragraph(f"• Questions évaluées : {k_total}")
-    doc.add_paragraph(f"• Conforme : {k_conf} • Partiel : {k_part} • Non conforme : {k_non}")
-    doc.add_paragraph(f"• Conformité moyenne : {k_avg}%")
-    if radar_png: doc.add_picture(io.BytesIO(radar_png), width=Inches(6.3))
-    doc.add_page_break()
-
-    # Constatations
-    doc.add_heading("2. Constatations détaillées", level=1)
-    t=_docx_header_table(doc, ["Domaine","Contrôle","État","Prob.","Perte (€)","Coût remédiation (€)","Commentaire","Preuves"])
-    for _,r in df.iterrows():
-        c=t.add_row().cells
-        c[0].text=r["domain"]
-        c[1].text=f"{r['qid']} — {r['question']}"
-        c[2].text=r["answer"]
-        c[3].text=f"{r['probability']*100:.0f}%"
-        c[4].text=fmt_money(r["loss_estimate"])
-        c[5].text=fmt_money(r["remediation_cost"])
-        c[6].text=(r.get("comment") or "").strip()
-        evs = r.get("evidences", [])
-        c[7].text = "\n".join(Path(p).name for p in evs) if evs else "—"
-
-    # Plan d’action
-    doc.add_heading("3. Recommandations & plan d’action", level=1)
-    pr={"Haute":0,"Moyenne":1,"Basse":2,"Info":3}
-    plan=df.sort_values(by=["priority","exp_loss"], key=lambda s: s.map(pr).fillna(9) if s.name=="priority" else -s, ascending=[True,True])
-    t2=_docx_header_table(doc, ["Priorité","Domaine","Contrôle","Perte probable (esp.)","Coût remédiation","Recommandation"])
-    for _,r in plan.iterrows():
-        c=t2.add_row().cells
-        c[0].text=r["priority"]; c[1].text=r["domain"]; c[2].text=f"{r['qid']} — {r['question']}"
-        c[3].text=fmt_money(r["exp_loss"]); c[4].text=fmt_money(r["remediation_cost"])
-        reco = r.get("yaml_recommendation") or default_reco(r["answer"])
-        c[5].text=reco
-
-    buf=io.BytesIO(); doc.save(buf); buf.seek(0); return buf
-
-def export_pdf(project, standard, audit_id, df, radar_png):
-    buf=io.BytesIO()
-    doc=SimpleDocTemplate(buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
-    styles=getSampleStyleSheet()
-    styles.add(ParagraphStyle("CPH1", parent=styles["Heading1"], textColor=colors.HexColor("#0A1F44")))
-    styles.add(ParagraphStyle("CPBody", parent=styles["BodyText"], fontSize=10, leading=13))
-    story=[]
-
-    story.append(Paragraph(f"CyberPivot™ — Rapport d’audit — {standard}", styles["Title"]))
-    story.append(Spacer(1,6))
-    story.append(Paragraph(f"Projet : {project} • Audit #{audit_id}", styles["CPBody"]))
-    story.append(Paragraph(f"Date : {date.today():%d/%m/%Y}", styles["CPBody"]))
-    story.append(PageBreak())
-
-    story.append(Paragraph("Sommaire", styles["CPH1"]))
-    story.append(Paragraph("1. Résumé exécutif", styles["CPBody"]))
-    story.append(Paragraph("2. Constatations détaillées", styles["CPBody"]))
-    story.append(Paragraph("3. Recommandations & plan d’action", styles["CPBody"]))
-    story.append(PageBreak())
-
-    mapping={"conforme":100,"partiellement conforme":50,"non conforme":0}
-    k_total=len(df)
-    k_avg=round(df["answer"].str.lower().map(mapping).fillna(0).mean(),1) if k_total else 0.0
-    k_conf=(df["answer"].str.lower()=="conforme").sum()
-    k_part=(df["answer"].str.lower()=="partiellement conforme").sum()
-    k_non =(df["answer"].str.lower()=="non conforme").sum()
-    story.append(Paragraph("1. Résumé exécutif", styles["CPH1"]))
-    story.append(Paragraph(f"Norme : {standard}", styles["CPBody"]))
-    story.append(Paragraph(f"Questions évaluées : {k_total}", styles["CPBody"]))
-    story.append(Paragraph(f"Conformes : {k_conf} • Partiels : {k_part} • Non conformes : {k_non}", styles["CPBody"]))
-    story.append(Paragraph(f"Conformité moyenne : {k_avg}%", styles["CPBody"]))
-    story.append(Spacer(1,8))
-    if radar_png: story.append(Image(io.BytesIO(radar_png), width=460, height=330))
-    story.append(PageBreak())
-
-    # Constatations
-    story.append(Paragraph("2. Constatations détaillées", styles["CPH1"]))
-    data=[["Domaine","Contrôle","État","Prob.","Perte (€)","Coût remédiation (€)","Commentaire","Preuves"]]
-    for _,r in df.iterrows():
-        evs = r.get("evidences", [])
-        ev_txt = "\n".join(Path(p).name for p in evs) if evs else "—"
-        data.append([
-            r["domain"], f"{r['qid']} — {r['question']}", r["answer"], f"{r['probability']*100:.0f}%",
-            fmt_money(r["loss_estimate"]), fmt_money(r["remediation_cost"]), (r.get("comment") or ""), ev_txt
-        ])
-    tbl=Table(data, colWidths=[90,220,70,45,75,95,120,120])
-    tbl.setStyle(TableStyle([
-        ("BACKGROUND",(0,0),(-1,0), colors.HexColor("#0A1F44")),
-        ("TEXTCOLOR",(0,0),(-1,0), colors.white),
-        ("FONTNAME",(0,0),(-1,0), "Helvetica-Bold"),
-        ("GRID",(0,0),(-1,-1), 0.4, colors.HexColor("#C8D1DA")),
-        ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.whitesmoke, colors.white]),
-        ("VALIGN",(0,0),(-1,-1), "TOP"),
-        ("ALIGN",(3,1),(5,-1), "CENTER"),
-    ]))
-    story.append(tbl); story.append(Spacer(1,12))
-
-    # Plan d’action
-    story.append(Paragraph("3. Recommandations & plan d’action", styles["CPH1"]))
-    pr={"Haute":0,"Moyenne":1,"Basse":2,"Info":3}
-    plan=df.sort_values(by=["priority","exp_loss"], key=lambda s: s.map(pr).fillna(9) if s.name=="priority" else -s, ascending=[True,True])
-    pdata=[["Priorité","Domaine","Contrôle","Perte probable (esp.)","Coût remédiation","Recommandation"]]
-    for _,r in plan.iterrows():
-        reco = r.get("yaml_recommendation") or default_reco(r["answer"])
-        pdata.append([r["priority"], r["domain"], f"{r['qid']} — {r['question']}",
-                      fmt_money(r["exp_loss"]), fmt_money(r["remediation_cost"]), reco])
-    pt=Table(pdata, colWidths=[65,90,220,85,95,170])
-    pt.setStyle(TableStyle([
-        ("BACKGROUND",(0,0),(-1,0), colors.HexColor("#0A1F44")),
-        ("TEXTCOLOR",(0,0),(-1,0), colors.white),
-        ("FONTNAME",(0,0),(-1,0), "Helvetica-Bold"),
-        ("GRID",(0,0),(-1,-1), 0.4, colors.HexColor("#C8D1DA")),
-        ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.whitesmoke, colors.white]),
-        ("VALIGN",(0,0),(-1,-1), "TOP"),
-    ]))
-    story.append(pt)
-    doc.build(story); buf.seek(0); return buf
+# ========= Moteur d'audit (risque, KPI, rapports, preuves) =========
+from engine.risk import enrich, simulate_frame, plan_frame, frontier, risk_reduction
+from engine.metrics import domain_scores
+from engine.reports import fmt_money, radar_figure, loss_hist_figure, fig_to_png_bytes, export_word, export_pdf
+from engine import evidence as ev_engine
 
 # ========= Auth =========
 def login_gate():
@@ -367,6 +127,10 @@ with st.sidebar.expander("🧭 Normes & Audits", expanded=True):
     auto_std = st.session_state.get("auto_std")
     idx = stds.index(auto_std) if auto_std in stds else 0
     standard = st.selectbox("Norme", stds, index=idx, key="standard_select")
+    std_meta = standards.standard_info(standard) if standard != "— Aucune —" else None
+    if std_meta:
+        st.caption(f"{std_meta['n_items']} contrôles • {len(std_meta['domains'])} domaines"
+                   + (f" • version {std_meta['version']}" if std_meta["version"] else ""))
     ver = st.text_input("Version (ex: 2022 / 2024)", value="")
 
     if st.button("➕ Créer audit pour ce projet"):
@@ -395,7 +159,7 @@ with st.sidebar.expander("🧭 Normes & Audits", expanded=True):
         current_audit_id=None
 
 with st.sidebar.expander("📥 Import Excel ⇒ YAML", expanded=False):
-    up = st.file_uploader("Excel (FR/EN : Domaine, ID, Question…)", type=["xlsx","xls"])
+    up = st.file_uploader("Excel (FR/EN : Domaine, ID, Question…)", type=["xlsx","xls","csv"])
     std_name_input = st.text_input("Nom de la norme à créer (ex: ISO/IEC 27001)")
     col_imp1, col_imp2 = st.columns(2)
     with col_imp1:
@@ -437,7 +201,7 @@ else:
     if standard == "— Aucune —":
         st.info("➡️ Choisis une **norme** (ou utilise le mode direct depuis Excel).")
         st.stop()
-    catalog = standards.load_yaml(standard)
+    catalog = standards.load_standard(standard)
     display_std_name = standard
 
 if not catalog:
@@ -448,25 +212,33 @@ if not current_audit_id:
     st.info("➡️ Crée/choisis un **audit** pour ce projet.")
     st.stop()
 
-# Charger preuves existantes
+# Charger preuves et réponses existantes (une fois par audit et par session)
+ANSWERS = ["Conforme","Partiellement conforme","Non conforme"]
+DEFAULT_ANSWER = "Partiellement conforme"
+PAGE_SIZE = int(os.environ.get("CYBERPIVOT_PAGE_SIZE", "25"))
 if "evid_map" not in st.session_state:
     st.session_state.evid_map = {}
+if "ans_store" not in st.session_state:
+    st.session_state.ans_store = {}   # audit_id -> {qid: [état, commentaire]} : seul état conservé
 key_prefix = f"P{current_project_id}:A{current_audit_id}:"
-with db() as con:
-    c=con.cursor()
-    c.execute("SELECT qid, evidence_json FROM responses WHERE audit_id=?", (current_audit_id,))
-    for qid, evjson in c.fetchall():
-        if evjson:
-            try:
-                st.session_state.evid_map[key_prefix+qid] = json.loads(evjson)
-            except Exception:
-                st.session_state.evid_map[key_prefix+qid] = []
-
-# ===== Questionnaire (sans reco) + upload preuves =====
-st.subheader(f"📝 Questionnaire — {display_std_name}")
-responses=[]
-for it in catalog:
+store = st.session_state.ans_store.get(current_audit_id)
+if store is None:
+    store = st.session_state.ans_store[current_audit_id] = {}
+    with db() as con:
+        c=con.cursor()
+        c.execute("SELECT qid, answer, comment, evidence_json FROM responses WHERE audit_id=?", (current_audit_id,))
+        for qid, ans, com, evjson in c.fetchall():
+            if ans in ANSWERS: store[qid] = [ans, com or ""]
+            if evjson:
+                try:
+                    st.session_state.evid_map[key_prefix+qid] = json.loads(evjson)
+                except Exception:
+                    st.session_state.evid_map[key_prefix+qid] = []
+
+def render_item(it):
+    """Widgets d'un contrôle ; les valeurs sont recopiées dans le store (source de vérité)."""
     qid = it["id"]; title = it.get("item") or f"{qid} — {it['question']}"
+    cur = store.get(qid, [DEFAULT_ANSWER, ""])
     col1,col2 = st.columns([2.0,1.0])
     with col1:
         st.markdown(f"**{title}**")
@@ -477,35 +249,81 @@ for it in catalog:
         if it.get("reference"): bits.append(f"**Référence :** {it['reference']}")
         if it.get("evidence"):  bits.append(f"**Preuve attendue :** {it['evidence']}")
         if bits: st.write(" / ".join(bits))
-        com = st.text_input(f"Commentaire — {qid}", key=f"com_{current_audit_id}_{qid}")
+        com = st.text_input(f"Commentaire — {qid}", value=cur[1], key=f"com_{current_audit_id}_{qid}")
     with col2:
-        ans = st.selectbox(f"État — {qid}",
-                           ["Conforme","Partiellement conforme","Non conforme"],
-                           index=1, key=f"ans_{current_audit_id}_{qid}")
+        ans = st.selectbox(f"État — {qid}", ANSWERS, index=ANSWERS.index(cur[0]), key=f"ans_{current_audit_id}_{qid}")
         files = st.file_uploader(f"📎 Preuves — {qid}",
                                  type=["pdf","png","jpg","jpeg","xls","xlsx","csv","txt","docx","pptx","zip"],
                                  accept_multiple_files=True,
                                  key=f"evid_{current_audit_id}_{qid}")
         if st.button(f"Enregistrer les preuves — {qid}", key=f"btn_evid_{current_audit_id}_{qid}"):
-            base = (EVID_DIR / f"proj_{current_project_id}" / f"audit_{current_audit_id}" / qid)
-            base.mkdir(parents=True, exist_ok=True)
-            saved=[]
-            for f in files or []:
-                name = Path(f.name).name
-                dest = base / name
-                i=1
-                while dest.exists():
-                    dest = base / f"{Path(name).stem}_{i}{Path(name).suffix}"
-                    i+=1
-                with open(dest,"wb") as out: out.write(f.read())
-                saved.append(str(dest))
+            saved = ev_engine.save_files(EVID_DIR / f"proj_{current_project_id}" / f"audit_{current_audit_id}" / qid, files)
             k = key_prefix+qid
             st.session_state.evid_map[k] = st.session_state.evid_map.get(k, []) + saved
             st.success(f"{len(saved)} fichier(s) enregistré(s)")
         current_evs = st.session_state.evid_map.get(key_prefix+qid, [])
         if current_evs:
             st.caption("Déjà attachées: " + ", ".join(Path(p).name for p in current_evs))
+    if [ans, com] != cur or qid in store: store[qid] = [ans, com]
+
+def _goto(key, delta, n_pages):
+    st.session_state[key] = min(max(1, st.session_state.get(key, 1) + delta), n_pages)
 
+# ===== Questionnaire (sans reco) + upload preuves =====
+st.subheader(f"📝 Questionnaire — {display_std_name}")
+qm1,qm2,qm3 = st.columns([1.6,1.0,1.4])
+with qm1: q_mode = st.radio("Affichage", ["Pages","Par domaine","Tout"], horizontal=True, key="q_mode")
+if q_mode == "Pages":
+    with qm2: page_size = st.number_input("Contrôles par page", 5, 200, PAGE_SIZE, 5, key="q_page_size")
+    n_pages = max(1, -(-len(catalog) // int(page_size)))
+    page_key = f"q_page_{current_audit_id}"
+    if st.session_state.get(page_key, 1) > n_pages: st.session_state[page_key] = n_pages
+    with qm3:
+        p1,p2,p3 = st.columns([1,2,1])
+        p1.button("◀", key="q_prev", on_click=_goto, args=(page_key, -1, n_pages), use_container_width=True)
+        with p2: page = st.number_input("Page", 1, n_pages, key=page_key, label_visibility="collapsed")
+        p3.button("▶", key="q_next", on_click=_goto, args=(page_key, 1, n_pages), use_container_width=True)
+    visible = catalog[(page-1)*int(page_size): page*int(page_size)]
+    st.caption(f"Page {page}/{n_pages} • {len(store)}/{len(catalog)} contrôles renseignés")
+elif q_mode == "Par domaine":
+    domains = list(dict.fromkeys(it["domain"] for it in catalog))
+    with qm2: dom = st.selectbox("Domaine", domains, key=f"q_dom_{current_audit_id}")
+    visible = [it for it in catalog if it["domain"] == dom]
+    st.caption(f"{len(visible)} contrôles dans ce domaine • {len(store)}/{len(catalog)} contrôles renseignés")
+else:
+    visible = catalog
+
+# Import en masse : une archive -> preuves associées par mapping.csv / dossier <ID>/ / préfixe du nom
+with st.expander("📦 Import en masse des preuves (ZIP)"):
+    bz = st.file_uploader("Archive ZIP (mapping.csv optionnel : fichier;ID)", type=["zip"], key=f"bulk_{current_audit_id}")
+    if st.button("📥 Importer l’archive", key=f"btn_bulk_{current_audit_id}", disabled=bz is None):
+        audit_dir = EVID_DIR / f"proj_{current_project_id}" / f"audit_{current_audit_id}"
+        def _dest(q, _i):
+            d = audit_dir / q; d.mkdir(parents=True, exist_ok=True); return str(d)
+        known = set()
+        for it in catalog:
+            for p in st.session_state.evid_map.get(key_prefix+it["id"], []):
+                if os.path.isfile(p): known.add((it["id"], it.get("item",""), ev_engine.file_sha256(p)))
+        bar = st.progress(0.0, text="Import des preuves…")
+        rep = ev_engine.ingest(bz, [(it["id"], it.get("item","")) for it in catalog], str(current_audit_id),
+                               dest=_dest, existing=known,
+                               progress=lambda k, n, b: bar.progress(k / max(n, 1), text=f"{k}/{n} fichier(s) — {b/1e6:.1f} Mo"))
+        for r in rep["rows"]:
+            k = key_prefix+r["qid"]; st.session_state.evid_map[k] = st.session_state.evid_map.get(k, []) + [r["path"]]
+        st.success(f"{rep['attached']} fichier(s) joint(s) sur {rep['files']} — {rep['duplicates']} doublon(s) — {rep['files_per_s']} fichiers/s. "
+                   "Enregistrez les réponses pour conserver les rattachements.")
+        if rep["unmatched"]:
+            st.warning(f"{len(rep['unmatched'])} fichier(s) non associé(s).")
+            st.dataframe(pd.DataFrame(rep["unmatched"]), use_container_width=True, hide_index=True)
+
+for it in visible:
+    render_item(it)
+    st.divider()
+
+# Réponses complètes (tout le catalogue) reconstruites depuis le store, sans widgets
+responses=[]
+for it in catalog:
+    qid = it["id"]; ans, com = store.get(qid, [DEFAULT_ANSWER, ""])
     responses.append({
         "audit_id": current_audit_id,
         "domain": it["domain"], "qid": qid, "question": it["question"],
@@ -513,7 +331,6 @@ for it in catalog:
         "yaml_recommendation": it.get("recommendation",""),
         "evidences": st.session_state.evid_map.get(key_prefix+qid, []),
     })
-    st.divider()
 
 if st.button("💾 Enregistrer toutes les réponses", use_container_width=True):
     with db() as con:
@@ -538,15 +355,17 @@ if st.button("💾 Enregistrer toutes les réponses", use_container_width=True):
         st.session_state.pop("temp_catalog", None)
         st.session_state.pop("temp_std_name", None)
 
-if st.button("📊 Calculer & Prévisualiser", use_container_width=True):
-    rows=[]
-    for r in responses:
-        risk=infer_risk(r["domain"], r["question"], r["answer"])
-        rows.append({**r, **risk})
-    df=pd.DataFrame(rows)
+with st.expander("🎲 Simulation Monte Carlo (pertes annuelles)"):
+    mc1,mc2,mc3 = st.columns(3)
+    with mc1: mc_trials = st.select_slider("Essais", options=[10_000,100_000,200_000,500_000,1_000_000], value=200_000)
+    with mc2: mc_rho = st.slider("Corrélation intra-domaine", 0.0, 0.9, 0.0, 0.05)
+    with mc3: mc_seed = st.number_input("Graine", min_value=0, value=42, step=1)
+budget = st.number_input("💶 Budget de remédiation (€) — 0 = plan trié par priorité", min_value=0, value=0, step=10_000)
 
-    mapping={"conforme":100,"partiellement conforme":50,"non conforme":0}
-    dom_scores = df.assign(score=df["answer"].str.lower().map(mapping).fillna(0)).groupby("domain")["score"].mean().round(1).to_dict()
+if st.button("📊 Calculer & Prévisualiser", use_container_width=True):
+    # caractéristiques par contrôle précalculées à l'import (recalculées si MODEL_VERSION a changé)
+    df=enrich(catalog, pd.DataFrame(responses))
+    dom_scores = domain_scores(df)
 
     st.subheader("📈 Radar des scores par domaine")
     fig=radar_figure(dom_scores)
@@ -557,20 +376,40 @@ if st.button("📊 Calculer & Prévisualiser", use_container_width=True):
     show["preuves"] = df["evidences"].apply(lambda x: ", ".join(Path(p).name for p in x) if isinstance(x,list) else "—")
     st.dataframe(show, use_container_width=True)
 
+    st.subheader("🎲 Distribution de la perte annuelle")
+    sim = simulate_frame(df, trials=int(mc_trials), rho=float(mc_rho), seed=int(mc_seed))
+    m1,m2,m3,m4 = st.columns(4)
+    m1.metric("Espérance", fmt_money(sim["expected"])); m2.metric("P50", fmt_money(sim["p50"]))
+    m3.metric("P90", fmt_money(sim["p90"])); m4.metric("P99", fmt_money(sim["p99"]))
+    hist_fig = loss_hist_figure(sim) if sim["hist"]["counts"] else None
+    if hist_fig: st.plotly_chart(hist_fig, use_container_width=True)
+
+    plan = None
+    if budget > 0:
+        st.subheader("🛠️ Plan de remédiation sous budget")
+        plan = plan_frame(df, float(budget)); sel = plan[plan["selected"]]
+        b1,b2,b3 = st.columns(3)
+        b1.metric("Actions retenues", f"{len(sel)} / {len(plan)}"); b2.metric("Coût", fmt_money(sel["remediation_cost"].sum()))
+        b3.metric("Réduction du risque", fmt_money(sel["risk_reduction"].sum()))
+        fr = frontier(df["remediation_cost"], risk_reduction(df), float(budget))
+        st.line_chart(fr.set_index("budget")["residual"], use_container_width=True)
+        st.dataframe(plan.loc[plan["selected"], ["domain","qid","question","answer","remediation_cost","risk_reduction"]], use_container_width=True)
+
     st.markdown("---")
     radar_png = fig_to_png_bytes(fig)
+    hist_png = fig_to_png_bytes(hist_fig, height=420) if hist_fig else None
 
     c1,c2 = st.columns(2)
     with c1:
         if st.button("📝 Générer le rapport Word", use_container_width=True, key="btn_word"):
-            buf = export_word(f"{current_project_id}", display_std_name, int(current_audit_id), df, radar_png)
+            buf = export_word(f"{current_project_id}", display_std_name, int(current_audit_id), df, radar_png, sim, hist_png, plan)
             st.download_button("⬇️ Télécharger Word", data=buf,
                 file_name=f"Rapport_{standards._norm_name(display_std_name)}_Audit_{current_audit_id}.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
                 use_container_width=True)
     with c2:
         if st.button("🧷 Générer le rapport PDF", use_container_width=True, key="btn_pdf"):
-            buf = export_pdf(f"{current_project_id}", display_std_name, int(current_audit_id), df, radar_png)
+            buf = export_pdf(f"{current_project_id}", display_std_name, int(current_audit_id), df, radar_png, sim, hist_png, plan)
             st.download_button("⬇️ Télécharger PDF", data=buf,
                 file_name=f"Rapport_{standards._norm_name(display_std_name)}_Audit_{current_audit_id}.pdf",
                 mime="application/pdf", use_container_width=True)
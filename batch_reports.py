@@ -0,0 +1,255 @@
+# batch_reports.py — génération en masse des livrables d'audit (DOCX, PDF, XLSX, ZIP preuves) hors UI
+# ============================================================
+# Usage :
+#   python batch_reports.py [AUDIT_ID|MOTIF ...] [--tenant default] [--db cyberpivot.db]
+#                           [--evidence-root evidence] [--out reports] [--formats docx,pdf,xlsx,zip]
+#                           [--workers N] [--force] [--snapshot] [--summary bilan.json]
+#
+# - Sans argument : tous les audits de la base ; les motifs suivent fnmatch (« audit-2025* »)
+# - Lecture seule via storage_backend (sauf index des instantanés avec --snapshot) et des preuves ;
+#   --db : backend SQLite sur ce fichier (hors ligne), sinon backend configuré (CYBERPIVOT_DB_URL)
+# - Par audit (un worker par audit, pool de processus dimensionné aux cœurs) :
+#     métriques (engine.metrics) + risque (engine.risk) puis rendu des livrables
+# - Empreinte d'entrée par livrable (réponses, preuves, version du modèle / du gabarit) dans
+#   <out>/<audit>/manifest.json : livrable présent et empreinte identique => non régénéré
+# - PDF : conversion du DOCX ISACA si docx2pdf / LibreOffice, sinon rapport reportlab (risque)
+# - --snapshot : instantané immuable (engine.snapshots) de chaque audit dont un livrable est régénéré
+# ============================================================
+
+import os
+import sys
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+FORMATS = ["docx", "pdf", "xlsx", "zip"]
+# À incrémenter quand un gabarit change : invalide les empreintes du format concerné
+RENDER_VERSION = {"docx": 1, "pdf": 1, "xlsx": 2, "zip": 1}
+RESP_COLS = ["domain", "qid", "item", "question", "level", "comment", "evidence_json"]
+EXPORT_COLS = ["Domain", "ID", "Item", "Contrôle", "Level", "Comment"]
+MANIFEST = "manifest.json"
+
+# ============================================================
+# Empreintes
+# ============================================================
+def _responses_fingerprint(rows: List[tuple]) -> str:
+    h = hashlib.sha256()
+    for r in rows: h.update(json.dumps(r, ensure_ascii=False).encode("utf-8")); h.update(b"\n")
+    return h.hexdigest()
+
+def _evidence_fingerprint(audit_id: str, root: str) -> str:
+    """Chemins relatifs, tailles et dates de modification (pas de lecture du contenu)."""
+    h = hashlib.sha256(); base = os.path.join(root, audit_id)
+    for d, dirs, fs in os.walk(base):
+        dirs.sort()
+        for fn in sorted(fs):
+            try: stt = os.stat(os.path.join(d, fn))
+            except OSError: continue
+            h.update(f"{os.path.relpath(os.path.join(d, fn), base)}|{stt.st_size}|{stt.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+def _fingerprints(resp: str, evid: str, model: str, pdf_mode: str) -> Dict[str, str]:
+    inputs = {"docx": [resp], "xlsx": [resp, model], "pdf": [resp, model, pdf_mode], "zip": [evid]}
+    return {f: hashlib.sha256(json.dumps([RENDER_VERSION[f]] + v).encode("utf-8")).hexdigest()[:24]
+            for f, v in inputs.items()}
+
+def _read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = path + ".part"
+    with open(tmp, "wb") as f: f.write(data)
+    os.replace(tmp, path)
+
+# ============================================================
+# Rendu d'un audit (exécuté dans un worker)
+# ============================================================
+def _frames(rows: List[tuple]):
+    import pandas as pd
+    from engine.risk import RISK_COLS, control_text, responses_risk
+    raw = pd.DataFrame.from_records(rows, columns=RESP_COLS)
+    export_df = pd.DataFrame({"Domain": raw["domain"], "ID": raw["qid"], "Item": raw["item"],
+                              "Contrôle": raw["question"], "Level": raw["level"],
+                              "Comment": raw["comment"]}, columns=EXPORT_COLS).fillna("").astype(str)
+    # Vue risque au format v13 (answer = niveau FR) ; les non applicables ne portent pas de risque
+    r = responses_risk(export_df.assign(question=control_text(export_df["Item"], export_df["Contrôle"])), "Domain", "question", "Level")
+    risk_df = pd.DataFrame({"domain": r["Domain"], "qid": r["ID"], "question": r["question"], "answer": r["answer"],
+                            "comment": r["Comment"], "yaml_recommendation": "", "evidences": [[] for _ in range(len(r))]}).join(r[RISK_COLS])
+    return export_df, risk_df
+
+def _xlsx(audit_id: str, export_df, risk_df, metrics: Dict[str, Any]) -> bytes:
+    from engine import reports
+    return reports.export_xlsx(audit_id, export_df, risk_df, metrics)
+
+def _pdf(audit_id: str, docx_bytes: Optional[bytes], risk_df, mode: str) -> Optional[bytes]:
+    from engine import reports
+    if mode == "convert":
+        return reports.docx_to_pdf_bytes(docx_bytes)
+    if not len(risk_df): return None
+    return reports.export_pdf("—", "Audit", audit_id, risk_df, None).getvalue()
+
+def render_audit(audit_id: str, out_dir: str, formats: List[str], tenant_id: Optional[str] = None,
+                 evidence_root: str = "evidence", force: bool = False, pdf_mode: str = "reportlab",
+                 snapshot: bool = False) -> Dict[str, Any]:
+    """Rend les livrables d'un audit ; renvoie {audit_id, metrics, written, skipped, missing, bytes, timings, snapshot, error}."""
+    from engine import reports
+    from engine.metrics import compute_metrics
+    from engine.evidence import export_zip
+    from engine.risk import MODEL_VERSION
+    res: Dict[str, Any] = {"audit_id": audit_id, "metrics": {}, "written": [], "skipped": [], "missing": [],
+                           "bytes": 0, "timings": {}, "snapshot": None, "error": ""}
+    t0 = time.perf_counter()
+    try:
+        rows = [tuple(r[c] for c in RESP_COLS) for r in _backend().query_responses(audit_id, columns=RESP_COLS, tenant_id=tenant_id)]
+        res["timings"]["load"] = time.perf_counter() - t0
+        if not rows:
+            res["error"] = "audit vide ou inconnu"; return res
+        fps = _fingerprints(_responses_fingerprint(rows), _evidence_fingerprint(audit_id, evidence_root), MODEL_VERSION, pdf_mode)
+        dest = os.path.join(out_dir, audit_id); os.makedirs(dest, exist_ok=True)
+        man_path = os.path.join(dest, MANIFEST); man = _read_manifest(man_path)
+        done = man.get("artifacts", {})
+        names = {"docx": f"rapport_ISACA_{audit_id}.docx", "pdf": f"rapport_ISACA_{audit_id}.pdf",
+                 "xlsx": f"audit_{audit_id}.xlsx", "zip": f"evidences_{audit_id}.zip"}
+        todo = [f for f in formats if force or (done.get(f) or {}).get("fingerprint") != fps[f]
+                or not os.path.isfile(os.path.join(dest, names[f]))]
+        res["skipped"] = [f for f in formats if f not in todo]
+        if not todo:
+            res["metrics"] = man.get("metrics", {}); res["timings"]["total"] = time.perf_counter() - t0
+            return res
+
+        t = time.perf_counter()
+        export_df, risk_df = _frames(rows)
+        res["metrics"] = compute_metrics(export_df)
+        res["timings"]["metrics"] = time.perf_counter() - t
+        docx_bytes = None
+        for f in todo:
+            t = time.perf_counter()
+            if f == "docx" or (f == "pdf" and pdf_mode == "convert"):
+                docx_bytes = docx_bytes or reports.generate_docx(audit_id, export_df)
+            data = {"docx": lambda: docx_bytes, "xlsx": lambda: _xlsx(audit_id, export_df, risk_df, res["metrics"]),
+                    "pdf": lambda: _pdf(audit_id, docx_bytes, risk_df, pdf_mode),
+                    "zip": lambda: export_zip(audit_id, root=evidence_root)}[f]()
+            res["timings"][f] = time.perf_counter() - t
+            if not data:
+                res["missing"].append(f); done.pop(f, None); continue
+            _write_atomic(os.path.join(dest, names[f]), data)
+            done[f] = {"file": names[f], "fingerprint": fps[f], "bytes": len(data),
+                       "generated_at": datetime.now().isoformat(timespec="seconds")}
+            res["written"].append(f); res["bytes"] += len(data)
+        if snapshot and res["written"]:
+            from engine import snapshots
+            t = time.perf_counter()
+            res["snapshot"] = snapshots.take(audit_id, label="batch", tenant_id=tenant_id, backend=_backend())["snapshot_id"]
+            res["timings"]["snapshot"] = time.perf_counter() - t
+        man = {"audit_id": audit_id, "tenant_id": tenant_id, "metrics": res["metrics"], "artifacts": done,
+               "snapshot": res["snapshot"] or man.get("snapshot")}
+        _write_atomic(man_path, json.dumps(man, ensure_ascii=False, indent=1).encode("utf-8"))
+    except Exception as e:
+        res["error"] = f"{type(e).__name__}: {e}"
+    res["timings"]["total"] = time.perf_counter() - t0
+    return res
+
+# ============================================================
+# Orchestration
+# ============================================================
+def select_audits(patterns: List[str], tenant_id: Optional[str] = None) -> List[str]:
+    known = [a["audit_id"] for a in _backend().list_audits(tenant_id)]
+    if not patterns: return known
+    out: List[str] = []
+    for p in patterns:
+        hit = fnmatch.filter(known, p) if any(ch in p for ch in "*?[") else [p]
+        out += [a for a in hit if a not in out]
+    return out
+
+_BACKEND = None  # backend du processus (principal ou worker), fixé par _init_worker
+
+def _init_worker(db_path: Optional[str]) -> None:
+    """--db : SQLiteBackend sur ce fichier ; sinon backend configuré (storage_backend.get_backend)."""
+    global _BACKEND
+    import storage
+    import storage_backend
+    if db_path:
+        storage.DB_PATH = db_path; _BACKEND = storage_backend.SQLiteBackend()
+    else:
+        _BACKEND = storage_backend.get_backend()
+
+def _backend():
+    if _BACKEND is None: _init_worker(None)
+    return _BACKEND
+
+def run(audits: List[str], out_dir: str = "reports", formats: Optional[List[str]] = None, tenant_id: Optional[str] = None,
+        db_path: Optional[str] = None, evidence_root: str = "evidence", workers: Optional[int] = None,
+        force: bool = False, snapshot: bool = False, log=print) -> Dict[str, Any]:
+    from engine import reports
+    formats = formats or list(FORMATS)
+    pdf_mode = "convert" if "pdf" in formats and reports.converter_available() else "reportlab"
+    workers = max(1, min(workers or os.cpu_count() or 1, len(audits) or 1))
+    kw = dict(out_dir=out_dir, formats=formats, tenant_id=tenant_id, evidence_root=evidence_root, force=force, pdf_mode=pdf_mode,
+              snapshot=snapshot)
+    t0 = time.perf_counter(); results: List[Dict[str, Any]] = []
+
+    def _done(r: Dict[str, Any]) -> None:
+        results.append(r)
+        state = r["error"] or (f"écrits {','.join(r['written']) or '-'} / inchangés {','.join(r['skipped']) or '-'}"
+                               + (f" / absents {','.join(r['missing'])}" if r["missing"] else ""))
+        log(f"[{len(results)}/{len(audits)}] {r['audit_id']:<32} {r['timings'].get('total', 0):7.2f} s  {state}")
+
+    if workers == 1:
+        _init_worker(db_path)
+        for a in audits: _done(render_audit(a, **kw))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as ex:
+            futs = [ex.submit(render_audit, a, **kw) for a in audits]
+            for f in as_completed(futs): _done(f.result())
+
+    elapsed = time.perf_counter() - t0
+    n_written = sum(len(r["written"]) for r in results)
+    by_fmt = {f: round(sum(r["timings"].get(f, 0.0) for r in results), 3) for f in formats}
+    return {"audits": len(audits), "workers": workers, "formats": formats, "pdf_mode": pdf_mode,
+            "written": n_written, "skipped": sum(len(r["skipped"]) for r in results),
+            "missing": sum(len(r["missing"]) for r in results), "errors": [r for r in results if r["error"]],
+            "bytes": sum(r["bytes"] for r in results), "seconds": round(elapsed, 3),
+            "audits_per_s": round(len(audits) / elapsed, 2) if elapsed else 0.0,
+            "artifacts_per_s": round(n_written / elapsed, 2) if elapsed else 0.0,
+            "render_s_by_format": by_fmt, "results": results}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Génération en masse des livrables d'audit")
+    ap.add_argument("audits", nargs="*", help="identifiants ou motifs fnmatch (défaut : tous)")
+    ap.add_argument("--tenant", default=None)
+    ap.add_argument("--db", default=None, help="base SQLite des réponses (défaut : backend configuré, storage.DB_PATH)")
+    ap.add_argument("--evidence-root", default="evidence")
+    ap.add_argument("--out", default="reports")
+    ap.add_argument("--formats", default=",".join(FORMATS))
+    ap.add_argument("--workers", type=int, default=0, help="processus (défaut : nombre de cœurs)")
+    ap.add_argument("--force", action="store_true", help="ignore les empreintes et régénère tout")
+    ap.add_argument("--snapshot", action="store_true", help="fige un instantané des audits régénérés")
+    ap.add_argument("--summary", default="", help="écrit le bilan JSON")
+    a = ap.parse_args(argv)
+    formats = [f.strip() for f in a.formats.split(",") if f.strip()]
+    bad = [f for f in formats if f not in FORMATS]
+    if bad: ap.error(f"formats inconnus : {bad}")
+    _init_worker(a.db)
+    audits = select_audits(a.audits, a.tenant)
+    if not audits:
+        print("Aucun audit sélectionné."); return
+    s = run(audits, a.out, formats, a.tenant, a.db, a.evidence_root, a.workers or None, a.force, a.snapshot)
+    print(f"\n{s['audits']} audit(s) • {s['workers']} worker(s) • PDF : {s['pdf_mode']}")
+    print(f"livrables écrits {s['written']} • inchangés {s['skipped']} • absents {s['missing']} • erreurs {len(s['errors'])}")
+    print(f"{s['bytes'] / 1e6:.1f} Mo en {s['seconds']:.2f} s • {s['audits_per_s']} audits/s • {s['artifacts_per_s']} livrables/s")
+    print("rendu cumulé par format (s) : " + ", ".join(f"{k}={v}" for k, v in s["render_s_by_format"].items()))
+    for r in s["errors"]: print(f"  ERREUR {r['audit_id']} : {r['error']}")
+    if a.summary:
+        with open(a.summary, "w", encoding="utf-8") as f: json.dump(s, f, ensure_ascii=False, indent=1)
+    if s["errors"]: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# benchmarks — mesures hors UI (python -m benchmarks.<script>) ; suite complète : python -m benchmarks.suite
@@ -0,0 +1,144 @@
+# api_load.py — test de charge de l'API REST locale (api_server), débit en requêtes/s
+# Usage : python -m benchmarks.api_load [--url http://127.0.0.1:8765] [--email admin@local --password admin]
+#                                       [--concurrency 8] [--duration 10] [--audits 20] [--controls 500]
+#                                       [--mix responses=4,metrics=3,norm=2,risk=1,put=1] [--out api_load.json]
+#   sans --url : bases temporaires peuplées par benchmarks.synth + serveur embarqué (start_in_thread)
+#   clients : threads http.client en keep-alive, Accept-Encoding gzip, If-None-Match rejoué sur les GET à ETag
+
+import os
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import http.client
+from typing import Any, Dict, List, Tuple
+from urllib.parse import quote, urlparse
+
+from benchmarks import synth
+
+NORM = "bench-norm"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def serve_local(tmp: str, audits: int, controls: int) -> Tuple[str, List[str]]:
+    """Peuple des bases temporaires et démarre l'API dans ce processus ; renvoie (url, audit_ids)."""
+    import auth, norms, storage
+    storage.DB_PATH = os.path.join(tmp, "cp.db"); norms.DB_PATH = os.path.join(tmp, "norms.db")
+    auth.DB_PATH = os.path.join(tmp, "auth.db")
+    import api_server
+    api_server._db().init()
+    cat = synth.catalogue(controls); ids = [f"load-{i:04d}" for i in range(audits)]
+    for i, a in enumerate(ids): storage.upsert_responses(a, synth.responses(synth.audit_frame(cat, seed=i)))
+    norms.save_norm("default", NORM, synth.norm_frame(cat))
+    port = _free_port(); srv = api_server.start_in_thread("127.0.0.1", port)
+    for _ in range(100):
+        if srv.started: break
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", ids
+
+class Client:
+    def __init__(self, url: str, token: str = ""):
+        u = urlparse(url); self.host, self.port = u.hostname, u.port or 80
+        self.con = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        self.token = token; self.etags: Dict[str, str] = {}
+
+    def call(self, method: str, path: str, body: Any = None) -> Tuple[int, int]:
+        h = {"Accept-Encoding": "gzip"}
+        if self.token: h["Authorization"] = f"Bearer {self.token}"
+        if method == "GET" and path in self.etags: h["If-None-Match"] = self.etags[path]
+        data = None
+        if body is not None: data = json.dumps(body).encode("utf-8"); h["Content-Type"] = "application/json"
+        try:
+            self.con.request(method, path, body=data, headers=h); r = self.con.getresponse(); payload = r.read()
+        except (http.client.HTTPException, OSError):
+            self.con.close(); self.con = http.client.HTTPConnection(self.host, self.port, timeout=30); raise
+        if r.getheader("ETag"): self.etags[path] = r.getheader("ETag")
+        return r.status, len(payload)
+
+def login(url: str, email: str, password: str) -> str:
+    c = Client(url); c.con.request("POST", "/auth/token", body=json.dumps({"email": email, "password": password}),
+                                   headers={"Content-Type": "application/json"})
+    r = c.con.getresponse(); b = json.loads(r.read() or b"{}")
+    if r.status != 200: raise SystemExit(f"Authentification refusée ({r.status}) : {b}")
+    return b["access_token"]
+
+def _requests(audit_ids: List[str], rnd: random.Random) -> Dict[str, Any]:
+    a = quote(rnd.choice(audit_ids), safe="")
+    return {"responses": ("GET", f"/audits/{a}/responses?limit=500", None),
+            "metrics": ("GET", f"/audits/{a}/metrics", None),
+            "norm": ("GET", f"/norms/{NORM}", None),
+            "risk": ("GET", f"/audits/{a}/risk?limit=50", None),
+            "put": ("PUT", f"/audits/{a}/responses",
+                    [{"domain": "Bench", "qid": f"PUT-{rnd.randrange(1000):04d}", "item": "Charge",
+                      "level": rnd.choice(synth.LEVELS_FR), "comment": "api_load"} for _ in range(10)])}
+
+def run(url: str, token: str, audit_ids: List[str], concurrency: int, duration: float, mix: Dict[str, int]) -> Dict[str, Any]:
+    names = [k for k, w in mix.items() for _ in range(w)]
+    lat: Dict[str, List[float]] = {k: [] for k in mix}; status: Dict[str, int] = {}; nbytes = [0]; errors = [0]
+    lock = threading.Lock(); stop = time.perf_counter() + duration
+
+    def worker(seed: int) -> None:
+        c = Client(url, token); rnd = random.Random(seed)
+        while time.perf_counter() < stop:
+            k = rnd.choice(names); method, path, body = _requests(audit_ids, rnd)[k]
+            t0 = time.perf_counter()
+            try: st, n = c.call(method, path, body)
+            except Exception:
+                with lock: errors[0] += 1
+                continue
+            dt = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                lat[k].append(dt); status[str(st)] = status.get(str(st), 0) + 1; nbytes[0] += n
+
+    t0 = time.perf_counter()
+    th = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in th: t.start()
+    for t in th: t.join()
+    elapsed = time.perf_counter() - t0; total = sum(len(v) for v in lat.values())
+    pct = lambda v, q: round(statistics.quantiles(v, n=100)[q - 1], 2) if len(v) >= 2 else round(v[0], 2) if v else None
+    return {"url": url, "concurrency": concurrency, "seconds": round(elapsed, 3), "requests": total, "errors": errors[0],
+            "rps": round(total / elapsed, 1) if elapsed else 0.0, "bytes": nbytes[0], "status": status,
+            "endpoints": {k: {"n": len(v), "rps": round(len(v) / elapsed, 1), "p50_ms": pct(v, 50), "p95_ms": pct(v, 95)}
+                          for k, v in lat.items()}}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="")
+    ap.add_argument("--email", default="admin@local")
+    ap.add_argument("--password", default="admin")
+    ap.add_argument("--audit", action="append", default=[], help="audits ciblés (avec --url)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--audits", type=int, default=20)
+    ap.add_argument("--controls", type=int, default=500)
+    ap.add_argument("--mix", default="responses=4,metrics=3,norm=2,risk=1,put=1")
+    ap.add_argument("--out", default="")
+    a = ap.parse_args(argv)
+    mix = {k: int(w) for k, w in (p.split("=") for p in a.mix.split(",") if p.strip())}
+    bad = [k for k in mix if k not in ("responses", "metrics", "norm", "risk", "put")]
+    if bad: ap.error(f"entrées de --mix inconnues : {bad}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if a.url:
+            url, ids = a.url.rstrip("/"), a.audit
+            if not ids:
+                c = Client(url, login(url, a.email, a.password)); c.con.request("GET", "/audits?limit=100", headers={"Authorization": f"Bearer {c.token}"})
+                ids = [r["audit_id"] for r in json.loads(c.con.getresponse().read())["items"]]
+        else:
+            url, ids = serve_local(tmp, a.audits, a.controls)
+        if not ids: raise SystemExit("Aucun audit à interroger.")
+        res = run(url, login(url, a.email, a.password), ids, a.concurrency, a.duration, mix)
+    print(f"{res['requests']} requêtes en {res['seconds']} s • {res['rps']} req/s • {res['concurrency']} clients • "
+          f"erreurs {res['errors']} • statuts {res['status']}")
+    for k, e in res["endpoints"].items():
+        print(f"  {k:<10} n={e['n']:<7} {e['rps']:>8} req/s  p50 {e['p50_ms']} ms  p95 {e['p95_ms']} ms")
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f: json.dump(res, f, ensure_ascii=False, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# bench_evidence.py — import en masse des preuves : ZIP (stocké, sans compression) -> evidence/ + table evidence
+#   débit en fichiers/s et Mo/s, second passage = dédoublonnage (aucune nouvelle ligne)
+# Usage : python -m benchmarks.bench_evidence [--files 2000] [--size-kb 256] [--controls 400]
+#   archive de 5 Go : --files 5000 --size-kb 1024
+
+import os
+import time
+import zipfile
+import argparse
+import tempfile
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--size-kb", type=int, default=256)
+    ap.add_argument("--controls", type=int, default=400)
+    a = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as d:
+        os.environ["DB_PATH"] = os.path.join(d, "bench.db")
+        import storage, storage_backend, evidence_store
+        storage.DB_PATH = os.environ["DB_PATH"]; storage.init_db()
+        controls = [(f"C-{i:04d}", f"Contrôle {i}") for i in range(a.controls)]
+        zp = os.path.join(d, "preuves.zip"); block = os.urandom(a.size_kb * 1024)
+        with zipfile.ZipFile(zp, "w", compression=zipfile.ZIP_STORED) as z:
+            for k in range(a.files):
+                q = controls[k % a.controls][0]
+                # un tiers par dossier <ID>/, le reste par préfixe du nom ; 1 % en double
+                name = f"{q}/capture_{k}.png" if k % 3 == 0 else f"{q}_capture_{k}.png"
+                z.writestr(name, block[: 16] + k.to_bytes(8, "little") + block[24:] if k % 100 else block)
+        cwd = os.getcwd(); os.chdir(d)
+        try:
+            be = storage_backend.SQLiteBackend()
+            r1 = evidence_store.ingest_for_audit("bench", zp, controls, backend=be)
+            t0 = time.perf_counter(); r2 = evidence_store.ingest_for_audit("bench", zp, controls, backend=be)
+            t2 = time.perf_counter() - t0
+            n_db = len(be.list_evidence("bench"))
+        finally:
+            os.chdir(cwd)
+        mb = r1["bytes"] / 1e6
+        print({"files": r1["files"], "archive_mb": round(os.path.getsize(zp) / 1e6, 1), "attached": r1["attached"],
+               "duplicates": r1["duplicates"], "unmatched": len(r1["unmatched"]), "seconds": r1["seconds"],
+               "files_per_s": r1["files_per_s"], "mb_per_s": round(mb / r1["seconds"], 1),
+               "reimport_seconds": round(t2, 3), "reimport_attached": r2["attached"], "rows_in_db": n_db})
+
+if __name__ == "__main__":
+    main()
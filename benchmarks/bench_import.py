@@ -0,0 +1,74 @@
+# bench_import.py — import de norme : lecture complète historique (pd.read_excel + map par cellule)
+#                   vs import en flux (openpyxl read_only, blocs vectorisés)
+# Usage : python -m benchmarks.bench_import [--rows 200000] [--csv] [--mem]
+
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import pandas as pd
+
+def make_file(path: str, rows: int) -> None:
+    hdr = ["Domaine", "QID", "Item", "Question", "Level", "Comment"]
+    data = ((f"D{i % 14}", f"Q-{i // 3:06d}", f"item {i % 3}", f"Contrôle {i} : chiffrement / sauvegarde", "No", "")
+            for i in range(rows))
+    if path.endswith(".csv"):
+        pd.DataFrame(list(data), columns=hdr).to_csv(path, index=False); return
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True); ws = wb.create_sheet()
+    ws.append(hdr)
+    for r in data: ws.append(r)
+    wb.save(path)
+
+def legacy_load(path: str) -> pd.DataFrame:
+    """Version précédente de validators.load_norme_excel (référence)."""
+    df = pd.read_csv(path, encoding="utf-8") if path.endswith(".csv") else pd.read_excel(path)
+    alias = {c.lower().strip(): c for c in df.columns}
+    def pick(key):
+        for k in alias:
+            if k == key.lower(): return alias[k]
+        return None
+    out = pd.DataFrame()
+    for c in ["Domain", "QID", "Item", "Question"]:
+        src = pick(c) or c
+        out[c] = df[src] if src in df.columns else ""
+    out["Level"] = df[pick("Level")] if pick("Level") in df.columns else "No"
+    out["Comment"] = df[pick("Comment")] if pick("Comment") in df.columns else ""
+    for c in ["Domain", "QID", "Item", "Question", "Level", "Comment"]:
+        out[c] = out[c].astype("string").fillna("").map(lambda v: str(v) if v is not None else "")
+    mask = (out["Domain"].str.strip() != "") | (out["QID"].str.strip() != "") | (out["Item"].str.strip() != "")
+    return out[mask].reset_index(drop=True)
+
+def _time(fn):
+    t0 = time.perf_counter(); res = fn(); return res, round(time.perf_counter() - t0, 2)
+
+def _peak_mb(fn) -> int:
+    tracemalloc.start(); fn(); peak = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return round(peak / 2**20)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--csv", action="store_true")
+    ap.add_argument("--mem", action="store_true", help="pic mémoire (tracemalloc, lent)")
+    a = ap.parse_args(argv)
+    import norms, validators
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "norme.csv" if a.csv else "norme.xlsx"); make_file(path, a.rows)
+        norms.DB_PATH = os.path.join(d, "norms.db"); norms.init_norms_db()
+        ref, t_old = _time(lambda: legacy_load(path))
+        new, t_load = _time(lambda: validators.load_norme_excel(path))
+        res, t_imp = _time(lambda: validators.import_norm(path, "bench", norms.save_norm))
+        # l'en-tête « Domaine » n'était pas reconnu par l'ancienne version
+        assert new.drop(columns="Domain").equals(ref.drop(columns="Domain"))
+        out = {"rows": a.rows, "format": "csv" if a.csv else "xlsx", "legacy_load_s": t_old, "stream_load_s": t_load,
+               "import_and_save_s": t_imp, "imported": res["rows_imported"], "errors": res["n_errors"]}
+        if a.mem:
+            out.update(legacy_peak_mb=_peak_mb(lambda: legacy_load(path)),
+                       stream_peak_mb=_peak_mb(lambda: validators.load_norme_excel(path)))
+        print(out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# bench_mc.py — simulation Monte Carlo : 1 M d'essais, séquentiel vs ProcessPool, reproductibilité
+# Usage : python -m benchmarks.bench_mc [--trials 1000000] [--controls 200] [--rho 0.3] [--workers 4]
+
+import time
+import argparse
+
+from risk_engine import infer_risk_batch
+from risk_sim import simulate_frame
+from benchmarks.bench_risk import synth
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--trials", type=int, default=1_000_000)
+    ap.add_argument("--controls", type=int, default=200)
+    ap.add_argument("--rho", type=float, default=0.3)
+    ap.add_argument("--workers", type=int, default=4)
+    a = ap.parse_args(argv)
+    df = synth(a.controls, catalogue=0)
+    df = df.join(infer_risk_batch(df))
+    for rho in (0.0, a.rho):
+        t0 = time.perf_counter(); s1 = simulate_frame(df, trials=a.trials, rho=rho, seed=1); t1 = time.perf_counter() - t0
+        t0 = time.perf_counter(); s2 = simulate_frame(df, trials=a.trials, rho=rho, seed=1, workers=a.workers); t2 = time.perf_counter() - t0
+        assert s1 == s2, "résultat dépendant du nombre de processus"
+        print({"controls": a.controls, "trials": a.trials, "rho": rho, "serial_s": round(t1, 2), f"pool{a.workers}_s": round(t2, 2),
+               "expected": round(s1["expected"]), "mean": round(s1["mean"]), "p50": round(s1["p50"]), "p90": round(s1["p90"]),
+               "p99": round(s1["p99"]), "mean_err_pct": round(100 * abs(s1["mean"] / s1["expected"] - 1), 2)})
+
+if __name__ == "__main__":
+    main()
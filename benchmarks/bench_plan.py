@@ -0,0 +1,28 @@
+# bench_plan.py — optimiseur de plan de remédiation : 10k contrôles, DP vs glouton, frontière
+# Usage : python -m benchmarks.bench_plan [--rows 10000] [--budget-frac 0.05]
+
+import time
+import argparse
+
+from risk_engine import infer_risk_batch
+from remediation import optimize, frontier, risk_reduction
+from benchmarks.bench_risk import synth
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--budget-frac", type=float, default=0.05)
+    a = ap.parse_args(argv)
+    df = synth(a.rows, catalogue=0); df = df.join(infer_risk_batch(df))
+    cost = df["remediation_cost"].to_numpy(); gain = risk_reduction(df)
+    budget = float(cost[gain > 0].sum() * a.budget_frac)
+    out = {"rows": a.rows, "budget": round(budget)}
+    for m in ("greedy", "dp", None):
+        t0 = time.perf_counter(); r = optimize(cost, gain, budget, method=m); dt = time.perf_counter() - t0
+        assert r["cost"] <= budget
+        out[f"{m or 'auto'}_ms"] = round(dt * 1000, 1); out[f"{m or 'auto'}_reduction_pct"] = round(100 * r["reduction"] / r["total"], 3)
+    t0 = time.perf_counter(); frontier(cost, gain, budget); out["frontier_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    print(out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# bench_portfolio.py — vue portefeuille : agrégats SQL (table de synthèse) vs pandas
+# Usage : python -m benchmarks.bench_portfolio [--audits 500] [--controls 400]
+
+import os
+import time
+import random
+import argparse
+import tempfile
+
+LEVELS = ["conforme", "partiellement conforme", "non conforme", "non applicable"]
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--audits", type=int, default=500)
+    ap.add_argument("--controls", type=int, default=400)
+    a = ap.parse_args(argv)
+    import storage
+    with tempfile.TemporaryDirectory() as d:
+        storage.DB_PATH = os.path.join(d, "bench.db"); storage.init_db()
+        rnd = random.Random(42)
+        t0 = time.perf_counter()
+        for k in range(a.audits):
+            storage.upsert_responses(f"audit-{k:04d}", [
+                {"domain": f"D{i % 12}", "qid": f"Q-{i:05d}", "item": "item", "level": rnd.choice(LEVELS),
+                 "evidence": [{"name": "x"}] if rnd.random() < .3 else []} for i in range(a.controls)])
+        t_load = time.perf_counter() - t0
+
+        t0 = time.perf_counter(); m = storage.audit_metrics(); t_sql = time.perf_counter() - t0
+        t0 = time.perf_counter(); dm = storage.domain_metrics(); t_dom = time.perf_counter() - t0
+
+        import pandas as pd
+        t0 = time.perf_counter()
+        rows = []
+        for aid in m:
+            df = pd.DataFrame(storage.list_responses(aid))
+            vc = df["level"].value_counts()
+            n_app = int(vc.get("conforme", 0) + vc.get("partiellement conforme", 0) + vc.get("non conforme", 0))
+            rows.append(None if n_app == 0 else round(((vc.get("conforme", 0) + .5 * vc.get("partiellement conforme", 0)) / n_app) * 100))
+        t_pd = time.perf_counter() - t0
+        assert rows == [v["rate"] for v in m.values()]
+        print({"audits": len(m), "rows": a.audits * a.controls, "load_s": round(t_load, 2),
+               "audit_metrics_ms": round(t_sql * 1000, 1), "domain_metrics_ms": round(t_dom * 1000, 1),
+               "pandas_per_audit_ms": round(t_pd * 1000, 1), "domains": sum(len(v) for v in dm.values())})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# bench_previews.py — panneau Preuves : coût d'un rerun (lecture intégrale des fichiers pour les boutons
+#   « Télécharger » vs recherche des vignettes + téléchargement au clic), débit de génération des vignettes
+# Usage : python -m benchmarks.bench_previews [--files 200] [--px 2400]
+
+import os
+import time
+import argparse
+import tempfile
+
+from PIL import Image
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=200)
+    ap.add_argument("--px", type=int, default=2400)
+    a = ap.parse_args(argv)
+    with tempfile.TemporaryDirectory() as d:
+        import previews
+        paths = []
+        base = Image.effect_noise((a.px, a.px * 3 // 4), 60).convert("RGB")
+        for k in range(a.files):
+            p = os.path.join(d, f"capture_{k}.{'jpg' if k % 2 else 'png'}")
+            base.save(p, quality=90) if k % 2 else base.save(p, compress_level=1); paths.append(p)
+        mb = sum(os.path.getsize(p) for p in paths) / 1e6
+        t0 = time.perf_counter()
+        for p in paths:
+            with open(p, "rb") as rb: rb.read()
+        t_eager = time.perf_counter() - t0
+        cache = previews.PreviewCache(root=os.path.join(d, ".previews"))
+        t0 = time.perf_counter(); cache.schedule(paths); cache.wait(); t_gen = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        hits = sum(cache.thumbnail(p) is not None for p in paths)
+        t_lazy = time.perf_counter() - t0
+        print({"files": a.files, "evidence_mb": round(mb, 1), "rerun_eager_read_ms": round(t_eager * 1000, 1),
+               "rerun_thumbnail_lookup_ms": round(t_lazy * 1000, 2), "thumbs_ready": hits,
+               "generate_s": round(t_gen, 2), "thumbs_per_s": round(a.files / t_gen, 1),
+               "cache_kb": round(cache._used() / 1024, 1), **cache.stats})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# bench_risk.py — infer_risk (boucle Python) vs infer_risk_batch (vectorisé) vs caractéristiques
+#                 précalculées (jointure STATE seule), contrôle d'égalité stricte
+# Usage : python -m benchmarks.bench_risk [--rows 100000] [--catalogue 2000]
+# --catalogue : nombre de contrôles distincts (les audits réutilisent le même catalogue) ;
+#               0 = pire cas, toutes les questions sont distinctes
+
+import time
+import random
+import argparse
+
+import pandas as pd
+
+from risk_engine import infer_risk, infer_risk_batch, infer_risk_from_features, control_features, DOMAIN_TIERS, RISK_COLS
+
+WORDS = ["mfa", "chiffrement", "backup", "pare-feu", "patch", "siem", "accès", "fournisseur",
+         "politique", "revue", "formation", "inventaire", "tls", "iam", "logs", "données"]
+ANSWERS = ["Conforme", "Partiellement conforme", "Non conforme", "  non   conforme ", "autre"]
+
+def synth(n: int, catalogue: int = 2000, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    doms = [d.title() for d in DOMAIN_TIERS] + ["Divers", "Gouvernance IA & Éthique"]
+    k = catalogue or n
+    ctl = [(rnd.choice(doms), " ".join(rnd.choices(WORDS, k=6)) + f" #{i}") for i in range(k)]
+    pick = [ctl[i % k] for i in range(n)]
+    return pd.DataFrame({
+        "domain": [d for d, _ in pick],
+        "question": [q for _, q in pick],
+        "answer": [rnd.choice(ANSWERS) for _ in range(n)],
+    })
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--catalogue", type=int, default=2000)
+    a = ap.parse_args(argv)
+    df = synth(a.rows, a.catalogue)
+    t0 = time.perf_counter()
+    ref = pd.DataFrame([infer_risk(d, q, s) for d, q, s in zip(df["domain"], df["question"], df["answer"])])
+    t_scalar = time.perf_counter() - t0
+    t0 = time.perf_counter(); out = infer_risk_batch(df); t_batch = time.perf_counter() - t0
+    feats = control_features(df["domain"], df["question"])  # fait une fois à l'import de la norme
+    t0 = time.perf_counter(); pre = infer_risk_from_features(feats, df["answer"]); t_pre = time.perf_counter() - t0
+    for c in RISK_COLS:
+        assert (ref[c].to_numpy() == out[c].to_numpy()).all(), c
+        assert (ref[c].to_numpy() == pre[c].to_numpy()).all(), c
+    print({"rows": a.rows, "distinct_questions": df["question"].nunique(), "scalar_s": round(t_scalar, 3), "batch_s": round(t_batch, 3),
+           "precomputed_s": round(t_pre, 3), "speedup": round(t_scalar / t_batch, 1), "identical": True})
+
+if __name__ == "__main__":
+    main()
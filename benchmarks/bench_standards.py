@@ -0,0 +1,52 @@
+# bench_standards.py — pipeline catalogue YAML sur 20k items : Excel -> YAML, puis chargements
+#   (yaml.safe_load pur Python, CSafeLoader, cache binaire .cache.pkl, mémo en mémoire)
+# Usage : python -m benchmarks.bench_standards [--items 20000]
+
+import os
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+import yaml
+
+def legacy_excel_to_yaml(excel_path, yaml_path):
+    """Version précédente (iterrows + yaml.dump pur Python), sans caractéristiques de risque."""
+    df = pd.read_excel(excel_path)
+    rows = []
+    for _, r in df.iterrows():
+        rows.append({"domain": str(r["domain"]), "id": str(r["id"]), "question": str(r["question"])})
+    with open(yaml_path, "w", encoding="utf-8") as f:
+        yaml.dump(rows, f, allow_unicode=True)
+
+def _t(fn, n=1):
+    t0 = time.perf_counter()
+    for _ in range(n): res = fn()
+    return res, round((time.perf_counter() - t0) / n * 1000, 2)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=20_000)
+    a = ap.parse_args(argv)
+    import standards
+    with tempfile.TemporaryDirectory() as d:
+        xl = os.path.join(d, "cat.xlsx")
+        pd.DataFrame({"domain": [f"Domaine {i % 14}" for i in range(a.items)], "id": [f"C-{i:05d}" for i in range(a.items)],
+                      "question": [f"Le contrôle {i} (chiffrement, sauvegarde, accès) est-il appliqué ?" for i in range(a.items)]}
+                     ).to_excel(xl, index=False)
+        old_y, new_y = os.path.join(d, "old.yaml"), os.path.join(d, "new.yaml")
+        _, t_old_w = _t(lambda: legacy_excel_to_yaml(xl, old_y))
+        _, t_new_w = _t(lambda: standards.excel_to_yaml(xl, new_y))
+        ref, t_safe = _t(lambda: yaml.safe_load(open(old_y, encoding="utf-8")))
+        _, t_c = _t(lambda: yaml.load(open(old_y, encoding="utf-8"), Loader=standards._Loader))  # même fichier que safe_load
+        first, t_first = _t(lambda: standards.load_yaml(new_y))  # YAML (avec item["risk"]) + écriture du cache
+        standards._MEMO.clear()
+        cached, t_pkl = _t(lambda: standards.load_yaml(new_y))     # cache binaire
+        _, t_memo = _t(lambda: standards.load_yaml(new_y), 100)    # mémo (rerun Streamlit)
+        assert [{k: v for k, v in it.items() if k != "risk"} for it in cached] == ref
+        print({"items": a.items, "excel_to_yaml_legacy_ms": t_old_w, "excel_to_yaml_ms": t_new_w,
+               "safe_load_ms": t_safe, "csafe_load_ms": t_c, "load_yaml_cold_ms": t_first,
+               "load_yaml_pickle_ms": t_pkl, "load_yaml_memo_ms": t_memo})
+
+if __name__ == "__main__":
+    main()
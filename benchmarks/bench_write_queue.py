@@ -0,0 +1,54 @@
+# bench_write_queue.py — 50 auditeurs simultanés : upsert direct vs file write-behind
+# Usage : python -m benchmarks.bench_write_queue [--auditors 50] [--saves 20] [--rows 200]
+
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+def _records(n: int, rev: int):
+    return [{"domain": f"D{i % 8}", "qid": f"Q-{i:04d}", "item": "item",
+             "level": ("conforme", "non conforme")[(i + rev) % 2], "comment": f"rev {rev}"} for i in range(n)]
+
+def _run(mode: str, auditors: int, saves: int, rows: int) -> dict:
+    import storage, write_queue
+    storage.init_db()
+    errors = []; lat = []; lock = threading.Lock()
+    q = write_queue.WriteBehindQueue(storage.write_rows) if mode == "queue" else None
+
+    def auditor(k: int):
+        for rev in range(saves):
+            t0 = time.perf_counter()
+            try:
+                if q is None: storage.upsert_responses(f"audit-{k}", _records(rows, rev))
+                else: q.submit(f"audit-{k}", _records(rows, rev)).result()
+            except Exception as e:
+                with lock: errors.append(str(e))
+            with lock: lat.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    th = [threading.Thread(target=auditor, args=(k,)) for k in range(auditors)]
+    for t in th: t.start()
+    for t in th: t.join()
+    dt = time.perf_counter() - t0
+    if q is not None: q.close()
+    lat.sort()
+    return {"mode": mode, "seconds": round(dt, 3), "rows_per_s": round(auditors * saves * rows / dt),
+            "p50_ms": round(lat[len(lat) // 2] * 1000, 1), "p95_ms": round(lat[int(len(lat) * .95)] * 1000, 1),
+            "errors": len(errors), "commits": q.stats["commits"] if q else auditors * saves}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--auditors", type=int, default=50)
+    ap.add_argument("--saves", type=int, default=20)
+    ap.add_argument("--rows", type=int, default=200)
+    a = ap.parse_args(argv)
+    for mode in ("direct", "queue"):
+        with tempfile.TemporaryDirectory() as d:
+            import storage
+            storage.DB_PATH = os.path.join(d, "bench.db")
+            print(_run(mode, a.auditors, a.saves, a.rows))
+
+if __name__ == "__main__":
+    main()
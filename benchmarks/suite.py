@@ -0,0 +1,283 @@
+# suite.py — suite de benchmarks hors UI sur données synthétiques, résultats JSON (suivi des régressions)
+# Usage : python -m benchmarks.suite [--sizes 100,2000,20000] [--domains 11] [--repeat 3]
+#                                    [--only storage,docx] [--full] [--out bench_results.json]
+#                                    [--compare ancien.json [--fail-above 1.25]]
+#   --full lève les plafonds par cas (DOCX/PDF/XLSX à 200k contrôles : plusieurs minutes)
+#   comparaison : ratio médiane nouvelle / ancienne par (cas, n) ; code de sortie 1 au-delà de --fail-above
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from benchmarks import synth
+
+CASES: List[Dict[str, Any]] = []
+
+def case(name: str, cap: Optional[int] = None):
+    """cap : taille max hors --full. La fonction reçoit (ctx, n) et renvoie run(i) à chronométrer (None : cas ignoré)."""
+    def deco(fn):
+        CASES.append({"name": name, "cap": cap, "fn": fn}); return fn
+    return deco
+
+# ============================================================
+# Cas
+# ============================================================
+@case("storage.upsert_responses")
+def _upsert(ctx, n):
+    import storage
+    recs = synth.responses(ctx["audit"])
+    return lambda i: storage.upsert_responses(f"bench-up-{n}-{i}", recs)
+
+@case("storage.list_responses")
+def _list(ctx, n):
+    import storage
+    storage.upsert_responses(f"bench-ls-{n}", synth.responses(ctx["audit"]))
+    return lambda i: list(storage.list_responses(f"bench-ls-{n}"))
+
+@case("storage.query_responses_frame")
+def _query(ctx, n):
+    import storage
+    storage.upsert_responses(f"bench-q-{n}", synth.responses(ctx["audit"]))
+    return lambda i: storage.query_responses(f"bench-q-{n}", columns=["qid", "item", "level", "comment"], as_frame=True)
+
+@case("norms.save_norm")
+def _norm_save(ctx, n):
+    import norms
+    df = synth.norm_frame(ctx["cat"])
+    return lambda i: norms.save_norm("default", f"bench-{n}-{i}", df)
+
+@case("norms.get_norm_df")
+def _norm_load(ctx, n):
+    import norms
+    norms.save_norm("default", f"bench-load-{n}", synth.norm_frame(ctx["cat"]))
+    return lambda i: norms.get_norm_df("default", f"bench-load-{n}")
+
+@case("validators.load_norme_excel[xlsx]", cap=50_000)
+def _val_xlsx(ctx, n):
+    import validators
+    p = synth.write_catalogue(ctx["cat"], os.path.join(ctx["dir"], f"cat_{n}.xlsx"))
+    return lambda i: validators.load_norme_excel(p)
+
+@case("validators.load_norme_excel[csv]")
+def _val_csv(ctx, n):
+    import validators
+    p = synth.write_catalogue(ctx["cat"], os.path.join(ctx["dir"], f"cat_{n}.csv"))
+    return lambda i: validators.load_norme_excel(p)
+
+@case("engine.compute_metrics")
+def _metrics(ctx, n):
+    from engine.metrics import compute_metrics
+    df = ctx["audit"]
+    return lambda i: compute_metrics(df)
+
+@case("engine.compute_scores")
+def _scores(ctx, n):
+    from engine.metrics import compute_scores
+    df = ctx["audit"]
+    return lambda i: compute_scores(df)
+
+@case("risk_engine.infer_risk[loop]", cap=20_000)
+def _risk_loop(ctx, n):
+    from risk_engine import infer_risk
+    v = ctx["v13"]; rows = list(zip(v["domain"], v["question"], v["answer"]))
+    return lambda i: [infer_risk(d, q, a) for d, q, a in rows]
+
+@case("risk_engine.infer_risk_batch")
+def _risk_batch(ctx, n):
+    from risk_engine import infer_risk_batch
+    v = ctx["v13"][["domain", "question", "answer"]]
+    return lambda i: infer_risk_batch(v)
+
+@case("engine.reports.generate_docx", cap=20_000)
+def _docx(ctx, n):
+    from engine.reports import generate_docx
+    df = ctx["audit"]
+    return lambda i: generate_docx("bench", df)
+
+@case("engine.reports.export_word", cap=5_000)
+def _word(ctx, n):
+    from engine.reports import export_word
+    df = ctx["v13"]
+    return lambda i: export_word("Projet", "Norme", 1, df, None)
+
+@case("engine.reports.export_pdf", cap=5_000)
+def _pdf(ctx, n):
+    from engine.reports import export_pdf
+    df = ctx["v13"]
+    return lambda i: export_pdf("Projet", "Norme", 1, df, None)
+
+def _evidence(ctx, n) -> str:
+    audit = f"bench-ev-{n}"
+    if not os.path.isdir(os.path.join(ctx["dir"], "evidence", audit)):
+        synth.evidence_tree(os.path.join(ctx["dir"], "evidence"), audit, ctx["audit"], per_control=ctx["evidence"])
+    return audit
+
+@case("engine.evidence.export_zip", cap=20_000)
+def _zip(ctx, n):
+    from engine.evidence import export_zip
+    audit = _evidence(ctx, n); root = os.path.join(ctx["dir"], "evidence")
+    return lambda i: export_zip(audit, root=root)
+
+@case("engine.evidence.evidence_stats", cap=50_000)
+def _evstats(ctx, n):
+    from engine.evidence import evidence_stats
+    audit = _evidence(ctx, n); root = os.path.join(ctx["dir"], "evidence")
+    return lambda i: evidence_stats(audit, ctx["audit"], root=root)
+
+@case("app.export_excel[ExcelWriter]", cap=50_000)
+def _xlsx_writer(ctx, n):
+    import io, pandas as pd
+    df = ctx["audit"]
+    def run(i):
+        with pd.ExcelWriter(io.BytesIO(), engine="openpyxl") as w: df.to_excel(w, index=False, sheet_name="Audit")
+    return run
+
+@case("engine.reports.export_xlsx", cap=50_000)
+def _xlsx_stream(ctx, n):
+    from engine.reports import export_xlsx
+    df = ctx["audit"]
+    return lambda i: export_xlsx("bench", df)
+
+@case("engine.reports.xlsx_cached[hit]")
+def _xlsx_hit(ctx, n):
+    from engine.reports import xlsx_cached
+    df = ctx["audit"]; xlsx_cached("bench", df)
+    return lambda i: xlsx_cached("bench", df)
+
+def _campaigns(ctx, n):
+    """Deux campagnes du même catalogue : niveaux et commentaires retirés au sort, 1 % de contrôles en moins."""
+    import pandas as pd
+    if "campaigns" not in ctx:
+        old = pd.DataFrame(synth.responses(ctx["audit"]))
+        new = pd.DataFrame(synth.responses(synth.audit_frame(ctx["cat"], seed=2))).iloc[n // 100:]
+        ctx["campaigns"] = (old, new)
+    return ctx["campaigns"]
+
+@case("engine.snapshots.encode")
+def _snap_encode(ctx, n):
+    from engine.snapshots import encode, decode
+    old, _ = _campaigns(ctx, n)
+    return lambda i: decode(encode(old, {"audit_id": "bench"})[0])
+
+@case("engine.snapshots.diff")
+def _snap_diff(ctx, n):
+    from engine.snapshots import diff
+    old, new = _campaigns(ctx, n)
+    return lambda i: diff(old, new)
+
+@case("engine.trends.points")
+def _trend_points(ctx, n):
+    from engine.trends import points
+    old, _ = _campaigns(ctx, n)
+    df = old.assign(evidence_json=old["evidence"].map(lambda e: "[{}]" if e else ""))
+    return lambda i: points("bench", df)
+
+def _frame(ctx, n):
+    import pandas as pd
+    if "frame" not in ctx: ctx["frame"] = pd.DataFrame(synth.responses(ctx["audit"])).assign(audit_id=f"bench-{n}")
+    return ctx["frame"]
+
+@case("pandas.to_excel[xlsx]", cap=50_000)
+def _xlsx(ctx, n):
+    import io
+    df = _frame(ctx, n)
+    return lambda i: df.to_excel(io.BytesIO(), index=False, engine="openpyxl")
+
+def _columnar_case(fmt):
+    def fn(ctx, n):
+        from engine import columnar
+        if fmt != "csv" and not columnar.available(): return None
+        df = _frame(ctx, n)
+        return lambda i: columnar.to_bytes(df, "responses", fmt)
+    return fn
+
+for _fmt in ("parquet", "arrow", "csv"): case(f"engine.columnar.to_bytes[{_fmt}]")(_columnar_case(_fmt))
+
+@case("engine.columnar.read_table[parquet]")
+def _col_read(ctx, n):
+    from engine import columnar
+    if not columnar.available(): return None
+    p = os.path.join(ctx["dir"], f"responses_{n}.parquet")
+    with open(p, "wb") as f: f.write(columnar.to_bytes(_frame(ctx, n), "responses", "parquet"))
+    return lambda i: columnar.read_table(p)
+
+# ============================================================
+# Exécution
+# ============================================================
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.dirname(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+def _meta() -> Dict[str, Any]:
+    import numpy, pandas
+    return {"date": datetime.now().isoformat(timespec="seconds"), "git": _git_rev(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "numpy": numpy.__version__, "pandas": pandas.__version__}
+
+def run(sizes: List[int], domains: int = 11, repeat: int = 3, only: Optional[List[str]] = None,
+        full: bool = False, evidence: float = 1.0, log=print) -> Dict[str, Any]:
+    results = []
+    with tempfile.TemporaryDirectory() as d:
+        import storage, norms
+        storage.DB_PATH = os.path.join(d, "bench.db"); storage.init_db()
+        norms.DB_PATH = os.path.join(d, "norms.db"); norms.init_norms_db()
+        for n in sizes:
+            cat = synth.catalogue(n, domains)
+            ctx = {"dir": d, "cat": cat, "audit": synth.audit_frame(cat), "v13": synth.v13_frame(cat), "evidence": evidence}
+            for c in CASES:
+                if only and not any(o in c["name"] for o in only): continue
+                if c["cap"] and n > c["cap"] and not full: continue
+                fn = c["fn"](ctx, n); ts = []
+                if fn is None: continue  # dépendance optionnelle absente
+                for i in range(repeat):
+                    t0 = time.perf_counter(); fn(i); ts.append(time.perf_counter() - t0)
+                r = {"case": c["name"], "n": n, "median_s": round(statistics.median(ts), 6), "min_s": round(min(ts), 6),
+                     "runs": repeat, "us_per_control": round(statistics.median(ts) / n * 1e6, 3)}
+                results.append(r); log(f"{r['case']:<40} n={n:<7} {r['median_s']*1000:10.1f} ms")
+    return {"meta": {**_meta(), "sizes": sizes, "domains": domains, "repeat": repeat}, "results": results}
+
+def compare(new: Dict[str, Any], old: Dict[str, Any]) -> List[Dict[str, Any]]:
+    prev = {(r["case"], r["n"]): r for r in old.get("results", [])}
+    out = []
+    for r in new["results"]:
+        o = prev.get((r["case"], r["n"]))
+        if o and o["median_s"] > 0:
+            out.append({"case": r["case"], "n": r["n"], "old_s": o["median_s"], "new_s": r["median_s"],
+                        "ratio": round(r["median_s"] / o["median_s"], 3)})
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,2000,20000")
+    ap.add_argument("--domains", type=int, default=11)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--evidence", type=float, default=1.0, help="preuves par contrôle (moyenne)")
+    ap.add_argument("--only", default="")
+    ap.add_argument("--full", action="store_true")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", default="")
+    ap.add_argument("--fail-above", type=float, default=0.0)
+    a = ap.parse_args(argv)
+    res = run([int(x) for x in a.sizes.split(",") if x.strip()], a.domains, a.repeat,
+              [o.strip() for o in a.only.split(",") if o.strip()] or None, a.full, a.evidence)
+    with open(a.out, "w", encoding="utf-8") as f: json.dump(res, f, ensure_ascii=False, indent=1)
+    print(f"-> {a.out} ({len(res['results'])} mesures)")
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f: cmp = compare(res, json.load(f))
+        bad = [c for c in cmp if a.fail_above and c["ratio"] > a.fail_above]
+        for c in cmp:
+            print(f"{c['case']:<40} n={c['n']:<7} x{c['ratio']:<6} {'RÉGRESSION' if c in bad else ''}")
+        if bad: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# synth.py — générateurs synthétiques (catalogues, audits, preuves) au schéma du dépôt
+#   catalogue(n)      : norme au format gen_modele_iso42001 / validators (Domain, QID, Item, Question, Level, Comment)
+#   norm_frame(cat)   : schéma publié (Domain, ID, Item, Contrôle, Level, Comment) — norms.save_norm, working_df
+#   audit_frame(cat)  : working_df avec niveaux FR et commentaires tirés au hasard
+#   responses(df)     : enregistrements storage.upsert_responses
+#   yaml_items(cat)   : items de catalogue v13 (domain, id, question, recommendation)
+#   v13_frame(cat)    : DataFrame « Calculer » de v13 (réponses + colonnes risque)
+#   evidence_tree(...): fichiers evidence/<audit>/<ID>__<item>/ (même arborescence que l'application)
+# Tout est déterministe (seed).
+
+import os
+import random
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["Domain", "QID", "Item", "Question", "Level", "Comment"]
+LEVELS_FR = ["conforme", "partiellement conforme", "non conforme", "non applicable"]
+LEVEL_MIX = (0.45, 0.25, 0.20, 0.10)
+ANSWERS_V13 = ["Conforme", "Partiellement conforme", "Non conforme"]
+# domaines du modèle de risque (risk_engine.DOMAIN_TIERS) puis génériques
+DOMAINS = ["Sécurité", "Contrôle d’accès", "Opérations", "Sécurité communications", "Gouvernance IA",
+           "Sécurité modèle/données", "Organisation", "Politiques de sécurité", "Gestion des risques IA",
+           "Conformité & éthique", "Ressources humaines"]
+PREFIXES = ["SEC", "IAM", "OPS", "COM", "GOV", "MOD", "ORG", "POL", "RISK", "ETH", "RH"]
+# sujets : une partie déclenche les pondérations par mots-clés du modèle de risque
+TOPICS = [("MFA", "Le MFA est-il activé pour les comptes à privilèges ?"),
+          ("Chiffrement", "Les données sensibles sont-elles chiffrées au repos et en transit (TLS) ?"),
+          ("Sauvegardes", "Les sauvegardes sont-elles testées par des restaurations régulières ?"),
+          ("Segmentation", "Le réseau est-il segmenté et filtré par pare-feu ?"),
+          ("Correctifs", "Les correctifs de sécurité (CVE critiques) sont-ils appliqués sous 30 jours ?"),
+          ("Journalisation", "Les journaux sont-ils centralisés dans un SIEM avec détection ?"),
+          ("Revue des accès", "Les droits d’accès sont-ils revus périodiquement ?"),
+          ("Fournisseurs", "Les fournisseurs tiers sont-ils évalués avant contractualisation ?"),
+          ("Politique", "Existe-t-il une politique formalisée, approuvée et communiquée ?"),
+          ("Formation", "Les collaborateurs sont-ils sensibilisés chaque année ?")]
+
+def domains(n_domains: int) -> List[str]:
+    return [DOMAINS[i] if i < len(DOMAINS) else f"Domaine {i + 1}" for i in range(n_domains)]
+
+def catalogue(n_controls: int, n_domains: int = 11, seed: int = 0) -> pd.DataFrame:
+    rnd = np.random.default_rng(seed)
+    doms = domains(n_domains)
+    d = np.arange(n_controls) % n_domains
+    t = rnd.integers(0, len(TOPICS), n_controls)
+    pre = [PREFIXES[i] if i < len(PREFIXES) else f"D{i + 1}" for i in range(n_domains)]
+    return pd.DataFrame({
+        "Domain": [doms[i] for i in d],
+        "QID": [f"{pre[di]}-{k:06d}" for k, di in enumerate(d)],
+        "Item": [TOPICS[i][0] for i in t],
+        "Question": [TOPICS[i][1] for i in t],
+        "Level": "No", "Comment": "",
+    }, columns=COLUMNS)
+
+def norm_frame(cat: pd.DataFrame) -> pd.DataFrame:
+    return cat.rename(columns={"QID": "ID", "Question": "Contrôle"})
+
+def _levels(n: int, seed: int, mix: Sequence[float] = LEVEL_MIX) -> np.ndarray:
+    return np.random.default_rng(seed).choice(LEVELS_FR, size=n, p=mix)
+
+def audit_frame(cat: pd.DataFrame, seed: int = 1, mix: Sequence[float] = LEVEL_MIX) -> pd.DataFrame:
+    d = norm_frame(cat).copy()
+    d["Level"] = _levels(len(d), seed, mix)
+    rnd = random.Random(seed)
+    d["Comment"] = [rnd.choice(["", "", "Preuve demandée", "Plan d’action en cours", "Vu en entretien"]) for _ in range(len(d))]
+    return d
+
+def responses(df: pd.DataFrame, evidence_ratio: float = 0.3, seed: int = 2) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [{"domain": r.Domain, "qid": r.ID, "item": r.Item, "question": r.Contrôle, "level": r.Level,
+             "comment": r.Comment, "evidence": [{"name": f"{r.ID}.pdf"}] if rnd.random() < evidence_ratio else []}
+            for r in df.itertuples(index=False)]
+
+def yaml_items(cat: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [{"domain": d, "id": q, "question": f"{i} — {t}", "recommendation": ""}
+            for d, q, i, t in zip(cat["Domain"], cat["QID"], cat["Item"], cat["Question"])]
+
+def v13_frame(cat: pd.DataFrame, seed: int = 3) -> pd.DataFrame:
+    from risk_engine import attach_features, catalog_features, infer_risk_from_features
+    items = attach_features(yaml_items(cat))
+    ans = np.random.default_rng(seed).choice(ANSWERS_V13, size=len(items), p=(.5, .3, .2))
+    df = pd.DataFrame({"audit_id": 1, "domain": [i["domain"] for i in items], "qid": [i["id"] for i in items],
+                       "question": [i["question"] for i in items], "answer": ans, "comment": "",
+                       "yaml_recommendation": "", "evidences": [[] for _ in items]})
+    return df.join(infer_risk_from_features(catalog_features(items), df["answer"], index=df.index))
+
+def evidence_tree(root: str, audit_id: str, df: pd.DataFrame, per_control: float = 1.0,
+                  size_kb: int = 4, seed: int = 4) -> int:
+    """per_control fichiers en moyenne par contrôle ; renvoie le nombre de fichiers écrits."""
+    from evidence_store import evidence_dir
+    rnd = random.Random(seed); blob = os.urandom(size_kb * 1024); n = 0
+    for r in df[["ID", "Item"]].drop_duplicates().itertuples(index=False):
+        k = int(per_control) + (rnd.random() < per_control - int(per_control))
+        if not k: continue
+        d = evidence_dir(audit_id, r.ID, r.Item, root=root)
+        for j in range(k):
+            with open(os.path.join(d, f"20250101-000000-{j:06d}__preuve-{j}.pdf"), "wb") as f: f.write(blob)
+            n += 1
+    return n
+
+def write_catalogue(cat: pd.DataFrame, path: str) -> str:
+    (cat.to_csv(path, index=False) if path.lower().endswith(".csv") else cat.to_excel(path, index=False))
+    return path
@@ -0,0 +1,18 @@
+# engine — moteur d'audit sans Streamlit : niveaux, métriques, risque, rapports, preuves
+# ============================================================
+# - levels   : niveaux FR (conforme / partiellement / non conforme / N/A), scores, gravité
+# - metrics  : taux pondéré (C + 0,5×PC sur applicables), scores par domaine, KPI v13
+# - risk     : modèle de risque (risk_engine), simulation (risk_sim), plan sous budget (remediation)
+# - reports  : DOCX ISACA, DOCX/PDF v13, radar, conversion PDF, rapport de comparaison, classeur Excel en flux
+# - evidence : arborescence des preuves, uploads, ZIP + manifest, import en masse
+# - snapshots: instantanés immuables compressés (.cpsnap) et diff entre campagnes
+# - trends   : séries de conformité / couverture / perte espérée par audit et domaine, agrégats mois / trimestre
+# - columnar : export / import Parquet, Arrow IPC (repli CSV) des réponses, normes et preuves
+# Fonctions pures (aucun import streamlit) : réutilisables en batch, en pool de processus, en benchmark.
+# ============================================================
+
+from engine.levels import LEVELS_FR, CANON_TO_FR, LEVEL_SCORE, SEVERITY, to_fr_level
+from engine.metrics import compute_metrics, compute_scores, answer_kpis, domain_scores
+
+__all__ = ["LEVELS_FR", "CANON_TO_FR", "LEVEL_SCORE", "SEVERITY", "to_fr_level",
+           "compute_metrics", "compute_scores", "answer_kpis", "domain_scores"]
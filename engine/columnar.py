@@ -0,0 +1,287 @@
+# columnar.py — export / import en colonnes (Parquet, Arrow IPC, repli CSV) des réponses, normes et preuves
+# ============================================================
+# - Formats : parquet (pyarrow, zstd : archivage compact) | arrow (fichier IPC non compressé : lecture
+#             en memory-map sans copie)
+#             | csv (.csv.gz, sans dépendance : repli automatique si pyarrow est absent)
+# - export_bundle(dest) : un dossier par export = responses.<ext>, evidence.<ext>, norms.<ext> + manifest.json
+#   (comptes, sha256) ; une table par jeu de données tous audits confondus (colonne audit_id),
+#   écrite audit par audit : mémoire bornée par le plus gros audit
+# - to_bytes(df)        : un fichier en mémoire (téléchargement d'un audit : app, API)
+# - read_table(path)    : DataFrame sans copie (types Arrow, pd.ArrowDtype) pour l'analytique
+# - import_file / import_bundle : relecture par lots -> backend.write_rows (journal + synthèse),
+#   add_evidence_many, save_norm ; le manifest est vérifié (sha256) avant tout import
+# CLI : python -m engine.columnar export [AUDIT|MOTIF ...] --out DIR [--format parquet|arrow|csv]
+#       python -m engine.columnar import DIR|FICHIER [--tenant T] [--db ...] [--norms-db ...]
+# ============================================================
+
+import io
+import os
+import sys
+import json
+import gzip
+import time
+import fnmatch
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+import perf
+import storage
+from norms import REQUIRED_COLS as NORM_COLS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow optionnel : CSV seulement
+    pa = pq = None
+
+FORMATS = ["parquet", "arrow", "csv"]
+EXT = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+MANIFEST = "manifest.json"
+BATCH_ROWS = 50_000
+# Colonnes par jeu de données ; numériques : le reste est du texte
+KINDS = {"responses": [c for c in storage.DEST_COLS if c != "id"],
+         "evidence": list(storage.EVIDENCE_COLS),
+         "norms": ["norm"] + NORM_COLS}
+NUMERIC = {"score": "float64", "bytes": "int64"}
+
+def available() -> bool:
+    return pa is not None
+
+def default_format() -> str:
+    return "parquet" if available() else "csv"
+
+def _check(fmt: str) -> str:
+    if fmt not in FORMATS: raise ValueError(f"Format inconnu : {fmt}")
+    if fmt != "csv" and not available(): raise RuntimeError(f"pyarrow requis pour le format {fmt} (pip install pyarrow)")
+    return fmt
+
+def _backend(backend=None):
+    import storage_backend
+    return backend or storage_backend.get_backend()
+
+# ============================================================
+# Écriture
+# ============================================================
+def _schema(kind: str):
+    return pa.schema([(c, pa.float64() if NUMERIC.get(c) == "float64" else pa.int64() if NUMERIC.get(c) == "int64"
+                       else pa.string()) for c in KINDS[kind]])
+
+def _conform(df: pd.DataFrame, kind: str) -> pd.DataFrame:
+    """Colonnes du jeu de données, dans l'ordre ; texte sans NaN, numériques typés."""
+    cols = KINDS[kind]; out = {}
+    for c in cols:
+        s = df[c] if c in df.columns else pd.Series([None] * len(df), index=df.index)
+        if c in NUMERIC: out[c] = pd.to_numeric(s, errors="coerce").astype("float64" if NUMERIC[c] == "float64" else "Int64")
+        else: out[c] = s.fillna("").astype(str)
+    return pd.DataFrame(out, index=df.index)
+
+class _Writer:
+    """Écriture incrémentale (un lot par audit) dans un fichier temporaire renommé à la fermeture."""
+    def __init__(self, path_or_buf, kind: str, fmt: str):
+        self.kind, self.fmt, self.rows = kind, _check(fmt), 0
+        self.path = path_or_buf if isinstance(path_or_buf, str) else None
+        self._sink = self.path + ".part" if self.path else path_or_buf
+        if fmt == "parquet":
+            self._w = pq.ParquetWriter(self._sink, _schema(kind), compression="zstd")
+        elif fmt == "arrow":
+            self._w = pa.ipc.new_file(self._sink, _schema(kind))  # non compressé : tampons lisibles en place
+        else:
+            self._w = gzip.GzipFile(filename="", mode="wb", fileobj=open(self._sink, "wb") if self.path else self._sink, compresslevel=6)
+            self._w.write((",".join(KINDS[kind]) + "\n").encode("utf-8"))
+
+    def write(self, df: pd.DataFrame) -> None:
+        if df is None or not len(df): return
+        d = _conform(df, self.kind); self.rows += len(d)
+        if self.fmt == "csv":
+            self._w.write(d.to_csv(index=False, header=False).encode("utf-8"))
+        else:
+            self._w.write_table(pa.Table.from_pandas(d, schema=_schema(self.kind), preserve_index=False))
+
+    def close(self) -> None:
+        if self.fmt == "csv":
+            fo = self._w.fileobj; self._w.close()
+            if self.path: fo.close()
+        else:
+            self._w.close()
+        if self.path: os.replace(self._sink, self.path)
+
+@perf.timed("columnar.to_bytes")
+def to_bytes(df: pd.DataFrame, kind: str = "responses", fmt: Optional[str] = None) -> bytes:
+    """Un jeu de données en mémoire (téléchargement) ; fmt par défaut : parquet si pyarrow, sinon csv."""
+    buf = io.BytesIO(); w = _Writer(buf, kind, fmt or default_format()); w.write(df); w.close()
+    return buf.getvalue()
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""): h.update(chunk)
+    return h.hexdigest()
+
+def select_audits(patterns: Optional[List[str]], tenant_id: Optional[str] = None, backend=None) -> List[str]:
+    known = [a["audit_id"] for a in _backend(backend).list_audits(tenant_id)]
+    if not patterns: return known
+    out: List[str] = []
+    for p in patterns:
+        out += [a for a in (fnmatch.filter(known, p) if any(ch in p for ch in "*?[") else [p]) if a not in out]
+    return out
+
+@perf.timed("columnar.export")
+def export_bundle(dest: str, audit_ids: Optional[List[str]] = None, tenant_id: Optional[str] = None, backend=None,
+                  fmt: Optional[str] = None, norms: bool = True, evidence: bool = True,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """Exporte réponses (+ preuves, normes) dans dest ; renvoie le manifest écrit."""
+    db = _backend(backend); fmt = _check(fmt or default_format()); t0 = time.perf_counter()
+    ids = audit_ids if audit_ids is not None else select_audits(None, tenant_id, db)
+    os.makedirs(dest, exist_ok=True)
+    writers = {"responses": _Writer(os.path.join(dest, "responses" + EXT[fmt]), "responses", fmt)}
+    if evidence: writers["evidence"] = _Writer(os.path.join(dest, "evidence" + EXT[fmt]), "evidence", fmt)
+    try:
+        for i, a in enumerate(ids, 1):
+            writers["responses"].write(db.query_responses(a, columns=KINDS["responses"], as_frame=True, tenant_id=tenant_id))
+            if evidence:
+                ev = db.list_evidence(a, tenant_id=tenant_id)
+                if ev: writers["evidence"].write(pd.DataFrame(ev))
+            if progress: progress(i, len(ids))
+        if norms:
+            writers["norms"] = _Writer(os.path.join(dest, "norms" + EXT[fmt]), "norms", fmt)
+            for n in db.list_norms(tenant_id or "default"):
+                d = db.get_norm_df(tenant_id or "default", n["name"])
+                if d is not None: writers["norms"].write(d.assign(norm=n["name"]))
+    finally:
+        for w in writers.values(): w.close()
+    files = {k: {"file": os.path.basename(w.path), "rows": w.rows, "bytes": os.path.getsize(w.path), "sha256": _sha256(w.path)}
+             for k, w in writers.items()}
+    man = {"version": 1, "format": fmt, "tenant_id": tenant_id, "exported_at": datetime.utcnow().isoformat(timespec="seconds"),
+           "audits": len(ids), "files": files, "seconds": round(time.perf_counter() - t0, 3)}
+    with open(os.path.join(dest, MANIFEST), "w", encoding="utf-8") as f: json.dump(man, f, ensure_ascii=False, indent=1)
+    return man
+
+# ============================================================
+# Lecture
+# ============================================================
+def detect(path: str) -> tuple:
+    """(jeu de données, format) d'après le nom : responses.parquet, norms.csv.gz, ..."""
+    base = os.path.basename(path)
+    for fmt, ext in EXT.items():
+        if base.endswith(ext) or (fmt == "csv" and base.endswith(".csv")):
+            stem = base[: -len(ext)] if base.endswith(ext) else base[:-4]
+            kind = next((k for k in KINDS if stem == k or stem.startswith(k + "_") or stem.endswith("_" + k)), "responses")
+            return kind, fmt
+    raise ValueError(f"Extension non reconnue : {base} (attendu {', '.join(EXT.values())})")
+
+def _read_csv(src, **kw):
+    return pd.read_csv(src, dtype=str, keep_default_na=False, compression="infer" if isinstance(src, str) else "gzip", **kw)
+
+@perf.timed("columnar.read")
+def read_table(path: str, arrow_types: bool = True) -> pd.DataFrame:
+    """Fichier complet en DataFrame ; arrow_types=True : colonnes pd.ArrowDtype adossées aux tampons Arrow (sans copie),
+    fichier .arrow lu en memory-map."""
+    _, fmt = detect(path)
+    if fmt == "csv": return _read_csv(path)
+    _check(fmt)
+    t = pq.read_table(path) if fmt == "parquet" else pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return t.to_pandas(types_mapper=pd.ArrowDtype) if arrow_types else t.to_pandas()
+
+def iter_frames(src, fmt: str, batch_rows: int = BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Lots successifs (mémoire bornée) ; src : chemin ou flux binaire."""
+    if fmt == "csv":
+        yield from _read_csv(src, chunksize=batch_rows); return
+    _check(fmt)
+    if fmt == "parquet":
+        for b in pq.ParquetFile(src).iter_batches(batch_size=batch_rows): yield b.to_pandas()
+    else:
+        r = pa.ipc.open_file(pa.memory_map(src) if isinstance(src, str) else src)
+        for i in range(r.num_record_batches): yield r.get_batch(i).to_pandas()
+
+# ============================================================
+# Import
+# ============================================================
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Lignes en dicts ; numériques retypés (le CSV est lu en texte), NaN -> None."""
+    df = df.copy()
+    for c in NUMERIC:
+        if c in df.columns: df[c] = pd.to_numeric(df[c].replace("", None), errors="coerce")
+    cols = {c: df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns}
+    if "bytes" in cols: cols["bytes"] = [None if v is None else int(v) for v in cols["bytes"]]
+    return [dict(zip(cols, vals)) for vals in zip(*cols.values())]
+
+@perf.timed("columnar.import")
+def import_file(src, kind: Optional[str] = None, fmt: Optional[str] = None, tenant_id: Optional[str] = None,
+                backend=None, batch_rows: int = BATCH_ROWS) -> Dict[str, Any]:
+    """Importe un fichier (chemin, ou flux avec kind/fmt explicites) ; upsert : réimporter est idempotent."""
+    db = _backend(backend); t0 = time.perf_counter()
+    if isinstance(src, str):
+        k, f = detect(src); kind = kind or k; fmt = fmt or f
+    if kind not in KINDS or fmt not in FORMATS: raise ValueError("kind / fmt requis pour un flux")
+    n = 0; audits: set = set(); norm_parts: Dict[str, List[pd.DataFrame]] = {}
+    now = storage._now()
+    for df in iter_frames(src, fmt, batch_rows):
+        missing = [c for c in (["audit_id", "domain", "qid", "item"] if kind == "responses" else
+                               ["audit_id", "qid", "item", "name", "path"] if kind == "evidence" else ["norm"]) if c not in df.columns]
+        if missing: raise ValueError(f"{kind} : colonnes manquantes {missing}")
+        if kind == "responses":
+            rows = [storage.response_row(r["audit_id"], r, r.get("updated_at") or now) for r in _records(df)]
+            n += db.write_rows(rows, tenant_id=tenant_id); audits.update(r["audit_id"] for r in rows)
+        elif kind == "evidence":
+            n += db.add_evidence_many(_records(df), tenant_id=tenant_id)
+        else:
+            for name, g in df.groupby("norm", sort=False): norm_parts.setdefault(str(name), []).append(g)
+    for name, parts in norm_parts.items():
+        d = pd.concat(parts, ignore_index=True)
+        db.save_norm(tenant_id or "default", name, d.drop(columns=["norm"])); n += len(d)
+    if audits:
+        from engine import trends
+        trends.touch(sorted(audits), tenant_id, db)
+    return {"kind": kind, "format": fmt, "rows": n, "audits": len(audits), "norms": len(norm_parts),
+            "seconds": round(time.perf_counter() - t0, 3)}
+
+def import_bundle(src: str, tenant_id: Optional[str] = None, backend=None, verify: bool = True) -> Dict[str, Any]:
+    """Importe un dossier produit par export_bundle (normes, puis réponses, puis preuves)."""
+    with open(os.path.join(src, MANIFEST), encoding="utf-8") as f: man = json.load(f)
+    if verify:
+        bad = [k for k, e in man["files"].items() if _sha256(os.path.join(src, e["file"])) != e["sha256"]]
+        if bad: raise ValueError(f"Empreinte invalide (fichier modifié ou tronqué) : {bad}")
+    out = {}
+    for k in ("norms", "responses", "evidence"):
+        if k in man["files"]: out[k] = import_file(os.path.join(src, man["files"][k]["file"]), k, man["format"], tenant_id, backend)
+    return out
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export / import en colonnes (Parquet, Arrow, CSV)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export"); ex.add_argument("audits", nargs="*", help="identifiants ou motifs fnmatch (défaut : tous)")
+    ex.add_argument("--out", required=True); ex.add_argument("--format", default=None, choices=FORMATS)
+    ex.add_argument("--no-norms", action="store_true"); ex.add_argument("--no-evidence", action="store_true")
+    im = sub.add_parser("import"); im.add_argument("src", help="dossier d'export ou fichier")
+    im.add_argument("--no-verify", action="store_true")
+    for p in (ex, im):
+        p.add_argument("--tenant", default=None); p.add_argument("--db", default=None, help="base SQLite (défaut : storage.DB_PATH)")
+        p.add_argument("--norms-db", default=None, help="base SQLite des normes (défaut : norms.DB_PATH)")
+    a = ap.parse_args(argv)
+    if a.db: storage.DB_PATH = a.db
+    if a.norms_db:
+        import norms; norms.DB_PATH = a.norms_db
+    db = _backend(); db.init()
+    if a.cmd == "export":
+        ids = select_audits(a.audits, a.tenant, db)
+        if not ids: print("Aucun audit sélectionné."); return
+        m = export_bundle(a.out, ids, a.tenant, db, a.format, norms=not a.no_norms, evidence=not a.no_evidence,
+                          progress=lambda i, n: print(f"\r{i}/{n} audits", end="", file=sys.stderr))
+        print(f"\n{m['audits']} audit(s) • format {m['format']} • {m['seconds']} s")
+        for k, e in m["files"].items(): print(f"  {e['file']:<22} {e['rows']:>10} lignes  {e['bytes'] / 1e6:8.2f} Mo")
+    else:
+        res = import_bundle(a.src, a.tenant, db, verify=not a.no_verify) if os.path.isdir(a.src) else {"file": import_file(a.src, tenant_id=a.tenant, backend=db)}
+        for k, r in res.items(): print(f"  {k:<10} {r['rows']:>10} lignes  {r['seconds']} s")
+
+if __name__ == "__main__":
+    main()
+
+__all__ = ["FORMATS", "available", "default_format", "to_bytes", "export_bundle", "read_table", "iter_frames",
+           "import_file", "import_bundle", "select_audits", "detect"]
@@ -0,0 +1,95 @@
+# evidence.py — preuves sur disque (sans Streamlit) : uploads, listing, ZIP + manifest, statistiques
+#   arborescence / nommage / import en masse : evidence_store
+
+import io, os, csv, json, zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+import perf
+from evidence_store import EVIDENCE_ROOT, slug, evidence_dir, stored_name, file_sha256, ingest, ingest_for_audit
+
+def _control_dir(audit: str, qid: str, item: str, root: str = EVIDENCE_ROOT) -> str:
+    return os.path.join(root, audit, f"{qid}__{slug(item)[:60]}")
+
+def has_evidence(audit: str, root: str = EVIDENCE_ROOT) -> bool:
+    base = os.path.join(root, audit)
+    if not os.path.isdir(base): return False
+    for _,_,files in os.walk(base):
+        if files: return True
+    return False
+
+def load_existing(audit: str, qid: str, item: str, root: str = EVIDENCE_ROOT) -> List[Dict[str,str]]:
+    p=evidence_dir(audit,qid,item,root); out=[]
+    for n in sorted(os.listdir(p)):
+        fp=os.path.join(p,n)
+        if os.path.isfile(fp): out.append({"name":n,"path":fp})
+    return out
+
+def persist_uploads(audit: str, qid: str, item: str, files, root: str = EVIDENCE_ROOT) -> List[Dict[str,str]]:
+    """files : objets fichier (name, read()) ; noms <horodatage>__<slug>. Renvoie les fichiers écrits."""
+    saved=[]; tgt=evidence_dir(audit,qid,item,root)
+    for f in files or []:
+        name=stored_name(f.name)
+        with open(os.path.join(tgt,name),"wb") as w: w.write(f.read())
+        saved.append({"name":name,"path":os.path.join(tgt,name)})
+    return saved
+
+def save_files(base: Path, files) -> List[str]:
+    """Arborescence v13 (nom d'origine, suffixe _1, _2… si déjà présent). Renvoie les chemins écrits."""
+    base.mkdir(parents=True, exist_ok=True)
+    saved=[]
+    for f in files or []:
+        name = Path(f.name).name
+        dest = base / name
+        i=1
+        while dest.exists():
+            dest = base / f"{Path(name).stem}_{i}{Path(name).suffix}"
+            i+=1
+        with open(dest,"wb") as out: out.write(f.read())
+        saved.append(str(dest))
+    return saved
+
+def delete_file(path: str, on_error: Optional[Callable[[str, Exception], None]] = None) -> bool:
+    try:
+        if os.path.isfile(path): os.remove(path); return True
+    except Exception as e:
+        if on_error: on_error("Suppression preuve", e)
+    return False
+
+@perf.timed("zip.evidence")
+def export_zip(audit_id: str, root: str = EVIDENCE_ROOT) -> Optional[bytes]:
+    """ZIP <audit>/<ID>__<item>/<fichier> + manifest.csv / manifest.json ; None si aucune preuve."""
+    base = os.path.join(root, audit_id)
+    if not os.path.isdir(base): return None
+    entries=[]; total=0; bio=io.BytesIO()
+    with zipfile.ZipFile(bio,"w",compression=zipfile.ZIP_DEFLATED) as z:
+        for d,_,fs in os.walk(base):
+            for fn in fs:
+                full=os.path.join(d,fn); rel=os.path.relpath(full,base)
+                try:
+                    size=os.path.getsize(full); total+=size
+                    entries.append({"path":os.path.join(audit_id,rel).replace("\\","/"),"bytes":int(size)})
+                    z.write(full, arcname=os.path.join(audit_id,rel))
+                except Exception: pass
+        if not entries: return None
+        buf=io.StringIO(); w=csv.writer(buf, lineterminator="\n")
+        w.writerow(["path","bytes"])
+        for e in entries: w.writerow([e["path"], e["bytes"]])
+        z.writestr("manifest.csv", buf.getvalue())
+        z.writestr("manifest.json", json.dumps({"audit_id":audit_id,"total_files":len(entries),"total_bytes":total,"entries":entries}, indent=2))
+    return bio.getvalue()
+
+@perf.timed("evidence_stats")
+def evidence_stats(audit_id: str, df: pd.DataFrame, root: str = EVIDENCE_ROOT) -> dict:
+    """Nombre de fichiers, total et par domaine (lecture seule : ne crée pas les répertoires)."""
+    tot=0; by={}
+    for r in df[["Domain","ID","Item"]].drop_duplicates().itertuples(index=False):
+        p=_control_dir(audit_id, str(r.ID), str(r.Item), root)
+        c= len([fn for fn in os.listdir(p) if os.path.isfile(os.path.join(p,fn))]) if os.path.isdir(p) else 0
+        tot+=c; by[str(r.Domain)]=by.get(str(r.Domain),0)+c
+    return {"total":tot,"by_domain":by}
+
+__all__ = ["EVIDENCE_ROOT", "slug", "evidence_dir", "stored_name", "file_sha256", "ingest", "ingest_for_audit",
+           "has_evidence", "load_existing", "persist_uploads", "save_files", "delete_file", "export_zip", "evidence_stats"]
@@ -0,0 +1,20 @@
+# levels.py — niveaux de conformité (FR) et réponses v13
+
+from typing import Any
+
+LEVELS_FR = ["conforme", "partiellement conforme", "non conforme", "non applicable"]
+CANON_TO_FR = {
+    "yes":"conforme","conforme":"conforme",
+    "partial":"partiellement conforme","partially compliant":"partiellement conforme","partiellement conforme":"partiellement conforme",
+    "no":"non conforme","non conforme":"non conforme",
+    "n/a":"non applicable","na":"non applicable","non applicable":"non applicable","": "non applicable",
+}
+LEVEL_SCORE = {"conforme":1.0,"partiellement conforme":0.5,"non conforme":0.0,"non applicable":None}
+SEVERITY = {"non conforme":"Haut","partiellement conforme":"Moyen","conforme":"Faible","non applicable":"N/A"}
+# v13 : réponses sans N/A, score en %
+ANSWER_SCORE = {"conforme":100,"partiellement conforme":50,"non conforme":0}
+
+def to_fr_level(x: Any) -> str:
+    if x is None: return "non applicable"
+    s = str(x).strip().lower()
+    return CANON_TO_FR.get(s, "non applicable")
@@ -0,0 +1,45 @@
+# metrics.py — taux de conformité et scores (sans Streamlit)
+
+from typing import Any, Dict
+
+import pandas as pd
+
+import perf
+from engine.levels import LEVEL_SCORE, ANSWER_SCORE, to_fr_level
+
+@perf.timed("metrics")
+def compute_metrics(df: pd.DataFrame) -> dict:
+    if df is None or df.empty:
+        return {"n_total":0,"n_applicable":0,"n_c":0,"n_pc":0,"n_nc":0,"n_na":0,"rate":None}
+    d = df.copy()
+    d["Level"] = d["Level"].map(to_fr_level)
+    vc = d["Level"].value_counts()
+    n_c  = int(vc.get("conforme",0))
+    n_pc = int(vc.get("partiellement conforme",0))
+    n_nc = int(vc.get("non conforme",0))
+    n_na = int(vc.get("non applicable",0))
+    n_app = n_c + n_pc + n_nc
+    rate = None if n_app==0 else round(((n_c + 0.5*n_pc)/n_app)*100)
+    return {"n_total":len(d),"n_applicable":n_app,"n_c":n_c,"n_pc":n_pc,"n_nc":n_nc,"n_na":n_na,"rate":rate}
+
+@perf.timed("scores")
+def compute_scores(df: pd.DataFrame) -> dict:
+    d = df.copy()
+    d["Level"] = d["Level"].map(to_fr_level)
+    d["__s"] = d["Level"].map(LEVEL_SCORE)
+    d = d[d["__s"].notna()]
+    return {
+        "global": float(d["__s"].mean()) if not d.empty else 0.0,
+        "by_domain": d.groupby("Domain")["__s"].mean().to_dict() if not d.empty else {}
+    }
+
+def answer_kpis(df: pd.DataFrame) -> Dict[str, Any]:
+    """KPI v13 (colonne answer) : total, moyenne en %, conformes / partiels / non conformes."""
+    a = df["answer"].str.lower() if len(df) else pd.Series(dtype=str)
+    return {"total": len(df), "avg": round(a.map(ANSWER_SCORE).fillna(0).mean(), 1) if len(df) else 0.0,
+            "conf": int((a == "conforme").sum()), "part": int((a == "partiellement conforme").sum()),
+            "non": int((a == "non conforme").sum())}
+
+def domain_scores(df: pd.DataFrame) -> Dict[str, float]:
+    """Score moyen (%) par domaine, v13."""
+    return df.assign(score=df["answer"].str.lower().map(ANSWER_SCORE).fillna(0)).groupby("domain")["score"].mean().round(1).to_dict()
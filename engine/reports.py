@@ -0,0 +1,475 @@
+# reports.py — livrables : DOCX ISACA (app principale), DOCX / PDF v13, radar, conversion PDF
+# ============================================================
+# - generate_docx(audit_id, df)                 : rapport ISACA (colonnes Domain/ID/Item/Contrôle/Level/Comment)
+# - export_word / export_pdf(projet, norme, ...) : rapports v13 (df enrichi par engine.risk.enrich)
+# - radar_png (matplotlib) ; radar_figure / loss_hist_figure / fig_to_png_bytes (plotly, kaleido)
+# - docx_to_pdf_bytes                           : docx2pdf ou LibreOffice
+# - add_diff_section / diff_docx                : comparaison de campagnes (engine.snapshots.diff)
+# - export_xlsx / xlsx_cached                   : classeur Excel en flux (Audit, Constats, Synthèse), mis en cache par empreinte
+# ============================================================
+
+import os, io, shutil, hashlib, threading
+from collections import OrderedDict
+from pathlib import Path
+from datetime import date
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from docx import Document
+from docx.shared import Pt, RGBColor, Inches, Cm
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.formatting.rule import CellIsRule, ColorScaleRule
+from openpyxl.utils import get_column_letter
+
+import perf
+from engine.levels import LEVELS_FR, LEVEL_SCORE, to_fr_level
+from engine.metrics import answer_kpis
+from engine.risk import default_reco, action_order
+
+def fmt_money(x)->str:
+    try: return f"{float(x):,.0f} €".replace(",", " ")
+    except: return "—"
+
+# ============================================================
+# Graphiques
+# ============================================================
+def radar_png(scores_by_domain: Dict[str,float]) -> Optional[bytes]:
+    if not scores_by_domain: return None
+    import matplotlib
+    matplotlib.use("agg")
+    import matplotlib.pyplot as plt
+    labels = list(scores_by_domain.keys())
+    vals = [max(0.0, min(1.0, scores_by_domain[k])) for k in labels]
+    if len(labels) < 3:
+        while len(labels) < 3:
+            labels.append(labels[-1]+" "); vals.append(vals[-1])
+    ang = np.linspace(0, 2*np.pi, len(labels), endpoint=False).tolist()
+    vals += vals[:1]; ang += ang[:1]
+    fig = plt.figure(figsize=(5,5)); ax = plt.subplot(111, polar=True)
+    ax.set_theta_offset(np.pi/2); ax.set_theta_direction(-1)
+    ax.set_rlabel_position(0); ax.set_ylim(0,1)
+    ax.plot(ang, vals, linewidth=2); ax.fill(ang, vals, alpha=0.25)
+    ax.set_xticks(ang[:-1]); ax.set_xticklabels(labels, fontsize=9)
+    ax.set_yticks([.25,.5,.75,1]); ax.set_yticklabels(['25%','50%','75%','100%'], fontsize=8)
+    bio = io.BytesIO(); fig.tight_layout(); fig.savefig(bio, format="png", dpi=180, bbox_inches="tight"); plt.close(fig)
+    return bio.getvalue()
+
+def radar_figure(domain_scores: Dict[str,float]):
+    import plotly.graph_objects as go
+    cats=list(domain_scores.keys()); vals=list(domain_scores.values())
+    fig=go.Figure()
+    if len(cats)>=3:
+        fig.add_trace(go.Scatterpolar(r=vals+[vals[0]], theta=cats+[cats[0]], fill='toself', line_color="#2563EB"))
+        fig.update_layout(polar=dict(radialaxis=dict(visible=True,range=[0,100])),
+                          showlegend=False, margin=dict(l=40,r=40,t=20,b=20), paper_bgcolor="white")
+    return fig
+
+def loss_hist_figure(sim: dict):
+    import plotly.graph_objects as go
+    e=sim["hist"]["edges"]; mids=[(a+b)/2 for a,b in zip(e[:-1],e[1:])]
+    fig=go.Figure(go.Bar(x=mids, y=sim["hist"]["counts"], marker_color="#2563EB"))
+    for k,col in (("p50","#16A34A"),("p90","#F59E0B"),("p99","#DC2626")):
+        fig.add_vline(x=sim[k], line_color=col, line_dash="dash", annotation_text=k.upper())
+    fig.update_layout(xaxis_title="Perte annuelle (€)", yaxis_title="Essais", showlegend=False,
+                      margin=dict(l=40,r=20,t=20,b=40), paper_bgcolor="white")
+    return fig
+
+def fig_to_png_bytes(fig, width=900, height=650, scale=2):
+    try: return fig.to_image(format="png", width=width, height=height, scale=scale)  # kaleido
+    except Exception: return None
+
+# ============================================================
+# DOCX ISACA (app principale)
+# ============================================================
+def justify_document(doc):
+    for p in doc.paragraphs:
+        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        for r in p.runs: r.font.size = Pt(11)
+
+@perf.timed("docx")
+def generate_docx(audit_id: str, df: pd.DataFrame, diff: Optional[dict] = None,
+                  diff_labels: tuple = ("précédent", "actuel")) -> bytes:
+    doc = Document()
+    for s in doc.sections:
+        s.top_margin = Cm(2); s.bottom_margin = Cm(2); s.left_margin = Cm(2); s.right_margin = Cm(2)
+
+    title = doc.add_paragraph()
+    r = title.add_run(f"Rapport d'audit (ISACA) — {audit_id}")
+    r.bold = True; r.font.size = Pt(22)
+
+    d = df.copy()
+    for c in ["Domain","ID","Item","Contrôle","Level","Comment"]:
+        if c not in d.columns: d[c] = ""
+        d[c] = d[c].astype(str)
+    d["Level"] = d["Level"].map(to_fr_level)
+    d["_s"] = d["Level"].map(LEVEL_SCORE)
+    dscore = d[d["_s"].notna()]
+    score_global = round(dscore["_s"].mean()*100) if not dscore.empty else 0
+    counts = d["Level"].value_counts().reindex(LEVELS_FR).fillna(0).astype(int)
+
+    doc.add_paragraph(f"Taux de conformité (pondéré) : {score_global}%")
+    doc.add_paragraph(
+        f"Répartition : {counts.get('conforme',0)} conformes, "
+        f"{counts.get('partiellement conforme',0)} partiellement conformes, "
+        f"{counts.get('non conforme',0)} non conformes, "
+        f"{counts.get('non applicable',0)} non applicables."
+    )
+    if diff is not None: add_diff_section(doc, diff, *diff_labels)
+    justify_document(doc)
+    bio = io.BytesIO(); doc.save(bio); return bio.getvalue()
+
+def converter_available():
+    try:
+        import docx2pdf; return True
+    except Exception:
+        return shutil.which("soffice") is not None
+
+@perf.timed("pdf.convert")
+def docx_to_pdf_bytes(docx_bytes: bytes, on_error: Optional[Callable[[str, Exception], None]] = None) -> Optional[bytes]:
+    """docx2pdf, sinon LibreOffice (soffice) ; None si aucun convertisseur. on_error(contexte, exc)."""
+    import tempfile, subprocess
+    tmp = tempfile.mkdtemp(prefix="cp_")
+    src = os.path.join(tmp, "r.docx"); pdf = os.path.join(tmp, "r.pdf")
+    with open(src,"wb") as f: f.write(docx_bytes)
+    try:
+        import docx2pdf; docx2pdf.convert(src, pdf); 
+        with open(pdf,"rb") as r: return r.read()
+    except Exception: pass
+    soffice = shutil.which("soffice")
+    if soffice:
+        try:
+            subprocess.run([soffice,"--headless","--convert-to","pdf","--outdir",tmp,src], check=True,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            with open(pdf,"rb") as r: return r.read()
+        except Exception as e:
+            if on_error: on_error("LibreOffice PDF", e)
+    return None
+
+# ============================================================
+# Rapports v13
+# ============================================================
+def docx_header_table(doc, headers):
+    t=doc.add_table(rows=1, cols=len(headers)); t.style="Table Grid"
+    for i,h in enumerate(headers):
+        cell=t.rows[0].cells[i]; cell.text=h
+        for run in cell.paragraphs[0].runs:
+            run.font.bold=True; run.font.color.rgb=RGBColor(255,255,255)
+        tcPr=cell._tc.get_or_add_tcPr(); shd=OxmlElement('w:shd')
+        shd.set(qn('w:val'),'clear'); shd.set(qn('w:color'),'auto'); shd.set(qn('w:fill'),'0A1F44'); tcPr.append(shd)
+    return t
+
+def export_word(project, standard, audit_id, df, radar_png, sim=None, hist_png=None, plan=None):
+    doc=Document()
+    styles=doc.styles
+    styles["Normal"].font.name="Segoe UI"; styles["Normal"].font.size=Pt(10)
+    for h,sz in [("Heading 1",16),("Heading 2",13),("Heading 3",11)]:
+        if h in styles:
+            styles[h].font.name="Segoe UI"; styles[h].font.size=Pt(sz); styles[h].font.bold=True; styles[h].font.color.rgb=RGBColor(0x0A,0x1F,0x44)
+
+    # Couverture
+    p=doc.add_paragraph(); p.alignment=WD_ALIGN_PARAGRAPH.CENTER
+    r=p.add_run(f"CyberPivot™\nRapport d’audit — {standard}"); r.bold=True; r.font.size=Pt(24)
+    doc.add_paragraph().add_run(f"Projet : {project} • Audit #{audit_id}")
+    doc.add_paragraph().add_run(f"Date : {date.today():%d/%m/%Y}")
+    doc.add_page_break()
+
+    # TOC
+    doc.add_heading("Sommaire", level=1)
+    p=doc.add_paragraph(); r=p.add_run()
+    fb=OxmlElement('w:fldChar'); fb.set(qn('w:fldCharType'),'begin'); r._r.append(fb)
+    it=OxmlElement('w:instrText'); it.set(qn('xml:space'),'preserve'); it.text=r'TOC \o "1-3" \h \z \u'; r._r.append(it)
+    fs=OxmlElement('w:fldChar'); fs.set(qn('w:fldCharType'),'separate'); r._r.append(fs)
+    p.add_run("Table des matières (mise à jour automatique)")
+    fe=OxmlElement('w:fldChar'); fe.set(qn('w:fldCharType'),'end'); r._r.append(fe)
+    doc.add_page_break()
+
+    # KPI
+    k=answer_kpis(df); k_total,k_avg,k_conf,k_part,k_non=k["total"],k["avg"],k["conf"],k["part"],k["non"]
+    doc.add_heading("1. Résumé exécutif", level=1)
+    doc.add_paragraph(f"• Norme : {standard}")
+    doc.add_paragraph(f"• Questions évaluées : {k_total}")
+    doc.add_paragraph(f"• Conforme : {k_conf} • Partiel : {k_part} • Non conforme : {k_non}")
+    doc.add_paragraph(f"• Conformité moyenne : {k_avg}%")
+    if sim:
+        doc.add_paragraph(f"• Perte annuelle simulée ({sim['trials']:,} essais) — P50 : {fmt_money(sim['p50'])} • "
+                          f"P90 : {fmt_money(sim['p90'])} • P99 : {fmt_money(sim['p99'])}".replace(",", " "))
+    if radar_png: doc.add_picture(io.BytesIO(radar_png), width=Inches(6.3))
+    if hist_png: doc.add_picture(io.BytesIO(hist_png), width=Inches(6.3))
+    doc.add_page_break()
+
+    # Constatations
+    doc.add_heading("2. Constatations détaillées", level=1)
+    t=docx_header_table(doc, ["Domaine","Contrôle","État","Prob.","Perte (€)","Coût remédiation (€)","Commentaire","Preuves"])
+    for _,r in df.iterrows():
+        c=t.add_row().cells
+        c[0].text=r["domain"]
+        c[1].text=f"{r['qid']} — {r['question']}"
+        c[2].text=r["answer"]
+        c[3].text=f"{r['probability']*100:.0f}%"
+        c[4].text=fmt_money(r["loss_estimate"])
+        c[5].text=fmt_money(r["remediation_cost"])
+        c[6].text=(r.get("comment") or "").strip()
+        evs = r.get("evidences", [])
+        c[7].text = "\n".join(Path(p).name for p in evs) if evs else "—"
+
+    # Plan d’action
+    doc.add_heading("3. Recommandations & plan d’action", level=1)
+    if plan is None:
+        plan=action_order(df)
+    else:
+        sel=plan[plan["selected"]]
+        doc.add_paragraph(f"Plan sous budget : {len(sel)} action(s) • coût {fmt_money(sel['remediation_cost'].sum())} • "
+                          f"réduction du risque {fmt_money(sel['risk_reduction'].sum())} / {fmt_money(plan['risk_reduction'].sum())}")
+    hdr=["Priorité","Domaine","Contrôle","Perte probable (esp.)","Coût remédiation","Recommandation"]+(["Budget"] if "selected" in plan else [])
+    t2=docx_header_table(doc, hdr)
+    for _,r in plan.iterrows():
+        c=t2.add_row().cells
+        c[0].text=r["priority"]; c[1].text=r["domain"]; c[2].text=f"{r['qid']} — {r['question']}"
+        c[3].text=fmt_money(r["exp_loss"]); c[4].text=fmt_money(r["remediation_cost"])
+        reco = r.get("yaml_recommendation") or default_reco(r["answer"])
+        c[5].text=reco
+        if "selected" in plan: c[6].text="✔" if r["selected"] else "—"
+
+    buf=io.BytesIO(); doc.save(buf); buf.seek(0); return buf
+
+def export_pdf(project, standard, audit_id, df, radar_png, sim=None, hist_png=None, plan=None):
+    buf=io.BytesIO()
+    doc=SimpleDocTemplate(buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
+    styles=getSampleStyleSheet()
+    styles.add(ParagraphStyle("CPH1", parent=styles["Heading1"], textColor=colors.HexColor("#0A1F44")))
+    styles.add(ParagraphStyle("CPBody", parent=styles["BodyText"], fontSize=10, leading=13))
+    story=[]
+
+    story.append(Paragraph(f"CyberPivot™ — Rapport d’audit — {standard}", styles["Title"]))
+    story.append(Spacer(1,6))
+    story.append(Paragraph(f"Projet : {project} • Audit #{audit_id}", styles["CPBody"]))
+    story.append(Paragraph(f"Date : {date.today():%d/%m/%Y}", styles["CPBody"]))
+    story.append(PageBreak())
+
+    story.append(Paragraph("Sommaire", styles["CPH1"]))
+    story.append(Paragraph("1. Résumé exécutif", styles["CPBody"]))
+    story.append(Paragraph("2. Constatations détaillées", styles["CPBody"]))
+    story.append(Paragraph("3. Recommandations & plan d’action", styles["CPBody"]))
+    story.append(PageBreak())
+
+    k=answer_kpis(df); k_total,k_avg,k_conf,k_part,k_non=k["total"],k["avg"],k["conf"],k["part"],k["non"]
+    story.append(Paragraph("1. Résumé exécutif", styles["CPH1"]))
+    story.append(Paragraph(f"Norme : {standard}", styles["CPBody"]))
+    story.append(Paragraph(f"Questions évaluées : {k_total}", styles["CPBody"]))
+    story.append(Paragraph(f"Conformes : {k_conf} • Partiels : {k_part} • Non conformes : {k_non}", styles["CPBody"]))
+    story.append(Paragraph(f"Conformité moyenne : {k_avg}%", styles["CPBody"]))
+    if sim:
+        story.append(Paragraph(f"Perte annuelle simulée ({sim['trials']:,} essais) — P50 : {fmt_money(sim['p50'])} • "
+                               f"P90 : {fmt_money(sim['p90'])} • P99 : {fmt_money(sim['p99'])}".replace(",", " "), styles["CPBody"]))
+    story.append(Spacer(1,8))
+    if radar_png: story.append(Image(io.BytesIO(radar_png), width=460, height=330))
+    if hist_png: story.append(Image(io.BytesIO(hist_png), width=460, height=250))
+    story.append(PageBreak())
+
+    # Constatations
+    story.append(Paragraph("2. Constatations détaillées", styles["CPH1"]))
+    data=[["Domaine","Contrôle","État","Prob.","Perte (€)","Coût remédiation (€)","Commentaire","Preuves"]]
+    for _,r in df.iterrows():
+        evs = r.get("evidences", [])
+        ev_txt = "\n".join(Path(p).name for p in evs) if evs else "—"
+        data.append([
+            r["domain"], f"{r['qid']} — {r['question']}", r["answer"], f"{r['probability']*100:.0f}%",
+            fmt_money(r["loss_estimate"]), fmt_money(r["remediation_cost"]), (r.get("comment") or ""), ev_txt
+        ])
+    tbl=Table(data, colWidths=[90,220,70,45,75,95,120,120])
+    tbl.setStyle(TableStyle([
+        ("BACKGROUND",(0,0),(-1,0), colors.HexColor("#0A1F44")),
+        ("TEXTCOLOR",(0,0),(-1,0), colors.white),
+        ("FONTNAME",(0,0),(-1,0), "Helvetica-Bold"),
+        ("GRID",(0,0),(-1,-1), 0.4, colors.HexColor("#C8D1DA")),
+        ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.whitesmoke, colors.white]),
+        ("VALIGN",(0,0),(-1,-1), "TOP"),
+        ("ALIGN",(3,1),(5,-1), "CENTER"),
+    ]))
+    story.append(tbl); story.append(Spacer(1,12))
+
+    # Plan d’action
+    story.append(Paragraph("3. Recommandations & plan d’action", styles["CPH1"]))
+    if plan is None:
+        plan=action_order(df)
+    else:
+        sel=plan[plan["selected"]]
+        story.append(Paragraph(f"Plan sous budget : {len(sel)} action(s) • coût {fmt_money(sel['remediation_cost'].sum())} • "
+                               f"réduction du risque {fmt_money(sel['risk_reduction'].sum())} / {fmt_money(plan['risk_reduction'].sum())}", styles["CPBody"]))
+    budget_col = "selected" in plan
+    pdata=[["Priorité","Domaine","Contrôle","Perte probable (esp.)","Coût remédiation","Recommandation"]+(["Budget"] if budget_col else [])]
+    for _,r in plan.iterrows():
+        reco = r.get("yaml_recommendation") or default_reco(r["answer"])
+        pdata.append([r["priority"], r["domain"], f"{r['qid']} — {r['question']}",
+                      fmt_money(r["exp_loss"]), fmt_money(r["remediation_cost"]), reco]+(["Oui" if r["selected"] else "—"] if budget_col else []))
+    pt=Table(pdata, colWidths=[65,90,220,85,95,170]+([50] if budget_col else []))
+    pt.setStyle(TableStyle([
+        ("BACKGROUND",(0,0),(-1,0), colors.HexColor("#0A1F44")),
+        ("TEXTCOLOR",(0,0),(-1,0), colors.white),
+        ("FONTNAME",(0,0),(-1,0), "Helvetica-Bold"),
+        ("GRID",(0,0),(-1,-1), 0.4, colors.HexColor("#C8D1DA")),
+        ("ROWBACKGROUNDS",(0,1),(-1,-1), [colors.whitesmoke, colors.white]),
+        ("VALIGN",(0,0),(-1,-1), "TOP"),
+    ]))
+    story.append(pt)
+    doc.build(story); buf.seek(0); return buf
+
+# ============================================================
+# Comparaison de campagnes (engine.snapshots.diff)
+# ============================================================
+DIFF_MAX_ROWS = 300  # au-delà, le détail est tronqué (le rapport reste lisible et rapide à produire)
+
+def _fmt_delta(x) -> str:
+    return "—" if x is None or pd.isna(x) else f"{x:+.1f}"
+
+def add_diff_section(doc, d: dict, old_label: str, new_label: str, level: int = 1, max_rows: int = DIFF_MAX_ROWS):
+    """Ajoute au document la synthèse d'un diff : écarts globaux, par domaine, transitions, détail."""
+    s=d["summary"]
+    doc.add_heading(f"Évolution : {old_label} → {new_label}", level=level)
+    doc.add_paragraph(f"• Conformité : {s['rate_old'] if s['rate_old'] is not None else '—'}% → "
+                      f"{s['rate_new'] if s['rate_new'] is not None else '—'}% ({_fmt_delta(s['rate_delta'])} pts)")
+    doc.add_paragraph(f"• Contrôles : {s['n_old']} → {s['n_new']} • ajoutés {s['added']} • retirés {s['removed']}")
+    doc.add_paragraph(f"• Niveaux modifiés : {s['level_changed']} (amélioration {s['improved']} • dégradation {s['regressed']}) "
+                      f"• commentaires modifiés {s['comment_changed']}")
+
+    doc.add_heading("Scores par domaine", level=level+1)
+    t=docx_header_table(doc, ["Domaine", old_label, new_label, "Écart (pts)"])
+    for _,r in d["domains"].iterrows():
+        c=t.add_row().cells
+        c[0].text=str(r["domain"]); c[1].text="—" if pd.isna(r["score_old"]) else f"{r['score_old']:.1f}%"
+        c[2].text="—" if pd.isna(r["score_new"]) else f"{r['score_new']:.1f}%"; c[3].text=_fmt_delta(r["delta"])
+
+    doc.add_heading("Transitions de niveau", level=level+1)
+    tr=d["transitions"]
+    t=docx_header_table(doc, ["avant \\ après"]+[str(c) for c in tr.columns])
+    for lv,row in tr.iterrows():
+        c=t.add_row().cells; c[0].text=str(lv)
+        for i,v in enumerate(row.tolist()): c[i+1].text=str(int(v))
+
+    def _detail(title, frame, cols, headers):
+        if frame.empty: return
+        doc.add_heading(f"{title} ({len(frame)})", level=level+1)
+        t=docx_header_table(doc, headers)
+        for row in frame[cols].head(max_rows).itertuples(index=False):
+            c=t.add_row().cells
+            for i,v in enumerate(row): c[i].text="" if v is None or (isinstance(v,float) and pd.isna(v)) else str(v)
+        if len(frame) > max_rows: doc.add_paragraph(f"… {len(frame)-max_rows} ligne(s) supplémentaire(s) non reproduite(s).")
+
+    # dégradations d'abord : ce sont elles qui appellent une action
+    lc=d["level_changes"]
+    lc=lc.assign(_o=(lc["direction"]!="dégradation")).sort_values(["_o","domain","qid"], kind="stable")
+    _detail("Changements de niveau", lc, ["domain","qid","item","level_old","level_new","direction"],
+            ["Domaine","ID","Item",old_label,new_label,"Sens"])
+    _detail("Contrôles ajoutés", d["added"], ["domain","qid","item","level"], ["Domaine","ID","Item","Niveau"])
+    _detail("Contrôles retirés", d["removed"], ["domain","qid","item","level"], ["Domaine","ID","Item","Niveau"])
+    _detail("Commentaires modifiés", d["comment_changes"], ["domain","qid","item","comment_old","comment_new"],
+            ["Domaine","ID","Item",old_label,new_label])
+    return doc
+
+@perf.timed("report.diff_docx")
+def diff_docx(d: dict, old_label: str, new_label: str, title: str = "") -> bytes:
+    """Rapport DOCX autonome de comparaison entre deux instantanés."""
+    doc=Document()
+    doc.add_heading(title or "Rapport de comparaison d’audit", 0)
+    doc.add_paragraph(f"Date : {date.today():%d/%m/%Y}")
+    add_diff_section(doc, d, old_label, new_label)
+    justify_document(doc)
+    buf=io.BytesIO(); doc.save(buf); return buf.getvalue()
+
+# ============================================================
+# Classeur Excel (écriture en flux, openpyxl write_only)
+# ============================================================
+XLSX_COLS = ["Domain","ID","Item","Contrôle","Level","Comment"]
+XLSX_FILLS = {"conforme": "DCFCE7", "partiellement conforme": "FEF3C7", "non conforme": "FEE2E2", "non applicable": "F1F5F9"}
+XLSX_WIDTHS = {"Domain": 22, "ID": 10, "Item": 10, "Contrôle": 60, "Level": 22, "Comment": 50}
+XLSX_RISK_COLS = ["priority","domain","qid","question","answer","probability","loss_estimate","remediation_cost","exp_loss"]
+XLSX_CACHE_MAX = 8  # classeurs gardés en mémoire (clé = empreinte du contenu)
+_XLSX_CACHE: "OrderedDict[str, bytes]" = OrderedDict()
+_XLSX_LOCK = threading.Lock()
+
+def _xlsx_sheet(wb, title: str, df: pd.DataFrame, widths: Optional[Dict[str,int]] = None, level_col: Optional[str] = None):
+    """Feuille en flux : en-tête figé et filtré, lignes ajoutées une à une (mémoire constante côté classeur)."""
+    ws = wb.create_sheet(title)
+    ncol, nrow = len(df.columns), len(df) + 1
+    for j, c in enumerate(df.columns, 1):
+        ws.column_dimensions[get_column_letter(j)].width = (widths or {}).get(c, max(10, min(40, len(str(c)) + 4)))
+    ws.freeze_panes = "A2"
+    ws.auto_filter.ref = f"A1:{get_column_letter(ncol)}{nrow}"
+    if level_col in df.columns and nrow > 1:
+        col = get_column_letter(df.columns.get_loc(level_col) + 1); rng = f"{col}2:{col}{nrow}"
+        for lv, color in XLSX_FILLS.items():  # comparaison Excel insensible à la casse
+            ws.conditional_formatting.add(rng, CellIsRule(operator="equal", formula=[f'"{lv}"'], fill=PatternFill("solid", fgColor=color)))
+    head = []
+    for c in df.columns:
+        cell = WriteOnlyCell(ws, value=str(c)); cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill("solid", fgColor="0A1F44"); head.append(cell)
+    ws.append(head)
+    # listes Python par colonne (pas d'itération ligne à ligne pandas) ; vide / NaN -> None : cellule non écrite
+    cols = [[None if v is None or v == "" or v != v else v for v in df[c].tolist()] for c in df.columns]
+    for row in zip(*cols): ws.append(row)
+    return ws
+
+def _xlsx_frames(df: pd.DataFrame) -> tuple:
+    """(Audit, Constats, Synthèse) : toutes les lignes ; écarts NC puis PC ; comptes et taux par domaine."""
+    d = pd.DataFrame({c: (df[c] if c in df.columns else "") for c in XLSX_COLS}, index=df.index).fillna("").astype(str)
+    u = pd.unique(d["Level"]); fr = d["Level"].map(dict(zip(u, (to_fr_level(x) for x in u))))
+    f = d.assign(Level=fr)[fr.isin(["non conforme", "partiellement conforme"])]
+    f = f.assign(_o=(f["Level"] == "partiellement conforme").astype(int)).sort_values(["_o", "Domain", "ID"], kind="stable").drop(columns="_o")
+    f["Recommandation"] = f["Level"].map({lv: default_reco(lv) for lv in ("non conforme", "partiellement conforme")})
+    ct = pd.crosstab(d["Domain"], fr).reindex(columns=LEVELS_FR, fill_value=0)
+    app = ct["conforme"] + ct["partiellement conforme"] + ct["non conforme"]
+    rate = ((ct["conforme"] + 0.5 * ct["partiellement conforme"]) / app.where(app > 0) * 100).round(1)
+    s = pd.DataFrame({"Domaine": ct.index, "Contrôles": ct.sum(axis=1).to_numpy(), "Conformes": ct["conforme"].to_numpy(),
+                      "Partiels": ct["partiellement conforme"].to_numpy(), "Non conformes": ct["non conforme"].to_numpy(),
+                      "N/A": ct["non applicable"].to_numpy(), "Taux (%)": rate.to_numpy()})
+    return d, f, s
+
+def xlsx_fingerprint(audit_id: str, df: pd.DataFrame, extra: Any = None) -> str:
+    """Empreinte du contenu (sha1 des colonnes jointes) : même classeur tant que les données ne changent pas."""
+    h = hashlib.sha1(f"{audit_id}|{list(df.columns)}|{extra}|{len(df)}".encode("utf-8"))
+    for c in df.columns: h.update("\x1f".join(df[c].astype(str).tolist()).encode("utf-8")); h.update(b"\x1e")
+    return h.hexdigest()
+
+@perf.timed("xlsx")
+def export_xlsx(audit_id: str, df: pd.DataFrame, risk_df: Optional[pd.DataFrame] = None,
+                metrics: Optional[Dict[str, Any]] = None) -> bytes:
+    """Classeur d'audit : Audit (toutes les réponses), Constats, Synthèse par domaine ; Risque si risk_df.
+    Filtre automatique et en-tête figé sur chaque feuille, mise en forme conditionnelle par niveau."""
+    d, f, s = _xlsx_frames(df)
+    wb = Workbook(write_only=True)
+    _xlsx_sheet(wb, "Audit", d, XLSX_WIDTHS, "Level")
+    _xlsx_sheet(wb, "Constats", f, {**XLSX_WIDTHS, "Recommandation": 50}, "Level")
+    ws = _xlsx_sheet(wb, "Synthèse", s, {"Domaine": 30})
+    if len(s):
+        col = get_column_letter(s.columns.get_loc("Taux (%)") + 1)
+        ws.conditional_formatting.add(f"{col}2:{col}{len(s) + 1}", ColorScaleRule(start_type="num", start_value=0, start_color="F8696B",
+                                      mid_type="num", mid_value=50, mid_color="FFEB84", end_type="num", end_value=100, end_color="63BE7B"))
+    if metrics:
+        _xlsx_sheet(wb, "Indicateurs", pd.DataFrame([{"audit_id": audit_id, **metrics}]))
+    if risk_df is not None and len(risk_df):
+        _xlsx_sheet(wb, "Risque", action_order(risk_df)[XLSX_RISK_COLS], {"question": 60}, "answer")
+    bio = io.BytesIO(); wb.save(bio); return bio.getvalue()
+
+def xlsx_cached(audit_id: str, df: pd.DataFrame) -> bytes:
+    """export_xlsx mémoïsé par empreinte (LRU borné) : un rerun sans modification ne régénère rien."""
+    key = xlsx_fingerprint(audit_id, df)
+    with _XLSX_LOCK:
+        if key in _XLSX_CACHE: _XLSX_CACHE.move_to_end(key); return _XLSX_CACHE[key]
+    data = export_xlsx(audit_id, df)
+    with _XLSX_LOCK:
+        _XLSX_CACHE[key] = data
+        while len(_XLSX_CACHE) > XLSX_CACHE_MAX: _XLSX_CACHE.popitem(last=False)
+    return data
@@ -0,0 +1,44 @@
+# risk.py — façade du modèle de risque : caractéristiques, inférence, simulation, plan sous budget
+
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from engine.levels import to_fr_level
+from risk_engine import (MODEL_VERSION, RISK_COLS, infer_risk, infer_risk_batch, infer_risk_from_features,
+                         attach_features, catalog_features, _norm)
+from risk_sim import simulate, simulate_frame
+from remediation import optimize, frontier, plan_frame, risk_reduction
+
+PRIORITY_ORDER = {"Haute":0,"Moyenne":1,"Basse":2,"Info":3}
+
+def enrich(catalog: List[Dict[str, Any]], df: pd.DataFrame, answer_col: str = "answer") -> pd.DataFrame:
+    """Réponses (alignées par position sur le catalogue) + colonnes risque (RISK_COLS)."""
+    return df.join(infer_risk_from_features(catalog_features(catalog), df[answer_col], index=df.index))
+
+def responses_risk(df: pd.DataFrame, domain_col: str = "domain", question_col: str = "question",
+                   level_col: str = "level") -> pd.DataFrame:
+    """Réponses au format storage (niveau libre) + answer (niveau FR) + RISK_COLS ; non applicables exclus."""
+    lv = df[level_col].map(to_fr_level)
+    d = df[lv != "non applicable"].assign(answer=lambda x: lv[x.index].str.capitalize())
+    if not len(d): return d.assign(**{c: pd.Series(dtype=float) for c in RISK_COLS})
+    return d.join(infer_risk_batch(d, domain_col, question_col))
+
+def control_text(item: pd.Series, question: pd.Series) -> pd.Series:
+    """Libellé noté par le modèle de risque : « item — question » (même perte espérée partout : API, lots, tendances)."""
+    return item.fillna("").astype(str) + " — " + question.fillna("").astype(str)
+
+def default_reco(answer: str)->str:
+    a=_norm(answer)
+    if a=="non conforme": return "Mettre en œuvre le contrôle requis et corriger la non-conformité."
+    if a=="partiellement conforme": return "Compléter la mise en œuvre jusqu’à conformité totale."
+    return "Maintenir, mesurer et documenter la conformité."
+
+def action_order(df: pd.DataFrame) -> pd.DataFrame:
+    """Plan d’action sans budget : priorité puis perte espérée décroissante."""
+    return df.sort_values(by=["priority","exp_loss"], key=lambda s: s.map(PRIORITY_ORDER).fillna(9) if s.name=="priority" else -s,
+                          ascending=[True,True])
+
+__all__ = ["MODEL_VERSION", "RISK_COLS", "infer_risk", "infer_risk_batch", "infer_risk_from_features", "attach_features",
+           "catalog_features", "simulate", "simulate_frame", "optimize", "frontier", "plan_frame", "risk_reduction",
+           "enrich", "responses_risk", "control_text", "default_reco", "action_order", "PRIORITY_ORDER"]
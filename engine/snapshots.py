@@ -0,0 +1,184 @@
+# snapshots.py — instantanés d'audit immuables (colonnes compressées) et diff entre campagnes
+# ============================================================
+# Fichier .cpsnap : MAGIC | u32 taille de l'en-tête | en-tête JSON | blocs zlib par colonne
+#   - colonne « dict » (peu de valeurs distinctes : domaine, niveau...) : valeurs uniques JSON + codes uint32
+#   - colonne « plain » : liste JSON
+# Identifiant = audit + empreinte du contenu : reprendre un instantané inchangé ne crée rien (idempotent).
+# Fichier en lecture seule, index (storage.snapshots) en insertion seule, sha256 vérifié au chargement.
+# Chaque instantané alimente aussi la série de tendance (engine.trends, source « snapshot »).
+# diff(old, new) : jointure par hachage sur (qid, item) -> transitions de niveau, contrôles ajoutés /
+#                  retirés, commentaires modifiés, écarts de score par domaine
+# ============================================================
+
+import os
+import json
+import zlib
+import struct
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import perf
+from engine.levels import LEVELS_FR, LEVEL_SCORE, to_fr_level
+from engine.metrics import compute_metrics
+from engine import trends
+from evidence_store import slug
+
+SNAPSHOT_DIR = os.getenv("CYBERPIVOT_SNAPSHOT_DIR", "snapshots")
+MAGIC = b"CPSNAP1\n"
+COLUMNS = ["domain", "qid", "item", "question", "level", "comment", "updated_at"]
+KEY = ["qid", "item"]
+DICT_RATIO = 0.5  # encodage dictionnaire si nb de valeurs distinctes <= 50 % des lignes
+
+# ============================================================
+# Format de fichier
+# ============================================================
+def _encode_column(s: pd.Series) -> tuple:
+    vals = s.fillna("").astype(str)
+    codes, uniq = pd.factorize(vals, sort=False)
+    if len(uniq) <= max(1, int(len(vals) * DICT_RATIO)):
+        a = zlib.compress(json.dumps(list(uniq), ensure_ascii=False).encode("utf-8"), 6)
+        b = zlib.compress(codes.astype("<u4").tobytes(), 6)
+        return {"enc": "dict", "sizes": [len(a), len(b)]}, [a, b]
+    a = zlib.compress(json.dumps(vals.tolist(), ensure_ascii=False).encode("utf-8"), 6)
+    return {"enc": "plain", "sizes": [len(a)]}, [a]
+
+def _decode_column(meta: Dict[str, Any], blobs: list) -> list:
+    if meta["enc"] == "dict":
+        uniq = np.array(json.loads(zlib.decompress(blobs[0])), dtype=object)
+        return uniq[np.frombuffer(zlib.decompress(blobs[1]), dtype="<u4")] if len(uniq) else []
+    return json.loads(zlib.decompress(blobs[0]))
+
+def encode(df: pd.DataFrame, meta: Dict[str, Any]) -> tuple:
+    """(octets du fichier, empreinte du contenu) ; l'empreinte ignore les métadonnées (date, libellé)."""
+    cols, blobs = [], []
+    for c in COLUMNS:
+        m, b = _encode_column(df[c] if c in df.columns else pd.Series([""] * len(df)))
+        cols.append({"name": c, **m}); blobs += b
+    content = hashlib.sha256(b"".join(blobs)).hexdigest()
+    header = json.dumps({"format": 1, "n": len(df), "columns": cols, "content_sha256": content, **meta},
+                        ensure_ascii=False).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(blobs), content
+
+def decode(data: bytes) -> tuple:
+    """(DataFrame, en-tête)."""
+    if not data.startswith(MAGIC): raise ValueError("Fichier d'instantané invalide")
+    (hl,) = struct.unpack_from("<I", data, len(MAGIC)); pos = len(MAGIC) + 4
+    header = json.loads(data[pos:pos + hl]); pos += hl
+    out = {}
+    for m in header["columns"]:
+        blobs = []
+        for sz in m["sizes"]: blobs.append(data[pos:pos + sz]); pos += sz
+        out[m["name"]] = _decode_column(m, blobs)
+    return pd.DataFrame(out, columns=[m["name"] for m in header["columns"]]), header
+
+# ============================================================
+# Prise / lecture
+# ============================================================
+def _backend(backend=None):
+    import storage_backend
+    return backend or storage_backend.get_backend()
+
+@perf.timed("snapshot.take")
+def take(audit_id: str, label: str = "", tenant_id: Optional[str] = None, backend=None,
+         root: str = SNAPSHOT_DIR) -> Dict[str, Any]:
+    """Fige l'état courant de l'audit ; renvoie la ligne d'index (existante si contenu identique)."""
+    db = _backend(backend)
+    df = db.query_responses(audit_id, columns=COLUMNS, as_frame=True, tenant_id=tenant_id)
+    if df.empty: raise ValueError(f"Audit vide ou inconnu : {audit_id}")
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    data, content = encode(df, {"audit_id": audit_id, "label": label, "created_at": now})
+    sid = f"{audit_id}@{content[:12]}"
+    prev = db.get_snapshot(sid, tenant_id=tenant_id)
+    if prev and os.path.isfile(prev["path"]): return prev
+    d = os.path.join(root, slug(audit_id)); os.makedirs(d, exist_ok=True)
+    path = os.path.join(d, f"{content[:16]}.cpsnap")
+    if not os.path.isfile(path):
+        tmp = path + ".part"
+        with open(tmp, "wb") as f: f.write(data)
+        os.replace(tmp, path); os.chmod(path, 0o444)
+        sha = hashlib.sha256(data).hexdigest(); size = len(data)
+    else:
+        with open(path, "rb") as f: raw = f.read()
+        sha = hashlib.sha256(raw).hexdigest(); size = len(raw)
+    m = compute_metrics(df.rename(columns={"level": "Level"}))
+    row = {"snapshot_id": sid, "audit_id": audit_id, "label": label or "", "path": path, "sha256": sha,
+           "n_controls": len(df), "rate": m["rate"], "bytes": size, "created_at": now}
+    db.add_snapshot(row, tenant_id=tenant_id)
+    trends.record(audit_id, tenant_id, db, source="snapshot")
+    return db.get_snapshot(sid, tenant_id=tenant_id) or row
+
+@perf.timed("snapshot.load")
+def load(snapshot: Union[str, Dict[str, Any]], tenant_id: Optional[str] = None, backend=None) -> pd.DataFrame:
+    """Instantané par identifiant, ligne d'index ou chemin ; sha256 vérifié si connu."""
+    meta = snapshot if isinstance(snapshot, dict) else None
+    if meta is None and not os.path.isfile(snapshot):
+        meta = _backend(backend).get_snapshot(snapshot, tenant_id=tenant_id)
+        if meta is None: raise KeyError(f"Instantané inconnu : {snapshot}")
+    path = meta["path"] if meta else snapshot
+    with open(path, "rb") as f: data = f.read()
+    if meta and meta.get("sha256") and hashlib.sha256(data).hexdigest() != meta["sha256"]:
+        raise ValueError(f"Instantané altéré (sha256) : {path}")
+    return decode(data)[0]
+
+def current(audit_id: str, tenant_id: Optional[str] = None, backend=None) -> pd.DataFrame:
+    """État courant au même format qu'un instantané (pour comparer sans figer)."""
+    return _backend(backend).query_responses(audit_id, columns=COLUMNS, as_frame=True, tenant_id=tenant_id)
+
+# ============================================================
+# Diff
+# ============================================================
+def _fr(s: pd.Series) -> pd.Series:
+    # to_fr_level sur les valeurs distinctes seulement (quelques-unes pour 100k lignes)
+    u = pd.unique(s.fillna("").astype(str))
+    return s.fillna("").astype(str).map(dict(zip(u, (to_fr_level(x) for x in u))))
+
+def _prep(df: pd.DataFrame) -> pd.DataFrame:
+    d = df[["domain", "qid", "item", "level", "comment"]].copy()
+    for c in ("domain", "qid", "item", "comment"): d[c] = d[c].fillna("").astype(str)
+    d["level"] = _fr(d["level"]); d["score"] = d["level"].map(LEVEL_SCORE).astype(float)
+    return d.drop_duplicates(KEY, keep="last")
+
+def _domain_scores(d: pd.DataFrame) -> pd.DataFrame:
+    g = d.groupby("domain", sort=True)
+    return pd.DataFrame({"score": g["score"].mean() * 100, "n": g.size()})
+
+def _rate(d: pd.DataFrame) -> Optional[float]:
+    s = d["score"].dropna()
+    return round(float(s.mean()) * 100, 1) if len(s) else None
+
+@perf.timed("snapshot.diff")
+def diff(old: pd.DataFrame, new: pd.DataFrame) -> Dict[str, Any]:
+    """Comparaison old -> new ; DataFrames prêts à afficher / exporter + résumé chiffré."""
+    o, n = _prep(old), _prep(new)
+    m = o.merge(n, on=KEY, how="outer", suffixes=("_old", "_new"), indicator=True, sort=False)
+    both = m[m["_merge"] == "both"]
+    added = m.loc[m["_merge"] == "right_only", ["domain_new", "qid", "item", "level_new"]]
+    removed = m.loc[m["_merge"] == "left_only", ["domain_old", "qid", "item", "level_old"]]
+    lv = both[both["level_old"] != both["level_new"]]
+    delta = lv["score_new"] - lv["score_old"]
+    direction = np.where(delta > 0, "amélioration", np.where(delta < 0, "dégradation", "n/a"))
+    level_changes = pd.DataFrame({"domain": lv["domain_new"], "qid": lv["qid"], "item": lv["item"],
+                                  "level_old": lv["level_old"], "level_new": lv["level_new"], "direction": direction})
+    cc = both[both["comment_old"] != both["comment_new"]]
+    comment_changes = pd.DataFrame({"domain": cc["domain_new"], "qid": cc["qid"], "item": cc["item"],
+                                    "comment_old": cc["comment_old"], "comment_new": cc["comment_new"]})
+    transitions = pd.crosstab(pd.Categorical(both["level_old"], LEVELS_FR), pd.Categorical(both["level_new"], LEVELS_FR),
+                              dropna=False).rename_axis(index="avant", columns="après")
+    ds = _domain_scores(o).join(_domain_scores(n), how="outer", lsuffix="_old", rsuffix="_new")
+    domains = ds.assign(delta=ds["score_new"] - ds["score_old"]).round(1).reset_index()
+    rate_old, rate_new = _rate(o), _rate(n)
+    summary = {"n_old": len(o), "n_new": len(n), "common": len(both), "added": len(added), "removed": len(removed),
+               "level_changed": len(level_changes), "improved": int((direction == "amélioration").sum()),
+               "regressed": int((direction == "dégradation").sum()), "comment_changed": len(comment_changes),
+               "rate_old": rate_old, "rate_new": rate_new,
+               "rate_delta": round(rate_new - rate_old, 1) if rate_old is not None and rate_new is not None else None}
+    return {"summary": summary, "transitions": transitions, "level_changes": level_changes.reset_index(drop=True),
+            "added": added.set_axis(["domain", "qid", "item", "level"], axis=1).reset_index(drop=True),
+            "removed": removed.set_axis(["domain", "qid", "item", "level"], axis=1).reset_index(drop=True),
+            "comment_changes": comment_changes.reset_index(drop=True), "domains": domains}
+
+__all__ = ["SNAPSHOT_DIR", "COLUMNS", "encode", "decode", "take", "load", "current", "diff"]
@@ -0,0 +1,149 @@
+# trends.py — séries temporelles de conformité (par audit et par domaine) au fil des campagnes
+# ============================================================
+# - points(audit_id, df)  : taux pondéré, couverture de preuves, perte espérée (engine.risk) par domaine
+#                           + ligne audit entier (domain = '') ; un point par jour et par audit
+# - record(audit_id)      : calcule et écrit (backend.record_trend : points + agrégats mois / trimestre)
+# - Alimentation incrémentale :
+#     * enregistrement : install() branche un écouteur sur write_queue ; les audits touchés sont
+#       recalculés en arrière-plan après DEBOUNCE_S sans nouvelle écriture (l'autosave ne recalcule pas à chaque frappe)
+#     * instantané     : engine.snapshots.take appelle record(..., source="snapshot")
+# - series(...)           : DataFrame (period, key, rate, evidence_coverage, expected_loss, n_audits)
+# ============================================================
+
+import os
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import perf
+from engine.levels import LEVEL_SCORE, to_fr_level
+from engine.risk import control_text, responses_risk
+
+DEBOUNCE_S = float(os.getenv("CYBERPIVOT_TRENDS_DEBOUNCE_MS", "3000")) / 1000.0
+COLUMNS = ["domain", "item", "question", "level", "evidence_json"]
+GRAINS = ["day", "month", "quarter"]
+
+def _backend(backend=None):
+    import storage_backend
+    return backend or storage_backend.get_backend()
+
+# ============================================================
+# Calcul des points
+# ============================================================
+def points(audit_id: str, df: pd.DataFrame, project: Optional[str] = None, standard: Optional[str] = None,
+           source: str = "save", ts: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Un point par domaine + un point audit entier (domain = '') ; df au format storage (COLUMNS)."""
+    ts = ts or datetime.utcnow().isoformat(timespec="seconds")
+    if df.empty: return []
+    d = pd.DataFrame({"domain": df["domain"].fillna("").astype(str)})
+    lv = df["level"].fillna("").astype(str); u = pd.unique(lv)
+    d["score"] = lv.map(dict(zip(u, (LEVEL_SCORE.get(to_fr_level(x)) for x in u)))).astype(float)
+    ev = df["evidence_json"].fillna("").astype(str).str.strip() if "evidence_json" in df else pd.Series("", index=df.index)
+    d["ev"] = ~ev.isin(["", "[]", "{}", "null"])
+    d["loss"] = 0.0
+    r = responses_risk(df.assign(question=control_text(df["item"], df["question"])), "domain", "question", "level")
+    if len(r): d.loc[r.index, "loss"] = r["exp_loss"].to_numpy(dtype=float)
+
+    def _row(dom: str, g: pd.DataFrame) -> Dict[str, Any]:
+        s = g["score"].dropna()
+        return {"audit_id": audit_id, "domain": dom, "day": ts[:10], "ts": ts, "source": source, "project": project,
+                "standard": standard, "n_total": int(len(g)), "n_applicable": int(len(s)),
+                "rate": round(float(s.mean()) * 100, 2) if len(s) else None,
+                "evidence_coverage": round(float(g["ev"].mean()), 4), "expected_loss": round(float(g["loss"].sum()), 2)}
+    return [_row("", d)] + [_row(str(k), g) for k, g in d.groupby("domain", sort=True)]
+
+@perf.timed("trends.record")
+def record(audit_id: str, tenant_id: Optional[str] = None, backend=None, source: str = "save",
+           df: Optional[pd.DataFrame] = None) -> int:
+    """Recalcule l'état courant de l'audit et l'écrit dans la série ; renvoie le nombre de points."""
+    db = _backend(backend)
+    if df is None: df = db.query_responses(audit_id, columns=COLUMNS, as_frame=True, tenant_id=tenant_id)
+    meta = db.get_audit_meta(audit_id, tenant_id=tenant_id)
+    pts = points(audit_id, df, meta.get("project"), meta.get("standard"), source)
+    return db.record_trend(pts, tenant_id=tenant_id) if pts else 0
+
+# ============================================================
+# Alimentation en arrière-plan (après commit de write_queue)
+# ============================================================
+class Recorder:
+    """Regroupe les audits touchés et les recalcule une fois l'activité retombée (debounce)."""
+    def __init__(self, delay: float = DEBOUNCE_S):
+        self.delay = delay
+        self._due: Dict[Tuple[Optional[str], str], Tuple[float, Any]] = {}
+        self._lock = threading.Lock(); self._wake = threading.Event()
+        self.stats = {"scheduled": 0, "recorded": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="cp-trends", daemon=True); self._thread.start()
+
+    def schedule(self, tenant_id: Optional[str], backend, audit_ids: Iterable[str]) -> None:
+        due = time.monotonic() + self.delay
+        with self._lock:
+            for a in audit_ids: self._due[(tenant_id, a)] = (due, backend); self.stats["scheduled"] += 1
+        self._wake.set()
+
+    def _pop_ready(self, force: bool = False) -> List[Tuple[Optional[str], str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            ready = [k for k, (due, _) in self._due.items() if force or due <= now]
+            return [(t, a, self._due.pop((t, a))[1]) for t, a in ready]
+
+    def flush(self) -> int:
+        """Recalcule immédiatement tout ce qui est en attente (tests, arrêt)."""
+        n = 0
+        for t, a, b in self._pop_ready(force=True): n += self._record(t, a, b)
+        return n
+
+    def _record(self, tenant_id, audit_id, backend) -> int:
+        try:
+            record(audit_id, tenant_id, backend); self.stats["recorded"] += 1; return 1
+        except Exception:
+            self.stats["errors"] += 1; return 0
+
+    def _run(self) -> None:
+        while True:
+            for t, a, b in self._pop_ready(): self._record(t, a, b)
+            with self._lock: nxt = min((due for due, _ in self._due.values()), default=None)
+            self._wake.wait(None if nxt is None else max(0.05, nxt - time.monotonic())); self._wake.clear()
+
+_RECORDER: Optional[Recorder] = None
+_LOCK = threading.Lock()
+
+def install() -> Recorder:
+    """Branche l'alimentation des tendances sur write_queue (une fois par processus)."""
+    global _RECORDER
+    import write_queue
+    with _LOCK:
+        if _RECORDER is None:
+            _RECORDER = Recorder(); write_queue.add_listener(_RECORDER.schedule)
+    return _RECORDER
+
+def touch(audit_ids: Iterable[str], tenant_id: Optional[str] = None, backend=None) -> None:
+    """Signale des audits modifiés hors write_queue (suppressions...) ; sans effet si install() n'a pas été appelé."""
+    if _RECORDER is not None: _RECORDER.schedule(tenant_id, _backend(backend), list(audit_ids))
+
+# ============================================================
+# Lecture
+# ============================================================
+def series(grain: str = "month", start: Optional[str] = None, end: Optional[str] = None,
+           project: Optional[str] = None, standard: Optional[str] = None, audit_ids: Optional[Iterable[str]] = None,
+           domain: Optional[str] = "", by: Optional[str] = None, tenant_id: Optional[str] = None,
+           backend=None, all_tenants: bool = False) -> pd.DataFrame:
+    """Série agrégée ; all_tenants=True (SQLite partitionné) ajoute une colonne tenant (vue multi-clients)."""
+    import storage
+    cols = ["period", "key", "rate", "evidence_coverage", "expected_loss", "n_audits"]
+    kw = dict(grain=grain, start=start, end=end, project=project, standard=standard, audit_ids=audit_ids, domain=domain, by=by)
+    if all_tenants:
+        rows = [{"tenant": t, **r} for t, rs in storage.trend_series_all_tenants(**kw).items() for r in rs]
+        return pd.DataFrame(rows, columns=["tenant"] + cols)
+    return pd.DataFrame(_backend(backend).trend_series(tenant_id=tenant_id, **kw), columns=cols)
+
+def pivot(df: pd.DataFrame, value: str = "rate") -> pd.DataFrame:
+    """period × key (une colonne par série) pour st.line_chart ; clé vide => « Global »."""
+    if df.empty: return pd.DataFrame()
+    k = df["key"].replace("", "Global")
+    if "tenant" in df: k = df["tenant"] + " • " + k
+    return df.assign(key=k).pivot_table(index="period", columns="key", values=value, aggfunc="mean")
+
+__all__ = ["GRAINS", "points", "record", "Recorder", "install", "touch", "series", "pivot"]
@@ -0,0 +1,204 @@
+# evidence_store.py — preuves sur disque : chemins, nommage, import en masse (ZIP / dossier)
+# ============================================================
+# - slug(s), evidence_dir(audit, qid, item) : arborescence evidence/<audit>/<qid>__<slug(item)[:60]>/
+# - stored_name(filename)                   : <horodatage>__<slug(nom)> (même convention que l'upload)
+# - ingest(source, controls, ...)           : ZIP ou dossier -> fichiers associés à (ID, Item) via
+#     1) un CSV de correspondance (colonnes fichier/ID/Item ; mapping.csv à la racine du ZIP)
+#     2) le dossier parent (<ID>__<slug item> comme l'export ZIP, ou <ID>)
+#     3) le préfixe du nom de fichier (<ID>__…, <ID>_…, <ID> …)
+#   copie en flux + sha256, dédoublonnage par (ID, Item, sha256), métadonnées en une transaction
+#   (échec : fichiers déjà placés supprimés, rien d'orphelin sur disque)
+# - ingest_for_audit(...)                   : ingest + table evidence (storage_backend)
+# ============================================================
+
+import io
+import os
+import re
+import csv
+import time
+import hashlib
+import zipfile
+import pathlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+EVIDENCE_ROOT = "evidence"
+CHUNK = 1 << 20
+SKIP_NAMES = {"mapping.csv", "manifest.csv", "manifest.json", ".ds_store", "thumbs.db"}
+FILE_COLS = ["file", "fichier", "path", "name", "nom"]
+
+Control = Tuple[str, str]
+
+def slug(s: str) -> str:
+    s = (s or "").strip().lower()
+    ok = "".join(ch if ch.isalnum() or ch in "-_." else "-" for ch in s)
+    while "--" in ok: ok = ok.replace("--", "-")
+    return ok.strip("-_.")
+
+def evidence_dir(audit: str, qid: str, item: str, root: str = EVIDENCE_ROOT) -> str:
+    p = os.path.join(root, audit, f"{qid}__{slug(item)[:60]}")
+    pathlib.Path(p).mkdir(parents=True, exist_ok=True); return p
+
+def stored_name(filename: str) -> str:
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}__{slug(os.path.basename(filename))}"
+
+# ============================================================
+# Association fichier -> (ID, Item)
+# ============================================================
+class Matcher:
+    def __init__(self, controls: Iterable[Control], mapping: Optional[Dict[str, Control]] = None):
+        self.controls: Set[Control] = {(str(q), str(i)) for q, i in controls}
+        self.by_dir = {f"{q}__{slug(i)[:60]}".lower(): (q, i) for q, i in self.controls}
+        self.by_qid: Dict[str, List[Control]] = {}
+        for q, i in self.controls: self.by_qid.setdefault(q.strip().lower(), []).append((q, i))
+        self.mapping = {k.lower(): v for k, v in (mapping or {}).items()}
+
+    def _qid(self, token: str) -> Tuple[Optional[Control], Optional[str]]:
+        c = self.by_qid.get(token.strip().lower())
+        if not c: return None, None
+        return (c[0], None) if len(c) == 1 else (None, f"ID {token} ambigu ({len(c)} Items)")
+
+    def match(self, rel: str) -> Tuple[Optional[Control], str]:
+        """(contrôle, "") ou (None, raison)."""
+        rel = rel.replace("\\", "/").strip("/"); base = rel.rsplit("/", 1)[-1]
+        m = self.mapping.get(rel.lower()) or self.mapping.get(base.lower())
+        if m is not None:
+            if m in self.controls: return m, ""
+            if not m[1]:
+                c, why = self._qid(m[0])
+                return (c, "") if c else (None, why or f"ID {m[0]} inconnu (mapping)")
+            return None, f"({m[0]}, {m[1]}) inconnu (mapping)"
+        why = ""
+        for part in reversed(rel.split("/")[:-1]):
+            if part.lower() in self.by_dir: return self.by_dir[part.lower()], ""
+            c, w = self._qid(part)
+            if c: return c, ""
+            why = why or w or ""
+        stem = os.path.splitext(base)[0]
+        for tok in (base.split("__", 1)[0], re.split(r"[ _]", base, 1)[0], stem):
+            c, w = self._qid(tok)
+            if c: return c, ""
+            why = why or w or ""
+        return None, why or "aucun ID reconnu"
+
+def read_mapping(f) -> Dict[str, Control]:
+    """CSV (séparateur , ou ;) : colonne fichier + ID (ou QID) + Item optionnel."""
+    raw = f.read() if hasattr(f, "read") else open(f, "rb").read()
+    text = raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw
+    rd = csv.DictReader(io.StringIO(text), dialect=csv.Sniffer().sniff(text.split("\n", 1)[0], ",;"))
+    cols = {c.strip().lower(): c for c in rd.fieldnames or []}
+    fc = next((cols[c] for c in FILE_COLS if c in cols), None)
+    ic = cols.get("id") or cols.get("qid"); tc = cols.get("item")
+    if not fc or not ic: raise ValueError("Le CSV de correspondance doit contenir les colonnes fichier et ID.")
+    return {(r[fc] or "").strip().replace("\\", "/").strip("/"): ((r[ic] or "").strip(), (r.get(tc) or "").strip() if tc else "")
+            for r in rd if (r.get(fc) or "").strip()}
+
+# ============================================================
+# Sources : membres d'un ZIP ou fichiers d'un dossier, lus en flux
+# ============================================================
+def _skip(rel: str) -> bool:
+    parts = rel.replace("\\", "/").split("/")
+    return parts[0] == "__MACOSX" or any(p.startswith(".") for p in parts) or parts[-1].lower() in SKIP_NAMES
+
+def _zip_entries(zf: zipfile.ZipFile) -> Iterator[Tuple[str, int, Callable[[], Any]]]:
+    for info in zf.infolist():
+        if info.is_dir() or _skip(info.filename): continue
+        yield info.filename, info.file_size, (lambda i=info: zf.open(i))
+
+def _dir_entries(root: str) -> Iterator[Tuple[str, int, Callable[[], Any]]]:
+    for d, dirs, files in os.walk(root):
+        dirs.sort()
+        for fn in sorted(files):
+            full = os.path.join(d, fn); rel = os.path.relpath(full, root).replace("\\", "/")
+            if _skip(rel): continue
+            yield rel, os.path.getsize(full), (lambda p=full: open(p, "rb"))
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(CHUNK), b""): h.update(b)
+    return h.hexdigest()
+
+def _remove_quiet(path: str) -> None:
+    try: os.remove(path)
+    except OSError: pass
+
+def _copy_hash(src, dest_dir: str, name: str) -> Tuple[str, str, int]:
+    """Copie en flux vers dest_dir/.name.part en calculant le sha256 ; renvoie (tmp, sha, taille)."""
+    tmp = os.path.join(dest_dir, f".{name}.part"); h = hashlib.sha256(); n = 0
+    try:
+        with src as r, open(tmp, "wb") as w:
+            for b in iter(lambda: r.read(CHUNK), b""):
+                h.update(b); w.write(b); n += len(b)
+    except Exception:
+        _remove_quiet(tmp); raise
+    return tmp, h.hexdigest(), n
+
+def ingest(source, controls: Iterable[Control], audit_id: str,
+           dest: Optional[Callable[[str, str], str]] = None, mapping=None,
+           existing: Optional[Set[Tuple[str, str, str]]] = None,
+           record: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+           progress: Optional[Callable[[int, int, int], None]] = None) -> Dict[str, Any]:
+    """source : chemin/objet fichier ZIP ou dossier. dest(qid, item) -> répertoire cible
+    (défaut evidence_dir). existing : {(qid, item, sha256)} déjà présents. record(rows) : persistance
+    des métadonnées (une transaction). progress(fichiers traités, total, octets)."""
+    t0 = time.perf_counter()
+    dest = dest or (lambda q, i: evidence_dir(audit_id, q, i))
+    seen = set(existing or ())
+    zf = None
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        entries = list(_dir_entries(str(source)))
+        if mapping is None and os.path.isfile(os.path.join(source, "mapping.csv")):
+            mapping = read_mapping(os.path.join(source, "mapping.csv"))
+    else:
+        zf = zipfile.ZipFile(source)
+        entries = list(_zip_entries(zf))
+        if mapping is None:
+            m = next((i for i in zf.infolist() if i.filename.lower() == "mapping.csv"), None)
+            if m is not None:
+                with zf.open(m) as f: mapping = read_mapping(f)
+    if mapping is not None and not isinstance(mapping, dict): mapping = read_mapping(mapping)
+    matcher = Matcher(controls, mapping)
+    rows: List[Dict[str, Any]] = []; unmatched: List[Dict[str, str]] = []
+    dup = 0; nbytes = 0; dirs: Dict[Control, str] = {}
+    try:
+        for k, (rel, size, opener) in enumerate(entries, 1):
+            ctl, why = matcher.match(rel)
+            if ctl is None:
+                unmatched.append({"file": rel, "reason": why})
+            else:
+                d = dirs.get(ctl) or dirs.setdefault(ctl, dest(*ctl))
+                name = stored_name(rel)
+                tmp, sha, n = _copy_hash(opener(), d, name); nbytes += n
+                if (ctl[0], ctl[1], sha) in seen:
+                    os.remove(tmp); dup += 1
+                else:
+                    seen.add((ctl[0], ctl[1], sha))
+                    final = os.path.join(d, name); j = 1
+                    while os.path.exists(final): final = os.path.join(d, f"{j}_{name}"); j += 1
+                    os.replace(tmp, final)
+                    rows.append({"audit_id": audit_id, "qid": ctl[0], "item": ctl[1], "name": os.path.basename(final),
+                                 "path": final, "sha256": sha, "bytes": n})
+            if progress: progress(k, len(entries), nbytes)
+        if record and rows: record(rows)
+    except Exception:
+        # échec en cours d'import ou de record : pas de fichiers placés sans métadonnées
+        for r in rows: _remove_quiet(r["path"])
+        raise
+    finally:
+        if zf is not None: zf.close()
+    dt = time.perf_counter() - t0
+    return {"files": len(entries), "attached": len(rows), "duplicates": dup, "unmatched": unmatched,
+            "bytes": nbytes, "seconds": round(dt, 3), "files_per_s": round(len(entries) / dt, 1) if dt else None,
+            "rows": rows, "touched": sorted({(r["qid"], r["item"]) for r in rows})}
+
+def ingest_for_audit(audit_id: str, source, controls: Iterable[Control], mapping=None,
+                     tenant_id: Optional[str] = None, backend=None, progress=None) -> Dict[str, Any]:
+    """ingest + dédoublonnage contre la table evidence + enregistrement en une transaction."""
+    import storage_backend
+    b = backend or storage_backend.get_backend()
+    # lignes dont le fichier a disparu (supprimé hors UI) : ne bloquent pas le ré-import
+    existing = {(e["qid"], e["item"], e["sha256"]) for e in b.list_evidence(audit_id, tenant_id=tenant_id)
+                if e.get("sha256") and os.path.isfile(e["path"])}
+    return ingest(source, controls, audit_id, mapping=mapping, existing=existing,
+                  record=lambda rows: b.add_evidence_many(rows, tenant_id=tenant_id), progress=progress)
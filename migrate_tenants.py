@@ -0,0 +1,106 @@
+# migrate_tenants.py — éclatement des bases mono-fichier en un fichier par tenant
+# ============================================================
+# Usage :
+#   python migrate_tenants.py [--audit-map audits.csv] [--default-tenant default] [--dry-run]
+#
+# - norms.db     : chaque norme part dans le shard de sa colonne tenant_id
+# - cyberpivot.db: la table responses n'a pas de tenant ; un CSV (audit_id,tenant_id)
+#                  indique le tenant de chaque audit, sinon --default-tenant
+# Les bases sources ne sont jamais modifiées (copie ATTACH + INSERT ... SELECT).
+# ============================================================
+
+import os
+import csv
+import sys
+import sqlite3
+import argparse
+from typing import Dict, List
+
+os.environ["CYBERPIVOT_SHARDING"] = "1"  # les shards cibles sont résolus via tenancy
+
+import tenancy
+import storage
+import norms
+
+RESP_COLS = ["audit_id", "domain", "qid", "item", "question", "level", "score", "criterion",
+             "recommendation", "comment", "evidence_json", "updated_at"]
+
+def _read_audit_map(path: str) -> Dict[str, str]:
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            aid = (row.get("audit_id") or "").strip()
+            if aid: out[aid] = tenancy.tenant_key(row.get("tenant_id"))
+    return out
+
+def _split_responses(src: str, audit_map: Dict[str, str], default_tenant: str, dry_run: bool) -> Dict[str, int]:
+    if not os.path.isfile(src): return {}
+    con = sqlite3.connect(src)
+    audits = [r[0] for r in con.execute("SELECT DISTINCT audit_id FROM responses")]
+    con.close()
+    by_tenant: Dict[str, List[str]] = {}
+    for a in audits:
+        by_tenant.setdefault(audit_map.get(a, tenancy.tenant_key(default_tenant)), []).append(a)
+    counts = {}
+    cols = ", ".join(RESP_COLS)
+    for tenant, aids in by_tenant.items():
+        if dry_run:
+            con = sqlite3.connect(src)
+            q = "SELECT COUNT(*) FROM responses WHERE audit_id IN (%s)" % ",".join("?" * len(aids))
+            counts[tenant] = con.execute(q, aids).fetchone()[0]; con.close()
+            continue
+        con = storage.get_conn(tenant)  # crée/migre le shard
+        con.execute("ATTACH DATABASE ? AS src", (src,))
+        con.execute("CREATE TEMP TABLE mig_audits(audit_id TEXT PRIMARY KEY)")
+        con.executemany("INSERT INTO mig_audits VALUES (?)", [(a,) for a in aids])
+        cur = con.execute(f"""INSERT OR REPLACE INTO main.responses({cols})
+                              SELECT {cols} FROM src.responses
+                              WHERE audit_id IN (SELECT audit_id FROM mig_audits)""")
+        counts[tenant] = cur.rowcount
+        con.commit(); con.execute("DETACH DATABASE src"); con.close()
+    return counts
+
+def _split_norms(src: str, dry_run: bool) -> Dict[str, int]:
+    if not os.path.isfile(src): return {}
+    con = sqlite3.connect(src)
+    tenants = [r[0] for r in con.execute("SELECT DISTINCT tenant_id FROM norms")]
+    con.close()
+    counts = {}
+    for t in tenants:
+        if dry_run:
+            con = sqlite3.connect(src)
+            counts[t] = con.execute("SELECT COUNT(*) FROM norms WHERE tenant_id=?", (t,)).fetchone()[0]
+            con.close(); continue
+        con = norms._con(t)
+        con.execute("ATTACH DATABASE ? AS src", (src,))
+        cur = con.execute("""INSERT OR REPLACE INTO main.norms(tenant_id, name, data_json, created_at, updated_at)
+                             SELECT tenant_id, name, data_json, created_at, updated_at
+                             FROM src.norms WHERE tenant_id=?""", (t,))
+        counts[t] = cur.rowcount
+        con.commit(); con.execute("DETACH DATABASE src"); con.close()
+    return counts
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Éclate cyberpivot.db / norms.db en un fichier par tenant.")
+    ap.add_argument("--storage-db", default=storage.DB_PATH)
+    ap.add_argument("--norms-db", default=norms.DB_PATH)
+    ap.add_argument("--audit-map", help="CSV audit_id,tenant_id")
+    ap.add_argument("--default-tenant", default=tenancy.DEFAULT_TENANT)
+    ap.add_argument("--dry-run", action="store_true")
+    a = ap.parse_args(argv)
+
+    for p in (a.storage_db, a.norms_db):
+        if os.path.abspath(os.path.dirname(p)).startswith(os.path.abspath(tenancy.TENANTS_DIR)):
+            print(f"[MIGRATE] source dans le dossier des shards : {p}", file=sys.stderr); return 2
+
+    amap = _read_audit_map(a.audit_map) if a.audit_map else {}
+    rc = _split_responses(a.storage_db, amap, a.default_tenant, a.dry_run)
+    nc = _split_norms(a.norms_db, a.dry_run)
+    mode = "DRY-RUN" if a.dry_run else "OK"
+    print(f"[MIGRATE] {mode} → {tenancy.TENANTS_DIR}")
+    for t in sorted(set(rc) | set(nc)):
+        print(f"  - {t}: {rc.get(t, 0)} réponse(s), {nc.get(t, 0)} norme(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
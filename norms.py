@@ -6,24 +6,40 @@
 # - list_norms(tenant)   : liste des normes publiées pour un tenant
 # - get_norm_df(...)     : récupère la norme en DataFrame (colonnes harmonisées)
 # - delete_norm(...)     : supprime une norme
+# - get_norm_risk(...)   : caractéristiques de risque par contrôle (calculées à la publication,
+#                          recalculées si risk_engine.MODEL_VERSION a changé)
+# Avec CYBERPIVOT_SHARDING=1, chaque tenant a son propre fichier (cf. tenancy.py).
 # ============================================================
 
 import os
 import json
 import sqlite3
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Set
 
 import pandas as pd
 
+import tenancy
+import risk_engine
+
 DB_PATH = os.getenv("NORMS_DB_PATH", "norms.db")
 REQUIRED_COLS = ["Domain", "ID", "Item", "Contrôle", "Level", "Comment"]
 
-def _con():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+_READY: Set[str] = set()
+_READY_LOCK = threading.Lock()
+
+def _con(tenant_id: Optional[str] = None):
+    path = tenancy.resolve("norms", tenant_id, DB_PATH)
+    con = sqlite3.connect(path, check_same_thread=False)
+    if tenancy.sharding_enabled() and path not in _READY:
+        with _READY_LOCK:
+            if path not in _READY:
+                _create_schema(con); _READY.add(path)
+    return con
 
-def init_norms_db():
-    con = _con(); c = con.cursor()
+def _create_schema(con):
+    c = con.cursor()
     c.execute("""
     CREATE TABLE IF NOT EXISTS norms(
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,10 +48,20 @@ def init_norms_db():
         data_json TEXT NOT NULL,
         created_at TEXT NOT NULL,
         updated_at TEXT NOT NULL,
+        risk_json TEXT,
+        risk_model TEXT,
         UNIQUE(tenant_id, name)
     )
     """)
-    con.commit(); con.close()
+    cols = {r[1] for r in c.execute("PRAGMA table_info(norms)").fetchall()}
+    for col in ("risk_json", "risk_model"):
+        if col not in cols: c.execute(f"ALTER TABLE norms ADD COLUMN {col} TEXT")
+    con.commit()
+
+def init_norms_db(tenant_id: Optional[str] = None):
+    con = _con(tenant_id)
+    _create_schema(con)
+    con.close()
 
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     d = df.copy()
@@ -43,24 +69,35 @@ def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     for col in REQUIRED_COLS:
         if col not in d.columns:
             d[col] = ""
-        d[col] = d[col].astype("string").fillna("").map(lambda v: str(v) if v is not None else "")
+        d[col] = d[col].astype("string").fillna("").astype(str)
     return d[REQUIRED_COLS].copy()
 
+def _records(d: pd.DataFrame) -> List[Dict]:
+    # équivalent de d.to_dict(orient="records"), sans la conversion cellule par cellule de pandas
+    cols = list(d.columns)
+    return [dict(zip(cols, r)) for r in zip(*(d[c].tolist() for c in cols))]
+
+def _risk_json(d: pd.DataFrame) -> str:
+    f = risk_engine.control_features(d["Domain"], d["Contrôle"])
+    return json.dumps(f.to_numpy(dtype=object).tolist(), ensure_ascii=False)
+
 def save_norm(tenant_id: str, name: str, df: pd.DataFrame) -> Dict:
     name = (name or "").strip()
     if not name:
         raise ValueError("Nom de la norme requis.")
     d = _normalize_columns(df)
-    payload = d.to_dict(orient="records")
+    payload = _records(d)
     now = datetime.utcnow().isoformat()
-    con = _con(); c = con.cursor()
+    con = _con(tenant_id); c = con.cursor()
     c.execute("""
-    INSERT INTO norms(tenant_id, name, data_json, created_at, updated_at)
-    VALUES(?,?,?,?,?)
+    INSERT INTO norms(tenant_id, name, data_json, created_at, updated_at, risk_json, risk_model)
+    VALUES(?,?,?,?,?,?,?)
     ON CONFLICT(tenant_id,name) DO UPDATE SET
       data_json=excluded.data_json,
-      updated_at=excluded.updated_at
-    """, (tenant_id, name, json.dumps(payload, ensure_ascii=False), now, now))
+      updated_at=excluded.updated_at,
+      risk_json=excluded.risk_json,
+      risk_model=excluded.risk_model
+    """, (tenant_id, name, json.dumps(payload, ensure_ascii=False), now, now, _risk_json(d), risk_engine.MODEL_VERSION))
     con.commit()
     c.execute("SELECT id, tenant_id, name, created_at, updated_at FROM norms WHERE tenant_id=? AND name=?",
               (tenant_id, name))
@@ -68,13 +105,13 @@ def save_norm(tenant_id: str, name: str, df: pd.DataFrame) -> Dict:
     return {"id": r[0], "tenant_id": r[1], "name": r[2], "created_at": r[3], "updated_at": r[4]}
 
 def list_norms(tenant_id: str) -> List[Dict]:
-    con = _con(); c = con.cursor()
+    con = _con(tenant_id); c = con.cursor()
     c.execute("SELECT id, name, created_at, updated_at FROM norms WHERE tenant_id=? ORDER BY name ASC", (tenant_id,))
     rows = c.fetchall(); con.close()
     return [{"id": r[0], "name": r[1], "created_at": r[2], "updated_at": r[3]} for r in rows]
 
 def get_norm_df(tenant_id: str, name: str) -> Optional[pd.DataFrame]:
-    con = _con(); c = con.cursor()
+    con = _con(tenant_id); c = con.cursor()
     c.execute("SELECT data_json FROM norms WHERE tenant_id=? AND name=?", (tenant_id, (name or "").strip()))
     r = c.fetchone(); con.close()
     if not r:
@@ -86,11 +123,58 @@ def get_norm_df(tenant_id: str, name: str) -> Optional[pd.DataFrame]:
     except Exception:
         return None
 
+def _norm_risk(data_json: str, risk_json: Optional[str], risk_model: Optional[str]):
+    """(DataFrame ID/Item + FEATURE_COLS, risk_json à réécrire ou None si le cache est valide)."""
+    d = _normalize_columns(pd.DataFrame(json.loads(data_json)))
+    fresh = None
+    if risk_model != risk_engine.MODEL_VERSION or not risk_json:
+        risk_json = fresh = _risk_json(d)
+    f = pd.DataFrame(json.loads(risk_json), columns=risk_engine.FEATURE_COLS)
+    return pd.concat([d[["ID", "Item"]].reset_index(drop=True), f], axis=1), fresh
+
+def get_norm_risk(tenant_id: str, name: str) -> Optional[pd.DataFrame]:
+    """ID / Item + FEATURE_COLS, alignés sur get_norm_df ; cache rafraîchi si le modèle a changé."""
+    name = (name or "").strip()
+    con = _con(tenant_id); c = con.cursor()
+    c.execute("SELECT data_json, risk_json, risk_model FROM norms WHERE tenant_id=? AND name=?", (tenant_id, name))
+    r = c.fetchone()
+    if not r:
+        con.close(); return None
+    out, fresh = _norm_risk(*r)
+    if fresh is not None:
+        c.execute("UPDATE norms SET risk_json=?, risk_model=? WHERE tenant_id=? AND name=?",
+                  (fresh, risk_engine.MODEL_VERSION, tenant_id, name))
+        con.commit()
+    con.close()
+    return out
+
 def delete_norm(tenant_id: str, name: str) -> bool:
-    con = _con(); c = con.cursor()
+    con = _con(tenant_id); c = con.cursor()
     c.execute("DELETE FROM norms WHERE tenant_id=? AND name=?", (tenant_id, (name or "").strip()))
     con.commit()
     ok = c.rowcount > 0
     con.close()
     return ok
 
+def list_norms_all_tenants() -> Dict[str, Any]:
+    """Vue admin cross-tenant : liste les normes de chaque shard en parallèle."""
+    if not tenancy.sharding_enabled():
+        con = _con(); c = con.cursor()
+        c.execute("SELECT DISTINCT tenant_id FROM norms ORDER BY tenant_id")
+        tenants = [r[0] for r in c.fetchall()]; con.close()
+        return {t: list_norms(t) for t in tenants}
+    # chaque shard est lu sans filtre et regroupé par la colonne tenant_id (identifiant réel)
+    res = tenancy.fan_out(_list_norms_by_tenant)
+    out: Dict[str, Any] = {}
+    for v in res.values():
+        if isinstance(v, Exception): continue
+        for t, rows in v.items(): out.setdefault(t, []).extend(rows)
+    return {t: sorted(rows, key=lambda r: r["name"]) for t, rows in sorted(out.items())}
+
+def _list_norms_by_tenant(shard_tenant: str) -> Dict[str, List[Dict]]:
+    con = _con(shard_tenant); c = con.cursor()
+    c.execute("SELECT tenant_id, id, name, created_at, updated_at FROM norms ORDER BY tenant_id, name")
+    rows = c.fetchall(); con.close()
+    out: Dict[str, List[Dict]] = {}
+    for r in rows: out.setdefault(r[0], []).append({"id": r[1], "name": r[2], "created_at": r[3], "updated_at": r[4]})
+    return out
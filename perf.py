@@ -0,0 +1,176 @@
+# perf.py — instrumentation des reruns : chronos par étape, puits local, profil à la demande
+# ============================================================
+# - Activé par CYBERPIVOT_PERF=1 (sinon span()/timed() ne coûtent qu'un test d'attribut)
+# - begin_rerun(page, profile) / end_rerun() : bornes d'un rerun Streamlit (état par thread)
+# - span("etape") / @timed("etape")          : durée cumulée par étape et par rerun
+# - Puits : CYBERPIVOT_PERF_SINK = perf.jsonl (une ligne par étape) ou *.db / *.sqlite (table perf_spans)
+# - summary(last)                            : p50 / p95 / max par étape sur les N derniers reruns
+# - profile=True : cProfile (ou pyinstrument si CYBERPIVOT_PERF_PROFILER=pyinstrument et installé)
+#                  sur un seul rerun, écrit dans PROFILE_DIR
+# ============================================================
+
+import os
+import io
+import json
+import time
+import uuid
+import sqlite3
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+ENABLED = os.getenv("CYBERPIVOT_PERF", "").strip().lower() not in ("", "0", "false", "off", "no")
+SINK = os.getenv("CYBERPIVOT_PERF_SINK", "perf.jsonl")
+PROFILE_DIR = os.getenv("CYBERPIVOT_PERF_PROFILE_DIR", "profiles")
+PROFILER = os.getenv("CYBERPIVOT_PERF_PROFILER", "cprofile").strip().lower()
+
+_local = threading.local()
+_sink_lock = threading.Lock()
+
+class _Rerun:
+    __slots__ = ("id", "page", "t0", "spans", "profiler", "kind")
+    def __init__(self, page: str):
+        self.id = uuid.uuid4().hex[:12]; self.page = page; self.t0 = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}  # étape -> [ms cumulées, appels]
+        self.profiler = None; self.kind = ""
+
+def _current() -> Optional[_Rerun]:
+    return getattr(_local, "rerun", None)
+
+def _start_profiler(r: _Rerun) -> None:
+    if PROFILER == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+            r.profiler = Profiler(); r.kind = "pyinstrument"; r.profiler.start(); return
+        except ImportError:
+            pass
+    r.profiler = cProfile.Profile(); r.kind = "cprofile"; r.profiler.enable()
+
+def _stop_profiler(r: _Rerun) -> Dict[str, str]:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"rerun-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{r.id}")
+    if r.kind == "pyinstrument":
+        r.profiler.stop(); path = base + ".html"
+        with open(path, "w", encoding="utf-8") as f: f.write(r.profiler.output_html())
+        return {"path": path, "text": r.profiler.output_text(unicode=True)}
+    r.profiler.disable(); path = base + ".prof"
+    r.profiler.dump_stats(path)
+    buf = io.StringIO(); pstats.Stats(r.profiler, stream=buf).sort_stats("cumulative").print_stats(30)
+    return {"path": path, "text": buf.getvalue()}
+
+def begin_rerun(page: str = "", profile: bool = False) -> None:
+    """Ouvre un rerun (un rerun interrompu par st.stop() est simplement abandonné)."""
+    old = _current()
+    if old is not None and old.profiler is not None:
+        try: old.profiler.disable() if old.kind == "cprofile" else old.profiler.stop()
+        except Exception: pass
+    if not (ENABLED or profile):
+        _local.rerun = None; return
+    r = _local.rerun = _Rerun(page)
+    if profile: _start_profiler(r)
+
+def set_page(page: str) -> None:
+    r = _current()
+    if r is not None: r.page = page
+
+def end_rerun() -> Optional[Dict[str, Any]]:
+    """Ferme le rerun : écrit les étapes (+ « rerun » = durée totale) ; renvoie {rerun_id, spans, profile}."""
+    r = _current(); _local.rerun = None
+    if r is None: return None
+    total = (time.perf_counter() - r.t0) * 1000.0
+    prof = _stop_profiler(r) if r.profiler is not None else None
+    spans = {k: round(v[0], 3) for k, v in r.spans.items()}; spans["rerun"] = round(total, 3)
+    if ENABLED:
+        ts = datetime.utcnow().isoformat(timespec="milliseconds")
+        write([{"ts": ts, "rerun_id": r.id, "page": r.page, "stage": k, "ms": v,
+                "calls": int(r.spans[k][1]) if k in r.spans else 1} for k, v in spans.items()])
+    return {"rerun_id": r.id, "spans": spans, "profile": prof}
+
+@contextmanager
+def span(name: str):
+    r = _current()
+    if r is None:
+        yield; return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        s = r.spans.get(name)
+        if s is None: s = r.spans[name] = [0.0, 0]
+        s[0] += (time.perf_counter() - t0) * 1000.0; s[1] += 1
+
+def timed(name: str):
+    """Décorateur : span(name) autour de chaque appel."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*a, **kw):
+            if _current() is None: return fn(*a, **kw)
+            with span(name): return fn(*a, **kw)
+        return wrapper
+    return deco
+
+# ============================================================
+# Puits JSONL / SQLite
+# ============================================================
+def _is_sqlite(path: str) -> bool:
+    return path.lower().endswith((".db", ".sqlite", ".sqlite3"))
+
+def _sqlite(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, timeout=10)
+    con.execute("""CREATE TABLE IF NOT EXISTS perf_spans (
+                     ts TEXT NOT NULL, rerun_id TEXT NOT NULL, page TEXT, stage TEXT NOT NULL,
+                     ms REAL NOT NULL, calls INTEGER NOT NULL DEFAULT 1)""")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_perf_spans_ts ON perf_spans(ts)")
+    return con
+
+def write(rows: List[Dict[str, Any]], sink: Optional[str] = None) -> None:
+    sink = sink or SINK
+    if not rows: return
+    with _sink_lock:
+        if _is_sqlite(sink):
+            con = _sqlite(sink)
+            try:
+                with con: con.executemany("INSERT INTO perf_spans(ts, rerun_id, page, stage, ms, calls) VALUES (?,?,?,?,?,?)",
+                                          [(r["ts"], r["rerun_id"], r["page"], r["stage"], r["ms"], r["calls"]) for r in rows])
+            finally:
+                con.close()
+        else:
+            with open(sink, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows))
+
+def read(last: int = 500, sink: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Étapes des `last` derniers reruns."""
+    sink = sink or SINK
+    if not os.path.exists(sink): return []
+    if _is_sqlite(sink):
+        con = _sqlite(sink); con.row_factory = sqlite3.Row
+        try:
+            return [dict(r) for r in con.execute(
+                """SELECT * FROM perf_spans WHERE rerun_id IN (
+                     SELECT rerun_id FROM perf_spans WHERE stage='rerun' ORDER BY ts DESC LIMIT ?)""", (last,))]
+        finally:
+            con.close()
+    rows: List[Dict[str, Any]] = []
+    with open(sink, "r", encoding="utf-8") as f:
+        for line in f:
+            try: rows.append(json.loads(line))
+            except ValueError: pass
+    keep = {r["rerun_id"] for r in [r for r in rows if r.get("stage") == "rerun"][-last:]}
+    return [r for r in rows if r["rerun_id"] in keep]
+
+def summary(last: int = 500, page: Optional[str] = None, sink: Optional[str] = None):
+    """DataFrame étape / n / p50_ms / p95_ms / max_ms (trié par p95 décroissant)."""
+    import numpy as np
+    import pandas as pd
+    rows = [r for r in read(last, sink) if page is None or r.get("page") == page]
+    cols = ["stage", "n", "p50_ms", "p95_ms", "max_ms"]
+    if not rows: return pd.DataFrame(columns=cols)
+    df = pd.DataFrame(rows)
+    out = [{"stage": k, "n": len(g), "p50_ms": round(float(np.percentile(g, 50)), 2),
+            "p95_ms": round(float(np.percentile(g, 95)), 2), "max_ms": round(float(g.max()), 2)}
+           for k, g in df.groupby("stage")["ms"]]
+    return pd.DataFrame(out, columns=cols).sort_values("p95_ms", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,180 @@
+# previews.py — vignettes des preuves (images, 1re page des PDF), générées en arrière-plan
+# ============================================================
+# - schedule(paths)  : à l'upload, génération asynchrone (pool de threads, une fois par fichier)
+# - thumbnail(path)  : chemin de la vignette si prête (sinon None + planification) ; lecture par stat
+#                      seulement — le fichier source n'est jamais relu au rerun
+# - Cache disque borné : PREVIEW_DIR (clé = sha1(chemin absolu, mtime, taille)), éviction LRU
+#                        (mtime des vignettes rafraîchi à la lecture) au-delà de MAX_BYTES
+# - PDF : pypdfium2 ou PyMuPDF si installés, sinon pdftoppm (poppler) ; sinon pas de vignette
+# ============================================================
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from PIL import Image
+
+PREVIEW_DIR = os.getenv("CYBERPIVOT_PREVIEW_DIR", os.path.join("evidence", ".previews"))
+MAX_BYTES = int(float(os.getenv("CYBERPIVOT_PREVIEW_MAX_MB", "200")) * 1024 * 1024)
+SIZE = (320, 320)
+WORKERS = int(os.getenv("CYBERPIVOT_PREVIEW_WORKERS", "2"))
+IMAGE_EXT = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp", ".tif", ".tiff"}
+PDF_EXT = {".pdf"}
+MAX_PIXELS = 80_000_000  # au-delà : pas de vignette (bombe de décompression)
+
+try:
+    import pypdfium2 as _pdfium
+except Exception:
+    _pdfium = None
+try:
+    import fitz as _fitz  # PyMuPDF
+except Exception:
+    _fitz = None
+
+def supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMAGE_EXT | PDF_EXT
+
+def _key(path: str) -> Optional[str]:
+    try: st = os.stat(path)
+    except OSError: return None
+    return hashlib.sha1(f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode()).hexdigest()
+
+def _save(img: "Image.Image", dest: str) -> None:
+    img.thumbnail(SIZE)
+    if img.mode not in ("RGB", "L"):
+        bg = Image.new("RGB", img.size, "white")
+        rgba = img.convert("RGBA"); bg.paste(rgba, mask=rgba.split()[-1]); img = bg
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{threading.get_ident()}.tmp"
+    img.save(tmp, "JPEG", quality=80, optimize=True); os.replace(tmp, dest)
+
+def _image(path: str) -> Optional["Image.Image"]:
+    with Image.open(path) as im:
+        if im.width * im.height > MAX_PIXELS: return None
+        im.draft("RGB", SIZE)  # JPEG : décodage directement à l'échelle réduite
+        im.seek(0); return im.copy()
+
+def _pdf_first_page(path: str) -> Optional["Image.Image"]:
+    if _pdfium is not None:
+        pdf = _pdfium.PdfDocument(path)
+        try:
+            page = pdf[0]; w, _ = page.get_size()
+            return page.render(scale=SIZE[0] / max(w, 1)).to_pil()
+        finally:
+            pdf.close()
+    if _fitz is not None:
+        with _fitz.open(path) as doc:
+            page = doc[0]; z = SIZE[0] / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=_fitz.Matrix(z, z))
+            return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    exe = shutil.which("pdftoppm")
+    if exe:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "p")
+            subprocess.run([exe, "-f", "1", "-l", "1", "-scale-to", str(SIZE[0]), "-jpeg", path, out],
+                           check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+            fs = [f for f in os.listdir(tmp) if f.startswith("p")]
+            if fs:
+                with Image.open(os.path.join(tmp, fs[0])) as im: return im.copy()
+    return None
+
+# ============================================================
+# Cache borné + génération en arrière-plan
+# ============================================================
+class PreviewCache:
+    def __init__(self, root: str = PREVIEW_DIR, max_bytes: int = MAX_BYTES, workers: int = WORKERS):
+        self.root = root; self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cp-preview")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self._failed: set = set()
+        self._bytes: Optional[int] = None
+        self.stats = {"generated": 0, "hits": 0, "evicted": 0, "failed": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + ".jpg")
+
+    def _used(self) -> int:
+        if self._bytes is None:
+            self._bytes = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(self.root) for f in fs if f.endswith(".jpg"))
+        return self._bytes
+
+    def _evict(self) -> None:
+        """LRU : supprime les vignettes les plus anciennement lues jusqu'à 90 % du plafond."""
+        files = []
+        for d, _, fs in os.walk(self.root):
+            for f in fs:
+                if not f.endswith(".jpg"): continue
+                p = os.path.join(d, f)
+                try: st = os.stat(p); files.append((st.st_mtime_ns, st.st_size, p))
+                except OSError: pass
+        used = sum(s for _, s, _ in files); target = int(self.max_bytes * 0.9)
+        for _, s, p in sorted(files):
+            if used <= target: break
+            try: os.remove(p); used -= s; self.stats["evicted"] += 1
+            except OSError: pass
+        self._bytes = used
+
+    def _generate(self, path: str, key: str) -> Optional[str]:
+        dest = self._path(key)
+        try:
+            ext = os.path.splitext(path)[1].lower()
+            img = _image(path) if ext in IMAGE_EXT else _pdf_first_page(path)
+            if img is None: raise ValueError("aperçu indisponible")
+            _save(img, dest)
+            with self._lock:
+                self._bytes = self._used() + os.path.getsize(dest); self.stats["generated"] += 1
+                if self._bytes > self.max_bytes: self._evict()
+            return dest
+        except Exception:
+            with self._lock: self._failed.add(key); self.stats["failed"] += 1
+            return None
+        finally:
+            with self._lock: self._pending.pop(key, None)
+
+    def schedule(self, paths: Iterable[str]) -> int:
+        """Planifie la génération des vignettes manquantes ; renvoie le nombre de tâches lancées."""
+        n = 0
+        for p in paths:
+            if not supported(p): continue
+            key = _key(p)
+            if key is None or os.path.exists(self._path(key)): continue
+            with self._lock:
+                if key in self._pending or key in self._failed: continue
+                self._pending[key] = self._pool.submit(self._generate, p, key); n += 1
+        return n
+
+    def thumbnail(self, path: str, schedule: bool = True) -> Optional[str]:
+        if not supported(path): return None
+        key = _key(path)
+        if key is None: return None
+        dest = self._path(key)
+        try: os.utime(dest)  # LRU
+        except OSError:
+            if schedule: self.schedule([path])
+            return None
+        self.stats["hits"] += 1; return dest
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        with self._lock: futs = list(self._pending.values())
+        for f in futs: f.result(timeout)
+
+_CACHE: Optional[PreviewCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_cache() -> PreviewCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None: _CACHE = PreviewCache()
+        return _CACHE
+
+def schedule(paths: Iterable[str]) -> int:
+    return get_cache().schedule(paths)
+
+def thumbnail(path: str) -> Optional[str]:
+    return get_cache().thumbnail(path)
@@ -0,0 +1,100 @@
+# remediation.py — plan de remédiation optimal sous contrainte de budget
+# ============================================================
+# - risk_reduction(df)       : gain de risque si le contrôle passe « conforme » (exp_loss - résiduel)
+# - optimize(cost, gain, B)  : sac à dos 0/1 ; DP sur une grille de coûts (arrondis au pas supérieur,
+#                              donc toujours dans le budget) dont la finesse s'adapte à n (n × cellules
+#                              <= DP_CELLS) ; le glouton (ratio) sert de repli et de garde-fou : on garde
+#                              la meilleure des deux solutions (la grille perd en précision quand beaucoup
+#                              de petits coûts tiennent dans le budget, cas où le glouton est quasi optimal)
+# - frontier(...)            : frontière budget -> risque résiduel (lue dans le tableau DP)
+# - plan_frame(df, budget)   : DataFrame pour « Recommandations & plan d’action » (retenus d'abord)
+# ============================================================
+
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from risk_engine import STATE, state_features
+
+GRID = int(os.getenv("CYBERPIVOT_PLAN_GRID", "20000"))           # cellules de coût max
+MIN_GRID = 256                                                     # en deçà : glouton seul
+DP_CELLS = int(os.getenv("CYBERPIVOT_PLAN_DP_CELLS", "60000000"))  # budget n × cellules de la DP
+
+def risk_reduction(df: pd.DataFrame, answer_col: str = "answer") -> np.ndarray:
+    """exp_loss × (1 - résiduel/actuel), le résiduel étant celui de l'état « conforme »."""
+    st = state_features(df[answer_col]); ok = STATE["conforme"]
+    cur = st["prob"] * st["loss_mul"]
+    res = ok["prob"] * ok["loss_mul"] / np.where(cur > 0, cur, 1.0)
+    return np.clip(df["exp_loss"].to_numpy(dtype=float) * (1.0 - res), 0.0, None)
+
+def _greedy(cost: np.ndarray, gain: np.ndarray, budget: float) -> np.ndarray:
+    """Ratio gain/coût décroissant ; comparé au meilleur élément seul (garantie 1/2)."""
+    take = np.zeros(len(cost), dtype=bool); left = budget
+    for i in np.argsort(-gain / np.maximum(cost, 1e-9), kind="stable"):
+        if cost[i] <= left: take[i] = True; left -= cost[i]
+    fit = np.flatnonzero(cost <= budget)
+    if len(fit):
+        j = fit[np.argmax(gain[fit])]
+        if gain[j] > gain[take].sum(): take[:] = False; take[j] = True
+    return take
+
+def _dp(w: np.ndarray, gain: np.ndarray, cap: int):
+    """best[c] = gain max pour une capacité c ; bits de choix compactés (packbits) pour la reconstruction."""
+    best = np.zeros(cap + 1); keep = []
+    for wi, gi in zip(w, gain):
+        if wi > cap: keep.append(None); continue
+        cand = best[:cap + 1 - wi] + gi
+        upd = np.zeros(cap + 1, dtype=bool); upd[wi:] = cand > best[wi:]
+        best[wi:] = np.where(upd[wi:], cand, best[wi:])
+        keep.append(np.packbits(upd))
+    take = np.zeros(len(w), dtype=bool); c = cap
+    for i in range(len(w) - 1, -1, -1):
+        k = keep[i]
+        if k is not None and (k[c >> 3] >> (7 - (c & 7))) & 1:
+            take[i] = True; c -= w[i]
+    return take, best
+
+def optimize(cost, gain, budget: float, grid: Optional[int] = None, method: Optional[str] = None) -> Dict[str, Any]:
+    """method=None : DP (grille min(GRID, DP_CELLS/n)) + glouton, meilleure des deux ; "dp" / "greedy" pour forcer."""
+    cost = np.asarray(cost, dtype=float); gain = np.asarray(gain, dtype=float)
+    cand = np.flatnonzero((gain > 0) & (cost <= budget))
+    take = np.zeros(len(cost), dtype=bool)
+    free = cand[cost[cand] <= 0]; take[free] = True; cand = cand[cost[cand] > 0]
+    left = budget - cost[free].sum(); out: Dict[str, Any] = {"method": "greedy", "unit": None, "best": None}
+    if len(cand) and left > 0:
+        cells = grid or min(GRID, DP_CELLS // len(cand))
+        t = _greedy(cost[cand], gain[cand], left) if method != "dp" else None
+        if method == "dp" or (method is None and (grid or cells >= MIN_GRID)):
+            unit = max(left / cells, 1.0); cap = int(left // unit)
+            w = np.ceil(cost[cand] / unit - 1e-9).astype(np.int64)
+            td, best = _dp(w, gain[cand], cap)
+            out.update(unit=unit, best=best)
+            if t is None or gain[cand[td]].sum() >= gain[cand[t]].sum(): t = td; out["method"] = "dp"
+        take[cand[t]] = True
+    out.update(selected=take, cost=float(cost[take].sum()), reduction=float(gain[take].sum()),
+               total=float(gain[gain > 0].sum()))
+    return out
+
+def frontier(cost, gain, budget: float, points: int = 20) -> pd.DataFrame:
+    """Frontière efficace : risque résiduel pour des budgets 0..budget (un seul passage DP, borné par le glouton)."""
+    cost = np.asarray(cost, dtype=float); gain = np.asarray(gain, dtype=float)
+    tot = float(gain[gain > 0].sum()); budgets = np.linspace(0, budget, points + 1)
+    res = optimize(cost, gain, budget)
+    red = np.array([optimize(cost, gain, b, method="greedy")["reduction"] for b in budgets])
+    if res["best"] is not None:
+        free = float(gain[(gain > 0) & (cost <= 0)].sum())
+        red = np.maximum(red, res["best"][np.clip((budgets // res["unit"]).astype(int), 0, len(res["best"]) - 1)] + free)
+    return pd.DataFrame({"budget": budgets, "reduction": red, "residual": tot - red})
+
+def plan_frame(df: pd.DataFrame, budget: float, **kw) -> pd.DataFrame:
+    """df enrichi (risk_engine) -> + risk_reduction / selected, trié : retenus (meilleur ratio) puis le reste."""
+    d = df.copy()
+    d["risk_reduction"] = risk_reduction(d)
+    d["selected"] = optimize(d["remediation_cost"], d["risk_reduction"], budget, **kw)["selected"]
+    d["_ratio"] = d["risk_reduction"] / d["remediation_cost"].clip(lower=1e-9)
+    pr = {"Haute": 0, "Moyenne": 1, "Basse": 2, "Info": 3}
+    d["_prio"] = d["priority"].map(pr).fillna(9)
+    d = d.sort_values(["selected", "_ratio", "_prio"], ascending=[False, False, True], kind="stable")
+    return d.drop(columns=["_ratio", "_prio"])
@@ -0,0 +1,166 @@
+# risk_engine.py — modèle de risque (probabilité, pertes, coûts) : version unitaire + version vectorisée
+# ============================================================
+# - infer_risk(domain, question, answer) : calcul scalaire historique (app v13)
+# - infer_risk_batch(df)                 : même calcul, colonne par colonne, sur un DataFrame
+#   (colonnes domain / question / answer) ; résultats strictement identiques au scalaire
+# Les tiers de domaine et multiplicateurs de mots-clés sont calculés une fois par valeur
+# distincte (factorize), puis diffusés sur toutes les lignes.
+# - control_features(...) / catalog_features(...) : caractéristiques propres au contrôle
+#   (tier, weight, loss_mul, cost_mul), précalculées à l'import/publication d'une norme et
+#   estampillées MODEL_VERSION ; au calcul, il ne reste qu'une jointure avec STATE.
+# ============================================================
+
+import re
+import json
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+DOMAIN_TIERS = {
+    "sécurité": ("high", 1.00), "contrôle d’accès": ("high", 1.00),
+    "opérations": ("high", 0.90), "sécurité communications": ("high", 0.95),
+    "gouvernance ia": ("high", 0.95), "sécurité modèle/données": ("high", 1.00),
+    "organisation": ("mid", 0.70), "politiques de sécurité": ("mid", 0.70),
+    "gestion des risques ia": ("mid", 0.75), "conformité & éthique": ("mid", 0.75),
+    "ressources humaines": ("low", 0.50),
+}
+KEYWORD_WEIGHTS = [
+    (r"\b(mfa|2fa|multi\-?factor)\b",           1.30, 1.20),
+    (r"\b(chiffr|encrypt|crypto|tls|ssl)\b",    1.25, 1.20),
+    (r"\b(sauvegard|backup|restore)\b",         1.20, 1.15),
+    (r"\b(pare\-?feu|firewall|segment|ids|ips)\b", 1.20, 1.15),
+    (r"\b(vuln|patch|correctif|cve)\b",         1.20, 1.15),
+    (r"\b(journal|log|siem|détect|detect)\b",   1.15, 1.10),
+    (r"\b(acc[eè]s|access|privilege|iam)\b",    1.20, 1.15),
+    (r"\b(fournisseur|tiers|vendor|third)\b",   1.15, 1.10),
+]
+STATE = {
+    "non conforme":             {"prob": 0.40, "loss_mul": 1.00, "cost_mul": 1.00, "prio": "Haute"},
+    "partiellement conforme":   {"prob": 0.22, "loss_mul": 0.75, "cost_mul": 0.75, "prio": "Moyenne"},
+    "conforme":                 {"prob": 0.05, "loss_mul": 0.20, "cost_mul": 0.30, "prio": "Info"},
+}
+BASE_FINANCIALS = {"high": {"loss": 70000, "cost": 17000}, "mid": {"loss": 40000, "cost": 10000}, "low": {"loss": 22000, "cost": 6000}}
+DEFAULT_STATE = "partiellement conforme"
+RISK_COLS = ["probability", "loss_estimate", "remediation_cost", "exp_loss", "priority"]
+FEATURE_COLS = ["tier", "weight", "loss_mul", "cost_mul"]
+
+# Toute modification de DOMAIN_TIERS / KEYWORD_WEIGHTS / BASE_FINANCIALS change la version
+# et invalide les caractéristiques stockées avec les normes.
+MODEL_VERSION = hashlib.sha256(json.dumps(
+    [DOMAIN_TIERS, KEYWORD_WEIGHTS, BASE_FINANCIALS], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+_WS = re.compile(r"\s+")
+_KW = [(re.compile(p), l, c) for p, l, c in KEYWORD_WEIGHTS]
+
+def _norm(s: str)->str: return _WS.sub(" ", (s or "").strip().lower())
+
+def _domain_weight(domain: str)->Tuple[str,float]:
+    d=_norm(domain)
+    for k,(tier,w) in DOMAIN_TIERS.items():
+        if k in d: return tier,w
+    return "mid",0.70
+
+def _kw_muls(q: str)->Tuple[float,float]:
+    qn=_norm(q); lm=1.0; cm=1.0
+    for pat,l,c in _KW:
+        if pat.search(qn): lm*=l; cm*=c
+    return lm,cm
+
+def infer_risk(domain: str, question: str, answer: str)->dict:
+    tier,w=_domain_weight(domain)
+    base=BASE_FINANCIALS.get(tier, BASE_FINANCIALS["mid"])
+    lm,cm=_kw_muls(question)
+    stt=STATE.get(_norm(answer), STATE[DEFAULT_STATE])
+    prob=stt["prob"]*w
+    loss=base["loss"]*lm*stt["loss_mul"]
+    cost=base["cost"]*cm*stt["cost_mul"]
+    exp=prob*loss
+    return {"probability":prob,"loss_estimate":loss,"remediation_cost":cost,"exp_loss":exp,"priority":stt["prio"]}
+
+# ============================================================
+# Version vectorisée
+# ============================================================
+def _codes(s: pd.Series):
+    codes, uniq = pd.factorize(s.fillna("").astype(str), sort=False)
+    return codes, list(uniq)
+
+def domain_features(domains) -> Dict[str, np.ndarray]:
+    """tier / weight / base_loss / base_cost par ligne (un appel _domain_weight par domaine distinct)."""
+    codes, uniq = _codes(pd.Series(domains))
+    tw = [_domain_weight(d) for d in uniq]
+    base = [BASE_FINANCIALS.get(t, BASE_FINANCIALS["mid"]) for t, _ in tw]
+    return {
+        "tier": np.array([t for t, _ in tw], dtype=object)[codes] if uniq else np.array([], dtype=object),
+        "weight": np.array([w for _, w in tw], dtype=float)[codes] if uniq else np.array([], dtype=float),
+        "base_loss": np.array([b["loss"] for b in base], dtype=float)[codes] if uniq else np.array([], dtype=float),
+        "base_cost": np.array([b["cost"] for b in base], dtype=float)[codes] if uniq else np.array([], dtype=float),
+    }
+
+def keyword_features(questions) -> Dict[str, np.ndarray]:
+    """loss_mul / cost_mul par ligne. Les motifs ne sont évalués que sur les questions distinctes
+    (un catalogue répété sur N audits ne coûte qu'une fois), motif par motif et dans l'ordre de
+    KEYWORD_WEIGHTS : un motif combiné ne signalerait pas les recouvrements entre motifs et le
+    produit doit rester identique à _kw_muls."""
+    codes, uniq = _codes(pd.Series(questions))
+    qn = [_norm(q) for q in uniq]
+    lm = np.ones(len(uniq)); cm = np.ones(len(uniq))
+    for pat, l, c in _KW:
+        hit = np.fromiter((pat.search(q) is not None for q in qn), dtype=bool, count=len(qn))
+        lm[hit] *= l; cm[hit] *= c
+    return {"loss_mul": lm[codes], "cost_mul": cm[codes]}
+
+def state_features(answers) -> Dict[str, np.ndarray]:
+    codes, uniq = _codes(pd.Series(answers))
+    st = [STATE.get(_norm(a), STATE[DEFAULT_STATE]) for a in uniq]
+    col = lambda k, dt: (np.array([s[k] for s in st], dtype=dt)[codes] if uniq else np.array([], dtype=dt))
+    return {"prob": col("prob", float), "loss_mul": col("loss_mul", float),
+            "cost_mul": col("cost_mul", float), "prio": col("prio", object)}
+
+def tier_financials(tiers) -> Dict[str, np.ndarray]:
+    """base_loss / base_cost par ligne (une recherche BASE_FINANCIALS par palier distinct)."""
+    codes, uniq = _codes(pd.Series(tiers))
+    base = [BASE_FINANCIALS.get(t, BASE_FINANCIALS["mid"]) for t in uniq]
+    col = lambda k: (np.array([b[k] for b in base], dtype=float)[codes] if uniq else np.array([], dtype=float))
+    return {"base_loss": col("loss"), "base_cost": col("cost")}
+
+def control_features(domains, questions) -> pd.DataFrame:
+    """tier / weight / loss_mul / cost_mul par contrôle (indépendants de la réponse)."""
+    dom = domain_features(domains); kw = keyword_features(questions)
+    return pd.DataFrame({"tier": dom["tier"], "weight": dom["weight"],
+                         "loss_mul": kw["loss_mul"], "cost_mul": kw["cost_mul"]})
+
+def infer_risk_from_features(features: pd.DataFrame, answers, index=None) -> pd.DataFrame:
+    """Jointure caractéristiques × STATE : mêmes opérations (et même ordre) que infer_risk."""
+    stt = state_features(answers)
+    base = tier_financials(features["tier"]); base_loss, base_cost = base["base_loss"], base["base_cost"]
+    prob = stt["prob"] * features["weight"].to_numpy(dtype=float)
+    loss = base_loss * features["loss_mul"].to_numpy(dtype=float) * stt["loss_mul"]
+    cost = base_cost * features["cost_mul"].to_numpy(dtype=float) * stt["cost_mul"]
+    return pd.DataFrame({"probability": prob, "loss_estimate": loss, "remediation_cost": cost,
+                         "exp_loss": prob * loss, "priority": stt["prio"]}, index=index)
+
+def infer_risk_batch(df: pd.DataFrame, domain_col: str = "domain", question_col: str = "question",
+                     answer_col: str = "answer") -> pd.DataFrame:
+    """Colonnes RISK_COLS pour chaque ligne de df (même index)."""
+    feats = control_features(df[domain_col], df[question_col])
+    return infer_risk_from_features(feats, df[answer_col], index=df.index)
+
+# ============================================================
+# Catalogues (liste d'items YAML) : item["risk"] = {model, tier, weight, loss_mul, cost_mul}
+# ============================================================
+def attach_features(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Ajoute (ou recalcule si MODEL_VERSION a changé) item["risk"] ; renvoie la liste modifiée."""
+    stale = [i for i, it in enumerate(items) if (it.get("risk") or {}).get("model") != MODEL_VERSION]
+    if stale:
+        f = control_features([items[i].get("domain", "") for i in stale], [items[i].get("question", "") for i in stale])
+        for i, r in zip(stale, f.itertuples(index=False)):
+            items[i]["risk"] = {"model": MODEL_VERSION, "tier": r.tier, "weight": float(r.weight),
+                                "loss_mul": float(r.loss_mul), "cost_mul": float(r.cost_mul)}
+    return items
+
+def catalog_features(items: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Caractéristiques alignées sur items (positionnellement), recalculées si périmées."""
+    attach_features(items)
+    return pd.DataFrame([{k: it["risk"][k] for k in FEATURE_COLS} for it in items], columns=FEATURE_COLS)
@@ -0,0 +1,78 @@
+# risk_sim.py — simulation Monte Carlo de la perte annuelle d'un audit
+# ============================================================
+# Paramètres par contrôle issus de risk_engine (probability, loss_estimate) :
+# - occurrence : Bernoulli(probability)
+# - perte si occurrence : lognormale de moyenne loss_estimate (sigma réglable)
+# - sans corrélation, tirage creux (binomiale par contrôle) : coût ∝ nb d'occurrences
+# - corrélation optionnelle par domaine (copule gaussienne à un facteur : rho)
+# Les essais sont découpés en blocs ; chaque bloc a sa graine (SeedSequence.spawn), donc
+# le résultat ne dépend que de seed, pas du nombre de processus (workers).
+# simulate(...) -> {"trials","expected","mean","p50","p90","p99","hist":{"counts","edges"}}
+# ============================================================
+
+import os
+import math
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+SIGMA = float(os.getenv("CYBERPIVOT_MC_SIGMA", "1.0"))
+TRIALS = int(os.getenv("CYBERPIVOT_MC_TRIALS", "1000000"))
+BLOCK_CELLS = 4_000_000  # essais × contrôles par bloc (borne mémoire du cas corrélé ~ 16 Mo)
+QUANTILES = (50, 90, 99)
+
+def _block(args) -> np.ndarray:
+    """Pertes totales de T essais (un vecteur de longueur T)."""
+    ss, T, p, mu, sigma, thr, codes, n_dom, rho = args
+    rng = np.random.default_rng(ss)
+    if rho > 0:
+        z = rng.standard_normal((T, n_dom), dtype=np.float32)
+        x = rng.standard_normal((T, len(p)), dtype=np.float32); x *= math.sqrt(1 - rho)
+        x += math.sqrt(rho) * z[:, codes]
+        r, c = np.nonzero(x < thr)
+    else:
+        # indépendance : nb d'occurrences ~ Binomiale(T, p) puis essais tirés sans remise
+        # (même loi que T×n Bernoulli, sans matrice dense)
+        k = rng.binomial(T, p)
+        r = np.concatenate([rng.choice(T, n, replace=False) for n in k]) if k.sum() else np.empty(0, dtype=np.int64)
+        c = np.repeat(np.arange(len(p)), k)
+    w = np.exp(mu[c] + sigma * rng.standard_normal(len(c), dtype=np.float32))
+    return np.bincount(r, weights=w, minlength=T)
+
+def simulate(prob, loss, domains=None, trials: int = TRIALS, sigma: float = SIGMA, rho: float = 0.0,
+             seed: Optional[int] = None, bins: int = 50, workers: int = 0) -> Dict[str, Any]:
+    """rho ∈ [0,1[ : corrélation des occurrences au sein d'un domaine ; workers > 1 : ProcessPool."""
+    p = np.clip(np.asarray(prob, dtype=float), 0.0, 1.0)
+    L = np.asarray(loss, dtype=float)
+    keep = (p > 0) & (L > 0); p = p[keep]; L = L[keep]
+    expected = float((p * L).sum())
+    if not len(p) or trials <= 0:
+        return {"trials": max(trials, 0), "expected": expected, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0,
+                "hist": {"counts": [], "edges": []}}
+    if not 0 <= rho < 1: raise ValueError("rho doit être dans [0, 1[.")
+    mu = np.log(L) - sigma * sigma / 2  # E[lognormale] = loss_estimate
+    nd = NormalDist()
+    thr = np.array([nd.inv_cdf(v) if v < 1 else np.inf for v in p], dtype=np.float32)
+    codes, uniq = pd.factorize(pd.Series(domains if domains is not None else [""] * len(keep)).astype(str)[keep], sort=False)
+    per = max(1, BLOCK_CELLS // len(p))
+    sizes = [per] * (trials // per) + ([trials % per] if trials % per else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(s, T, p, mu, sigma, thr, codes, len(uniq), rho) for s, T in zip(seeds, sizes)]
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex: parts = list(ex.map(_block, jobs))
+    else:
+        parts = [_block(j) for j in jobs]
+    tot = np.concatenate(parts)
+    q = np.percentile(tot, QUANTILES)
+    counts, edges = np.histogram(tot, bins=bins)
+    out = {"trials": trials, "expected": expected, "mean": float(tot.mean())}
+    out.update({f"p{k}": float(v) for k, v in zip(QUANTILES, q)})
+    out["hist"] = {"counts": counts.tolist(), "edges": edges.tolist()}
+    return out
+
+def simulate_frame(df: pd.DataFrame, **kw) -> Dict[str, Any]:
+    """Raccourci sur un DataFrame enrichi par risk_engine (probability / loss_estimate / domain)."""
+    return simulate(df["probability"], df["loss_estimate"], df["domain"] if "domain" in df else None, **kw)
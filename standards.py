@@ -1,21 +1,239 @@
+# standards.py — catalogues de normes (Excel -> YAML, chargement YAML, registre)
+# ============================================================
+# - excel_to_items(excel)          : items (domain/id/question + champs optionnels), en-têtes FR/EN
+# - excel_to_yaml(excel, cible)    : cible = chemin .yaml, ou nom de norme -> STANDARDS_DIR/<_norm_name>.yaml
+#                                    (format {name, version, items}) ; construction vectorisée + CSafeDumper
+# - load_yaml(yaml_path)           : liste d'items ; CSafeLoader si libyaml est présent ; cache binaire à
+#                                    côté du YAML (<fichier>.cache.pkl) clé (mtime, taille, sha256) + mémo
+#                                    en mémoire : les reruns Streamlit ne relisent plus le YAML
+# - Registry / list_standards() / load_standard(name) / standard_info(name) :
+#   index des normes (nom, version, nb d'items, domaines, sha256) dans STANDARDS_DIR/.index.json,
+#   rafraîchi incrémentalement (mtime du répertoire, puis mtime/taille de chaque fichier)
+# ============================================================
 import pandas as pd, yaml, os
+import re
+import json
+import pickle
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from risk_engine import attach_features
+
+STANDARDS_DIR = Path(os.getenv("CYBERPIVOT_STANDARDS_DIR", str(Path(__file__).parent.resolve() / "standards")))
+INDEX_FILE = ".index.json"
+# colonne cible -> en-têtes acceptés (insensibles à la casse / aux espaces)
+ITEM_ALIASES = {
+    "domain": ["domain", "domaine"],
+    "id": ["id", "qid"],
+    "question": ["question", "contrôle", "controle", "control"],
+    "item": ["item", "titre", "title"],
+    "criterion": ["criterion", "critère", "critere"],
+    "objective": ["objective", "objectif"],
+    "reference": ["reference", "référence"],
+    "evidence": ["evidence", "preuve", "preuve attendue"],
+    "recommendation": ["recommendation", "recommandation"],
+}
+REQUIRED_ITEM_COLS = ["domain", "id", "question"]
+
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+CACHE_SUFFIX = ".cache.pkl"
+
+_MEMO = {}  # chemin absolu -> (mtime_ns, taille, items)
+_MEMO_LOCK = threading.Lock()
+
+def _norm_name(name: str) -> str:
+    """Nom de norme -> nom de fichier sûr (ex. "ISO/IEC 27001" -> "ISO_IEC_27001")."""
+    a = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", a).strip("._") or "norme"
+
+def _records(df, cols):
+    return [dict(zip(cols, r)) for r in zip(*(df[c].astype(str).tolist() for c in cols))]
+
+def excel_to_items(excel) -> List[Dict[str, Any]]:
+    df = pd.read_csv(excel) if str(getattr(excel, "name", excel)).lower().endswith(".csv") else pd.read_excel(excel)
+    pos = {str(c).strip().lower(): c for c in df.columns}
+    src = {k: next((pos[a] for a in al if a in pos), None) for k, al in ITEM_ALIASES.items()}
+    missing = [k for k in REQUIRED_ITEM_COLS if src[k] is None]
+    if missing:
+        raise ValueError(f"Excel doit contenir les colonnes: {', '.join(missing)} (FR/EN acceptés)")
+    cols = [k for k in ITEM_ALIASES if src[k] is not None]
+    d = pd.DataFrame({k: df[src[k]].astype("string").fillna("").str.strip() for k in cols})
+    d = d[(d["id"] != "") | (d["question"] != "")]
+    rows = [{k: v for k, v in r.items() if v or k in REQUIRED_ITEM_COLS} for r in _records(d, cols)]
+    return attach_features(rows)
 
 def excel_to_yaml(excel_path, yaml_path):
-    df = pd.read_excel(excel_path)
-    required = ["domain", "id", "question"]
-    if not all(col in df.columns for col in required):
-        raise ValueError(f"Excel doit contenir les colonnes: {', '.join(required)}")
-    rows = []
-    for _, r in df.iterrows():
-        rows.append({
-            "domain": str(r["domain"]),
-            "id": str(r["id"]),
-            "question": str(r["question"])
-        })
-    with open(yaml_path, "w", encoding="utf-8") as f:
-        yaml.dump(rows, f, allow_unicode=True)
+    """yaml_path : chemin .yaml/.yml (liste d'items, 3 colonnes historiques) ou nom de norme
+    (fichier STANDARDS_DIR/<_norm_name>.yaml, format {name, version, items}). Renvoie le chemin."""
+    if str(yaml_path).lower().endswith((".yaml", ".yml")):
+        df = pd.read_excel(excel_path)
+        required = ["domain", "id", "question"]
+        if not all(col in df.columns for col in required):
+            raise ValueError(f"Excel doit contenir les colonnes: {', '.join(required)}")
+        doc = rows = _records(df, required)
+        attach_features(rows)  # tier/weight/multiplicateurs précalculés (item["risk"])
+        path = Path(yaml_path)
+    else:
+        name = str(yaml_path).strip()
+        doc = {"name": name, "version": "", "items": excel_to_items(excel_path)}
+        STANDARDS_DIR.mkdir(parents=True, exist_ok=True)
+        path = STANDARDS_DIR / f"{_norm_name(name)}.yaml"
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(doc, f, Dumper=_Dumper, allow_unicode=True)
+    get_registry().refresh(force=True)
+    return str(path)
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for b in iter(lambda: f.read(1 << 20), b""): h.update(b)
+    return h.hexdigest()
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f: return pickle.load(f)
+    except Exception:
+        return None
+
+def _write_cache(cache_path, st, digest, items):
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest, "items": items},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+    except OSError:  # répertoire en lecture seule : on se passe du cache
+        try: os.remove(tmp)
+        except OSError: pass
+
+def _load_doc(yaml_path):
+    """Document YAML brut (liste d'items ou {name, version, items}), via mémo puis cache binaire."""
+    path = os.path.abspath(yaml_path)
+    st = os.stat(path)
+    m = _MEMO.get(path)
+    if m and m[0] == st.st_mtime_ns and m[1] == st.st_size:
+        return m[2]
+    cache_path = path + CACHE_SUFFIX
+    c = _read_cache(cache_path) or {}
+    if c.get("mtime_ns") == st.st_mtime_ns and c.get("size") == st.st_size:
+        items = c["items"]
+    else:
+        digest = _sha256(path)
+        if c.get("sha256") == digest:  # fichier touché mais contenu inchangé
+            items = c["items"]
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                items = yaml.load(f, Loader=_Loader)
+        _write_cache(cache_path, st, digest, items)
+    with _MEMO_LOCK:
+        _MEMO[path] = (st.st_mtime_ns, st.st_size, items)
+    return items
+
+def _items(doc) -> List[Dict[str, Any]]:
+    return (doc.get("items") or []) if isinstance(doc, dict) else (doc or [])
 
 def load_yaml(yaml_path):
-    with open(yaml_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    return _items(_load_doc(yaml_path))
+
+# ============================================================
+# Registre des normes disponibles
+# ============================================================
+class Registry:
+    """Index {nom -> métadonnées} des YAML d'un répertoire. refresh() ne relit que les fichiers dont
+    (mtime, taille) a changé et ne fait qu'un stat du répertoire quand rien n'a bougé."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._by_file: Dict[str, Dict[str, Any]] = {}
+        self._dir_mtime: Optional[int] = None
+        self._load_index()
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.root / INDEX_FILE, "r", encoding="utf-8") as f:
+                self._by_file = {e["file"]: e for e in json.load(f).get("standards", [])}
+        except (OSError, ValueError, KeyError):
+            self._by_file = {}
+        self._by_name = {e["name"]: e for e in self._by_file.values()}
+
+    def _save_index(self) -> None:
+        tmp = self.root / f"{INDEX_FILE}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"standards": sorted(self._by_file.values(), key=lambda e: e["name"])}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.root / INDEX_FILE)
+        except OSError:
+            pass
+
+    def _meta(self, path: Path, st) -> Dict[str, Any]:
+        doc = _load_doc(path); items = _items(doc)
+        meta = doc if isinstance(doc, dict) else {}
+        return {"file": path.name, "name": str(meta.get("name") or path.stem), "version": str(meta.get("version") or ""),
+                "n_items": len(items), "domains": sorted({str(it.get("domain", "")) for it in items if isinstance(it, dict)}),
+                "sha256": _sha256(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+    def refresh(self, force: bool = False) -> None:
+        try: dm = self.root.stat().st_mtime_ns
+        except OSError:
+            with self._lock: self._by_file, self._by_name, self._dir_mtime = {}, {}, None
+            return
+        if not force and dm == self._dir_mtime: return
+        with self._lock:
+            files = {}; changed = False
+            for p in sorted(self.root.glob("*.y*ml")):
+                try: st = p.stat()
+                except OSError: continue
+                e = self._by_file.get(p.name)
+                if e is None or e["mtime_ns"] != st.st_mtime_ns or e["size"] != st.st_size:
+                    try: e = self._meta(p, st)
+                    except Exception: continue  # YAML invalide : ignoré
+                    changed = True
+                files[p.name] = e
+            changed = changed or files.keys() != self._by_file.keys()
+            self._by_file = files; self._by_name = {e["name"]: e for e in files.values()}
+            self._dir_mtime = dm
+            if changed: self._save_index()
+
+    def _entry(self, name: str) -> Optional[Dict[str, Any]]:
+        self.refresh()
+        e = self._by_name.get(name)
+        if e is None: return None
+        try: st = (self.root / e["file"]).stat()
+        except OSError: self.refresh(force=True); return self._by_name.get(name)
+        if st.st_mtime_ns != e["mtime_ns"] or st.st_size != e["size"]:  # modifié sur place
+            self.refresh(force=True); e = self._by_name.get(name)
+        return e
+
+    def names(self) -> List[str]:
+        self.refresh()
+        return sorted(self._by_name)
+
+    def info(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._entry(name)
+
+    def load(self, name: str) -> List[Dict[str, Any]]:
+        e = self._entry(name)
+        if e is None: raise KeyError(f"Norme inconnue : {name}")
+        return load_yaml(self.root / e["file"])
+
+_REGISTRY: Optional[Registry] = None
+
+def get_registry() -> Registry:
+    global _REGISTRY
+    if _REGISTRY is None or _REGISTRY.root != STANDARDS_DIR:
+        _REGISTRY = Registry(STANDARDS_DIR)
+    return _REGISTRY
+
+def list_standards() -> List[str]:
+    return get_registry().names()
+
+def standard_info(name: str) -> Optional[Dict[str, Any]]:
+    return get_registry().info(name)
 
+def load_standard(name: str) -> List[Dict[str, Any]]:
+    return get_registry().load(name)
@@ -4,15 +4,37 @@ import os
 import json
 import sqlite3
 import datetime
-from typing import Any, Dict, Iterable, Set
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import tenancy
 
 DB_PATH = os.getenv("DB_PATH", "cyberpivot.db")
+# attente max (ms) sur le verrou d'écriture SQLite avant "database is locked"
+BUSY_TIMEOUT_MS = int(os.getenv("CYBERPIVOT_BUSY_TIMEOUT_MS", "5000"))
+
+# shards déjà migrés dans ce process (init paresseuse des bases par tenant)
+_READY: Set[str] = set()
+_READY_LOCK = threading.Lock()
+
+def db_path(tenant_id: Optional[str] = None) -> str:
+    return tenancy.resolve("storage", tenant_id, DB_PATH)
 
-def get_conn() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+def _open(path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(path, check_same_thread=False)
     con.row_factory = sqlite3.Row
     con.execute("PRAGMA journal_mode=WAL;")
     con.execute("PRAGMA foreign_keys=ON;")
+    con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+    return con
+
+def get_conn(tenant_id: Optional[str] = None) -> sqlite3.Connection:
+    path = db_path(tenant_id)
+    con = _open(path)
+    if tenancy.sharding_enabled() and path not in _READY:
+        with _READY_LOCK:
+            if path not in _READY:
+                _migrate_table(con); _READY.add(path)
     return con
 
 DEST_COLS = [
@@ -42,6 +64,150 @@ CREATE TABLE IF NOT EXISTS responses (
 """
 
 UNIQUE_INDEX_SQL = "CREATE UNIQUE INDEX IF NOT EXISTS uniq_responses_aqi ON responses(audit_id, qid, item)"
+# index couvrant pour l'ordre de lecture (domain, qid, item) et la pagination par clé
+COVERING_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_responses_adqi ON responses(audit_id, domain, qid, item)"
+PAGE_KEY = ("domain", "qid", "item")
+
+# Synthèse matérialisée par (audit, domaine), rafraîchie dans la transaction d'écriture.
+# Le CASE reprend CANON_TO_FR / _to_fr_level de l'app (valeur inconnue => non applicable).
+LEVEL_CLASS_SQL = """CASE lower(trim(COALESCE(level, ''), char(32, 9, 10, 13)))
+    WHEN 'conforme' THEN 'c' WHEN 'yes' THEN 'c'
+    WHEN 'partiellement conforme' THEN 'pc' WHEN 'partial' THEN 'pc' WHEN 'partially compliant' THEN 'pc'
+    WHEN 'non conforme' THEN 'nc' WHEN 'no' THEN 'nc'
+    ELSE 'na' END"""
+HAS_EVIDENCE_SQL = "(COALESCE(evidence_json, '') NOT IN ('', '[]', '{}', 'null'))"
+CREATE_SUMMARY_SQL = """
+CREATE TABLE IF NOT EXISTS response_summary (
+    audit_id   TEXT NOT NULL,
+    domain     TEXT NOT NULL,
+    n_total    INTEGER NOT NULL,
+    n_c        INTEGER NOT NULL,
+    n_pc       INTEGER NOT NULL,
+    n_nc       INTEGER NOT NULL,
+    n_na       INTEGER NOT NULL,
+    n_evidence INTEGER NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (audit_id, domain)
+)
+"""
+SUMMARY_SELECT_SQL = f"""
+    SELECT audit_id, domain, COUNT(*),
+           SUM(lc = 'c'), SUM(lc = 'pc'), SUM(lc = 'nc'), SUM(lc = 'na'), SUM(ev), MAX(updated_at)
+    FROM (SELECT audit_id, domain, updated_at, {LEVEL_CLASS_SQL} AS lc, {HAS_EVIDENCE_SQL} AS ev FROM responses %s)
+    GROUP BY audit_id, domain
+"""
+
+# Métadonnées des preuves (les fichiers restent sur disque, cf. evidence/<audit>/...)
+EVIDENCE_COLS = ["audit_id", "qid", "item", "name", "path", "sha256", "bytes", "created_at"]
+CREATE_EVIDENCE_SQL = """
+CREATE TABLE IF NOT EXISTS evidence (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    audit_id   TEXT NOT NULL,
+    qid        TEXT NOT NULL,
+    item       TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    path       TEXT NOT NULL,
+    sha256     TEXT,
+    bytes      INTEGER,
+    created_at TEXT NOT NULL,
+    UNIQUE(audit_id, qid, item, name)
+)
+"""
+
+# Journal des changements (append-only) : une ligne par upsert / suppression, écrite dans la même
+# transaction que la table responses ; seq AUTOINCREMENT => strictement croissant, jamais réutilisé.
+# data = ligne complète après upsert (JSON), NULL pour une suppression : réplication sans relecture.
+CHANGE_COLS = ["seq", "audit_id", "qid", "item", "op", "data", "changed_at"]
+CREATE_CHANGES_SQL = """
+CREATE TABLE IF NOT EXISTS response_changes (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    audit_id   TEXT NOT NULL,
+    qid        TEXT NOT NULL,
+    item       TEXT NOT NULL,
+    op         TEXT NOT NULL,
+    data       TEXT,
+    changed_at TEXT NOT NULL
+)
+"""
+CHANGES_AUDIT_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_changes_audit_seq ON response_changes(audit_id, seq)"
+UPDATED_AT_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_responses_updated ON responses(updated_at)"
+CHANGE_INSERT_SQL = "INSERT INTO response_changes(audit_id, qid, item, op, data, changed_at) VALUES (?, ?, ?, ?, ?, ?)"
+CHANGE_DATA_COLS = [c for c in DEST_COLS if c not in ("id", "audit_id", "qid", "item")]
+
+# Index des instantanés d'audit (fichiers immuables, cf. engine/snapshots.py) : insertion seule
+SNAPSHOT_COLS = ["snapshot_id", "audit_id", "label", "path", "sha256", "n_controls", "rate", "bytes", "created_at"]
+CREATE_SNAPSHOTS_SQL = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id TEXT PRIMARY KEY,
+    audit_id    TEXT NOT NULL,
+    label       TEXT,
+    path        TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    n_controls  INTEGER NOT NULL,
+    rate        INTEGER,
+    bytes       INTEGER,
+    created_at  TEXT NOT NULL
+)
+"""
+SNAPSHOTS_AUDIT_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_snapshots_audit ON snapshots(audit_id, created_at)"
+
+# Métadonnées d'audit pour les vues longitudinales (projet / client, norme de référence)
+AUDIT_META_COLS = ["audit_id", "project", "standard", "updated_at"]
+CREATE_AUDIT_META_SQL = """
+CREATE TABLE IF NOT EXISTS audit_meta (
+    audit_id   TEXT PRIMARY KEY,
+    project    TEXT,
+    standard   TEXT,
+    updated_at TEXT NOT NULL
+)
+"""
+
+# Séries de tendance : un point par (audit, domaine, jour), le dernier calcul du jour l'emporte ;
+# domain = '' => audit entier. Agrégats mois / trimestre recalculés pour les périodes touchées
+# (valeur de fin de période + min / max / moyenne) : un graphe pluriannuel ne lit que les agrégats.
+TREND_COLS = ["audit_id", "domain", "day", "ts", "source", "project", "standard",
+              "n_total", "n_applicable", "rate", "evidence_coverage", "expected_loss"]
+CREATE_TRENDS_SQL = """
+CREATE TABLE IF NOT EXISTS trend_points (
+    audit_id          TEXT NOT NULL,
+    domain            TEXT NOT NULL,
+    day               TEXT NOT NULL,
+    ts                TEXT NOT NULL,
+    source            TEXT,
+    project           TEXT,
+    standard          TEXT,
+    n_total           INTEGER,
+    n_applicable      INTEGER,
+    rate              REAL,
+    evidence_coverage REAL,
+    expected_loss     REAL,
+    PRIMARY KEY (audit_id, domain, day)
+)
+"""
+TREND_GRAINS = ("month", "quarter")
+TREND_ROLLUP_COLS = ["grain", "period", "audit_id", "domain", "project", "standard", "rate", "rate_min", "rate_max",
+                     "rate_avg", "evidence_coverage", "expected_loss", "n_points", "last_day"]
+CREATE_TREND_ROLLUPS_SQL = """
+CREATE TABLE IF NOT EXISTS trend_rollups (
+    grain             TEXT NOT NULL,
+    period            TEXT NOT NULL,
+    audit_id          TEXT NOT NULL,
+    domain            TEXT NOT NULL,
+    project           TEXT,
+    standard          TEXT,
+    rate              REAL,
+    rate_min          REAL,
+    rate_max          REAL,
+    rate_avg          REAL,
+    evidence_coverage REAL,
+    expected_loss     REAL,
+    n_points          INTEGER NOT NULL,
+    last_day          TEXT NOT NULL,
+    PRIMARY KEY (grain, period, audit_id, domain)
+)
+"""
+TREND_DAY_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_trend_points_day ON trend_points(domain, day)"
+TREND_ROLLUP_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_trend_rollups_period ON trend_rollups(grain, domain, period)"
 
 def _table_columns(con: sqlite3.Connection, table: str) -> Set[str]:
     cur = con.cursor()
@@ -112,6 +278,21 @@ def _rebuild_table(con: sqlite3.Connection, existing_cols: Set[str]):
     con.commit()
 
 def _migrate_table(con: sqlite3.Connection):
+    _migrate_responses(con)
+    con.execute(COVERING_INDEX_SQL)
+    con.execute(CREATE_EVIDENCE_SQL)
+    con.execute(CREATE_CHANGES_SQL); con.execute(CHANGES_AUDIT_INDEX_SQL)
+    con.execute(CREATE_SNAPSHOTS_SQL); con.execute(SNAPSHOTS_AUDIT_INDEX_SQL)
+    con.execute(CREATE_AUDIT_META_SQL)
+    con.execute(CREATE_TRENDS_SQL); con.execute(TREND_DAY_INDEX_SQL)
+    con.execute(CREATE_TREND_ROLLUPS_SQL); con.execute(TREND_ROLLUP_INDEX_SQL)
+    con.execute(UPDATED_AT_INDEX_SQL)
+    if not _table_exists(con, "response_summary"):
+        con.execute(CREATE_SUMMARY_SQL)
+        con.execute("INSERT INTO response_summary " + SUMMARY_SELECT_SQL % "")
+    con.commit()
+
+def _migrate_responses(con: sqlite3.Connection):
     if not _table_exists(con, "responses"):
         _create_fresh(con); return
     existing = _table_columns(con, "responses")
@@ -131,8 +312,8 @@ def _migrate_table(con: sqlite3.Connection):
     c.execute(UNIQUE_INDEX_SQL)
     con.commit()
 
-def init_db():
-    con = get_conn()
+def init_db(tenant_id: Optional[str] = None):
+    con = get_conn(tenant_id)
     _migrate_table(con)
     con.close()
 
@@ -145,48 +326,446 @@ def _evidence_to_json(evidence: Any) -> str:
     if isinstance(evidence, str): return evidence
     return json.dumps([], ensure_ascii=False)
 
-def upsert_response(audit_id: str, rec: Dict[str, Any]) -> None:
+UPSERT_SQL = """
+    INSERT INTO responses(audit_id, domain, qid, item, question, level, score, criterion, recommendation, comment, evidence_json, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(audit_id, qid, item) DO UPDATE SET
+        question       = excluded.question,
+        level          = excluded.level,
+        score          = excluded.score,
+        criterion      = excluded.criterion,
+        recommendation = excluded.recommendation,
+        comment        = excluded.comment,
+        evidence_json  = excluded.evidence_json,
+        updated_at     = excluded.updated_at
+"""
+
+def _now() -> str:
+    return datetime.datetime.utcnow().isoformat(timespec="seconds")
+
+def response_row(audit_id: str, rec: Dict[str, Any], now: Optional[str] = None) -> Dict[str, Any]:
+    """Valide et normalise un enregistrement (colonnes de DEST_COLS, sans id)."""
     if not audit_id: raise ValueError("audit_id requis")
     domain = _as_text(rec.get("domain"))
     qid    = _as_text(rec.get("qid"))
     item   = _as_text(rec.get("item"))
     if not domain or not qid or not item:
         raise ValueError(f"Champs requis manquants: domain='{domain}', qid='{qid}', item='{item}'")
-    question = _as_text(rec.get("question"))
-    level = _as_text(rec.get("level"))
-    score = rec.get("score", None)
-    criterion = _as_text(rec.get("criterion"))
-    recommendation = _as_text(rec.get("recommendation"))
-    comment = _as_text(rec.get("comment"))
-    evidence_json = _evidence_to_json(rec.get("evidence") or rec.get("evidence_json"))
-    now = datetime.datetime.utcnow().isoformat(timespec="seconds")
-    con = get_conn(); c = con.cursor()
-    c.execute("""
-        INSERT INTO responses(audit_id, domain, qid, item, question, level, score, criterion, recommendation, comment, evidence_json, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(audit_id, qid, item) DO UPDATE SET
-            question       = excluded.question,
-            level          = excluded.level,
-            score          = excluded.score,
-            criterion      = excluded.criterion,
-            recommendation = excluded.recommendation,
-            comment        = excluded.comment,
-            evidence_json  = excluded.evidence_json,
-            updated_at     = excluded.updated_at
-    """, (audit_id, domain, qid, item, question, level, score, criterion, recommendation, comment, evidence_json, now))
-    con.commit(); con.close()
+    return {
+        "audit_id": audit_id, "domain": domain, "qid": qid, "item": item,
+        "question": _as_text(rec.get("question")),
+        "level": _as_text(rec.get("level")),
+        "score": rec.get("score", None),
+        "criterion": _as_text(rec.get("criterion")),
+        "recommendation": _as_text(rec.get("recommendation")),
+        "comment": _as_text(rec.get("comment")),
+        "evidence_json": _evidence_to_json(rec.get("evidence") or rec.get("evidence_json")),
+        "updated_at": now or _now(),
+    }
+
+def _row_params(row: Dict[str, Any]) -> tuple:
+    return tuple(row[c] for c in DEST_COLS[1:])
+
+def upsert_response(audit_id: str, rec: Dict[str, Any], tenant_id: Optional[str] = None) -> None:
+    write_rows([response_row(audit_id, rec)], tenant_id=tenant_id)
+
+def upsert_responses(audit_id: str, recs: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None) -> int:
+    """Upsert d'un lot dans une seule transaction (tout ou rien)."""
+    now = _now()
+    return write_rows([response_row(audit_id, r, now) for r in recs], tenant_id=tenant_id)
 
-def list_responses(audit_id: str) -> Iterable[Dict[str, Any]]:
-    con = get_conn(); c = con.cursor()
+def change_params(row: Dict[str, Any], op: str = "upsert") -> tuple:
+    data = json.dumps({c: row.get(c) for c in CHANGE_DATA_COLS}, ensure_ascii=False) if op == "upsert" else None
+    return (row["audit_id"], row["qid"], row["item"], op, data, row.get("updated_at") or _now())
+
+def write_rows(rows: List[Dict[str, Any]], tenant_id: Optional[str] = None) -> int:
+    """Écrit des lignes déjà normalisées (cf. response_row), tous audits confondus, en une transaction
+    (réponses + synthèse + journal des changements)."""
+    if not rows: return 0
+    con = get_conn(tenant_id)
+    try:
+        con.executemany(UPSERT_SQL, [_row_params(r) for r in rows])
+        con.executemany(CHANGE_INSERT_SQL, [change_params(r) for r in rows])
+        _refresh_summary(con, {r["audit_id"] for r in rows})
+        con.commit()
+    finally:
+        con.close()
+    return len(rows)
+
+def list_responses(audit_id: str, tenant_id: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+    con = get_conn(tenant_id); c = con.cursor()
     c.execute("SELECT * FROM responses WHERE audit_id=? ORDER BY domain, qid, item", (audit_id,))
     rows = [dict(r) for r in c.fetchall()]
     con.close(); return rows
 
-def get_response(audit_id: str, qid: str, item: str):
-    con = get_conn(); c = con.cursor()
+def get_response(audit_id: str, qid: str, item: str, tenant_id: Optional[str] = None):
+    con = get_conn(tenant_id); c = con.cursor()
     c.execute("SELECT * FROM responses WHERE audit_id=? AND qid=? AND item=? LIMIT 1", (audit_id, qid, item))
     row = c.fetchone(); con.close()
     return dict(row) if row else None
 
+def delete_responses(audit_id: str, keys: Optional[Iterable[tuple]] = None, tenant_id: Optional[str] = None) -> int:
+    """Supprime les réponses (qid, item) de l'audit (toutes si keys=None) ; journalisé dans la même transaction."""
+    con = get_conn(tenant_id)
+    try:
+        if keys is None:
+            found = [tuple(r) for r in con.execute("SELECT qid, item FROM responses WHERE audit_id=?", (audit_id,))]
+        else:
+            found = [k for k in {(str(q), str(i)) for q, i in keys}
+                     if con.execute("SELECT 1 FROM responses WHERE audit_id=? AND qid=? AND item=?", (audit_id, *k)).fetchone()]
+        if not found: return 0
+        con.executemany("DELETE FROM responses WHERE audit_id=? AND qid=? AND item=?", [(audit_id, q, i) for q, i in found])
+        now = _now()
+        con.executemany(CHANGE_INSERT_SQL, [(audit_id, q, i, "delete", None, now) for q, i in found])
+        _refresh_summary(con, [audit_id])
+        con.commit()
+    finally:
+        con.close()
+    return len(found)
+
+def delete_response(audit_id: str, qid: str, item: str, tenant_id: Optional[str] = None) -> bool:
+    return delete_responses(audit_id, [(qid, item)], tenant_id=tenant_id) > 0
+
+# ============================================================
+# Journal des changements : lecture par curseur (seq) et purge
+# ============================================================
+def change_record(r: tuple) -> Dict[str, Any]:
+    d = dict(zip(CHANGE_COLS, r)); d["data"] = json.loads(d["data"]) if d["data"] else None
+    return d
+
+def changes_since(since: int = 0, limit: int = 1000, audit_ids: Optional[Iterable[str]] = None,
+                  tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    """Changements de seq > since (ordre croissant) ; next = curseur à repasser, has_more si la page est pleine."""
+    sql = f"SELECT {', '.join(CHANGE_COLS)} FROM response_changes WHERE seq > ?"; args: List[Any] = [int(since)]
+    if audit_ids is not None:
+        ids = list(audit_ids)
+        if not ids: return {"changes": [], "next": int(since), "has_more": False}
+        sql += " AND audit_id IN (%s)" % ",".join("?" * len(ids)); args += ids
+    sql += " ORDER BY seq LIMIT ?"; args.append(int(limit))
+    con = get_conn(tenant_id); c = con.cursor(); c.row_factory = None
+    rows = c.execute(sql, args).fetchall(); con.close()
+    out = [change_record(r) for r in rows]
+    return {"changes": out, "next": out[-1]["seq"] if out else int(since), "has_more": len(out) == int(limit)}
+
+def last_change_seq(tenant_id: Optional[str] = None) -> int:
+    con = get_conn(tenant_id)
+    try: return int(con.execute("SELECT COALESCE(MAX(seq), 0) FROM response_changes").fetchone()[0])
+    finally: con.close()
+
+def prune_changes(before_seq: int, tenant_id: Optional[str] = None) -> int:
+    """Purge les changements seq <= before_seq (déjà consommés par tous les abonnés)."""
+    con = get_conn(tenant_id)
+    try:
+        n = con.execute("DELETE FROM response_changes WHERE seq <= ?", (int(before_seq),)).rowcount
+        con.commit(); return n
+    finally:
+        con.close()
+
+# ============================================================
+# Lecture : projection, filtres, pagination par clé (domain, qid, item)
+# ============================================================
+def _query_sql(columns: Optional[List[str]], domains, levels, after, limit) -> tuple:
+    cols = list(columns) if columns else list(DEST_COLS)
+    bad = [c for c in cols if c not in DEST_COLS]
+    if bad: raise ValueError(f"Colonnes inconnues : {bad}")
+    where = ["audit_id=?"]; args: List[Any] = []
+    if domains:
+        where.append("domain IN (%s)" % ",".join("?" * len(domains))); args += list(domains)
+    if levels:
+        where.append("level IN (%s)" % ",".join("?" * len(levels))); args += list(levels)
+    if after is not None:
+        where.append("(domain, qid, item) > (?, ?, ?)"); args += list(after)
+    sql = f"SELECT {', '.join(cols)} FROM responses WHERE {' AND '.join(where)} ORDER BY domain, qid, item"
+    if limit is not None:
+        sql += " LIMIT ?"; args.append(int(limit))
+    return cols, sql, args
+
+def query_responses(audit_id: str, columns: Optional[List[str]] = None,
+                    domains: Optional[List[str]] = None, levels: Optional[List[str]] = None,
+                    after: Optional[tuple] = None, limit: Optional[int] = None,
+                    as_frame: bool = False, tenant_id: Optional[str] = None):
+    """Lit uniquement les colonnes demandées ; as_frame=True construit le DataFrame
+    directement depuis les tuples du curseur (pas de dict intermédiaire)."""
+    cols, sql, args = _query_sql(columns, domains, levels, after, limit)
+    con = get_conn(tenant_id); c = con.cursor(); c.row_factory = None
+    c.execute(sql, [audit_id] + args)
+    rows = c.fetchall(); con.close()
+    if as_frame:
+        import pandas as pd
+        return pd.DataFrame.from_records(rows, columns=cols)
+    return [dict(zip(cols, r)) for r in rows]
+
+def page_responses(audit_id: str, columns: Optional[List[str]] = None, limit: int = 500,
+                   after: Optional[tuple] = None, tenant_id: Optional[str] = None, **filters) -> Dict[str, Any]:
+    """Une page + le curseur suivant (None en fin de parcours)."""
+    want = list(columns) if columns else list(DEST_COLS)
+    cols = want + [k for k in PAGE_KEY if k not in want]
+    rows = query_responses(audit_id, columns=cols, after=after, limit=limit, tenant_id=tenant_id, **filters)
+    nxt = tuple(rows[-1][k] for k in PAGE_KEY) if len(rows) == limit else None
+    if cols != want: rows = [{k: r[k] for k in want} for r in rows]
+    return {"rows": rows, "next": nxt}
+
+# ============================================================
+# Agrégats (portefeuille) — même pondération que _compute_metrics : (C + 0,5×PC) / applicables
+# ============================================================
+def _refresh_summary(con: sqlite3.Connection, audit_ids: Iterable[str]) -> None:
+    for aid in audit_ids:
+        con.execute("DELETE FROM response_summary WHERE audit_id=?", (aid,))
+        con.execute("INSERT INTO response_summary " + SUMMARY_SELECT_SQL % "WHERE audit_id=?", (aid,))
+
+def rebuild_summary(tenant_id: Optional[str] = None) -> None:
+    con = get_conn(tenant_id)
+    con.execute("DELETE FROM response_summary")
+    con.execute("INSERT INTO response_summary " + SUMMARY_SELECT_SQL % "")
+    con.commit(); con.close()
+
+def _rate(n_c: int, n_pc: int, n_app: int) -> Optional[int]:
+    return None if n_app == 0 else round(((n_c + 0.5 * n_pc) / n_app) * 100)
+
+def _summary_rows(audit_ids: Optional[Iterable[str]], group_by_domain: bool, tenant_id: Optional[str]) -> List[tuple]:
+    keys = "audit_id, domain" if group_by_domain else "audit_id"
+    sql = (f"SELECT {keys}, SUM(n_total), SUM(n_c), SUM(n_pc), SUM(n_nc), SUM(n_na), SUM(n_evidence) "
+           "FROM response_summary")
+    args: List[Any] = []
+    if audit_ids is not None:
+        ids = list(audit_ids)
+        if not ids: return []
+        sql += " WHERE audit_id IN (%s)" % ",".join("?" * len(ids)); args = ids
+    sql += f" GROUP BY {keys} ORDER BY {keys}"
+    con = get_conn(tenant_id); c = con.cursor(); c.row_factory = None
+    c.execute(sql, args); rows = c.fetchall(); con.close()
+    return rows
+
+def _metrics(n_total, n_c, n_pc, n_nc, n_na, n_ev) -> Dict[str, Any]:
+    n_app = n_c + n_pc + n_nc
+    return {"n_total": n_total, "n_applicable": n_app, "n_c": n_c, "n_pc": n_pc, "n_nc": n_nc, "n_na": n_na,
+            "rate": _rate(n_c, n_pc, n_app), "n_evidence": n_ev,
+            "evidence_coverage": (n_ev / n_total) if n_total else None}
+
+def audit_metrics(audit_ids: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Taux, comptes par niveau et couverture de preuves, par audit (tous si audit_ids=None)."""
+    return {r[0]: _metrics(*r[1:]) for r in _summary_rows(audit_ids, False, tenant_id)}
+
+def domain_metrics(audit_ids: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for r in _summary_rows(audit_ids, True, tenant_id):
+        out.setdefault(r[0], {})[r[1]] = _metrics(*r[2:])
+    return out
+
+def domain_scores(audit_id: str, tenant_id: Optional[str] = None) -> Dict[str, float]:
+    """Équivalent de _compute_scores(...)["by_domain"] : score 0..1 par domaine (N/A exclus)."""
+    out = {}
+    for dom, m in domain_metrics([audit_id], tenant_id).get(audit_id, {}).items():
+        if m["n_applicable"]: out[dom] = (m["n_c"] + 0.5 * m["n_pc"]) / m["n_applicable"]
+    return out
+
+def list_audits(tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute("""SELECT audit_id, COUNT(*) AS n_responses, MAX(updated_at) AS updated_at
+                 FROM responses GROUP BY audit_id ORDER BY audit_id""")
+    rows = [dict(r) for r in c.fetchall()]
+    con.close(); return rows
+
+def list_audits_all_tenants() -> Dict[str, List[Dict[str, Any]]]:
+    """Vue admin cross-tenant : interroge chaque shard en parallèle."""
+    if not tenancy.sharding_enabled():
+        return {tenancy.DEFAULT_TENANT: list_audits()}
+    res = tenancy.fan_out(list_audits)
+    return {t: ([] if isinstance(v, Exception) else v) for t, v in res.items()}
+
+# ============================================================
+# Preuves (métadonnées)
+# ============================================================
+EVIDENCE_UPSERT_SQL = """INSERT INTO evidence(audit_id, qid, item, name, path, sha256, bytes, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(audit_id, qid, item, name) DO UPDATE SET
+                     path=excluded.path, sha256=excluded.sha256, bytes=excluded.bytes"""
+
+def add_evidence(audit_id: str, qid: str, item: str, name: str, path: str,
+                 sha256: str = "", size: int = 0, tenant_id: Optional[str] = None) -> None:
+    add_evidence_many([{"audit_id": audit_id, "qid": qid, "item": item, "name": name, "path": path,
+                        "sha256": sha256, "bytes": size}], tenant_id=tenant_id)
+
+def add_evidence_many(rows: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None) -> int:
+    """Plusieurs preuves (clés de EVIDENCE_COLS) en une seule transaction."""
+    now = _now()
+    params = [(r["audit_id"], r["qid"], r["item"], r["name"], r["path"], r.get("sha256", ""),
+               int(r.get("bytes") or 0), r.get("created_at") or now) for r in rows]
+    if not params: return 0
+    con = get_conn(tenant_id)
+    try:
+        with con: con.executemany(EVIDENCE_UPSERT_SQL, params)
+    finally:
+        con.close()
+    return len(params)
+
+def list_evidence(audit_id: str, qid: Optional[str] = None, item: Optional[str] = None,
+                  tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql = "SELECT " + ", ".join(EVIDENCE_COLS) + " FROM evidence WHERE audit_id=?"
+    args: List[Any] = [audit_id]
+    if qid is not None: sql += " AND qid=?"; args.append(qid)
+    if item is not None: sql += " AND item=?"; args.append(item)
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute(sql + " ORDER BY qid, item, name", args)
+    rows = [dict(r) for r in c.fetchall()]
+    con.close(); return rows
+
+def delete_evidence(audit_id: str, qid: str, item: str, name: str, tenant_id: Optional[str] = None) -> bool:
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute("DELETE FROM evidence WHERE audit_id=? AND qid=? AND item=? AND name=?", (audit_id, qid, item, name))
+    con.commit(); ok = c.rowcount > 0; con.close()
+    return ok
+
+# ============================================================
+# Instantanés (index)
+# ============================================================
+def add_snapshot(row: Dict[str, Any], tenant_id: Optional[str] = None) -> bool:
+    """Enregistre un instantané ; False s'il existe déjà (même snapshot_id : immuable)."""
+    con = get_conn(tenant_id)
+    try:
+        with con:
+            cur = con.execute(f"INSERT OR IGNORE INTO snapshots({', '.join(SNAPSHOT_COLS)}) VALUES ({','.join('?' * len(SNAPSHOT_COLS))})",
+                              [row.get(c) for c in SNAPSHOT_COLS])
+        return cur.rowcount > 0
+    finally:
+        con.close()
+
+def list_snapshots(audit_id: Optional[str] = None, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    sql = "SELECT " + ", ".join(SNAPSHOT_COLS) + " FROM snapshots"; args: List[Any] = []
+    if audit_id is not None: sql += " WHERE audit_id=?"; args.append(audit_id)
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute(sql + " ORDER BY audit_id, created_at DESC", args)
+    rows = [dict(r) for r in c.fetchall()]
+    con.close(); return rows
+
+def get_snapshot(snapshot_id: str, tenant_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute("SELECT " + ", ".join(SNAPSHOT_COLS) + " FROM snapshots WHERE snapshot_id=?", (snapshot_id,))
+    r = c.fetchone(); con.close()
+    return dict(r) if r else None
+
+# ============================================================
+# Métadonnées d'audit (projet, norme)
+# ============================================================
+def set_audit_meta(audit_id: str, project: Optional[str] = None, standard: Optional[str] = None,
+                   tenant_id: Optional[str] = None) -> None:
+    """Renseigne projet / norme (None = inchangé)."""
+    con = get_conn(tenant_id)
+    try:
+        with con:
+            con.execute("""INSERT INTO audit_meta(audit_id, project, standard, updated_at) VALUES (?, ?, ?, ?)
+                           ON CONFLICT(audit_id) DO UPDATE SET project=COALESCE(excluded.project, audit_meta.project),
+                           standard=COALESCE(excluded.standard, audit_meta.standard), updated_at=excluded.updated_at""",
+                        (audit_id, project, standard, _now()))
+    finally:
+        con.close()
+
+def get_audit_meta(audit_id: str, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+    con = get_conn(tenant_id); c = con.cursor()
+    c.execute("SELECT " + ", ".join(AUDIT_META_COLS) + " FROM audit_meta WHERE audit_id=?", (audit_id,))
+    r = c.fetchone(); con.close()
+    return dict(r) if r else {"audit_id": audit_id, "project": None, "standard": None, "updated_at": None}
+
+# ============================================================
+# Tendances : points journaliers + agrégats mois / trimestre
+# ============================================================
+def trend_period(day: str, grain: str) -> str:
+    """'2025-05-17' -> '2025-05' (month) | '2025-Q2' (quarter) | inchangé (day)."""
+    if grain == "month": return day[:7]
+    if grain == "quarter": return f"{day[:4]}-Q{(int(day[5:7]) + 2) // 3}"
+    if grain == "day": return day[:10]
+    raise ValueError(f"Granularité inconnue : {grain}")
+
+def _period_days(period: str, grain: str) -> tuple:
+    """Bornes [premier jour, jour suivant la fin) d'une période, au format 'YYYY-MM-DD'."""
+    y = int(period[:4])
+    m0 = int(period[5:7]) if grain == "month" else (int(period[-1]) - 1) * 3 + 1
+    m1 = m0 + (1 if grain == "month" else 3)
+    end = f"{y + 1}-01-01" if m1 > 12 else f"{y}-{m1:02d}-01"
+    return f"{y}-{m0:02d}-01", end
+
+def trend_rollup_rows(points: List[Dict[str, Any]], grain: str) -> List[Dict[str, Any]]:
+    """Agrège des points (même audit) par (période, domaine) ; valeurs « fin de période » = dernier jour."""
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for p in points: groups.setdefault((trend_period(p["day"], grain), p["domain"]), []).append(p)
+    out = []
+    for (period, dom), ps in groups.items():
+        ps.sort(key=lambda p: p["day"]); last = ps[-1]
+        rates = [p["rate"] for p in ps if p["rate"] is not None]
+        out.append({"grain": grain, "period": period, "audit_id": last["audit_id"], "domain": dom,
+                    "project": last["project"], "standard": last["standard"], "rate": last["rate"],
+                    "rate_min": min(rates) if rates else None, "rate_max": max(rates) if rates else None,
+                    "rate_avg": round(sum(rates) / len(rates), 2) if rates else None,
+                    "evidence_coverage": last["evidence_coverage"], "expected_loss": last["expected_loss"],
+                    "n_points": len(ps), "last_day": last["day"]})
+    return out
+
+TREND_UPSERT_SQL = (f"INSERT INTO trend_points({', '.join(TREND_COLS)}) VALUES ({','.join('?' * len(TREND_COLS))}) "
+                    "ON CONFLICT(audit_id, domain, day) DO UPDATE SET "
+                    + ", ".join(f"{c}=excluded.{c}" for c in TREND_COLS if c not in ("audit_id", "domain", "day")))
+
+def record_trend(points: List[Dict[str, Any]], tenant_id: Optional[str] = None) -> int:
+    """Écrit des points (cf. engine.trends) et recalcule les agrégats des périodes touchées, en une transaction."""
+    if not points: return 0
+    con = get_conn(tenant_id)
+    try:
+        with con:
+            con.executemany(TREND_UPSERT_SQL, [[p.get(c) for c in TREND_COLS] for p in points])
+            for grain in TREND_GRAINS:
+                for aid, period in {(p["audit_id"], trend_period(p["day"], grain)) for p in points}:
+                    lo, hi = _period_days(period, grain)
+                    c = con.execute("SELECT " + ", ".join(TREND_COLS) + " FROM trend_points WHERE audit_id=? AND day>=? AND day<?",
+                                    (aid, lo, hi))
+                    rows = trend_rollup_rows([dict(r) for r in c.fetchall()], grain)
+                    con.execute("DELETE FROM trend_rollups WHERE grain=? AND period=? AND audit_id=?", (grain, period, aid))
+                    con.executemany(f"INSERT INTO trend_rollups({', '.join(TREND_ROLLUP_COLS)}) VALUES ({','.join('?' * len(TREND_ROLLUP_COLS))})",
+                                    [[r[k] for k in TREND_ROLLUP_COLS] for r in rows])
+        return len(points)
+    finally:
+        con.close()
+
+TREND_BY = {None: "''", "audit": "audit_id", "project": "COALESCE(project, '')", "standard": "COALESCE(standard, '')",
+            "domain": "domain"}
+
+def trend_sql(grain: str = "month", start: Optional[str] = None, end: Optional[str] = None,
+              project: Optional[str] = None, standard: Optional[str] = None, audit_ids: Optional[Iterable[str]] = None,
+              domain: Optional[str] = "", by: Optional[str] = None) -> tuple:
+    """(sql, params nommés) : une ligne par (période, clé) ; moyenne des audits (taux, couverture), somme des pertes.
+    Paramètres nommés (:p) : utilisable tel quel par sqlite3 et sqlalchemy.text."""
+    if by not in TREND_BY: raise ValueError(f"Regroupement inconnu : {by}")
+    if grain not in ("day",) + TREND_GRAINS: raise ValueError(f"Granularité inconnue : {grain}")
+    if grain == "day":
+        src, per, where, args = "trend_points", "day", [], {}
+    else:
+        src, per, where, args = "trend_rollups", "period", ["grain = :grain"], {"grain": grain}
+    if by == "domain": where.append("domain <> ''")
+    elif domain is not None: where.append("domain = :domain"); args["domain"] = domain
+    if start: where.append(f"{per} >= :start"); args["start"] = trend_period(start, grain)
+    if end: where.append(f"{per} <= :end"); args["end"] = trend_period(end, grain)
+    if project is not None: where.append("project = :project"); args["project"] = project
+    if standard is not None: where.append("standard = :standard"); args["standard"] = standard
+    if audit_ids is not None:
+        ids = list(audit_ids); names = [f"a{i}" for i in range(len(ids))]
+        where.append("audit_id IN (%s)" % (",".join(":" + n for n in names) or "NULL")); args.update(zip(names, ids))
+    sql = (f"SELECT {per} AS period, {TREND_BY[by]} AS key, AVG(rate) AS rate, AVG(evidence_coverage) AS evidence_coverage, "
+           f"SUM(expected_loss) AS expected_loss, COUNT(DISTINCT audit_id) AS n_audits FROM {src}"
+           + (" WHERE " + " AND ".join(where) if where else "") + " GROUP BY 1, 2 ORDER BY 1, 2")
+    return sql, args
+
+TREND_SERIES_COLS = ["period", "key", "rate", "evidence_coverage", "expected_loss", "n_audits"]
 
+def trend_series(grain: str = "month", start: Optional[str] = None, end: Optional[str] = None,
+                 project: Optional[str] = None, standard: Optional[str] = None, audit_ids: Optional[Iterable[str]] = None,
+                 domain: Optional[str] = "", by: Optional[str] = None, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Série agrégée (cf. trend_sql) ; grain = day | month | quarter."""
+    sql, args = trend_sql(grain, start, end, project, standard, audit_ids, domain, by)
+    con = get_conn(tenant_id); c = con.cursor(); c.row_factory = None
+    c.execute(sql, args); rows = c.fetchall(); con.close()
+    return [dict(zip(TREND_SERIES_COLS, r)) for r in rows]
 
+def trend_series_all_tenants(**kw) -> Dict[str, List[Dict[str, Any]]]:
+    """Vue admin multi-clients : une série par shard (interrogés en parallèle)."""
+    if not tenancy.sharding_enabled():
+        return {tenancy.DEFAULT_TENANT: trend_series(**kw)}
+    res = tenancy.fan_out(lambda t: trend_series(tenant_id=t, **kw))
+    return {t: ([] if isinstance(v, Exception) else v) for t, v in res.items()}
@@ -0,0 +1,650 @@
+# storage_backend.py — interface de persistance + implémentations SQLite / SQLAlchemy Core
+# ============================================================
+# - StorageBackend      : contrat commun (réponses, normes, utilisateurs, métadonnées de preuves)
+# - SQLiteBackend       : délègue aux modules historiques storage / norms / auth
+# - SQLAlchemyBackend   : SQLAlchemy Core (pool de connexions, upserts côté serveur)
+#                         pour PostgreSQL (ou SQLite) ⇒ plusieurs réplicas derrière un LB
+# - get_backend()       : singleton ; CYBERPIVOT_DB_URL=postgresql+psycopg://... active SQLAlchemy
+#                         (refusé avec CYBERPIVOT_SHARDING=1 : pas de partition par tenant côté serveur SQL)
+# ============================================================
+
+import os
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import storage
+import norms
+import risk_engine
+import auth
+
+class StorageBackend(ABC):
+    name = "abstract"
+
+    @abstractmethod
+    def init(self) -> None: ...
+
+    # ---- Réponses ----
+    @abstractmethod
+    def upsert_responses(self, audit_id: str, recs: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None) -> int: ...
+    @abstractmethod
+    def write_rows(self, rows: List[Dict[str, Any]], tenant_id: Optional[str] = None) -> int: ...
+    @abstractmethod
+    def list_responses(self, audit_id: str, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def get_response(self, audit_id: str, qid: str, item: str, tenant_id: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+    @abstractmethod
+    def query_responses(self, audit_id: str, columns: Optional[List[str]] = None,
+                        domains: Optional[List[str]] = None, levels: Optional[List[str]] = None,
+                        after: Optional[tuple] = None, limit: Optional[int] = None,
+                        as_frame: bool = False, tenant_id: Optional[str] = None): ...
+    @abstractmethod
+    def list_audits(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def audit_metrics(self, audit_ids: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]: ...
+    @abstractmethod
+    def domain_metrics(self, audit_ids: Optional[Iterable[str]] = None, tenant_id: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]: ...
+
+    @abstractmethod
+    def delete_responses(self, audit_id: str, keys: Optional[Iterable[tuple]] = None, tenant_id: Optional[str] = None) -> int: ...
+    @abstractmethod
+    def changes_since(self, since: int = 0, limit: int = 1000, audit_ids: Optional[Iterable[str]] = None,
+                      tenant_id: Optional[str] = None) -> Dict[str, Any]: ...
+    @abstractmethod
+    def last_change_seq(self, tenant_id: Optional[str] = None) -> int: ...
+
+    def upsert_response(self, audit_id: str, rec: Dict[str, Any], tenant_id: Optional[str] = None) -> None:
+        self.upsert_responses(audit_id, [rec], tenant_id=tenant_id)
+
+    def delete_response(self, audit_id: str, qid: str, item: str, tenant_id: Optional[str] = None) -> bool:
+        return self.delete_responses(audit_id, [(qid, item)], tenant_id=tenant_id) > 0
+
+    # ---- Normes ----
+    @abstractmethod
+    def save_norm(self, tenant_id: str, name: str, df: pd.DataFrame) -> Dict: ...
+    @abstractmethod
+    def list_norms(self, tenant_id: str) -> List[Dict]: ...
+    @abstractmethod
+    def get_norm_df(self, tenant_id: str, name: str) -> Optional[pd.DataFrame]: ...
+    @abstractmethod
+    def get_norm_risk(self, tenant_id: str, name: str) -> Optional[pd.DataFrame]: ...
+    @abstractmethod
+    def delete_norm(self, tenant_id: str, name: str) -> bool: ...
+
+    # ---- Utilisateurs ----
+    @abstractmethod
+    def create_user(self, email: str, password: Optional[str], full_name: str = "", role: str = "user",
+                    tenant_id: str = "default", is_active: bool = True) -> Dict[str, Any]: ...
+    @abstractmethod
+    def get_user(self, email: str) -> Optional[Dict[str, Any]]: ...
+    @abstractmethod
+    def list_users(self) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def set_password(self, email: str, new_password: str) -> None: ...
+    @abstractmethod
+    def update_user_profile(self, email: str, full_name: Optional[str] = None, tenant_id: Optional[str] = None) -> None: ...
+
+    def user_exists(self, email: str) -> bool:
+        return self.get_user(email) is not None
+
+    def verify_password(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+        u = self.get_user(email)
+        if not u or not u["is_active"] or u["pwd_hash"] is None: return None
+        try: ok = auth.bcrypt.verify(password, u["pwd_hash"])
+        except Exception: ok = False
+        return u if ok else None
+
+    def get_or_create_user(self, email: str, full_name: Optional[str] = None,
+                           role: str = "user", tenant_id: str = "default") -> Dict[str, Any]:
+        email = (email or "").strip().lower()
+        u = self.get_user(email)
+        if u: return u
+        return self.create_user(email=email, password=None, full_name=full_name or email,
+                                role=role, tenant_id=tenant_id, is_active=True)
+
+    # ---- Preuves (métadonnées) ----
+    @abstractmethod
+    def add_evidence(self, audit_id: str, qid: str, item: str, name: str, path: str,
+                     sha256: str = "", size: int = 0, tenant_id: Optional[str] = None) -> None: ...
+    @abstractmethod
+    def add_evidence_many(self, rows: Iterable[Dict[str, Any]], tenant_id: Optional[str] = None) -> int: ...
+    @abstractmethod
+    def list_evidence(self, audit_id: str, qid: Optional[str] = None, item: Optional[str] = None,
+                      tenant_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def delete_evidence(self, audit_id: str, qid: str, item: str, name: str, tenant_id: Optional[str] = None) -> bool: ...
+
+    # ---- Instantanés (index) ----
+    @abstractmethod
+    def add_snapshot(self, row: Dict[str, Any], tenant_id: Optional[str] = None) -> bool: ...
+    @abstractmethod
+    def list_snapshots(self, audit_id: Optional[str] = None, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def get_snapshot(self, snapshot_id: str, tenant_id: Optional[str] = None) -> Optional[Dict[str, Any]]: ...
+
+    # ---- Métadonnées d'audit / tendances ----
+    @abstractmethod
+    def set_audit_meta(self, audit_id: str, project: Optional[str] = None, standard: Optional[str] = None,
+                       tenant_id: Optional[str] = None) -> None: ...
+    @abstractmethod
+    def get_audit_meta(self, audit_id: str, tenant_id: Optional[str] = None) -> Dict[str, Any]: ...
+    @abstractmethod
+    def record_trend(self, points: List[Dict[str, Any]], tenant_id: Optional[str] = None) -> int: ...
+    @abstractmethod
+    def trend_series(self, grain: str = "month", start: Optional[str] = None, end: Optional[str] = None,
+                     project: Optional[str] = None, standard: Optional[str] = None,
+                     audit_ids: Optional[Iterable[str]] = None, domain: Optional[str] = "", by: Optional[str] = None,
+                     tenant_id: Optional[str] = None) -> List[Dict[str, Any]]: ...
+
+# ============================================================
+# SQLite (modules existants)
+# ============================================================
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def init(self) -> None:
+        auth.init_auth_db(); storage.init_db(); norms.init_norms_db()
+
+    def upsert_responses(self, audit_id, recs, tenant_id=None): return storage.upsert_responses(audit_id, recs, tenant_id=tenant_id)
+    def write_rows(self, rows, tenant_id=None): return storage.write_rows(rows, tenant_id=tenant_id)
+    def list_responses(self, audit_id, tenant_id=None): return list(storage.list_responses(audit_id, tenant_id=tenant_id))
+    def get_response(self, audit_id, qid, item, tenant_id=None): return storage.get_response(audit_id, qid, item, tenant_id=tenant_id)
+    def list_audits(self, tenant_id=None): return storage.list_audits(tenant_id)
+    def audit_metrics(self, audit_ids=None, tenant_id=None): return storage.audit_metrics(audit_ids, tenant_id=tenant_id)
+    def domain_metrics(self, audit_ids=None, tenant_id=None): return storage.domain_metrics(audit_ids, tenant_id=tenant_id)
+    def query_responses(self, audit_id, columns=None, domains=None, levels=None, after=None, limit=None,
+                        as_frame=False, tenant_id=None):
+        return storage.query_responses(audit_id, columns=columns, domains=domains, levels=levels, after=after,
+                                       limit=limit, as_frame=as_frame, tenant_id=tenant_id)
+    def delete_responses(self, audit_id, keys=None, tenant_id=None): return storage.delete_responses(audit_id, keys, tenant_id=tenant_id)
+    def changes_since(self, since=0, limit=1000, audit_ids=None, tenant_id=None):
+        return storage.changes_since(since, limit, audit_ids, tenant_id=tenant_id)
+    def last_change_seq(self, tenant_id=None): return storage.last_change_seq(tenant_id)
+
+    def save_norm(self, tenant_id, name, df): return norms.save_norm(tenant_id, name, df)
+    def list_norms(self, tenant_id): return norms.list_norms(tenant_id)
+    def get_norm_df(self, tenant_id, name): return norms.get_norm_df(tenant_id, name)
+    def get_norm_risk(self, tenant_id, name): return norms.get_norm_risk(tenant_id, name)
+    def delete_norm(self, tenant_id, name): return norms.delete_norm(tenant_id, name)
+
+    def create_user(self, email, password, full_name="", role="user", tenant_id="default", is_active=True):
+        return auth.create_user(email=email, password=password, full_name=full_name, role=role,
+                                tenant_id=tenant_id, is_active=is_active)
+    def get_user(self, email): return auth.get_user(email)
+    def list_users(self): return auth.list_users()
+    def set_password(self, email, new_password): auth.set_password(email, new_password)
+    def update_user_profile(self, email, full_name=None, tenant_id=None):
+        auth.update_user_profile(email, full_name=full_name, tenant_id=tenant_id)
+    def verify_password(self, email, password): return auth.verify_password(email, password)
+
+    def add_evidence(self, audit_id, qid, item, name, path, sha256="", size=0, tenant_id=None):
+        storage.add_evidence(audit_id, qid, item, name, path, sha256=sha256, size=size, tenant_id=tenant_id)
+    def add_evidence_many(self, rows, tenant_id=None): return storage.add_evidence_many(rows, tenant_id=tenant_id)
+    def list_evidence(self, audit_id, qid=None, item=None, tenant_id=None):
+        return storage.list_evidence(audit_id, qid=qid, item=item, tenant_id=tenant_id)
+    def delete_evidence(self, audit_id, qid, item, name, tenant_id=None):
+        return storage.delete_evidence(audit_id, qid, item, name, tenant_id=tenant_id)
+
+    def add_snapshot(self, row, tenant_id=None): return storage.add_snapshot(row, tenant_id=tenant_id)
+    def list_snapshots(self, audit_id=None, tenant_id=None): return storage.list_snapshots(audit_id, tenant_id=tenant_id)
+    def get_snapshot(self, snapshot_id, tenant_id=None): return storage.get_snapshot(snapshot_id, tenant_id=tenant_id)
+
+    def set_audit_meta(self, audit_id, project=None, standard=None, tenant_id=None):
+        storage.set_audit_meta(audit_id, project, standard, tenant_id=tenant_id)
+    def get_audit_meta(self, audit_id, tenant_id=None): return storage.get_audit_meta(audit_id, tenant_id=tenant_id)
+    def record_trend(self, points, tenant_id=None): return storage.record_trend(points, tenant_id=tenant_id)
+    def trend_series(self, grain="month", start=None, end=None, project=None, standard=None, audit_ids=None,
+                     domain="", by=None, tenant_id=None):
+        return storage.trend_series(grain, start, end, project, standard, audit_ids, domain, by, tenant_id=tenant_id)
+
+# ============================================================
+# SQLAlchemy Core (PostgreSQL / SQLite)
+# ============================================================
+class SQLAlchemyBackend(StorageBackend):
+    """Même schéma que les bases SQLite ; tenant_id n'y sert qu'aux normes/utilisateurs
+    (un serveur SQL gère lui-même la concurrence d'écriture, pas besoin de shards)."""
+    name = "sqlalchemy"
+
+    DIALECTS = ("postgresql", "sqlite")  # upserts ON CONFLICT (dialectes sqlalchemy.dialects.*.insert)
+    CHANGE_LOG_LOCK = 0x43505243  # clé pg_advisory_xact_lock du journal response_changes (« CPRC »)
+
+    def __init__(self, url: str, pool_size: int = 10, max_overflow: int = 20):
+        import sqlalchemy as sa
+        self.sa = sa
+        dialect = sa.engine.make_url(url).get_backend_name()
+        if dialect not in self.DIALECTS:
+            raise ValueError(f"CYBERPIVOT_DB_URL : dialecte « {dialect} » non supporté (attendu : {', '.join(self.DIALECTS)})")
+        kw: Dict[str, Any] = {"pool_pre_ping": True}
+        if url.startswith("sqlite"):
+            from sqlalchemy.pool import StaticPool
+            kw.update(connect_args={"check_same_thread": False})
+            if ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"):
+                kw["poolclass"] = StaticPool
+        else:
+            kw.update(pool_size=pool_size, max_overflow=max_overflow)
+        self.engine = sa.create_engine(url, **kw)
+        md = self.md = sa.MetaData()
+        self.responses = sa.Table(
+            "responses", md,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("audit_id", sa.Text, nullable=False), sa.Column("domain", sa.Text, nullable=False),
+            sa.Column("qid", sa.Text, nullable=False), sa.Column("item", sa.Text, nullable=False),
+            sa.Column("question", sa.Text), sa.Column("level", sa.Text), sa.Column("score", sa.Float),
+            sa.Column("criterion", sa.Text), sa.Column("recommendation", sa.Text), sa.Column("comment", sa.Text),
+            sa.Column("evidence_json", sa.Text), sa.Column("updated_at", sa.Text, nullable=False),
+            sa.UniqueConstraint("audit_id", "qid", "item", name="uniq_responses_aqi"),
+            sa.Index("idx_responses_adqi", "audit_id", "domain", "qid", "item"),
+            sa.Index("idx_responses_updated", "updated_at"),
+        )
+        self.changes = sa.Table(
+            "response_changes", md,
+            sa.Column("seq", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("audit_id", sa.Text, nullable=False), sa.Column("qid", sa.Text, nullable=False),
+            sa.Column("item", sa.Text, nullable=False), sa.Column("op", sa.Text, nullable=False),
+            sa.Column("data", sa.Text), sa.Column("changed_at", sa.Text, nullable=False),
+            sa.Index("idx_changes_audit_seq", "audit_id", "seq"),
+        )
+        self.norms = sa.Table(
+            "norms", md,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("tenant_id", sa.Text, nullable=False), sa.Column("name", sa.Text, nullable=False),
+            sa.Column("data_json", sa.Text, nullable=False),
+            sa.Column("created_at", sa.Text, nullable=False), sa.Column("updated_at", sa.Text, nullable=False),
+            sa.Column("risk_json", sa.Text), sa.Column("risk_model", sa.Text),
+            sa.UniqueConstraint("tenant_id", "name"),
+        )
+        self.users = sa.Table(
+            "users", md,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("email", sa.Text, unique=True, nullable=False),
+            sa.Column("full_name", sa.Text, server_default=""), sa.Column("role", sa.Text, server_default="user"),
+            sa.Column("tenant_id", sa.Text, server_default="default"), sa.Column("is_active", sa.Integer, server_default="1"),
+            sa.Column("pwd_hash", sa.Text), sa.Column("created_at", sa.Text),
+        )
+        self.evidence = sa.Table(
+            "evidence", md,
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=True),
+            sa.Column("audit_id", sa.Text, nullable=False), sa.Column("qid", sa.Text, nullable=False),
+            sa.Column("item", sa.Text, nullable=False), sa.Column("name", sa.Text, nullable=False),
+            sa.Column("path", sa.Text, nullable=False), sa.Column("sha256", sa.Text),
+            sa.Column("bytes", sa.Integer), sa.Column("created_at", sa.Text, nullable=False),
+            sa.UniqueConstraint("audit_id", "qid", "item", "name"),
+        )
+        self.snapshots = sa.Table(
+            "snapshots", md,
+            sa.Column("snapshot_id", sa.Text, primary_key=True), sa.Column("audit_id", sa.Text, nullable=False),
+            sa.Column("label", sa.Text), sa.Column("path", sa.Text, nullable=False), sa.Column("sha256", sa.Text, nullable=False),
+            sa.Column("n_controls", sa.Integer, nullable=False), sa.Column("rate", sa.Integer), sa.Column("bytes", sa.Integer),
+            sa.Column("created_at", sa.Text, nullable=False),
+            sa.Index("idx_snapshots_audit", "audit_id", "created_at"),
+        )
+        self.audit_meta = sa.Table(
+            "audit_meta", md,
+            sa.Column("audit_id", sa.Text, primary_key=True), sa.Column("project", sa.Text), sa.Column("standard", sa.Text),
+            sa.Column("updated_at", sa.Text, nullable=False),
+        )
+        self.trends = sa.Table(
+            "trend_points", md,
+            sa.Column("audit_id", sa.Text, primary_key=True), sa.Column("domain", sa.Text, primary_key=True),
+            sa.Column("day", sa.Text, primary_key=True), sa.Column("ts", sa.Text, nullable=False),
+            sa.Column("source", sa.Text), sa.Column("project", sa.Text), sa.Column("standard", sa.Text),
+            sa.Column("n_total", sa.Integer), sa.Column("n_applicable", sa.Integer), sa.Column("rate", sa.Float),
+            sa.Column("evidence_coverage", sa.Float), sa.Column("expected_loss", sa.Float),
+            sa.Index("idx_trend_points_day", "domain", "day"),
+        )
+        self.trend_rollups = sa.Table(
+            "trend_rollups", md,
+            sa.Column("grain", sa.Text, primary_key=True), sa.Column("period", sa.Text, primary_key=True),
+            sa.Column("audit_id", sa.Text, primary_key=True), sa.Column("domain", sa.Text, primary_key=True),
+            sa.Column("project", sa.Text), sa.Column("standard", sa.Text), sa.Column("rate", sa.Float),
+            sa.Column("rate_min", sa.Float), sa.Column("rate_max", sa.Float), sa.Column("rate_avg", sa.Float),
+            sa.Column("evidence_coverage", sa.Float), sa.Column("expected_loss", sa.Float),
+            sa.Column("n_points", sa.Integer, nullable=False), sa.Column("last_day", sa.Text, nullable=False),
+            sa.Index("idx_trend_rollups_period", "grain", "domain", "period"),
+        )
+
+    def _insert(self, table):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:  # sqlite (dialecte vérifié dans __init__)
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(table)
+
+    def _lock_changes(self, cx) -> None:
+        # Postgres : les seq de response_changes sont attribués à l'insertion mais visibles au commit ;
+        # deux transactions concurrentes peuvent donc publier 42 après 43 et un lecteur de changes_since
+        # sauterait 42. Verrou consultatif de transaction : les écritures du journal se sérialisent
+        # et l'ordre des seq suit l'ordre des commits (SQLite : écrivain unique par construction).
+        if self.engine.dialect.name == "postgresql":
+            cx.execute(self.sa.text("SELECT pg_advisory_xact_lock(:k)"), {"k": self.CHANGE_LOG_LOCK})
+
+    def _upsert(self, table, keys: List[str], update: List[str]):
+        ins = self._insert(table)
+        return ins.on_conflict_do_update(index_elements=keys, set_={c: ins.excluded[c] for c in update})
+
+    def init(self) -> None:
+        self.md.create_all(self.engine)
+        have = {c["name"] for c in self.sa.inspect(self.engine).get_columns("norms")}
+        with self.engine.begin() as cx:
+            for col in ("risk_json", "risk_model"):
+                if col not in have: cx.execute(self.sa.text(f"ALTER TABLE norms ADD COLUMN {col} TEXT"))
+            cx.execute(self.sa.text(storage.UPDATED_AT_INDEX_SQL))  # bases créées avant l'index
+            n = cx.execute(self.sa.select(self.sa.func.count()).select_from(self.users)).scalar()
+            if n == 0:
+                cx.execute(self.users.insert().values(
+                    email="admin@local", full_name="Admin", role="admin", tenant_id="default",
+                    is_active=1, pwd_hash=auth.bcrypt.hash("admin"), created_at=datetime.utcnow().isoformat()))
+
+    # ---- Réponses ----
+    def upsert_responses(self, audit_id, recs, tenant_id=None):
+        now = storage._now()
+        return self.write_rows([storage.response_row(audit_id, r, now) for r in recs], tenant_id=tenant_id)
+
+    def write_rows(self, rows, tenant_id=None):
+        if not rows: return 0
+        stmt = self._upsert(self.responses, ["audit_id", "qid", "item"],
+                            [c for c in storage.DEST_COLS if c not in ("id", "audit_id", "qid", "item", "domain")])
+        keys = ["audit_id", "qid", "item", "op", "data", "changed_at"]
+        with self.engine.begin() as cx:
+            self._lock_changes(cx)
+            cx.execute(stmt, rows)
+            cx.execute(self.changes.insert(), [dict(zip(keys, storage.change_params(r))) for r in rows])
+        return len(rows)
+
+    def delete_responses(self, audit_id, keys=None, tenant_id=None):
+        t = self.responses; sa = self.sa
+        q = sa.select(t.c.qid, t.c.item).where(t.c.audit_id == audit_id)
+        if keys is not None:
+            ks = list({(str(a), str(b)) for a, b in keys})
+            if not ks: return 0
+            q = q.where(sa.tuple_(t.c.qid, t.c.item).in_(ks))
+        now = storage._now()
+        with self.engine.begin() as cx:
+            self._lock_changes(cx)
+            found = [tuple(r) for r in cx.execute(q)]
+            if not found: return 0
+            cx.execute(t.delete().where(t.c.audit_id == audit_id, sa.tuple_(t.c.qid, t.c.item).in_(found)))
+            cx.execute(self.changes.insert(), [{"audit_id": audit_id, "qid": a, "item": b, "op": "delete",
+                                                "data": None, "changed_at": now} for a, b in found])
+        return len(found)
+
+    def changes_since(self, since=0, limit=1000, audit_ids=None, tenant_id=None):
+        c = self.changes
+        q = self.sa.select(*[c.c[k] for k in storage.CHANGE_COLS]).where(c.c.seq > int(since))
+        if audit_ids is not None: q = q.where(c.c.audit_id.in_(list(audit_ids)))
+        with self.engine.connect() as cx:
+            out = [storage.change_record(tuple(r)) for r in cx.execute(q.order_by(c.c.seq).limit(int(limit)))]
+        return {"changes": out, "next": out[-1]["seq"] if out else int(since), "has_more": len(out) == int(limit)}
+
+    def last_change_seq(self, tenant_id=None):
+        with self.engine.connect() as cx:
+            return int(cx.execute(self.sa.select(self.sa.func.coalesce(self.sa.func.max(self.changes.c.seq), 0))).scalar())
+
+    def list_responses(self, audit_id, tenant_id=None):
+        t = self.responses
+        q = self.sa.select(t).where(t.c.audit_id == audit_id).order_by(t.c.domain, t.c.qid, t.c.item)
+        with self.engine.connect() as cx:
+            return [dict(r._mapping) for r in cx.execute(q)]
+
+    def get_response(self, audit_id, qid, item, tenant_id=None):
+        t = self.responses
+        q = self.sa.select(t).where(t.c.audit_id == audit_id, t.c.qid == qid, t.c.item == item).limit(1)
+        with self.engine.connect() as cx:
+            r = cx.execute(q).first()
+        return dict(r._mapping) if r else None
+
+    def query_responses(self, audit_id, columns=None, domains=None, levels=None, after=None, limit=None,
+                        as_frame=False, tenant_id=None):
+        t = self.responses; sa = self.sa
+        cols = list(columns) if columns else list(storage.DEST_COLS)
+        bad = [c for c in cols if c not in storage.DEST_COLS]
+        if bad: raise ValueError(f"Colonnes inconnues : {bad}")
+        q = sa.select(*[t.c[c] for c in cols]).where(t.c.audit_id == audit_id)
+        if domains: q = q.where(t.c.domain.in_(list(domains)))
+        if levels: q = q.where(t.c.level.in_(list(levels)))
+        if after is not None: q = q.where(sa.tuple_(t.c.domain, t.c.qid, t.c.item) > sa.tuple_(*after))
+        q = q.order_by(t.c.domain, t.c.qid, t.c.item)
+        if limit is not None: q = q.limit(int(limit))
+        with self.engine.connect() as cx:
+            rows = cx.execute(q).fetchall()
+        if as_frame:
+            return pd.DataFrame.from_records(rows, columns=cols)
+        return [dict(zip(cols, r)) for r in rows]
+
+    def _grouped_counts(self, audit_ids, by_domain: bool):
+        # pas de table matérialisée côté serveur : agrégat groupé direct (index audit_id, domain, ...)
+        t = self.responses; sa = self.sa
+        lv = sa.func.lower(sa.func.trim(sa.func.coalesce(t.c.level, "")))
+        lc = sa.case((lv.in_(["conforme", "yes"]), "c"),
+                     (lv.in_(["partiellement conforme", "partial", "partially compliant"]), "pc"),
+                     (lv.in_(["non conforme", "no"]), "nc"), else_="na")
+        ev = sa.case((sa.func.coalesce(t.c.evidence_json, "").in_(["", "[]", "{}", "null"]), 0), else_=1)
+        n = lambda k: sa.func.sum(sa.case((lc == k, 1), else_=0))
+        keys = [t.c.audit_id, t.c.domain] if by_domain else [t.c.audit_id]
+        q = sa.select(*keys, sa.func.count(), n("c"), n("pc"), n("nc"), n("na"), sa.func.sum(ev)).group_by(*keys).order_by(*keys)
+        if audit_ids is not None: q = q.where(t.c.audit_id.in_(list(audit_ids)))
+        with self.engine.connect() as cx:
+            return [tuple(int(v) if i >= len(keys) else v for i, v in enumerate(r)) for r in cx.execute(q)]
+
+    def audit_metrics(self, audit_ids=None, tenant_id=None):
+        return {r[0]: storage._metrics(*r[1:]) for r in self._grouped_counts(audit_ids, False)}
+
+    def domain_metrics(self, audit_ids=None, tenant_id=None):
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for r in self._grouped_counts(audit_ids, True):
+            out.setdefault(r[0], {})[r[1]] = storage._metrics(*r[2:])
+        return out
+
+    def list_audits(self, tenant_id=None):
+        t = self.responses; sa = self.sa
+        q = (sa.select(t.c.audit_id, sa.func.count().label("n_responses"), sa.func.max(t.c.updated_at).label("updated_at"))
+             .group_by(t.c.audit_id).order_by(t.c.audit_id))
+        with self.engine.connect() as cx:
+            return [dict(r._mapping) for r in cx.execute(q)]
+
+    # ---- Normes ----
+    def save_norm(self, tenant_id, name, df):
+        name = (name or "").strip()
+        if not name: raise ValueError("Nom de la norme requis.")
+        d = norms._normalize_columns(df)
+        payload = json.dumps(norms._records(d), ensure_ascii=False)
+        now = datetime.utcnow().isoformat(); t = self.norms
+        stmt = self._upsert(t, ["tenant_id", "name"], ["data_json", "updated_at", "risk_json", "risk_model"])
+        with self.engine.begin() as cx:
+            cx.execute(stmt, {"tenant_id": tenant_id, "name": name, "data_json": payload, "created_at": now, "updated_at": now,
+                              "risk_json": norms._risk_json(d), "risk_model": risk_engine.MODEL_VERSION})
+            r = cx.execute(self.sa.select(t.c.id, t.c.tenant_id, t.c.name, t.c.created_at, t.c.updated_at)
+                           .where(t.c.tenant_id == tenant_id, t.c.name == name)).first()
+        return dict(r._mapping)
+
+    def list_norms(self, tenant_id):
+        t = self.norms
+        q = self.sa.select(t.c.id, t.c.name, t.c.created_at, t.c.updated_at).where(t.c.tenant_id == tenant_id).order_by(t.c.name)
+        with self.engine.connect() as cx:
+            return [dict(r._mapping) for r in cx.execute(q)]
+
+    def get_norm_df(self, tenant_id, name):
+        t = self.norms
+        q = self.sa.select(t.c.data_json).where(t.c.tenant_id == tenant_id, t.c.name == (name or "").strip())
+        with self.engine.connect() as cx:
+            raw = cx.execute(q).scalar()
+        if raw is None: return None
+        try: return norms._normalize_columns(pd.DataFrame(json.loads(raw)))
+        except Exception: return None
+
+    def get_norm_risk(self, tenant_id, name):
+        t = self.norms; name = (name or "").strip()
+        q = self.sa.select(t.c.data_json, t.c.risk_json, t.c.risk_model).where(t.c.tenant_id == tenant_id, t.c.name == name)
+        with self.engine.connect() as cx:
+            r = cx.execute(q).first()
+        if r is None: return None
+        out, fresh = norms._norm_risk(*r)
+        if fresh is not None:
+            with self.engine.begin() as cx:
+                cx.execute(t.update().where(t.c.tenant_id == tenant_id, t.c.name == name)
+                           .values(risk_json=fresh, risk_model=risk_engine.MODEL_VERSION))
+        return out
+
+    def delete_norm(self, tenant_id, name):
+        t = self.norms
+        with self.engine.begin() as cx:
+            res = cx.execute(t.delete().where(t.c.tenant_id == tenant_id, t.c.name == (name or "").strip()))
+        return res.rowcount > 0
+
+    # ---- Utilisateurs ----
+    def _user(self, r) -> Dict[str, Any]:
+        m = r._mapping
+        return {"id": m["id"], "email": m["email"], "full_name": m["full_name"], "role": m["role"],
+                "tenant_id": m["tenant_id"], "is_active": bool(m["is_active"]), "pwd_hash": m["pwd_hash"],
+                "created_at": m["created_at"]}
+
+    def create_user(self, email, password, full_name="", role="user", tenant_id="default", is_active=True):
+        email = (email or "").strip().lower()
+        if not email: raise ValueError("Email requis")
+        with self.engine.begin() as cx:
+            cx.execute(self.users.insert().values(
+                email=email, full_name=full_name or email, role=role or "user", tenant_id=tenant_id or "default",
+                is_active=1 if is_active else 0, pwd_hash=auth.bcrypt.hash(password) if password else None,
+                created_at=datetime.utcnow().isoformat()))
+        return self.get_user(email)
+
+    def get_user(self, email):
+        t = self.users
+        with self.engine.connect() as cx:
+            r = cx.execute(self.sa.select(t).where(t.c.email == (email or "").strip().lower())).first()
+        return self._user(r) if r else None
+
+    def list_users(self):
+        t = self.users
+        with self.engine.connect() as cx:
+            return [self._user(r) for r in cx.execute(self.sa.select(t).order_by(t.c.created_at.desc()))]
+
+    def _update_user(self, email, **values):
+        t = self.users
+        with self.engine.begin() as cx:
+            cx.execute(t.update().where(t.c.email == (email or "").strip().lower()).values(**values))
+
+    def set_password(self, email, new_password):
+        if not new_password: raise ValueError("Mot de passe requis")
+        self._update_user(email, pwd_hash=auth.bcrypt.hash(new_password))
+
+    def update_user_profile(self, email, full_name=None, tenant_id=None):
+        vals = {k: v for k, v in {"full_name": full_name, "tenant_id": tenant_id}.items() if v is not None}
+        if vals: self._update_user(email, **vals)
+
+    # ---- Preuves ----
+    def add_evidence(self, audit_id, qid, item, name, path, sha256="", size=0, tenant_id=None):
+        self.add_evidence_many([{"audit_id": audit_id, "qid": qid, "item": item, "name": name, "path": path,
+                                 "sha256": sha256, "bytes": size}])
+
+    def add_evidence_many(self, rows, tenant_id=None):
+        now = storage._now()
+        params = [{"audit_id": r["audit_id"], "qid": r["qid"], "item": r["item"], "name": r["name"], "path": r["path"],
+                   "sha256": r.get("sha256", ""), "bytes": int(r.get("bytes") or 0), "created_at": r.get("created_at") or now}
+                  for r in rows]
+        if not params: return 0
+        stmt = self._upsert(self.evidence, ["audit_id", "qid", "item", "name"], ["path", "sha256", "bytes"])
+        with self.engine.begin() as cx:
+            cx.execute(stmt, params)
+        return len(params)
+
+    def list_evidence(self, audit_id, qid=None, item=None, tenant_id=None):
+        t = self.evidence
+        q = self.sa.select(*[t.c[c] for c in storage.EVIDENCE_COLS]).where(t.c.audit_id == audit_id)
+        if qid is not None: q = q.where(t.c.qid == qid)
+        if item is not None: q = q.where(t.c.item == item)
+        with self.engine.connect() as cx:
+            return [dict(r._mapping) for r in cx.execute(q.order_by(t.c.qid, t.c.item, t.c.name))]
+
+    def delete_evidence(self, audit_id, qid, item, name, tenant_id=None):
+        t = self.evidence
+        with self.engine.begin() as cx:
+            res = cx.execute(t.delete().where(t.c.audit_id == audit_id, t.c.qid == qid, t.c.item == item, t.c.name == name))
+        return res.rowcount > 0
+
+    # ---- Instantanés (index) ----
+    def add_snapshot(self, row, tenant_id=None):
+        stmt = self._insert(self.snapshots).on_conflict_do_nothing(index_elements=["snapshot_id"])
+        with self.engine.begin() as cx:
+            res = cx.execute(stmt, {c: row.get(c) for c in storage.SNAPSHOT_COLS})
+        return res.rowcount > 0
+
+    def list_snapshots(self, audit_id=None, tenant_id=None):
+        t = self.snapshots
+        q = self.sa.select(*[t.c[c] for c in storage.SNAPSHOT_COLS])
+        if audit_id is not None: q = q.where(t.c.audit_id == audit_id)
+        with self.engine.connect() as cx:
+            return [dict(r._mapping) for r in cx.execute(q.order_by(t.c.audit_id, t.c.created_at.desc()))]
+
+    def get_snapshot(self, snapshot_id, tenant_id=None):
+        t = self.snapshots
+        with self.engine.connect() as cx:
+            r = cx.execute(self.sa.select(*[t.c[c] for c in storage.SNAPSHOT_COLS]).where(t.c.snapshot_id == snapshot_id)).first()
+        return dict(r._mapping) if r else None
+
+    # ---- Métadonnées d'audit / tendances ----
+    def set_audit_meta(self, audit_id, project=None, standard=None, tenant_id=None):
+        t = self.audit_meta; ins = self._insert(t)
+        stmt = ins.on_conflict_do_update(index_elements=["audit_id"], set_={
+            "project": self.sa.func.coalesce(ins.excluded.project, t.c.project),
+            "standard": self.sa.func.coalesce(ins.excluded.standard, t.c.standard), "updated_at": ins.excluded.updated_at})
+        with self.engine.begin() as cx:
+            cx.execute(stmt, {"audit_id": audit_id, "project": project, "standard": standard, "updated_at": storage._now()})
+
+    def get_audit_meta(self, audit_id, tenant_id=None):
+        t = self.audit_meta
+        with self.engine.connect() as cx:
+            r = cx.execute(self.sa.select(*[t.c[c] for c in storage.AUDIT_META_COLS]).where(t.c.audit_id == audit_id)).first()
+        return dict(r._mapping) if r else {"audit_id": audit_id, "project": None, "standard": None, "updated_at": None}
+
+    def record_trend(self, points, tenant_id=None):
+        if not points: return 0
+        t, ru = self.trends, self.trend_rollups
+        stmt = self._upsert(t, ["audit_id", "domain", "day"], [c for c in storage.TREND_COLS if c not in ("audit_id", "domain", "day")])
+        with self.engine.begin() as cx:
+            cx.execute(stmt, [{c: p.get(c) for c in storage.TREND_COLS} for p in points])
+            for grain in storage.TREND_GRAINS:
+                for aid, period in {(p["audit_id"], storage.trend_period(p["day"], grain)) for p in points}:
+                    lo, hi = storage._period_days(period, grain)
+                    rows = [dict(r._mapping) for r in cx.execute(
+                        self.sa.select(*[t.c[c] for c in storage.TREND_COLS]).where(t.c.audit_id == aid, t.c.day >= lo, t.c.day < hi))]
+                    cx.execute(ru.delete().where(ru.c.grain == grain, ru.c.period == period, ru.c.audit_id == aid))
+                    agg = storage.trend_rollup_rows(rows, grain)
+                    if agg: cx.execute(ru.insert(), agg)
+        return len(points)
+
+    def trend_series(self, grain="month", start=None, end=None, project=None, standard=None, audit_ids=None,
+                     domain="", by=None, tenant_id=None):
+        sql, args = storage.trend_sql(grain, start, end, project, standard, audit_ids, domain, by)
+        with self.engine.connect() as cx:
+            return [dict(zip(storage.TREND_SERIES_COLS, r)) for r in cx.execute(self.sa.text(sql), args)]
+
+# ============================================================
+# Sélection
+# ============================================================
+_BACKEND: Optional[StorageBackend] = None
+_BACKEND_LOCK = threading.Lock()
+
+def make_backend(url: Optional[str] = None) -> StorageBackend:
+    url = url if url is not None else os.getenv("CYBERPIVOT_DB_URL", "")
+    if url:
+        import tenancy
+        if tenancy.sharding_enabled():
+            # Schéma SQLAlchemy sans partition par tenant (réponses, preuves, instantanés, tendances) :
+            # refuser plutôt que fusionner silencieusement les données de tous les clients
+            raise ValueError("CYBERPIVOT_DB_URL et CYBERPIVOT_SHARDING=1 sont incompatibles : "
+                             "un serveur SQL ne partitionne pas les audits par tenant (désactiver l'un des deux).")
+        return SQLAlchemyBackend(url, pool_size=int(os.getenv("CYBERPIVOT_DB_POOL", "10")))
+    return SQLiteBackend()
+
+def get_backend() -> StorageBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                _BACKEND = make_backend()
+    return _BACKEND
@@ -0,0 +1,94 @@
+# tenancy.py — routage multi-tenant des bases SQLite (un fichier par tenant)
+# ============================================================
+# - sharding_enabled()              : CYBERPIVOT_SHARDING=1 active le mode "un tenant = un fichier"
+# - resolve(kind, tenant, default)  : tenant_id -> chemin du fichier SQLite ("storage" | "norms")
+# - list_tenants()                  : tenants (identifiants réels) ayant au moins une base sur disque
+#
+# Dossier d'un shard = slug lisible + empreinte courte de l'identifiant réel (« acme-corp-1f2e3d4c5b ») :
+# « Acme Corp » et « acme-corp » ont chacun leur shard. L'identifiant réel est enregistré dans
+# tenant.json à la création.
+# - fan_out(fn, tenants)            : exécute fn(tenant_id) en parallèle (requêtes admin cross-tenant)
+#
+# Sans sharding, resolve() renvoie le chemin historique (cyberpivot.db / norms.db) :
+# le comportement mono-fichier reste celui par défaut. auth.db reste partagé
+# (c'est l'annuaire qui donne le tenant d'un utilisateur).
+# ============================================================
+
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+TENANTS_DIR = os.getenv("CYBERPIVOT_TENANTS_DIR", os.path.join("data", "tenants"))
+DEFAULT_TENANT = "default"
+DB_FILES = {"storage": "cyberpivot.db", "norms": "norms.db"}
+
+def sharding_enabled() -> bool:
+    return os.getenv("CYBERPIVOT_SHARDING", "0") == "1"
+
+def safe_tenant(tenant_id: Optional[str]) -> str:
+    s = (tenant_id or "").strip().lower()
+    ok = "".join(ch if ch.isalnum() or ch in "-_." else "-" for ch in s).strip("-_.")
+    return ok or DEFAULT_TENANT
+
+TENANT_FILE = "tenant.json"
+
+def tenant_key(tenant_id: Optional[str]) -> str:
+    """Identifiant réel (seuls les espaces de bord sont retirés)."""
+    return (tenant_id or "").strip() or DEFAULT_TENANT
+
+def shard_name(tenant_id: Optional[str]) -> str:
+    k = tenant_key(tenant_id)
+    return f"{safe_tenant(k)}-{hashlib.sha1(k.encode('utf-8')).hexdigest()[:10]}"
+
+def tenant_dir(tenant_id: Optional[str]) -> str:
+    return os.path.join(TENANTS_DIR, shard_name(tenant_id))
+
+def shard_path(kind: str, tenant_id: Optional[str]) -> str:
+    if kind not in DB_FILES:
+        raise ValueError(f"Type de base inconnu : {kind}")
+    return os.path.join(tenant_dir(tenant_id), DB_FILES[kind])
+
+def resolve(kind: str, tenant_id: Optional[str], default_path: str) -> str:
+    if not sharding_enabled():
+        return default_path
+    p = shard_path(kind, tenant_id); d = os.path.dirname(p)
+    if not os.path.isdir(d):
+        os.makedirs(d, exist_ok=True)
+        # nom unique : deux premiers resolve concurrents (UI, write_queue, trends) écrivent chacun le leur
+        tmp = os.path.join(d, f"{TENANT_FILE}.{os.getpid()}.{threading.get_ident()}.part")
+        with open(tmp, "w", encoding="utf-8") as f: json.dump({"tenant_id": tenant_key(tenant_id)}, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(d, TENANT_FILE))
+    return p
+
+def shard_tenant(d: str) -> str:
+    """Identifiant réel d'un dossier de shard (nom du dossier si tenant.json est absent)."""
+    try:
+        with open(os.path.join(d, TENANT_FILE), encoding="utf-8") as f: return json.load(f)["tenant_id"]
+    except (OSError, ValueError, KeyError):
+        return os.path.basename(d)
+
+def list_tenants() -> List[str]:
+    if not os.path.isdir(TENANTS_DIR): return []
+    out = []
+    for n in sorted(os.listdir(TENANTS_DIR)):
+        d = os.path.join(TENANTS_DIR, n)
+        if os.path.isdir(d) and any(os.path.isfile(os.path.join(d, f)) for f in DB_FILES.values()):
+            out.append(shard_tenant(d))
+    return sorted(set(out))
+
+def fan_out(fn: Callable[[str], Any], tenants: Optional[Iterable[str]] = None,
+            max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Exécute fn(tenant) sur chaque shard en parallèle ; une erreur n'interrompt pas les autres."""
+    tl = list(tenants) if tenants is not None else list_tenants()
+    if not tl: return {}
+    workers = max_workers or min(16, len(tl))
+    out: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = {t: ex.submit(fn, t) for t in tl}
+        for t, f in futs.items():
+            try: out[t] = f.result()
+            except Exception as e: out[t] = e
+    return out
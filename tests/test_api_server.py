@@ -0,0 +1,75 @@
+# test_api_server.py — API ASGI appelée en direct (sans uvicorn) sur un backend SQLite temporaire
+
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import api_server
+import storage_backend
+
+def call(method, path, token=None, body=None):
+    scope = {"type": "http", "method": method, "path": path.split("?")[0],
+             "query_string": (path.split("?", 1)[1] if "?" in path else "").encode(),
+             "headers": [(b"authorization", f"Bearer {token}".encode())] if token else []}
+    sent = []
+    async def receive(): return {"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}
+    async def send(msg): sent.append(msg)
+    asyncio.run(api_server.app(scope, receive, send))
+    raw = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return sent[0]["status"], (json.loads(raw) if raw else None)
+
+@pytest.fixture
+def api(monkeypatch):
+    b = storage_backend.SQLiteBackend(); b.init()
+    monkeypatch.setattr(storage_backend, "_BACKEND", b)
+    return b
+
+def _token(role):
+    return api_server.issue_token({"email": f"{role}@example.com", "tenant_id": "default", "role": role})
+
+ROWS = [{"Domain": "Accès", "ID": "A1", "Item": "a", "Contrôle": "MFA ?", "Level": "", "Comment": ""}]
+
+def test_norm_write_requires_admin(api):
+    user = _token("user")
+    assert call("PUT", "/norms/N1", user, {"rows": ROWS})[0] == 403
+    assert api.list_norms("default") == []
+    api.save_norm("default", "N1", pd.DataFrame(ROWS))
+    assert call("DELETE", "/norms/N1", user)[0] == 403
+    assert call("GET", "/norms/N1", user)[0] == 200  # lecture ouverte aux utilisateurs du tenant
+
+def test_norm_write_as_admin(api):
+    admin = _token("admin")
+    status, meta = call("PUT", "/norms/N1", admin, {"rows": ROWS})
+    assert status == 200 and meta["name"] == "N1"
+    assert call("DELETE", "/norms/N1", admin)[0] == 204
+    assert call("DELETE", "/norms/N1", admin)[0] == 404
+
+def test_requires_token(api):
+    assert call("GET", "/norms")[0] == 401
+
+def _tenant_token(tenant):
+    return api_server.issue_token({"email": f"u@{tenant}.example.com", "tenant_id": tenant, "role": "user"})
+
+CROSS = ["/audits", "/changes", "/metrics", "/trends"]
+
+def test_single_file_cross_audit_views_are_admin_only(api):
+    api.upsert_responses("a-t1", [{"domain": "D", "qid": "Q", "item": "I", "level": "conforme"}], tenant_id="t1")
+    api.upsert_responses("a-t2", [{"domain": "D", "qid": "Q", "item": "I", "level": "conforme"}], tenant_id="t2")
+    for tok in (_tenant_token("t1"), _tenant_token("t2")):
+        assert [call("GET", p, tok)[0] for p in CROSS] == [403] * len(CROSS)
+        assert call("POST", "/metrics", tok, {})[0] == 403
+        assert call("GET", "/metrics?audits=a-t1", tok)[0] == 200  # ciblé par identifiant
+    assert [call("GET", p, _token("admin"))[0] for p in CROSS] == [200] * len(CROSS)
+
+def test_sharded_tenants_only_see_their_audits(api, tmp_path, monkeypatch):
+    import tenancy
+    monkeypatch.setenv("CYBERPIVOT_SHARDING", "1"); monkeypatch.setattr(tenancy, "TENANTS_DIR", str(tmp_path / "tenants"))
+    for t in ("t1", "t2"):
+        api.upsert_responses(f"a-{t}", [{"domain": "D", "qid": "Q", "item": "I", "level": "conforme"}], tenant_id=t)
+    for t in ("t1", "t2"):
+        st, body = call("GET", "/audits", _tenant_token(t))
+        assert st == 200 and [a["audit_id"] for a in body["items"]] == [f"a-{t}"]
+        st, body = call("GET", "/changes", _tenant_token(t))
+        assert st == 200 and {c["audit_id"] for c in body["changes"]} == {f"a-{t}"}
@@ -0,0 +1,33 @@
+# test_batch_reports.py — génération hors UI : lecture via storage_backend, empreintes, --db hors ligne
+
+import os
+
+import pytest
+
+import batch_reports
+import storage_backend
+
+RECS = [{"domain": "D", "qid": f"Q{i}", "item": "I", "question": f"q{i}", "level": "non conforme", "comment": ""} for i in range(3)]
+
+@pytest.fixture(autouse=True)
+def _reset_backend(monkeypatch):
+    monkeypatch.setattr(batch_reports, "_BACKEND", None)
+
+def test_run_with_db_renders_then_skips(tmp_path):
+    db = str(tmp_path / "offline.db")
+    batch_reports._init_worker(db); b = batch_reports._backend()
+    assert isinstance(b, storage_backend.SQLiteBackend)
+    b.init(); b.upsert_responses("a1", RECS)
+    assert batch_reports.select_audits([]) == ["a1"]
+    out = str(tmp_path / "out"); log = lambda *_: None
+    s = batch_reports.run(["a1"], out, ["docx", "xlsx"], db_path=db, evidence_root=str(tmp_path), workers=1, log=log)
+    assert not s["errors"] and s["written"] == 2 and os.path.isfile(os.path.join(out, "a1", "audit_a1.xlsx"))
+    s = batch_reports.run(["a1"], out, ["docx", "xlsx"], db_path=db, evidence_root=str(tmp_path), workers=1, log=log)
+    assert s["written"] == 0 and s["skipped"] == 2
+
+def test_render_audit_reads_through_configured_backend(tmp_path, monkeypatch):
+    b = storage_backend.SQLAlchemyBackend("sqlite://"); b.init(); b.upsert_responses("a1", RECS)
+    monkeypatch.setattr(batch_reports, "_BACKEND", b)
+    r = batch_reports.render_audit("a1", str(tmp_path / "out"), ["xlsx"], evidence_root=str(tmp_path))
+    assert not r["error"] and r["written"] == ["xlsx"] and r["metrics"]
+    assert batch_reports.render_audit("inconnu", str(tmp_path / "out"), ["xlsx"])["error"]
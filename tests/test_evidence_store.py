@@ -0,0 +1,58 @@
+# test_evidence_store.py — import en masse des preuves : association, dédoublonnage, nettoyage sur échec
+
+import os
+
+import pytest
+
+import evidence_store
+
+CONTROLS = [("Q1", "I"), ("Q2", "I")]
+
+@pytest.fixture
+def src(tmp_path):
+    d = tmp_path / "src"; d.mkdir()
+    (d / "Q1__a.txt").write_bytes(b"a"); (d / "Q2__b.txt").write_bytes(b"b"); (d / "Q2__copie.txt").write_bytes(b"b")
+    return str(d)
+
+def _files(root):
+    return sorted(f for _, _, fs in os.walk(root) for f in fs)
+
+def test_ingest_matches_and_dedups(src, tmp_path):
+    root = str(tmp_path / "ev"); got = []
+    res = evidence_store.ingest(src, CONTROLS, "a1", dest=lambda q, i: evidence_store.evidence_dir("a1", q, i, root=root),
+                                record=got.extend)
+    assert res["attached"] == 2 and res["duplicates"] == 1 and not res["unmatched"]
+    assert {(r["qid"], r["item"]) for r in got} == set(CONTROLS) and all(os.path.isfile(r["path"]) for r in got)
+
+def test_failed_record_removes_placed_files(src, tmp_path):
+    root = str(tmp_path / "ev")
+    def record(rows): raise RuntimeError("base indisponible")
+    with pytest.raises(RuntimeError):
+        evidence_store.ingest(src, CONTROLS, "a1", dest=lambda q, i: evidence_store.evidence_dir("a1", q, i, root=root),
+                              record=record)
+    assert _files(root) == []
+
+def test_failure_mid_import_removes_placed_files(src, tmp_path):
+    root = str(tmp_path / "ev")
+    def progress(k, total, nbytes):
+        if k == 2: raise OSError("disque plein")
+    with pytest.raises(OSError):
+        evidence_store.ingest(src, CONTROLS, "a1", dest=lambda q, i: evidence_store.evidence_dir("a1", q, i, root=root),
+                              record=lambda rows: None, progress=progress)
+    assert _files(root) == []
+
+def test_reimport_after_delete_attaches_again(src, tmp_path, monkeypatch):
+    import storage_backend
+    from engine import evidence
+    monkeypatch.chdir(tmp_path); b = storage_backend.SQLiteBackend(); b.init()
+    first = evidence_store.ingest_for_audit("a1", src, CONTROLS, backend=b)
+    assert first["attached"] == 2
+    p = next(r for r in first["rows"] if r["qid"] == "Q1")
+    # suppression depuis l'UI : fichier + ligne evidence
+    assert evidence.delete_file(p["path"]) and b.delete_evidence("a1", "Q1", "I", p["name"])
+    again = evidence_store.ingest_for_audit("a1", src, CONTROLS, backend=b)
+    assert again["attached"] == 1 and again["duplicates"] == 2
+    # suppression hors UI : la ligne reste, le fichier a disparu => ré-importé quand même
+    os.remove(again["rows"][0]["path"])
+    third = evidence_store.ingest_for_audit("a1", src, CONTROLS, backend=b)
+    assert third["attached"] == 1 and os.path.isfile(third["rows"][0]["path"])
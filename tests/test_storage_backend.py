@@ -0,0 +1,166 @@
+# test_storage_backend.py — contrat StorageBackend : mêmes résultats en SQLite et en SQLAlchemy (PostgreSQL)
+
+import threading
+
+import pandas as pd
+import pytest
+
+import storage_backend
+
+AUDIT = "audit-1"
+
+def _recs(n=5, level="conforme"):
+    return [{"domain": f"D{i % 2}", "qid": f"Q{i}", "item": "I", "question": f"Question {i}",
+             "level": level, "comment": f"c{i}", "evidence": [{"name": f"Q{i}.pdf"}] if i == 0 else []} for i in range(n)]
+
+def _norm_df():
+    return pd.DataFrame({"Domain": ["Accès", "Accès", "Réseau"], "ID": ["A1", "A2", "R1"], "Item": ["a", "b", "c"],
+                         "Contrôle": ["MFA activé ?", "Revue des droits ?", "Pare-feu ?"], "Level": ["", "", ""],
+                         "Comment": ["", "", ""]})
+
+# ============================================================
+# Réponses
+# ============================================================
+def test_upsert_list_get(backend):
+    assert backend.upsert_responses(AUDIT, _recs()) == 5
+    rows = backend.list_responses(AUDIT)
+    assert len(rows) == 5 and {r["qid"] for r in rows} == {f"Q{i}" for i in range(5)}
+    r = backend.get_response(AUDIT, "Q0", "I")
+    assert r["level"] == "conforme" and r["comment"] == "c0" and "Q0.pdf" in r["evidence_json"]
+    assert backend.get_response(AUDIT, "Q9", "I") is None
+
+def test_upsert_is_idempotent_and_updates(backend):
+    backend.upsert_responses(AUDIT, _recs())
+    backend.upsert_response(AUDIT, {"domain": "D0", "qid": "Q0", "item": "I", "level": "non conforme", "comment": "modifié"})
+    assert len(backend.list_responses(AUDIT)) == 5
+    r = backend.get_response(AUDIT, "Q0", "I")
+    assert (r["level"], r["comment"]) == ("non conforme", "modifié")
+
+def test_upsert_rejects_missing_keys(backend):
+    with pytest.raises(ValueError):
+        backend.upsert_responses(AUDIT, [{"domain": "D", "qid": "", "item": "I"}])
+
+def test_list_audits(backend):
+    backend.upsert_responses(AUDIT, _recs(3)); backend.upsert_responses("audit-2", _recs(2))
+    got = {a["audit_id"]: a["n_responses"] for a in backend.list_audits()}
+    assert got == {AUDIT: 3, "audit-2": 2}
+
+def test_query_filters_and_pagination(backend):
+    backend.upsert_responses(AUDIT, _recs(6))
+    backend.upsert_response(AUDIT, {"domain": "D1", "qid": "Q1", "item": "I", "level": "non conforme"})
+    d1 = backend.query_responses(AUDIT, columns=["domain", "qid", "item", "level"], domains=["D1"])
+    assert {r["qid"] for r in d1} == {"Q1", "Q3", "Q5"} and set(d1[0]) == {"domain", "qid", "item", "level"}
+    nc = backend.query_responses(AUDIT, levels=["non conforme"])
+    assert [r["qid"] for r in nc] == ["Q1"]
+    page1 = backend.query_responses(AUDIT, limit=4)
+    last = page1[-1]
+    page2 = backend.query_responses(AUDIT, after=(last["domain"], last["qid"], last["item"]), limit=4)
+    assert len(page1) == 4 and len(page2) == 2
+    assert {r["qid"] for r in page1} | {r["qid"] for r in page2} == {f"Q{i}" for i in range(6)}
+
+def test_query_as_frame(backend):
+    backend.upsert_responses(AUDIT, _recs())
+    df = backend.query_responses(AUDIT, columns=["domain", "qid", "level"], as_frame=True)
+    assert isinstance(df, pd.DataFrame) and list(df.columns) == ["domain", "qid", "level"] and len(df) == 5
+    assert backend.query_responses("inconnu", columns=["qid"], as_frame=True).empty
+
+def test_delete_and_change_log(backend):
+    backend.upsert_responses(AUDIT, _recs(3))
+    seq = backend.last_change_seq()
+    assert backend.delete_response(AUDIT, "Q0", "I") is True
+    assert backend.delete_response(AUDIT, "Q0", "I") is False
+    ch = backend.changes_since(seq)
+    assert [(c["qid"], c["op"]) for c in ch["changes"]] == [("Q0", "delete")]
+    assert backend.delete_responses(AUDIT) == 2 and backend.list_responses(AUDIT) == []
+
+def test_change_log_tail_misses_nothing_under_concurrent_writers(backend):
+    # un lecteur qui suit changes_since pendant des écritures concurrentes ne doit sauter aucun seq
+    if backend.name == "sqlalchemy" and backend.engine.dialect.name == "sqlite":
+        pytest.skip("sqlite:// en mémoire : connexion unique, pas d'écrivains concurrents")
+    writers, per = 4, 25; done = threading.Event(); seen = []
+    def write(w):
+        for i in range(per): backend.upsert_responses(AUDIT, [{"domain": "D", "qid": f"W{w}-{i}", "item": "I", "level": "conforme"}])
+    def tail():
+        cur = 0
+        while True:
+            last = done.is_set(); page = backend.changes_since(cur, 50)
+            seen.extend(c["seq"] for c in page["changes"]); cur = page["next"]
+            if last and not page["has_more"]: return
+    ts = [threading.Thread(target=write, args=(w,)) for w in range(writers)]; reader = threading.Thread(target=tail)
+    reader.start(); [t.start() for t in ts]; [t.join() for t in ts]; done.set(); reader.join(30)
+    assert len(seen) == writers * per and seen == sorted(seen)
+
+def test_metrics(backend):
+    backend.upsert_responses(AUDIT, _recs(4))
+    backend.upsert_response(AUDIT, {"domain": "D0", "qid": "Q0", "item": "I", "level": "non conforme"})
+    m = backend.audit_metrics([AUDIT])[AUDIT]
+    assert (m["n_total"], m["n_c"], m["n_nc"]) == (4, 3, 1)
+
+# ============================================================
+# Normes
+# ============================================================
+def test_norms_roundtrip(backend):
+    meta = backend.save_norm("default", "ISO 27001", _norm_df())
+    assert meta["name"] == "ISO 27001"
+    assert [n["name"] for n in backend.list_norms("default")] == ["ISO 27001"]
+    df = backend.get_norm_df("default", "ISO 27001")
+    assert list(df["ID"]) == ["A1", "A2", "R1"] and list(df["Contrôle"])[0] == "MFA activé ?"
+    assert backend.get_norm_risk("default", "ISO 27001") is not None
+
+def test_norms_are_scoped_by_tenant(backend):
+    backend.save_norm("acme", "N1", _norm_df())
+    assert backend.list_norms("default") == [] and backend.get_norm_df("default", "N1") is None
+    assert backend.delete_norm("acme", "N1") is True and backend.list_norms("acme") == []
+
+def test_save_norm_overwrites(backend):
+    backend.save_norm("default", "N", _norm_df())
+    backend.save_norm("default", "N", _norm_df().head(1))
+    assert len(backend.list_norms("default")) == 1 and len(backend.get_norm_df("default", "N")) == 1
+
+# ============================================================
+# Utilisateurs
+# ============================================================
+def test_users(backend):
+    u = backend.create_user("Alice@Example.com", "s3cret!", full_name="Alice", tenant_id="acme")
+    assert u["email"] == "alice@example.com"
+    assert backend.user_exists("alice@example.com")
+    assert backend.verify_password("alice@example.com", "s3cret!")["tenant_id"] == "acme"
+    assert backend.verify_password("alice@example.com", "mauvais") is None
+    backend.set_password("alice@example.com", "n0uveau")
+    assert backend.verify_password("alice@example.com", "n0uveau") is not None
+    backend.update_user_profile("alice@example.com", full_name="Alice B.", tenant_id="globex")
+    g = backend.get_user("alice@example.com")
+    assert (g["full_name"], g["tenant_id"]) == ("Alice B.", "globex")
+    assert "alice@example.com" in {x["email"] for x in backend.list_users()}
+
+def test_get_or_create_user(backend):
+    a = backend.get_or_create_user("sso@example.com", "SSO")
+    b = backend.get_or_create_user("SSO@example.com")
+    assert a["email"] == b["email"] == "sso@example.com"
+    assert backend.verify_password("sso@example.com", "") is None  # pas de mot de passe local
+
+# ============================================================
+# Preuves (métadonnées)
+# ============================================================
+def test_evidence(backend):
+    backend.add_evidence(AUDIT, "Q0", "I", "a.pdf", "/e/a.pdf", sha256="aa", size=10)
+    n = backend.add_evidence_many([{"audit_id": AUDIT, "qid": "Q1", "item": "I", "name": "b.pdf", "path": "/e/b.pdf",
+                                    "sha256": "bb", "bytes": 20, "created_at": "2026-01-01T00:00:00"}])
+    assert n == 1
+    assert {e["name"] for e in backend.list_evidence(AUDIT)} == {"a.pdf", "b.pdf"}
+    assert [e["name"] for e in backend.list_evidence(AUDIT, qid="Q1", item="I")] == ["b.pdf"]
+    assert backend.delete_evidence(AUDIT, "Q0", "I", "a.pdf") is True
+    assert backend.delete_evidence(AUDIT, "Q0", "I", "a.pdf") is False
+    assert [e["name"] for e in backend.list_evidence(AUDIT)] == ["b.pdf"]
+
+# ============================================================
+# Sélection du backend
+# ============================================================
+def test_make_backend_rejects_unknown_dialect():
+    with pytest.raises(ValueError, match="dialecte"):
+        storage_backend.make_backend("mysql+pymysql://u@localhost/db")
+
+def test_make_backend_rejects_sql_url_with_sharding(monkeypatch):
+    monkeypatch.setenv("CYBERPIVOT_SHARDING", "1")
+    with pytest.raises(ValueError, match="SHARDING"):
+        storage_backend.make_backend("sqlite://")
@@ -0,0 +1,51 @@
+# test_tenancy.py — shards par tenant : noms sans collision, vues multi-clients complètes
+
+import os
+
+import pytest
+
+import norms
+import storage
+import tenancy
+from tests.test_storage_backend import _norm_df
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    monkeypatch.setenv("CYBERPIVOT_SHARDING", "1")
+    monkeypatch.setattr(tenancy, "TENANTS_DIR", str(tmp_path / "tenants"))
+    return tmp_path / "tenants"
+
+def test_similar_tenant_ids_get_distinct_shards(shards):
+    assert tenancy.safe_tenant("Acme Corp") == tenancy.safe_tenant("acme-corp")
+    assert tenancy.tenant_dir("Acme Corp") != tenancy.tenant_dir("acme-corp")
+    norms.save_norm("Acme Corp", "N1", _norm_df()); norms.save_norm("acme-corp", "N2", _norm_df())
+    assert [n["name"] for n in norms.list_norms("Acme Corp")] == ["N1"]
+    assert [n["name"] for n in norms.list_norms("acme-corp")] == ["N2"]
+    assert sorted(tenancy.list_tenants()) == ["Acme Corp", "acme-corp"]
+    allv = norms.list_norms_all_tenants()
+    assert {t: [n["name"] for n in v] for t, v in allv.items()} == {"Acme Corp": ["N1"], "acme-corp": ["N2"]}
+
+def test_audits_all_tenants_keyed_by_real_id(shards):
+    storage.upsert_responses("a1", [{"domain": "D", "qid": "Q", "item": "I"}], tenant_id="Acme Corp")
+    storage.upsert_responses("a2", [{"domain": "D", "qid": "Q", "item": "I"}], tenant_id="acme-corp")
+    got = {t: [a["audit_id"] for a in v] for t, v in storage.list_audits_all_tenants().items()}
+    assert got == {"Acme Corp": ["a1"], "acme-corp": ["a2"]}
+
+def test_slug_only_directory_is_not_shared(shards):
+    os.makedirs(shards / "acme-corp")
+    assert os.path.basename(tenancy.tenant_dir("Acme Corp")) != "acme-corp"
+    assert tenancy.tenant_dir("Acme Corp") != tenancy.tenant_dir("acme-corp")
+
+def test_concurrent_first_resolve(shards, monkeypatch):
+    import threading
+    errs = []; n = 4; barrier = threading.Barrier(n); mk = os.makedirs
+    def makedirs(*a, **kw):  # tous les threads ont vu le dossier absent avant sa création
+        barrier.wait(5); mk(*a, **kw)
+    monkeypatch.setattr(tenancy.os, "makedirs", makedirs)
+    def go():
+        try: tenancy.resolve("storage", "Nouveau client", "unused.db")
+        except Exception as e: errs.append(e)
+    ts = [threading.Thread(target=go) for _ in range(n)]; [t.start() for t in ts]; [t.join() for t in ts]
+    d = tenancy.tenant_dir("Nouveau client")
+    assert errs == [] and tenancy.shard_tenant(d) == "Nouveau client"
+    assert [f for f in os.listdir(d) if f.endswith(".part")] == []
@@ -0,0 +1,28 @@
+# test_trends.py — points de tendance : perte espérée identique à celle de /risk et des rapports par lots
+
+import pandas as pd
+
+import api_server
+import batch_reports
+import storage_backend
+from engine import trends
+
+RECS = [{"domain": "Accès", "qid": f"A{i}", "item": f"{i}", "question": q, "level": lv, "comment": "", "evidence": []}
+        for i, (q, lv) in enumerate([("MFA activé pour les comptes à privilèges ?", "non conforme"),
+                                     ("Revue trimestrielle des droits ?", "partiellement conforme"),
+                                     ("Sauvegardes chiffrées ?", "conforme")])]
+
+def test_expected_loss_matches_risk_api_and_batch(monkeypatch):
+    b = storage_backend.SQLiteBackend(); b.init(); b.upsert_responses("a1", RECS)
+    monkeypatch.setattr(storage_backend, "_BACKEND", b)
+    df = b.query_responses("a1", columns=trends.COLUMNS, as_frame=True)
+    loss = trends.points("a1", df)[0]["expected_loss"]
+    api = api_server._risk_rows("a1", None, 100)["exp_loss_total"]
+    rows = [tuple(r[c] for c in batch_reports.RESP_COLS) for r in b.query_responses("a1", columns=batch_reports.RESP_COLS)]
+    batch = float(batch_reports._frames(rows)[1]["exp_loss"].sum())
+    assert loss > 0 and round(api, 2) == loss == round(batch, 2)
+
+def test_points_per_domain_and_global():
+    df = pd.DataFrame(RECS).assign(evidence_json="")
+    pts = trends.points("a1", df)
+    assert [p["domain"] for p in pts] == ["", "Accès"] and pts[0]["rate"] == 50.0 and pts[0]["n_total"] == 3
@@ -0,0 +1,39 @@
+# test_webhooks.py — diffuseur du journal des changements : curseurs, réveil après commit de write_queue
+
+import json
+
+import storage_backend
+import webhooks
+import write_queue
+
+def _dispatcher(tmp_path, sent, cls=webhooks.Dispatcher, **kw):
+    def send(url, body, headers):
+        sent.append(json.loads(body)); return 200
+    return cls([webhooks.Subscriber("s", "http://hook")], backend=storage_backend.SQLiteBackend(),
+                               state_path=str(tmp_path / "state.json"), send=send, **kw)
+
+def test_deliver_once_advances_cursor(tmp_path):
+    sent = []; d = _dispatcher(tmp_path, sent); b = d.backend; b.init()
+    assert d.deliver_once(d.subs[0]) == 0  # nouvel abonné : pas de rejeu de l'historique
+    b.upsert_responses("A", [{"domain": "D", "qid": "Q1", "item": "I", "level": "conforme"}])
+    assert d.deliver_once(d.subs[0]) == 1 and sent[0]["changes"][0]["qid"] == "Q1"
+    assert d.deliver_once(d.subs[0]) == 0
+    assert webhooks.Dispatcher(d.subs, backend=b, state_path=d.state_path).cursors == d.cursors
+
+def test_commit_wakes_embedded_dispatcher(tmp_path, monkeypatch):
+    sent = []; backend = storage_backend.SQLiteBackend(); backend.init()
+    monkeypatch.setattr(write_queue, "_LISTENERS", []); monkeypatch.setattr(write_queue, "_QUEUES", {})
+    monkeypatch.setattr(webhooks, "_DISPATCHER", None)
+    monkeypatch.setattr(webhooks, "load_subscribers", lambda: [webhooks.Subscriber("s", "http://hook")])
+    monkeypatch.setattr(webhooks, "Dispatcher", lambda subs: _dispatcher(tmp_path, sent, poll=60).start())
+    d = webhooks.start_in_thread(); q = write_queue.get_queue(None, backend)
+    try:
+        assert webhooks._on_commit in write_queue._LISTENERS
+        d._cursor(d.subs[0])
+        q.submit("A", [{"domain": "D", "qid": "Q1", "item": "I", "level": "conforme"}]); q.flush(5)
+        for _ in range(100):
+            if sent: break
+            d._stop.wait(0.05)
+        assert sent and sent[0]["changes"][0]["qid"] == "Q1"  # livré sans attendre les 60 s d'interrogation
+    finally:
+        d.stop(); q.close()
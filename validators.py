@@ -1,37 +1,123 @@
 # validators.py — chargement Excel/CSV & normalisation
+# ============================================================
+# - load_norme_excel(file)       : DataFrame complet (comportement historique, lecture en flux)
+# - iter_norme_chunks(file, ...) : lecture en flux (openpyxl read_only / CSV par blocs),
+#                                  alias de colonnes résolus une fois sur l'en-tête,
+#                                  normalisation vectorisée par bloc
+# - import_norm(file, name, save, ...) : valide (erreurs par ligne), publie via save(tenant, name, df)
+# ============================================================
+
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 
 REQUIRED_COLS = ["Domain", "QID", "Item", "Question"]
+OUT_COLS = REQUIRED_COLS + ["Level", "Comment"]
+DEFAULTS = {"Level": "No"}
+# en-têtes acceptés (insensibles à la casse / aux espaces), par ordre de préférence
+ALIASES = {
+    "Domain": ["domain", "domaine"],
+    "QID": ["qid", "id"],
+    "Item": ["item"],
+    "Question": ["question", "contrôle", "controle", "control"],
+    "Level": ["level", "niveau"],
+    "Comment": ["comment", "commentaire"],
+}
+CHUNK_ROWS = int(os.getenv("CYBERPIVOT_IMPORT_CHUNK", "5000"))
 
-def load_norme_excel(file) -> pd.DataFrame:
-    name = getattr(file, "name", "").lower()
-    if name.endswith(".csv"):
-        df = pd.read_csv(file, encoding="utf-8")
-    else:
-        df = pd.read_excel(file)
+def resolve_columns(header) -> Dict[str, Optional[int]]:
+    """Position de chaque colonne cible dans l'en-tête (None si absente)."""
+    pos: Dict[str, int] = {}
+    for i, h in enumerate(header):
+        if h is not None: pos[str(h).strip().lower()] = i
+    return {c: next((pos[a] for a in ALIASES[c] if a in pos), None) for c in OUT_COLS}
 
-    cols = list(df.columns)
-    alias = {c.lower().strip(): c for c in cols}
-    def pick(key):
-        for k in alias:
-            if k == key.lower(): return alias[k]
-        return None
+def _to_str(s: pd.Series) -> pd.Series:
+    """Équivalent vectorisé de astype("string").fillna("").map(str)."""
+    return s.astype("string").fillna("").astype(str)
 
-    out = pd.DataFrame()
-    for c in REQUIRED_COLS:
-        src = pick(c) or c
-        out[c] = df[src] if src in df.columns else ""
+def _normalize_chunk(raw: pd.DataFrame, cols: Dict[str, Optional[int]]) -> pd.DataFrame:
+    out = {}
+    for c in OUT_COLS:
+        i = cols[c]
+        out[c] = _to_str(raw.iloc[:, i]) if i is not None and i < raw.shape[1] else pd.Series(DEFAULTS.get(c, ""), index=raw.index).astype(str)
+    return pd.DataFrame(out, index=raw.index)
 
-    out["Level"] = df[pick("Level")] if pick("Level") in df.columns else "No"
-    out["Comment"] = df[pick("Comment")] if pick("Comment") in df.columns else ""
+def _excel_chunks(file, chunk_rows: int):
+    """(en-tête, itérateur de blocs DataFrame, nb de lignes annoncé par la feuille) via openpyxl read_only."""
+    from openpyxl import load_workbook
+    wb = load_workbook(file, read_only=True, data_only=True)
+    ws = wb.active; rows = ws.iter_rows(values_only=True)
+    header = list(next(rows, ()) or ())
+    total = (ws.max_row - 1) if ws.max_row else None
+    def gen():
+        try:
+            buf: List[Tuple[Any, ...]] = []
+            for r in rows:
+                buf.append(r)
+                if len(buf) >= chunk_rows:
+                    yield pd.DataFrame.from_records(buf); buf = []
+            if buf: yield pd.DataFrame.from_records(buf)
+        finally:
+            wb.close()
+    return header, gen(), total
 
-    for c in ["Domain","QID","Item","Question","Level","Comment"]:
-        out[c] = out[c].astype("string").fillna("").map(lambda v: str(v) if v is not None else "")
+def iter_norme_chunks(file, chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[pd.DataFrame, Optional[int]]]:
+    """(bloc normalisé OUT_COLS indexé par n° de ligne du fichier, total de lignes si connu) ;
+    lignes vides incluses."""
+    name = getattr(file, "name", str(file) if isinstance(file, (str, os.PathLike)) else "").lower()
+    if hasattr(file, "seek"): file.seek(0)
+    if name.endswith(".csv"):
+        reader = pd.read_csv(file, encoding="utf-8", chunksize=chunk_rows)
+        cols = None; row = 2
+        for raw in reader:
+            if cols is None: cols = resolve_columns(raw.columns)
+            raw.index = range(row, row + len(raw)); row += len(raw)
+            yield _normalize_chunk(raw, cols), None
+        return
+    if name.endswith(".xls"):  # format binaire : pas de lecture en flux possible
+        df = pd.read_excel(file); cols = resolve_columns(df.columns)
+        for k in range(0, len(df), chunk_rows):
+            raw = df.iloc[k:k + chunk_rows].copy(); raw.index = range(k + 2, k + 2 + len(raw))
+            yield _normalize_chunk(raw, cols), len(df)
+        return
+    header, chunks, total = _excel_chunks(file, chunk_rows)
+    cols = resolve_columns(header); row = 2
+    for raw in chunks:
+        raw.index = range(row, row + len(raw)); row += len(raw)
+        yield _normalize_chunk(raw, cols), total
 
+def _nonblank(d: pd.DataFrame) -> pd.Series:
     # garder les lignes où au moins un identifiant est renseigné
-    mask = (out["Domain"].str.strip()!="") | (out["QID"].str.strip()!="") | (out["Item"].str.strip()!="")
-    out = out[mask].reset_index(drop=True)
-    return out
+    return (d["Domain"].str.strip() != "") | (d["QID"].str.strip() != "") | (d["Item"].str.strip() != "")
 
+def load_norme_excel(file) -> pd.DataFrame:
+    parts = [d[_nonblank(d)] for d, _ in iter_norme_chunks(file)]
+    if not parts: return pd.DataFrame({c: pd.Series(dtype=str) for c in OUT_COLS})
+    return pd.concat(parts, ignore_index=True)
 
+def import_norm(file, name: str, save: Callable[[str, str, pd.DataFrame], Dict], tenant_id: str = "default",
+                chunk_rows: int = CHUNK_ROWS, progress: Optional[Callable[[int, Optional[int]], None]] = None,
+                max_errors: int = 1000) -> Dict[str, Any]:
+    """Lit en flux, écarte les lignes invalides (sans QID ni Item, doublon QID+Item) avec leur n° de
+    ligne, puis publie la norme (colonnes ID / Contrôle) en une seule écriture."""
+    t0 = time.perf_counter()
+    parts: List[pd.DataFrame] = []; errors: List[Dict[str, Any]] = []; n_read = 0; n_err = 0
+    def _report(rows, msg):
+        nonlocal n_err
+        n_err += len(rows)
+        errors.extend({"row": int(r), "error": msg} for r in rows[:max(0, max_errors - len(errors))])
+    for d, total in iter_norme_chunks(file, chunk_rows):
+        n_read += len(d)
+        d = d[_nonblank(d)]
+        bad = (d["QID"].str.strip() == "") & (d["Item"].str.strip() == "")
+        _report(d.index[bad], "ni QID ni Item"); parts.append(d[~bad])
+        if progress: progress(n_read, total)
+    df = pd.concat(parts) if parts else pd.DataFrame(columns=OUT_COLS)
+    dup = (df["QID"].str.strip() + "\x1f" + df["Item"].str.strip()).duplicated()
+    _report(df.index[dup], "doublon QID+Item"); df = df[~dup]
+    info = save(tenant_id, name, df.rename(columns={"QID": "ID", "Question": "Contrôle"})) if len(df) else None
+    return {"info": info, "rows_read": n_read, "rows_imported": len(df), "n_errors": n_err,
+            "errors": errors, "seconds": round(time.perf_counter() - t0, 3)}
@@ -0,0 +1,180 @@
+# webhooks.py — diffusion du journal des changements (response_changes) vers des webhooks
+# ============================================================
+# - Abonnés : CYBERPIVOT_WEBHOOKS="https://a/hook,https://b/hook"
+#             ou CYBERPIVOT_WEBHOOKS_FILE=webhooks.json : [{name, url, secret, tenant, audits}]
+# - Un curseur (dernier seq acquitté) par abonné, persisté dans CYBERPIVOT_WEBHOOKS_STATE (JSON) :
+#   reprise exacte après redémarrage ; un nouvel abonné part du seq courant (pas de rejeu de l'historique)
+# - Livraison « au moins une fois » par lots (BATCH changements) : le curseur n'avance qu'après un 2xx ;
+#   X-CyberPivot-Delivery = <abonné>:<seq de fin> permet au consommateur de dédoublonner
+# - Échec : backoff exponentiel plafonné + gigue, par abonné (un abonné en panne ne bloque pas les autres)
+# - Signature optionnelle : X-CyberPivot-Signature = sha256=HMAC(secret, corps)
+# Lancement : python webhooks.py  |  embarqué : start_in_thread() (cf. app_cyberpivot.py),
+#   réveillé après chaque commit de write_queue (sinon interrogation toutes les POLL_S)
+# ============================================================
+
+import os
+import hmac
+import json
+import time
+import random
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional
+
+import storage_backend
+import write_queue
+
+BATCH = int(os.getenv("CYBERPIVOT_WEBHOOKS_BATCH", "500"))
+POLL_S = float(os.getenv("CYBERPIVOT_WEBHOOKS_POLL_MS", "1000")) / 1000.0
+TIMEOUT_S = float(os.getenv("CYBERPIVOT_WEBHOOKS_TIMEOUT_S", "10"))
+BACKOFF_BASE_S, BACKOFF_MAX_S = 1.0, 300.0
+STATE_PATH = os.getenv("CYBERPIVOT_WEBHOOKS_STATE", "webhooks_state.json")
+
+class Subscriber:
+    def __init__(self, name: str, url: str, secret: str = "", tenant: Optional[str] = None,
+                 audits: Optional[List[str]] = None):
+        self.name = name; self.url = url; self.secret = secret; self.tenant = tenant; self.audits = audits
+        self.failures = 0; self.next_try = 0.0; self.last_error = ""; self.delivered = 0
+        self.stats = {"batches": 0, "retries": 0}
+
+def load_subscribers() -> List[Subscriber]:
+    path = os.getenv("CYBERPIVOT_WEBHOOKS_FILE", "")
+    if path and os.path.isfile(path):
+        with open(path, encoding="utf-8") as f: conf = json.load(f)
+        return [Subscriber(name=c.get("name") or c["url"], url=c["url"], secret=c.get("secret") or "",
+                           tenant=c.get("tenant"), audits=c.get("audits")) for c in conf]
+    urls = [u.strip() for u in os.getenv("CYBERPIVOT_WEBHOOKS", "").split(",") if u.strip()]
+    return [Subscriber(name=u, url=u, secret=os.getenv("CYBERPIVOT_WEBHOOKS_SECRET", "")) for u in urls]
+
+def backoff(failures: int, base: float = BACKOFF_BASE_S, cap: float = BACKOFF_MAX_S) -> float:
+    """Délai avant la tentative suivante : base × 2^(n-1), plafonné, gigue ×[0.5, 1.5)."""
+    return min(cap, base * (2 ** max(0, failures - 1))) * (0.5 + random.random())
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+def post_json(url: str, body: bytes, headers: Dict[str, str], timeout: float = TIMEOUT_S) -> int:
+    req = urllib.request.Request(url, data=body, method="POST", headers={"Content-Type": "application/json", **headers})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r: return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+class Dispatcher:
+    def __init__(self, subscribers: List[Subscriber], backend: Optional[storage_backend.StorageBackend] = None,
+                 state_path: str = STATE_PATH, batch: int = BATCH, poll: float = POLL_S,
+                 send: Callable[[str, bytes, Dict[str, str]], int] = post_json):
+        self.subs = subscribers; self.backend = backend or storage_backend.get_backend()
+        self.state_path = state_path; self.batch = batch; self.poll = poll; self._send = send
+        self.cursors: Dict[str, int] = self._load_state()
+        self._stop = threading.Event(); self._wake = threading.Event(); self._thread: Optional[threading.Thread] = None
+
+    # ---- curseurs ----
+    def _load_state(self) -> Dict[str, int]:
+        try:
+            with open(self.state_path, encoding="utf-8") as f: return {k: int(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        tmp = self.state_path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(self.cursors, f)
+        os.replace(tmp, self.state_path)
+
+    def _cursor(self, s: Subscriber) -> int:
+        if s.name not in self.cursors:
+            # nouvel abonné : à partir de maintenant (la réplication initiale passe par l'API de lecture)
+            self.cursors[s.name] = self.backend.last_change_seq(tenant_id=s.tenant); self._save_state()
+        return self.cursors[s.name]
+
+    # ---- livraison ----
+    def deliver_once(self, s: Subscriber) -> int:
+        """Envoie au plus un lot ; renvoie le nombre de changements acquittés (0 si rien / échec)."""
+        since = self._cursor(s)
+        page = self.backend.changes_since(since, self.batch, s.audits, tenant_id=s.tenant)
+        if not page["changes"]:
+            return 0
+        body = json.dumps({"subscriber": s.name, "tenant": s.tenant, "from_seq": since, "to_seq": page["next"],
+                           "changes": page["changes"]}, ensure_ascii=False).encode("utf-8")
+        headers = {"X-CyberPivot-Event": "response.changes", "X-CyberPivot-Delivery": f"{s.name}:{page['next']}"}
+        if s.secret: headers["X-CyberPivot-Signature"] = sign(s.secret, body)
+        try:
+            status = self._send(s.url, body, headers); err = "" if 200 <= status < 300 else f"HTTP {status}"
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+        if err:
+            s.failures += 1; s.stats["retries"] += 1; s.last_error = err
+            s.next_try = time.monotonic() + backoff(s.failures)
+            return 0
+        s.failures = 0; s.last_error = ""; s.next_try = 0.0; s.delivered += len(page["changes"]); s.stats["batches"] += 1
+        self.cursors[s.name] = page["next"]; self._save_state()
+        return len(page["changes"])
+
+    def run_once(self) -> int:
+        """Un tour sur les abonnés prêts ; renvoie le nombre de changements livrés."""
+        now = time.monotonic(); n = 0
+        for s in self.subs:
+            if s.next_try <= now: n += self.deliver_once(s)
+        return n
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try: n = self.run_once()
+            except Exception: n = 0  # base momentanément indisponible : nouveau tour au prochain réveil
+            if n: continue  # arriéré : on enchaîne les lots
+            pending = [s.next_try - time.monotonic() for s in self.subs if s.next_try]
+            wait = min([self.poll] + [max(0.0, p) for p in pending])
+            self._wake.wait(wait); self._wake.clear()
+
+    def notify(self) -> None:
+        """Réveille la boucle (ex. après une écriture) sans attendre l'intervalle d'interrogation."""
+        self._wake.set()
+
+    def start(self) -> "Dispatcher":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="cp-webhooks", daemon=True); self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set(); self._wake.set()
+        if self._thread is not None: self._thread.join(timeout)
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [{"name": s.name, "url": s.url, "cursor": self.cursors.get(s.name), "delivered": s.delivered,
+                 "failures": s.failures, "last_error": s.last_error, **s.stats} for s in self.subs]
+
+_DISPATCHER: Optional[Dispatcher] = None
+_LOCK = threading.Lock()
+
+def start_in_thread() -> Optional[Dispatcher]:
+    """Démarre le diffuseur une seule fois par processus ; None si aucun abonné configuré."""
+    global _DISPATCHER
+    with _LOCK:
+        if _DISPATCHER is None:
+            subs = load_subscribers()
+            if not subs: return None
+            _DISPATCHER = Dispatcher(subs).start()
+            write_queue.add_listener(_on_commit)
+    return _DISPATCHER
+
+def _on_commit(tenant_id: Optional[str], backend: storage_backend.StorageBackend, audit_ids: List[str]) -> None:
+    """Écouteur write_queue : livre sans attendre le prochain tour d'interrogation."""
+    if _DISPATCHER is not None: _DISPATCHER.notify()
+
+def main():
+    subs = load_subscribers()
+    if not subs: raise SystemExit("Aucun abonné : définir CYBERPIVOT_WEBHOOKS ou CYBERPIVOT_WEBHOOKS_FILE.")
+    storage_backend.get_backend().init()
+    d = Dispatcher(subs).start()
+    try:
+        while True:
+            time.sleep(30)
+            for s in d.status(): print(json.dumps(s, ensure_ascii=False))
+    except KeyboardInterrupt:
+        d.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# write_queue.py — file d'écriture asynchrone (write-behind) pour les réponses
+# ============================================================
+# - Un seul thread écrivain par base : plus de contention sur le verrou SQLite
+# - submit(audit_id, recs) -> Future : acquittement de durabilité (résultat = nb de lignes)
+# - Coalescence : plusieurs écritures du même (audit_id, qid, item) => seule la dernière est écrite
+# - Commits groupés : les lots en attente sont vidés ensemble dans une transaction
+# - get_queue(tenant_id) : une file par fichier SQLite (ou par moteur SQLAlchemy et tenant)
+# - add_listener(fn) : fn(tenant_id, backend, audit_ids) après chaque commit (ex. engine.trends)
+# ============================================================
+
+import os
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import storage
+import storage_backend
+
+MAX_BATCH = int(os.getenv("CYBERPIVOT_WQ_MAX_BATCH", "5000"))
+LINGER_S = float(os.getenv("CYBERPIVOT_WQ_LINGER_MS", "20")) / 1000.0
+
+_STOP = object()
+
+class WriteBehindQueue:
+    def __init__(self, writer: Callable[[List[Dict[str, Any]]], int],
+                 max_batch: int = MAX_BATCH, linger: float = LINGER_S, name: str = "cp-writer",
+                 on_commit: Optional[Callable[[List[str]], None]] = None):
+        self._writer = writer; self._on_commit = on_commit
+        self._q: "queue.Queue[Any]" = queue.Queue()
+        self.max_batch = max_batch
+        self.linger = linger
+        self.stats = {"submitted": 0, "written": 0, "coalesced": 0, "commits": 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, audit_id: str, recs: Iterable[Dict[str, Any]]) -> Future:
+        """Valide immédiatement (ValueError côté appelant), écrit en arrière-plan."""
+        now = storage._now()
+        rows = [storage.response_row(audit_id, r, now) for r in recs]
+        fut: Future = Future()
+        if not rows:
+            fut.set_result(0); return fut
+        self._q.put((rows, fut))
+        return fut
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Bloque jusqu'à ce que tout ce qui a été soumis avant l'appel soit durable."""
+        f = Future(); self._q.put(([], f)); f.result(timeout)
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        if self._thread.is_alive():
+            self._q.put(_STOP); self._thread.join(timeout)
+
+    def _drain(self, first) -> Tuple[List[Tuple[List[Dict[str, Any]], Future]], bool]:
+        batch = [first]; n = len(first[0]); stop = False
+        while n < self.max_batch:
+            try: nxt = self._q.get(timeout=self.linger)
+            except queue.Empty: break
+            if nxt is _STOP: stop = True; break
+            batch.append(nxt); n += len(nxt[0])
+        return batch, stop
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is _STOP: return
+            batch, stop = self._drain(first)
+            merged: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+            n_in = 0
+            for rows, _ in batch:
+                for r in rows:
+                    merged[(r["audit_id"], r["qid"], r["item"])] = r; n_in += 1
+            try:
+                if merged: self._writer(list(merged.values()))
+            except Exception as e:
+                for rows, fut in batch: fut.set_exception(e)
+            else:
+                self.stats["submitted"] += n_in; self.stats["written"] += len(merged)
+                self.stats["coalesced"] += n_in - len(merged); self.stats["commits"] += 1 if merged else 0
+                for rows, fut in batch: fut.set_result(len(rows))
+                if merged and self._on_commit is not None:
+                    try: self._on_commit(sorted({k[0] for k in merged}))
+                    except Exception: pass  # un écouteur ne doit jamais bloquer l'écrivain
+            if stop: return
+
+# ============================================================
+# Registre : une file par base
+# ============================================================
+_QUEUES: Dict[str, WriteBehindQueue] = {}
+_LOCK = threading.Lock()
+_LISTENERS: List[Callable[[Optional[str], storage_backend.StorageBackend, List[str]], None]] = []
+
+def add_listener(fn: Callable[[Optional[str], storage_backend.StorageBackend, List[str]], None]) -> None:
+    """Écouteur appelé (thread écrivain) avec les audits touchés par chaque commit ; doit rester rapide."""
+    if fn not in _LISTENERS: _LISTENERS.append(fn)
+
+def _notify(tenant_id: Optional[str], backend: storage_backend.StorageBackend, audit_ids: List[str]) -> None:
+    for fn in list(_LISTENERS):
+        try: fn(tenant_id, backend, audit_ids)
+        except Exception: pass
+
+def get_queue(tenant_id: Optional[str] = None,
+              backend: Optional[storage_backend.StorageBackend] = None) -> WriteBehindQueue:
+    b = backend or storage_backend.get_backend()
+    # une file par (base, tenant) : le tenant passé à write_rows et aux écouteurs est celui de la file
+    key = storage.db_path(tenant_id) if isinstance(b, storage_backend.SQLiteBackend) else f"{b.name}:{id(b)}:{tenant_id or ''}"
+    q = _QUEUES.get(key)
+    if q is None:
+        with _LOCK:
+            q = _QUEUES.get(key)
+            if q is None:
+                q = WriteBehindQueue(lambda rows: b.write_rows(rows, tenant_id=tenant_id), name=f"cp-writer:{key}",
+                                     on_commit=lambda ids: _notify(tenant_id, b, ids))
+                _QUEUES[key] = q
+    return q
+
+@atexit.register
+def _close_all() -> None:
+    for q in list(_QUEUES.values()):
+        try: q.close()
+        except Exception: pass